@@ -0,0 +1,8 @@
+"""
+Main
+"""
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,297 @@
+"""
+Batch
+"""
+import numpy as np
+
+from . import dedup
+from . import vectorized
+
+
+FLUID_FIELDS = (
+    "oil_api_gravity",
+    "gas_specific_gravity",
+    "water_specific_gravity",
+    "water_cut",
+    "production_gas_liquid_ratio",
+)
+
+
+class FluidCatalog:
+    """
+    Set of distinct fluids, each stored once and referenced by its integer
+    index. Identical fluids share an index. Work that only depends on the
+    fluid (and temperature) is done once per fluid: the catalog keeps the
+    bubble points of the (fluid, temperature) pairs it has evaluated and the
+    specialized gradient kernel of every fluid asked for.
+
+    The bubble points are kept in sorted arrays of at most
+    ``_max_bubble_points`` pairs; a call that would exceed it replaces them
+    with its own pairs. Temperatures that differ from well to well rarely
+    repeat, so ``_temperature_step`` optionally rounds them to a multiple of
+    the step first (the bubble points are then those of the rounded
+    temperatures).
+
+    Args:
+        _pvt (optional): PVT source of the bubble points and fluid
+            properties instead of the correlations (see `pvt`).
+        _temperature_step (float, optional): Rounding step of the bubble
+            point temperatures (fahrenheit degrees).
+        _max_bubble_points (int, optional): Bubble points kept.
+    """
+    def __init__(self, _pvt=None, _temperature_step=None,
+                 _max_bubble_points=1 << 18):
+        self.pvt = _pvt
+        self.temperature_step = _temperature_step
+        self.max_bubble_points = _max_bubble_points
+        self._indexes = {}
+        self._fluids = []
+        self._arrays = None
+        self._pairs = np.empty(0, dtype=complex)
+        self._bubble_points = np.empty(0)
+        self.bubble_point_evaluations = 0
+
+    def __len__(self):
+        return len(self._fluids)
+
+    def add(self,
+            _oil_api_gravity,
+            _gas_specific_gravity,
+            _water_specific_gravity=1.07,
+            _water_cut=0.0,
+            _production_gas_liquid_ratio=100.0):
+        """
+        Adds a fluid (unless an identical one is already there).
+
+        Returns:
+            The index of the fluid.
+        """
+        fluid = (float(_oil_api_gravity),
+                 float(_gas_specific_gravity),
+                 float(_water_specific_gravity),
+                 float(_water_cut),
+                 float(_production_gas_liquid_ratio))
+        index = self._indexes.get(fluid)
+        if index is None:
+            index = self._indexes[fluid] = len(self._fluids)
+            self._fluids.append(fluid)
+            self._arrays = None
+        return index
+
+    def fluid(self, _index):
+        """
+        Returns the parameters of a fluid as a dict keyed by `FLUID_FIELDS`.
+        """
+        return dict(zip(FLUID_FIELDS, self._fluids[_index]))
+
+    @property
+    def arrays(self):
+        """
+        Contiguous array of each fluid parameter, one entry per fluid.
+        """
+        if self._arrays is None:
+            table = np.array(self._fluids, dtype=float).reshape(-1, 5)
+            self._arrays = {name: np.ascontiguousarray(table[:, i])
+                            for i, name in enumerate(FLUID_FIELDS)}
+        return self._arrays
+
+    def gather(self, _indexes):
+        """
+        Returns the parameters of the fluids ``_indexes`` refers to, one
+        array per `FLUID_FIELDS` name with the shape of ``_indexes``.
+        """
+        return {name: values.take(_indexes)
+                for name, values in self.arrays.items()}
+
+    def bubble_points(self, _indexes, _temperatures):
+        """
+        Returns the mixture bubble points (:math:`psig`) of fluids at
+        temperatures (both arrays broadcast together). Only the (fluid,
+        temperature) pairs not kept from previous calls are evaluated, in a
+        single vectorized call.
+        """
+        temperatures = np.asarray(_temperatures, dtype=float)
+        if self.temperature_step:
+            temperatures = dedup.quantize(temperatures, self.temperature_step)
+        indexes, temperatures = np.broadcast_arrays(
+            np.asarray(_indexes, dtype=np.int64), temperatures)
+        # Pairs packed as complex numbers sort much faster than rows
+        pairs = indexes.ravel() + 1j * temperatures.ravel()
+        unique, inverse = np.unique(pairs, return_inverse=True)
+        values = np.empty(unique.size)
+        found = np.zeros(unique.size, dtype=bool)
+        if self._pairs.size:
+            position = np.minimum(np.searchsorted(self._pairs, unique),
+                                  self._pairs.size - 1)
+            found = self._pairs[position] == unique
+            values[found] = self._bubble_points[position[found]]
+        missing = unique[~found]
+        if missing.size:
+            fluids = self.gather(missing.real.astype(np.int64))
+            values[~found] = (self.pvt or vectorized).mixture_bubble_point(
+                missing.imag,
+                fluids["gas_specific_gravity"],
+                fluids["oil_api_gravity"],
+                fluids["water_cut"],
+                fluids["production_gas_liquid_ratio"]
+            )
+            self.bubble_point_evaluations += missing.size
+            if self._pairs.size + missing.size <= self.max_bubble_points:
+                pairs = np.concatenate((self._pairs, missing))
+                order = np.argsort(pairs)
+                self._pairs = pairs[order]
+                self._bubble_points = np.concatenate(
+                    (self._bubble_points, values[~found]))[order]
+            elif unique.size <= self.max_bubble_points:
+                self._pairs = unique
+                self._bubble_points = values
+        return values[inverse.ravel()].reshape(indexes.shape)
+
+    def kernel(self, _index):
+        """
+        Returns the gradient kernel specialized for a fluid (see
+        `specialize.kernel`).
+
+        Raises:
+            ValueError: If the catalog has a PVT source: kernels are
+                specialized from the correlations.
+        """
+        if self.pvt is not None:
+            raise ValueError("Kernels are specialized from the correlations, "
+                             "not from a PVT source.")
+        from . import specialize
+
+        return specialize.kernel(*self._fluids[_index])
+
+
+class WellBatch:
+    """
+    Structure of arrays of vertical producers. Every attribute is a
+    contiguous array with one entry per well; fluids are indexes into a
+    `FluidCatalog`, so wells sharing a fluid share its parameters and its
+    bubble points.
+
+    Args:
+        _catalog (FluidCatalog): Catalog the ``_fluid`` indexes refer to.
+        _fluid (array): Fluid index of each well.
+        _wellhead_pressure (array): Wellhead pressure (:math:`psig`).
+        _wellhead_temperature (array): Wellhead temperature (fahrenheit
+            degrees).
+        _bottomhole_temperature (array): Bottomhole temperature (fahrenheit
+            degrees).
+        _depth (array): Well depth (:math:`ft`).
+        _diameter (array): Tubing diameter (:math:`in`).
+        _liquid_flow_rate (array): Liquid flow rate (:math:`bpd`).
+        _rugosity (array, optional): Relative pipe roughness (no unit).
+
+    Scalars are broadcast to every well.
+    """
+    FIELDS = (
+        "wellhead_pressure",
+        "wellhead_temperature",
+        "bottomhole_temperature",
+        "depth",
+        "diameter",
+        "liquid_flow_rate",
+        "rugosity",
+    )
+
+    def __init__(self,
+                 _catalog,
+                 _fluid,
+                 _wellhead_pressure,
+                 _wellhead_temperature,
+                 _bottomhole_temperature,
+                 _depth,
+                 _diameter,
+                 _liquid_flow_rate,
+                 _rugosity=0.0006):
+        values = (_wellhead_pressure,
+                  _wellhead_temperature,
+                  _bottomhole_temperature,
+                  _depth,
+                  _diameter,
+                  _liquid_flow_rate,
+                  _rugosity)
+        size = np.broadcast(_fluid, *values).size
+        self.catalog = _catalog
+        self.fluid = np.ascontiguousarray(
+            np.broadcast_to(np.asarray(_fluid, dtype=np.int32), size))
+        if size and not 0 <= self.fluid.min() <= self.fluid.max() < len(
+                _catalog):
+            raise IndexError("Fluid index outside the catalog.")
+        for name, value in zip(self.FIELDS, values):
+            setattr(self, name, np.ascontiguousarray(
+                np.broadcast_to(np.asarray(value, dtype=float), size)))
+
+    def __len__(self):
+        return self.fluid.size
+
+    def subset(self, _index):
+        """
+        Returns the wells selected by an index or boolean mask.
+        """
+        return WellBatch(self.catalog,
+                         self.fluid[_index],
+                         *(getattr(self, name)[_index]
+                           for name in self.FIELDS))
+
+    def fluid_parameters(self):
+        """
+        Gathers the fluid parameters of every well (see
+        `FluidCatalog.gather`).
+        """
+        return self.catalog.gather(self.fluid)
+
+    def temperatures(self, _segments):
+        """
+        Returns the ``(wells, nodes)`` linear temperature profiles.
+        """
+        fractions = np.linspace(0.0, 1.0, _segments + 1)
+        return (self.wellhead_temperature[:, None] +
+                (self.bottomhole_temperature -
+                 self.wellhead_temperature)[:, None] * fractions)
+
+    def traverse(self, _segments=20, _tolerance=1e-3, _max_iterations=20,
+                 _friction_table=None):
+        """
+        Marches every well from the wellhead down with
+        `vectorized.traverse`. Segment bubble points come from the catalog,
+        so they are only evaluated once per fluid and temperature.
+
+        Returns:
+            A tuple ``(pressures, flow_patterns)`` of ``(wells, nodes)`` and
+            ``(wells, segments)`` arrays.
+        """
+        temperatures = self.temperatures(_segments)
+        bubble_points = self.catalog.bubble_points(
+            self.fluid[:, None],
+            (temperatures[:, :-1] + temperatures[:, 1:]) / 2
+        )
+        fluids = self.fluid_parameters()
+        return vectorized.traverse(
+            self.wellhead_pressure,
+            np.broadcast_to(self.depth / _segments, (_segments, len(self))),
+            [90.0] * _segments,
+            temperatures,
+            fluids["oil_api_gravity"],
+            fluids["gas_specific_gravity"],
+            fluids["water_specific_gravity"],
+            fluids["water_cut"],
+            fluids["production_gas_liquid_ratio"],
+            self.liquid_flow_rate,
+            self.diameter,
+            self.rugosity,
+            _against_flow=True,
+            _tolerance=_tolerance,
+            _max_iterations=_max_iterations,
+            _friction_table=_friction_table,
+            _bubble_points=bubble_points,
+            _pvt=self.catalog.pvt
+        )
+
+    def bottomhole_pressure(self, _segments=20):
+        """
+        Returns the flowing bottomhole pressure of every well (:math:`psig`).
+        """
+        pressures, _ = self.traverse(_segments)
+        return pressures[:, -1]
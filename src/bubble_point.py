@@ -0,0 +1,336 @@
+"""
+Bubble point
+"""
+import numpy as np
+
+from . import vectorized
+
+
+# Bracket of `correlations.mixture_bubble_point` (psig)
+LOWER = 0.0
+UPPER = 100000.0
+
+# Iterations of `correlations.mixture_bubble_point` when the bubble point is
+# outside the bracket
+NAIVE_MAX_ITERATIONS = 200
+
+STATISTICS = ("rows", "groups", "iterations", "naive_iterations",
+              "fallbacks", "bisections")
+
+
+def solubility(_pressure,
+               _temperature,
+               _gas_specific_gravity,
+               _oil_api_gravity,
+               _water_cut):
+    """
+    Calculates the gas dissolved per unit of liquid at a pressure (the
+    production gas liquid ratio whose bubble point it is) and its derivative
+    with respect to the pressure.
+
+    Returns:
+        A tuple ``(solubility, derivative)`` in :math:`scf/stb` and
+        :math:`scf/stb/psi`.
+    """
+    rso = vectorized.gas_solubility_in_oil(_pressure,
+                                           _pressure,
+                                           _temperature,
+                                           _gas_specific_gravity,
+                                           _oil_api_gravity)
+    rsw = vectorized.gas_solubility_in_water(_pressure, _pressure,
+                                             _temperature)
+    # d(Rso)/dp from Standing's power law
+    drso = 1.2048 * rso / ((_pressure + 14.7) + 1.4 * 18.2)
+    term_b = (1.01021e-2 -
+              7.44241e-5 * _temperature +
+              3.05553e-7 * (_temperature ** 2) -
+              2.94883e-10 * (_temperature ** 3))
+    term_c = (-9.02505 +
+              0.130237 * _temperature -
+              8.53425e-4 * (_temperature ** 2) +
+              2.34122e-6 * (_temperature ** 3) -
+              2.37049e-9 * (_temperature ** 4)) * (10 ** -7)
+    drsw = term_b + 2 * term_c * (_pressure + 14.7)
+    return ((1 - _water_cut) * rso + _water_cut * rsw,
+            (1 - _water_cut) * drso + _water_cut * drsw)
+
+
+class OrderedBubblePoints:
+    """
+    Batch mixture bubble point solver for tables that are dense in gas liquid
+    ratio. Within a fluid and temperature the bubble point increases with
+    the production gas liquid ratio, so once the rows are sorted by fluid,
+    temperature and ratio every solved row brackets its neighbours: the gas
+    dissolved at a neighbour's bubble point is known, so the residual at both
+    ends of the bracket costs nothing and the secant through them is the
+    initial guess.
+
+    The first and last rows of every group are solved on the bracket of
+    `correlations.mixture_bubble_point`, then the rows in between by halving
+    strides (the middle row, then the quarter rows...), each level in a
+    single vectorized Newton iteration safeguarded by bisection. Repeated
+    rows are copied from their neighbour without any evaluation. Rows whose
+    neighbours do not bracket them (the water solubility is not monotonic at
+    very high pressures) are solved on the full bracket again.
+
+    At high water cuts the solubility may fall below the ratio again at the
+    top of the bracket, which then holds two bubble points (or none). Such
+    rows take the bisection of `vectorized.mixture_bubble_point`, so they
+    get the same root.
+
+    The results agree with `vectorized.mixture_bubble_point` within its
+    tolerance (the residual is below ``_tolerance`` in both).
+
+    Args:
+        _tolerance (double, optional): Largest residual (:math:`scf/stb`).
+        _max_iterations (int, optional): Newton iterations per level.
+
+    Attributes:
+        statistics (dict): ``rows`` and ``groups`` (fluid and temperature
+            pairs) solved, ``iterations`` (solubility evaluations, summed
+            over the rows), ``naive_iterations`` (the bisection iterations
+            `vectorized.mixture_bubble_point` would have taken, estimated
+            from the slope at each bubble point), ``fallbacks`` and
+            ``bisections`` (rows solved by bisection).
+    """
+    def __init__(self, _tolerance=1e-10, _max_iterations=50):
+        self.tolerance = _tolerance
+        self.max_iterations = _max_iterations
+        self.statistics = dict.fromkeys(STATISTICS, 0)
+
+    @property
+    def speedup(self):
+        """
+        Naive iterations per iteration actually taken.
+        """
+        iterations = self.statistics["iterations"]
+        return (self.statistics["naive_iterations"] / iterations
+                if iterations else 1.0)
+
+    def reset(self):
+        self.statistics = dict.fromkeys(STATISTICS, 0)
+
+    def _evaluate(self, _pressure, _index):
+        self.statistics["iterations"] += _index.size
+        return solubility(_pressure,
+                          self._temperature[_index],
+                          self._gas_specific_gravity[_index],
+                          self._oil_api_gravity[_index],
+                          self._water_cut[_index])
+
+    def _set(self, _index, _pressure, _solubility, _slope):
+        self._pressure[_index] = _pressure
+        self._solubility[_index] = _solubility
+        self._slope[_index] = _slope
+
+    def _solve_full(self, _index):
+        # Solves rows on the bracket of the bisection
+        lower = np.full(_index.size, LOWER)
+        upper = np.full(_index.size, UPPER)
+        low, low_slope = self._evaluate(lower, _index)
+        high, high_slope = self._evaluate(upper, _index)
+        ratio = self._ratio[_index]
+        self._solve(_index, lower, upper, ratio - low, ratio - high,
+                    low_slope, high_slope, _fallback=False)
+
+    def _bisect(self, _index):
+        # Bisects rows on the bracket of `vectorized.mixture_bubble_point`
+        self.statistics["bisections"] += _index.size
+        index = _index
+        low = np.full(index.size, LOWER)
+        high = np.full(index.size, UPPER)
+        for _ in range(NAIVE_MAX_ITERATIONS):
+            if not index.size:
+                break
+            pressure = (low + high) / 2
+            value, slope = self._evaluate(pressure, index)
+            self._set(index, pressure, value, slope)
+            rising = self._ratio[index] - value > 0
+            low = np.where(rising, pressure, low)
+            high = np.where(rising, high, pressure)
+            active = np.abs(self._ratio[index] - value) > self.tolerance
+            index = index[active]
+            low = low[active]
+            high = high[active]
+        # Rows still above the bracket have no slope, as in `_solve`
+        self._slope[index] = np.nan
+
+    def _solve(self,
+               _index,
+               _low,
+               _high,
+               _low_error,
+               _high_error,
+               _low_slope,
+               _high_slope,
+               _fallback=True):
+        tolerance = self.tolerance
+        ratio = self._ratio[_index]
+
+        # Rows that match an end of their bracket
+        done = np.abs(_low_error) <= tolerance
+        self._set(_index[done], _low[done], (ratio - _low_error)[done],
+                  _low_slope[done])
+        high_done = ~done & (np.abs(_high_error) <= tolerance)
+        self._set(_index[high_done], _high[high_done],
+                  (ratio - _high_error)[high_done], _high_slope[high_done])
+        done |= high_done
+        # Bubble points below the bracket of the bisection stay at its end,
+        # with no slope (the bisection never converges there). Above it the
+        # solubility may have risen past the ratio and fallen back
+        below = ~done & (_low_error < 0) & (_low == LOWER)
+        above = ~done & (_high_error > 0) & (_high == UPPER)
+        self._set(_index[below], LOWER, (ratio - _low_error)[below], np.nan)
+        self._bisect(_index[above])
+        done |= below | above
+
+        valid = (_low_error > 0) & (_high_error < 0)
+        if _fallback:
+            fallback = ~done & ~valid
+            if fallback.any():
+                self.statistics["fallbacks"] += int(fallback.sum())
+                self._solve_full(_index[fallback])
+                done |= fallback
+
+        active = ~done & valid
+        index = _index[active]
+        low = _low[active]
+        high = _high[active]
+        low_error = _low_error[active]
+        high_error = _high_error[active]
+        ratio = ratio[active]
+        # Secant through the ends of the bracket
+        pressure = low + low_error * (high - low) / (low_error - high_error)
+        for _ in range(self.max_iterations):
+            if not index.size:
+                break
+            value, slope = self._evaluate(pressure, index)
+            error = ratio - value
+            self._set(index, pressure, value, slope)
+
+            rising = error > 0
+            low = np.where(rising, pressure, low)
+            high = np.where(rising, high, pressure)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                newton = pressure + error / slope
+            inside = (newton > low) & (newton < high)
+            pressure = np.where(inside, newton, (low + high) / 2)
+
+            active = ((np.abs(error) > tolerance) &
+                      (high - low > 4 * np.spacing(high)))
+            index = index[active]
+            pressure = pressure[active]
+            low = low[active]
+            high = high[active]
+            ratio = ratio[active]
+
+    def solve(self,
+              _temperature,
+              _gas_specific_gravity,
+              _oil_api_gravity,
+              _water_cut,
+              _production_gas_liquid_ratio):
+        """
+        Ordered, warm-started version of `vectorized.mixture_bubble_point`.
+        Arguments are arrays (or scalars) that broadcast together.
+
+        Returns:
+            The mixture's bubble point Pb (psi) as an array.
+        """
+        columns = [np.ravel(value) for value in np.broadcast_arrays(
+            *(np.asarray(value, dtype=float) for value in (
+                _temperature,
+                _gas_specific_gravity,
+                _oil_api_gravity,
+                _water_cut,
+                _production_gas_liquid_ratio)))]
+        shape = np.broadcast_shapes(*(np.shape(value) for value in (
+            _temperature,
+            _gas_specific_gravity,
+            _oil_api_gravity,
+            _water_cut,
+            _production_gas_liquid_ratio)))
+        size = columns[0].size
+        result = np.empty(size)
+        if not size:
+            return result.reshape(shape)
+
+        # Sort by fluid, temperature and ratio
+        order = np.lexsort(columns[::-1])
+        (self._temperature,
+         self._gas_specific_gravity,
+         self._oil_api_gravity,
+         self._water_cut,
+         self._ratio) = (column[order] for column in columns)
+        self._pressure = np.empty(size)
+        self._solubility = np.empty(size)
+        self._slope = np.empty(size)
+
+        first = np.zeros(size, dtype=bool)
+        first[0] = True
+        for column in columns[:4]:
+            sorted_column = column[order]
+            first[1:] |= sorted_column[1:] != sorted_column[:-1]
+        starts = np.flatnonzero(first)
+        ends = np.append(starts[1:], size) - 1
+        group = np.cumsum(first) - 1
+        position = np.arange(size)
+        rank = position - starts[group]
+        last = ends[group]
+
+        self._solve_full(np.unique(np.concatenate([starts, ends])))
+        stride = 1 << int(np.max(ends - starts)).bit_length()
+        while stride > 1:
+            stride //= 2
+            index = np.flatnonzero((rank % (2 * stride) == stride) &
+                                   (position != last))
+            if not index.size:
+                continue
+            lower = index - stride
+            upper = np.minimum(index + stride, last[index])
+            ratio = self._ratio[index]
+            self._solve(index,
+                        self._pressure[lower],
+                        self._pressure[upper],
+                        ratio - self._solubility[lower],
+                        ratio - self._solubility[upper],
+                        self._slope[lower],
+                        self._slope[upper])
+
+        # Bisection from the full bracket until the residual is below the
+        # tolerance: the bracket has to shrink to tolerance / slope, about
+        # log2(width * slope / tolerance) halvings, and a midpoint usually
+        # lands close enough two halvings earlier
+        with np.errstate(divide="ignore", invalid="ignore"):
+            naive = np.rint(np.log2((UPPER - LOWER) * np.abs(self._slope) /
+                                    self.tolerance) - 2)
+        naive = np.where(np.isfinite(naive),
+                         np.clip(naive, 1, NAIVE_MAX_ITERATIONS),
+                         NAIVE_MAX_ITERATIONS)
+        self.statistics["rows"] += size
+        self.statistics["groups"] += starts.size
+        self.statistics["naive_iterations"] += int(naive.sum())
+
+        result[order] = self._pressure
+        del (self._temperature, self._gas_specific_gravity,
+             self._oil_api_gravity, self._water_cut, self._ratio,
+             self._pressure, self._solubility, self._slope)
+        return result.reshape(shape)
+
+
+def mixture_bubble_point(_temperature,
+                         _gas_specific_gravity,
+                         _oil_api_gravity,
+                         _water_cut,
+                         _production_gas_liquid_ratio):
+    """
+    Solves a batch of mixture bubble points with a new `OrderedBubblePoints`.
+
+    Returns:
+        The mixture's bubble point Pb (psi) as an array.
+    """
+    return OrderedBubblePoints().solve(_temperature,
+                                       _gas_specific_gravity,
+                                       _oil_api_gravity,
+                                       _water_cut,
+                                       _production_gas_liquid_ratio)
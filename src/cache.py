@@ -0,0 +1,373 @@
+"""
+Cache
+"""
+import enum
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from . import __version__
+from . import deviation
+from . import formulas
+from . import friction
+from . import monte_carlo
+from . import pvt
+from . import traverse
+from . import vectorized
+
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "mfsim",
+                            "results.sqlite")
+DEFAULT_MAX_BYTES = 256 << 20
+
+# Modules whose source takes part in the cache keys, so results computed by
+# another version of the models are never returned
+MODULES = ("correlations", "deviation", "formulas", "friction", "fused",
+           "monte_carlo", "pvt", "traverse", "vectorized")
+
+STATISTICS = ("hits", "misses", "stores", "evictions")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS results ("
+    " key TEXT PRIMARY KEY,"
+    " kind TEXT NOT NULL,"
+    " size INTEGER NOT NULL,"
+    " created REAL NOT NULL,"
+    " accessed REAL NOT NULL,"
+    " value BLOB NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)",
+    "CREATE TABLE IF NOT EXISTS statistics ("
+    " name TEXT PRIMARY KEY,"
+    " value INTEGER NOT NULL)",
+)
+
+_CODE_VERSION = None
+
+
+def code_version():
+    """
+    Returns the library version followed by a digest of the source of the
+    `MODULES`.
+    """
+    global _CODE_VERSION
+    if _CODE_VERSION is None:
+        digest = hashlib.sha256()
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in MODULES:
+            with open(os.path.join(directory, name + ".py"), "rb") as source:
+                digest.update(source.read())
+        _CODE_VERSION = "{}+{}".format(__version__,
+                                       digest.hexdigest()[:16])
+    return _CODE_VERSION
+
+
+class Uncacheable(Exception):
+    """
+    Raised by `canonical` for values without a canonical form (e.g.
+    functions), whose calls are not cached.
+    """
+
+
+def canonical(_value):
+    """
+    Returns a JSON-serializable description of an argument that is equal for
+    equal contents: numbers are compared as doubles (``1 == 1.0``, ``-0.0 ==
+    0.0``), sequences and arrays by their float64 contents (hashed), PVT
+    sources by their tables, friction tables and well models by their
+    parameters.
+
+    Raises:
+        Uncacheable: For values it cannot describe.
+    """
+    if _value is None or isinstance(_value, (bool, str)):
+        return _value
+    if isinstance(_value, enum.Enum):
+        return [type(_value).__name__, _value.value]
+    if isinstance(_value, (int, float, np.number)):
+        return (float(_value) + 0.0).hex()
+    if isinstance(_value, (list, tuple, np.ndarray)):
+        try:
+            array = np.ascontiguousarray(_value, dtype=float) + 0.0
+        except (TypeError, ValueError):
+            return [canonical(value) for value in _value]
+        return {"shape": list(array.shape),
+                "sha256": hashlib.sha256(array.tobytes()).hexdigest()}
+    if isinstance(_value, dict):
+        return {str(name): canonical(value)
+                for name, value in sorted(_value.items())}
+    if isinstance(_value, pvt.BlackOilTable):
+        return {"pvt": canonical(_value.keywords())}
+    if isinstance(_value, deviation.DeviationPVT):
+        return {"deviation": _value.method}
+    if isinstance(_value, pvt.CorrelationPVT):
+        return None
+    if isinstance(_value, friction.FrictionTable):
+        return {"friction_table": [canonical(_value.rugosity),
+                                   canonical(_value.tolerance),
+                                   _value.points]}
+    if isinstance(_value, monte_carlo.WellModel):
+        return {type(_value).__name__: canonical(vars(_value))}
+    raise Uncacheable(type(_value).__name__)
+
+
+def key(_kind, _arguments):
+    """
+    Returns the cache key (a hex digest) of a call of ``_kind`` with the
+    given arguments, or None if an argument is `Uncacheable`.
+    """
+    try:
+        description = json.dumps({"kind": _kind,
+                                  "version": code_version(),
+                                  "arguments": canonical(_arguments)},
+                                 sort_keys=True)
+    except Uncacheable:
+        return None
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+def _encode(_kind, _result):
+    if _kind == "traverse":
+        pressures, patterns = _result
+        arrays = {"pressures": np.asarray(pressures, dtype=float),
+                  "patterns": np.array([pattern.value for pattern in patterns],
+                                       dtype=np.int8)}
+    elif isinstance(_result, dict):
+        arrays = {name: np.asarray(value) for name, value in _result.items()}
+    else:
+        arrays = {"item_{}".format(i): np.asarray(value)
+                  for i, value in enumerate(_result)}
+    output = io.BytesIO()
+    np.savez(output, **arrays)
+    return output.getvalue()
+
+
+def _decode(_kind, _blob):
+    with np.load(io.BytesIO(_blob), allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+    if _kind == "traverse":
+        return (arrays["pressures"].tolist(),
+                [formulas.FlowPattern(value)
+                 for value in arrays["patterns"].tolist()])
+    if all(name.startswith("item_") for name in arrays):
+        return tuple(arrays["item_{}".format(i)] for i in range(len(arrays)))
+    return arrays
+
+
+class ResultCache:
+    """
+    Persistent cache of traverse and VLP results in a SQLite file shared by
+    every process and user of the machine that can write to it.
+
+    Results are stored as ``.npz`` blobs keyed by a hash of the call (see
+    `key`): the kind of call, every argument (fluid, tubing, trajectory, PVT
+    source and friction table) and the `code_version`. The least recently
+    used results are evicted when the file holds more than ``_max_bytes``
+    of them. The database runs in WAL mode and every write is a short
+    ``BEGIN IMMEDIATE`` transaction, so concurrent processes wait for each
+    other (up to ``_timeout`` seconds) instead of corrupting it.
+
+    While enabled (as a context manager or with `enable`),
+    `traverse.traverse`, `vectorized.traverse` and `monte_carlo.WellModel`
+    consult it before computing anything; a call may also pass its own cache
+    (or ``False`` to skip it) in its ``_cache`` argument.
+
+    Args:
+        _path (str, optional): Database file, `DEFAULT_PATH` by default
+            (created with its directory if needed).
+        _max_bytes (int, optional): Largest size of the stored results.
+        _timeout (double, optional): Seconds to wait for a lock.
+
+    Attributes:
+        statistics (dict): ``hits``, ``misses``, ``stores`` and
+            ``evictions`` of this instance (see `totals` for every process).
+    """
+    def __init__(self,
+                 _path=None,
+                 _max_bytes=DEFAULT_MAX_BYTES,
+                 _timeout=30.0):
+        self.path = _path or DEFAULT_PATH
+        self.max_bytes = _max_bytes
+        self.timeout = _timeout
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self.statistics = dict.fromkeys(STATISTICS, 0)
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        self._previous = []
+        with self._lock:
+            connection = self._connect()
+            self._begin(connection)
+            try:
+                for statement in _SCHEMA:
+                    connection.execute(statement)
+                connection.executemany(
+                    "INSERT OR IGNORE INTO statistics VALUES (?, 0)",
+                    [(name,) for name in STATISTICS])
+            finally:
+                connection.execute("COMMIT")
+
+    def _connect(self):
+        # Connections are not shared with forked children
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path,
+                                               timeout=self.timeout,
+                                               isolation_level=None,
+                                               check_same_thread=False)
+            self._pid = os.getpid()
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+        return self._connection
+
+    @staticmethod
+    def _begin(_connection):
+        _connection.execute("BEGIN IMMEDIATE")
+
+    def _count(self, _connection, _name, _amount=1):
+        self.statistics[_name] += _amount
+        _connection.execute(
+            "UPDATE statistics SET value = value + ? WHERE name = ?",
+            (_amount, _name))
+
+    def get(self, _key, _kind):
+        """
+        Returns the stored result of a key, or None.
+        """
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT value FROM results WHERE key = ?", (_key,)).fetchone()
+            self._begin(connection)
+            try:
+                if row is None:
+                    self._count(connection, "misses")
+                else:
+                    connection.execute(
+                        "UPDATE results SET accessed = ? WHERE key = ?",
+                        (time.time(), _key))
+                    self._count(connection, "hits")
+            finally:
+                connection.execute("COMMIT")
+        return None if row is None else _decode(_kind, row[0])
+
+    def put(self, _key, _kind, _result):
+        """
+        Stores a result, then evicts the least recently used ones beyond
+        ``max_bytes``.
+        """
+        blob = _encode(_kind, _result)
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            self._begin(connection)
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                    (_key, _kind, len(blob), now, now, blob))
+                self._count(connection, "stores")
+                total = connection.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+                if total > self.max_bytes:
+                    evicted = []
+                    for old_key, size in connection.execute(
+                            "SELECT key, size FROM results"
+                            " ORDER BY accessed, created, rowid"):
+                        if total <= self.max_bytes:
+                            break
+                        evicted.append((old_key,))
+                        total -= size
+                    connection.executemany(
+                        "DELETE FROM results WHERE key = ?", evicted)
+                    self._count(connection, "evictions", len(evicted))
+            finally:
+                connection.execute("COMMIT")
+
+    def call(self, _kind, _function, _arguments):
+        """
+        Returns the cached result of ``_function(**_arguments)``, computing
+        and storing it on a miss (the function is called with
+        ``_cache=False``). Calls with `Uncacheable` arguments are simply
+        evaluated.
+        """
+        cache_key = key(_kind, _arguments)
+        if cache_key is not None:
+            result = self.get(cache_key, _kind)
+            if result is not None:
+                return result
+        result = _function(**_arguments, _cache=False)
+        if cache_key is not None:
+            self.put(cache_key, _kind, result)
+        return result
+
+    @property
+    def hit_rate(self):
+        """
+        Fraction of the lookups of this instance that were hits.
+        """
+        lookups = self.statistics["hits"] + self.statistics["misses"]
+        return self.statistics["hits"] / lookups if lookups else 0.0
+
+    def totals(self):
+        """
+        Returns the statistics of every process that used the file, with its
+        ``entries``, ``bytes`` and ``hit_rate``.
+        """
+        with self._lock:
+            connection = self._connect()
+            totals = dict(connection.execute(
+                "SELECT name, value FROM statistics").fetchall())
+            totals["entries"], totals["bytes"] = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        lookups = totals["hits"] + totals["misses"]
+        totals["hit_rate"] = totals["hits"] / lookups if lookups else 0.0
+        return totals
+
+    def clear(self):
+        """
+        Drops every stored result and resets the statistics.
+        """
+        with self._lock:
+            connection = self._connect()
+            self._begin(connection)
+            try:
+                connection.execute("DELETE FROM results")
+                connection.execute("UPDATE statistics SET value = 0")
+            finally:
+                connection.execute("COMMIT")
+        self.statistics = dict.fromkeys(STATISTICS, 0)
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        self._previous.append((traverse._CACHE, vectorized._CACHE))
+        traverse._CACHE = vectorized._CACHE = self
+        return self
+
+    def __exit__(self, *_exception):
+        traverse._CACHE, vectorized._CACHE = self._previous.pop()
+
+
+def enable(_path=None, _max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Enables a `ResultCache` until `disable` is called and returns it.
+    """
+    return ResultCache(_path, _max_bytes).__enter__()
+
+
+def disable():
+    """
+    Disables the result cache.
+    """
+    traverse._CACHE = None
+    vectorized._CACHE = None
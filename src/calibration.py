@@ -0,0 +1,329 @@
+"""
+Calibration
+"""
+import numpy as np
+
+from . import vectorized
+
+
+PARAMETERS = {
+    "holdup": (0.5, 1.5),
+    "friction": (0.5, 2.0),
+    "bubble_point": (0.7, 1.3),
+    "oil_api_gravity": (0.9, 1.1),
+    "gas_specific_gravity": (0.8, 1.2),
+    "production_gas_liquid_ratio": (0.7, 1.3),
+}
+
+WELL_FIELDS = (
+    "wellhead_temperature",
+    "bottomhole_temperature",
+    "oil_api_gravity",
+    "gas_specific_gravity",
+    "water_specific_gravity",
+    "water_cut",
+    "production_gas_liquid_ratio",
+    "diameter",
+    "rugosity",
+)
+
+WELL_DEFAULTS = {
+    "oil_api_gravity": 30.0,
+    "gas_specific_gravity": 0.7,
+    "water_specific_gravity": 1.07,
+    "water_cut": 0.0,
+    "production_gas_liquid_ratio": 100.0,
+    "rugosity": 0.0006,
+}
+
+
+class CalibrationResult:
+    """
+    Multipliers found by `Calibration.fit`.
+
+    Attributes:
+        parameters (dict): Best multiplier of every tuned parameter.
+        vector (array): The same multipliers in `Calibration.names` order.
+        error (double): Root mean square pressure mismatch (:math:`psi`).
+        residuals (array): Modelled minus measured pressure of every test
+            (:math:`psi`).
+        generations (int): Optimizer generations run.
+        evaluations (int): Parameter vectors evaluated with a traverse.
+        cache_hits (int): Parameter vectors answered from the cache.
+        history (list): Best error after every generation.
+        converged (boolean): Whether the population converged before the
+            generation limit.
+    """
+    def __init__(self,
+                 _names,
+                 _vector,
+                 _error,
+                 _residuals,
+                 _generations,
+                 _evaluations,
+                 _cache_hits,
+                 _history,
+                 _converged):
+        self.parameters = dict(zip(_names, _vector.tolist()))
+        self.vector = _vector
+        self.error = _error
+        self.residuals = _residuals
+        self.generations = _generations
+        self.evaluations = _evaluations
+        self.cache_hits = _cache_hits
+        self.history = _history
+        self.converged = _converged
+
+
+class Calibration:
+    """
+    Fits Beggs and Brill tuning multipliers of a vertical well to measured
+    bottomhole pressures at several rates.
+
+    The tunable parameters (see `PARAMETERS` for their default bounds) are
+    the ``holdup`` and ``friction`` multipliers (see
+    `vectorized.gradient_intermediates`), a ``bubble_point`` multiplier and
+    multipliers of the fluid inputs (``oil_api_gravity``,
+    ``gas_specific_gravity``, ``production_gas_liquid_ratio``). A
+    population of parameter vectors is evaluated with a single
+    `vectorized.traverse` over every (vector, test) pair, and the mismatch of
+    every vector is cached, so vectors seen before cost nothing.
+
+    Args:
+        _well (dict): Well description: ``depth`` (:math:`ft`) and the
+            `WELL_FIELDS` (`WELL_DEFAULTS` fill the missing ones).
+        _tests (dict): Arrays with one value per test: ``liquid_flow_rate``
+            (:math:`bpd`), ``wellhead_pressure`` and the measured
+            ``bottomhole_pressure`` (:math:`psig`). Any `WELL_FIELDS` entry
+            may vary per test too (e.g. the ``water_cut``).
+        _parameters (dict or sequence, optional): Tuned parameters, either
+            names (default bounds) or a dict of ``(lower, upper)`` bounds.
+        _segments (int, optional): Tubing segments.
+        _friction_table (FrictionTable, optional): Moody friction factor
+            table (see `vectorized.gradient_intermediates`).
+        _pvt (optional): PVT source of the bubble points and fluid
+            properties instead of the correlations (see `pvt`).
+    """
+    def __init__(self,
+                 _well,
+                 _tests,
+                 _parameters=("holdup", "friction"),
+                 _segments=20,
+                 _friction_table=None,
+                 _pvt=None):
+        unknown = set(_parameters) - set(PARAMETERS)
+        if unknown:
+            raise ValueError("Unknown calibration parameters: {}.".format(
+                ", ".join(sorted(unknown))))
+        if not isinstance(_parameters, dict):
+            _parameters = {name: PARAMETERS[name] for name in _parameters}
+        self.names = tuple(_parameters)
+        bounds = np.asarray([_parameters[name] for name in self.names],
+                            dtype=float)
+        self.lower = bounds[:, 0]
+        self.upper = bounds[:, 1]
+        self.segments = _segments
+        self.friction_table = _friction_table
+        self.pvt = _pvt
+        self.depth = float(_well["depth"])
+
+        self.measured = np.asarray(_tests["bottomhole_pressure"], dtype=float)
+        size = self.measured.size
+        well = dict(WELL_DEFAULTS)
+        well.update(_well)
+        well.update(_tests)
+        missing = [name for name in WELL_FIELDS if name not in well]
+        if missing:
+            raise KeyError("Missing well fields: {}.".format(
+                ", ".join(missing)))
+        self.tests = {
+            name: np.broadcast_to(np.asarray(well[name], dtype=float),
+                                  size).copy()
+            for name in WELL_FIELDS + ("liquid_flow_rate",
+                                       "wellhead_pressure")
+        }
+        self._cache = {}
+        self.evaluations = 0
+        self.cache_hits = 0
+
+    def __len__(self):
+        return self.measured.size
+
+    def bottomhole_pressures(self, _vectors):
+        """
+        Models the bottomhole pressure of every test for every parameter
+        vector in one `vectorized.traverse`.
+
+        Args:
+            _vectors (array): ``(population, parameters)`` multipliers.
+
+        Returns:
+            A ``(population, tests)`` array (:math:`psig`).
+        """
+        vectors = np.atleast_2d(np.asarray(_vectors, dtype=float))
+        population = len(vectors)
+        size = len(self)
+        inputs = {name: np.tile(values, population)
+                  for name, values in self.tests.items()}
+        multipliers = {name: np.repeat(vectors[:, i], size)
+                       for i, name in enumerate(self.names)}
+        for name in ("oil_api_gravity",
+                     "gas_specific_gravity",
+                     "production_gas_liquid_ratio"):
+            if name in multipliers:
+                inputs[name] = inputs[name] * multipliers[name]
+
+        fractions = np.linspace(0.0, 1.0, self.segments + 1)
+        temperatures = (
+            inputs["wellhead_temperature"][:, None] +
+            (inputs["bottomhole_temperature"] -
+             inputs["wellhead_temperature"])[:, None] * fractions
+        )
+        bubble_points = None
+        if "bubble_point" in multipliers:
+            bubble_points = (self.pvt or vectorized).mixture_bubble_point(
+                (temperatures[:, :-1] + temperatures[:, 1:]) / 2,
+                inputs["gas_specific_gravity"][:, None],
+                inputs["oil_api_gravity"][:, None],
+                inputs["water_cut"][:, None],
+                inputs["production_gas_liquid_ratio"][:, None]
+            ) * multipliers["bubble_point"][:, None]
+
+        pressures, _ = vectorized.traverse(
+            inputs["wellhead_pressure"],
+            [self.depth / self.segments] * self.segments,
+            [90.0] * self.segments,
+            temperatures,
+            inputs["oil_api_gravity"],
+            inputs["gas_specific_gravity"],
+            inputs["water_specific_gravity"],
+            inputs["water_cut"],
+            inputs["production_gas_liquid_ratio"],
+            inputs["liquid_flow_rate"],
+            inputs["diameter"],
+            inputs["rugosity"],
+            _against_flow=True,
+            _friction_table=self.friction_table,
+            _bubble_points=bubble_points,
+            _holdup_multiplier=multipliers.get("holdup"),
+            _friction_multiplier=multipliers.get("friction"),
+            _pvt=self.pvt
+        )
+        return pressures[:, -1].reshape(population, size)
+
+    def objective(self, _vectors):
+        """
+        Returns the root mean square mismatch (:math:`psi`) of every
+        parameter vector. Vectors already evaluated come from the cache and
+        the others are evaluated together (see `bottomhole_pressures`);
+        vectors whose traverse fails (not finite) get an infinite error.
+        """
+        vectors = np.atleast_2d(np.asarray(_vectors, dtype=float))
+        keys = [vector.tobytes() for vector in vectors]
+        new = {}
+        for key, vector in zip(keys, vectors):
+            if key not in self._cache and key not in new:
+                new[key] = vector
+        self.cache_hits += len(keys) - len(new)
+        if new:
+            with np.errstate(all="ignore"):
+                modelled = self.bottomhole_pressures(list(new.values()))
+                errors = np.sqrt(np.mean((modelled - self.measured) ** 2,
+                                         axis=1))
+            errors[~np.isfinite(errors)] = np.inf
+            self._cache.update(zip(new, errors.tolist()))
+            self.evaluations += len(new)
+        return np.array([self._cache[key] for key in keys])
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def fit(self,
+            _population=None,
+            _generations=100,
+            _seed=0,
+            _mutation=(0.5, 1.0),
+            _crossover=0.9,
+            _tolerance=0.01,
+            _absolute_tolerance=0.01):
+        """
+        Minimizes `objective` with differential evolution (rand/1/bin with
+        dithered mutation). Every generation's trial vectors are evaluated
+        in one batch, then each replaces its parent if it is not worse.
+
+        Args:
+            _population (int, optional): Population size, 10 per parameter
+                (at least 12) by default.
+            _generations (int, optional): Largest number of generations.
+            _seed (int, optional): Random seed.
+            _mutation (tuple, optional): Range of the mutation factor, drawn
+                every generation.
+            _crossover (double, optional): Crossover probability.
+            _tolerance (double, optional): Stops when the standard
+                deviation of the population errors is below ``_tolerance``
+                times their mean plus ``_absolute_tolerance``.
+            _absolute_tolerance (double, optional): See ``_tolerance``
+                (:math:`psi`).
+
+        Returns:
+            A `CalibrationResult`.
+        """
+        rng = np.random.default_rng(_seed)
+        dimensions = len(self.names)
+        size = _population or max(12, 10 * dimensions)
+        span = self.upper - self.lower
+
+        # Latin hypercube start: one member per stratum of every parameter
+        strata = np.argsort(rng.random((dimensions, size)), axis=1).T
+        population = (self.lower +
+                      (strata + rng.random((size, dimensions))) / size * span)
+        errors = self.objective(population)
+        history = []
+        converged = False
+        generation = 0
+        for generation in range(1, _generations + 1):
+            choices = np.argsort(rng.random((size, size - 1)), axis=1)[:, :3]
+            # Skip the member itself
+            choices += choices >= np.arange(size)[:, None]
+            first, second, third = (population[choices[:, k]]
+                                    for k in range(3))
+            factor = rng.uniform(*_mutation)
+            mutant = first + factor * (second - third)
+            # Out of bounds components are placed between the bound and the
+            # base vector
+            mutant = np.where(mutant < self.lower,
+                              self.lower + rng.random(mutant.shape) *
+                              (first - self.lower),
+                              mutant)
+            mutant = np.where(mutant > self.upper,
+                              self.upper - rng.random(mutant.shape) *
+                              (self.upper - first),
+                              mutant)
+            cross = rng.random((size, dimensions)) < _crossover
+            cross[np.arange(size), rng.integers(dimensions, size=size)] = True
+            trial = np.where(cross, mutant, population)
+
+            trial_errors = self.objective(trial)
+            better = trial_errors <= errors
+            population[better] = trial[better]
+            errors[better] = trial_errors[better]
+            history.append(float(errors.min()))
+            finite = errors[np.isfinite(errors)]
+            if (finite.size == size and
+                    np.std(finite) <= (_tolerance * np.mean(finite) +
+                                       _absolute_tolerance)):
+                converged = True
+                break
+
+        best = int(np.argmin(errors))
+        vector = population[best].copy()
+        residuals = self.bottomhole_pressures(vector)[0] - self.measured
+        return CalibrationResult(self.names,
+                                 vector,
+                                 float(errors[best]),
+                                 residuals,
+                                 generation,
+                                 self.evaluations,
+                                 self.cache_hits,
+                                 history,
+                                 converged)
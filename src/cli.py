@@ -0,0 +1,498 @@
+"""
+CLI
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+
+
+DEFAULTS = {
+    "oil_api_gravity": 30.0,
+    "gas_specific_gravity": 0.7,
+    "water_specific_gravity": 1.07,
+    "water_cut": 0.0,
+    "production_gas_liquid_ratio": 100.0,
+    "rugosity": 0.0006,
+    "inclination": 90.0,
+}
+
+FLUID = (
+    "oil_api_gravity",
+    "gas_specific_gravity",
+    "water_specific_gravity",
+    "water_cut",
+    "production_gas_liquid_ratio",
+)
+
+WELL = (
+    "wellhead_pressure",
+    "wellhead_temperature",
+    "bottomhole_temperature",
+    "depth",
+) + FLUID + ("diameter", "rugosity")
+
+FORMATS = ("csv", "npy", "parquet")
+
+
+class InputError(Exception):
+    """
+    Invalid command line input, reported without a traceback.
+    """
+
+
+def _number(_value):
+    try:
+        return float(_value)
+    except (TypeError, ValueError):
+        return _value
+
+
+def read_rows(_path):
+    """
+    Reads input cases from a JSON file (an object or a list of objects) or a
+    CSV file with a header line. ``-`` reads JSON from the standard input.
+
+    Returns:
+        A list of dicts.
+    """
+    if _path == "-":
+        data = json.load(sys.stdin)
+    elif _path.lower().endswith(".json"):
+        with open(_path) as source:
+            data = json.load(source)
+    else:
+        with open(_path, newline="") as source:
+            return [{name: _number(value) for name, value in row.items()}
+                    for row in csv.DictReader(source)]
+    return [data] if isinstance(data, dict) else list(data)
+
+
+def _case(_row, _names, _overrides, _number_of_row):
+    case = dict(DEFAULTS)
+    case.update(_row)
+    case.update(_overrides)
+    missing = [name for name in _names if name not in case]
+    if missing:
+        raise InputError("row {}: missing {}".format(_number_of_row,
+                                                     ", ".join(missing)))
+    return case
+
+
+def _cases(_args, _names):
+    return [_case(row, _names, _args.set, i + 1)
+            for i, row in enumerate(read_rows(_args.input))]
+
+
+def _output_format(_args):
+    if _args.format:
+        return _args.format
+    extension = os.path.splitext(_args.output or "")[1].lower().lstrip(".")
+    return extension if extension in FORMATS else "csv"
+
+
+def write_columns(_columns, _path, _format="csv"):
+    """
+    Writes a dict of equally long columns to CSV (the standard output when
+    ``_path`` is None), NPY (a structured array) or Parquet. NumPy and
+    pyarrow are only imported for the last two.
+    """
+    names = list(_columns)
+    if _format == "csv":
+        output = (sys.stdout if _path is None
+                  else open(_path, "w", newline=""))
+        try:
+            writer = csv.writer(output)
+            writer.writerow(names)
+            writer.writerows(zip(*(_columns[name] for name in names)))
+        finally:
+            if _path is not None:
+                output.close()
+        return
+    if _path is None:
+        raise InputError("{} output needs --output".format(_format))
+    import numpy as np
+
+    arrays = {name: np.asarray(values) for name, values in _columns.items()}
+    if _format == "npy":
+        records = np.empty(len(arrays[names[0]]) if names else 0,
+                           dtype=[(name, values.dtype)
+                                  for name, values in arrays.items()])
+        for name, values in arrays.items():
+            records[name] = values
+        np.save(_path, records)
+    elif _format == "parquet":
+        from . import columnar
+
+        pa = columnar._pyarrow()
+        table = pa.table({
+            name: (pa.array(values).dictionary_encode()
+                   if values.dtype.kind == "U" else values)
+            for name, values in arrays.items()
+        })
+        columnar.write_parquet(table, _path)
+    else:
+        raise InputError("unknown output format {}".format(_format))
+
+
+def _columns(_rows):
+    names = list(_rows[0]) if _rows else []
+    return {name: [row[name] for row in _rows] for name in names}
+
+
+def _pvt_table(_args):
+    """
+    Returns the `pvt.BlackOilTable` of ``--pvt`` or the
+    `deviation.DeviationPVT` of ``--z-factor``, if any.
+    """
+    if getattr(_args, "z_factor", None):
+        if _args.pvt:
+            raise InputError("--pvt and --z-factor are exclusive")
+        from . import deviation
+
+        return deviation.DeviationPVT(_args.z_factor)
+    if not getattr(_args, "pvt", None):
+        return None
+    from . import pvt as black_oil
+
+    return black_oil.read(_args.pvt)
+
+
+def pvt(_args):
+    from . import correlations
+    from . import traverse
+
+    table = _pvt_table(_args)
+    rows = []
+    for case in _cases(_args, ("pressure", "temperature")):
+        bubble_point = case.get("bubble_point")
+        if bubble_point is None:
+            bubble_point = (table or correlations).mixture_bubble_point(
+                case["temperature"],
+                case["gas_specific_gravity"],
+                case["oil_api_gravity"],
+                case["water_cut"],
+                case["production_gas_liquid_ratio"]
+            )
+        row = {"pressure": case["pressure"],
+               "temperature": case["temperature"],
+               "bubble_point": bubble_point}
+        row.update(traverse.fluid_properties(
+            case["pressure"],
+            case["temperature"],
+            bubble_point,
+            *(case[name] for name in FLUID),
+            _pvt=table
+        ))
+        rows.append(row)
+    return _columns(rows)
+
+
+def bubble_point(_args):
+    from . import correlations
+
+    table = _pvt_table(_args)
+    rows = []
+    for case in _cases(_args, ("temperature",)):
+        rows.append({
+            "temperature": case["temperature"],
+            "bubble_point": (table or correlations).mixture_bubble_point(
+                case["temperature"],
+                case["gas_specific_gravity"],
+                case["oil_api_gravity"],
+                case["water_cut"],
+                case["production_gas_liquid_ratio"]
+            ),
+        })
+    return _columns(rows)
+
+
+def _result_cache(_args):
+    """
+    Returns the `cache.ResultCache` of ``--cache`` (enabled as a context
+    manager), or a context doing nothing.
+    """
+    if not getattr(_args, "cache", None):
+        return contextlib.nullcontext()
+    from . import cache
+
+    return cache.ResultCache(_args.cache)
+
+
+def gradient(_args):
+    from . import correlations
+    from . import traverse
+
+    table = _pvt_table(_args)
+    rows = []
+    names = ("pressure", "temperature", "liquid_flow_rate", "diameter")
+    for case in _cases(_args, names):
+        bubble_point = case.get("bubble_point")
+        if bubble_point is None:
+            bubble_point = (table or correlations).mixture_bubble_point(
+                case["temperature"],
+                case["gas_specific_gravity"],
+                case["oil_api_gravity"],
+                case["water_cut"],
+                case["production_gas_liquid_ratio"]
+            )
+        gravitational, frictional, pattern = traverse.pressure_gradient(
+            case["pressure"],
+            case["temperature"],
+            bubble_point,
+            *(case[name] for name in FLUID),
+            case["liquid_flow_rate"],
+            case["diameter"],
+            case["inclination"],
+            case["rugosity"],
+            _pvt=table
+        )
+        rows.append({
+            "pressure": case["pressure"],
+            "temperature": case["temperature"],
+            "gravitational_pressure_gradient": gravitational,
+            "frictional_pressure_gradient": frictional,
+            "flow_pattern": pattern.name,
+        })
+    return _columns(rows)
+
+
+def _traverse(_args):
+    from . import traverse
+
+    table = _pvt_table(_args)
+    rows = []
+    segments = _args.segments
+    for i, case in enumerate(_cases(_args, WELL + ("liquid_flow_rate",))):
+        length = case["depth"] / segments
+        temperatures = traverse.linear_temperatures(
+            case["wellhead_temperature"],
+            case["bottomhole_temperature"],
+            segments
+        )
+        pressures, patterns = traverse.traverse(
+            case["wellhead_pressure"],
+            [length] * segments,
+            [90.0] * segments,
+            temperatures,
+            *(case[name] for name in FLUID),
+            case["liquid_flow_rate"],
+            case["diameter"],
+            case["rugosity"],
+            _against_flow=True,
+            _pvt=table
+        )
+        for node, pressure in enumerate(pressures):
+            rows.append({
+                "case": i,
+                "depth": node * length,
+                "temperature": temperatures[node],
+                "pressure": pressure,
+                "flow_pattern": patterns[node - 1].name if node else "",
+            })
+    return _columns(rows)
+
+
+def vlp(_args):
+    import numpy as np
+    from . import monte_carlo
+
+    table = _pvt_table(_args)
+    rates = np.asarray(_args.rates, dtype=float)
+    columns = {"case": [], "liquid_flow_rate": [], "bottomhole_pressure": []}
+    for i, case in enumerate(_cases(_args, WELL)):
+        model = monte_carlo.WellModel(
+            *(case[name] for name in WELL[:4]),
+            case["diameter"],
+            *(case[name] for name in FLUID),
+            _rugosity=case["rugosity"],
+            _liquid_flow_rate=rates,
+            _segments=_args.segments,
+            _pvt=table
+        )
+        result = model({"liquid_flow_rate": rates})
+        columns["case"].extend([i] * rates.size)
+        columns["liquid_flow_rate"].extend(rates.tolist())
+        columns["bottomhole_pressure"].extend(
+            result["bottomhole_pressure"].tolist())
+    return columns
+
+
+def _sweep(_args):
+    from . import formulas
+    from . import monte_carlo
+    from . import sweep
+
+    specification = read_rows(_args.input)[0]
+    well = dict(specification.get("well", {}))
+    well.update(_args.set)
+    table = _pvt_table(_args)
+    if _args.serve is None:
+        model = monte_carlo.WellModel(
+            **{"_" + name: value for name, value in well.items()},
+            _segments=_args.segments,
+            _pvt=table
+        )
+        runner = sweep.Sweep(_args.directory,
+                             specification["axes"],
+                             model,
+                             specification.get("unit_size", 1000))
+        runner.run(_processes=_args.processes)
+    else:
+        # Workers build their model from the JSON well description
+        if table is not None:
+            raise InputError("--pvt and --z-factor are not supported with "
+                             "--serve")
+        from . import cluster
+
+        host, _, port = _args.serve.rpartition(":")
+        with cluster.Coordinator(_args.directory,
+                                 specification["axes"],
+                                 well,
+                                 specification.get("unit_size", 1000),
+                                 _args.segments,
+                                 host or "0.0.0.0",
+                                 int(port),
+                                 _args.lease_timeout) as coordinator:
+            print("mfsim: serving on {}:{}".format(*coordinator.address),
+                  file=sys.stderr, flush=True)
+            coordinator.wait()
+            for worker, stats in coordinator.statistics()[
+                    "workers"].items():
+                print("mfsim: worker {}: {} units, {:.0f} rows/s".format(
+                    worker, stats["units"], stats["rows_per_second"]),
+                    file=sys.stderr)
+        runner = coordinator.sweep
+    results = runner.results()
+    columns = {}
+    for name, values in results.items():
+        if name == "flow_pattern":
+            for segment in range(values.shape[1]):
+                columns["flow_pattern_{}".format(segment)] = [
+                    formulas.FlowPattern(code).name if code else ""
+                    for code in values[:, segment].tolist()
+                ]
+        else:
+            columns[name] = values.tolist()
+    return columns
+
+
+def _worker(_args):
+    from . import cluster
+
+    cluster.run_worker(_args.host, _args.port, _args.name)
+
+
+def _assignment(_text):
+    name, separator, value = _text.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(
+            "expected name=value, got {!r}".format(_text))
+    return name, _number(value)
+
+
+def parser():
+    """
+    Returns the `argparse` parser of ``mfsim``.
+    """
+    main_parser = argparse.ArgumentParser(
+        prog="mfsim",
+        description="Multiphase flow simulator batch runner."
+    )
+    commands = main_parser.add_subparsers(dest="command", required=True)
+
+    def command(_name, _function, _help):
+        command_parser = commands.add_parser(_name, help=_help)
+        command_parser.set_defaults(function=_function)
+        command_parser.add_argument(
+            "input",
+            help="JSON or CSV file of input cases ('-' for JSON on stdin)"
+        )
+        command_parser.add_argument(
+            "-o", "--output",
+            help="output file (CSV on stdout if omitted)"
+        )
+        command_parser.add_argument(
+            "-f", "--format", choices=FORMATS,
+            help="output format (from the output extension by default)"
+        )
+        command_parser.add_argument(
+            "-s", "--set", type=_assignment, action="append", default=[],
+            metavar="NAME=VALUE", help="input value applied to every case"
+        )
+        return command_parser
+
+    pvt_parsers = [
+        command("pvt", pvt, "fluid properties"),
+        command("bubble-point", bubble_point, "mixture bubble point"),
+        command("gradient", gradient, "Beggs and Brill pressure gradient"),
+        command("traverse", _traverse, "wellhead to bottom traverse"),
+    ]
+    well_parsers = [
+        pvt_parsers[-1],
+        command("vlp", vlp, "bottomhole pressure against rate"),
+        command("sweep", _sweep, "checkpointed sweep of a JSON spec"),
+    ]
+    for command_parser in pvt_parsers + well_parsers[1:]:
+        command_parser.add_argument(
+            "--pvt", metavar="FILE",
+            help="black-oil tables (PVTO, PVDG, PVTW) used instead of the "
+                 "correlations"
+        )
+        command_parser.add_argument(
+            "--z-factor",
+            choices=("papay", "hall_yarborough", "dranchuk_abou_kassem"),
+            help="gas deviation factor method (papay by default)"
+        )
+    for command_parser in well_parsers:
+        command_parser.add_argument("--segments", type=int, default=20)
+        command_parser.add_argument(
+            "--cache", metavar="FILE", default=os.environ.get("MFSIM_CACHE"),
+            help="SQLite file of cached results shared between runs "
+                 "($MFSIM_CACHE by default)"
+        )
+    commands.choices["vlp"].add_argument(
+        "--rates", type=lambda text: [float(v) for v in text.split(",")],
+        required=True, help="comma separated liquid rates (bpd)"
+    )
+    commands.choices["sweep"].add_argument(
+        "--directory", required=True, help="journal directory"
+    )
+    commands.choices["sweep"].add_argument(
+        "--processes", type=int, help="process pool size"
+    )
+    commands.choices["sweep"].add_argument(
+        "--serve", metavar="[HOST:]PORT",
+        help="hand the units out to 'mfsim worker' processes instead"
+    )
+    commands.choices["sweep"].add_argument(
+        "--lease-timeout", type=float, default=60.0,
+        help="seconds before a unit of a lost worker is reassigned"
+    )
+    worker_parser = commands.add_parser(
+        "worker", help="evaluate the units of a 'sweep --serve' coordinator")
+    worker_parser.set_defaults(function=_worker, set=[], output=None,
+                               format=None)
+    worker_parser.add_argument("host")
+    worker_parser.add_argument("port", type=int)
+    worker_parser.add_argument("--name", help="name in the statistics")
+    return main_parser
+
+
+def main(_argv=None):
+    """
+    Runs ``mfsim`` and returns its exit status.
+    """
+    main_parser = parser()
+    args = main_parser.parse_args(_argv)
+    args.set = dict(args.set)
+    try:
+        with _result_cache(args):
+            columns = args.function(args)
+        if columns is not None:
+            write_columns(columns, args.output, _output_format(args))
+    except (InputError, OSError, ValueError, KeyError) as error:
+        main_parser.exit(2, "mfsim: error: {}\n".format(error))
+    return 0
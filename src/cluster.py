@@ -0,0 +1,351 @@
+"""
+Cluster
+"""
+import collections
+import io
+import json
+import socket
+import socketserver
+import struct
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from . import monte_carlo
+from . import sweep
+
+
+def send(_socket, _header, _payload=b""):
+    """
+    Sends a message: a 4 byte big-endian length, a JSON header (which
+    records the payload size) and an optional binary payload.
+    """
+    header = json.dumps(dict(_header, bytes=len(_payload))).encode()
+    _socket.sendall(struct.pack(">I", len(header)) + header + _payload)
+
+
+def _receive_exactly(_socket, _size):
+    data = bytearray()
+    while len(data) < _size:
+        chunk = _socket.recv(min(_size - len(data), 1 << 20))
+        if not chunk:
+            raise ConnectionError("Connection closed by the peer.")
+        data += chunk
+    return bytes(data)
+
+
+def receive(_socket):
+    """
+    Receives a message sent with `send`.
+
+    Returns:
+        A tuple ``(header, payload)``.
+    """
+    size, = struct.unpack(">I", _receive_exactly(_socket, 4))
+    header = json.loads(_receive_exactly(_socket, size))
+    return header, _receive_exactly(_socket, header["bytes"])
+
+
+def _pack(_results):
+    buffer = io.BytesIO()
+    np.savez(buffer, **_results)
+    return buffer.getvalue()
+
+
+def _unpack(_payload):
+    with np.load(io.BytesIO(_payload), allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+
+def well_model(_well, _segments=20):
+    """
+    Returns the `monte_carlo.WellModel` of a JSON well description (its
+    constructor arguments without the leading underscore).
+    """
+    return monte_carlo.WellModel(
+        **{"_" + name: value for name, value in _well.items()},
+        _segments=_segments
+    )
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        coordinator = self.server.coordinator
+        worker = None
+        try:
+            while True:
+                header, payload = receive(self.request)
+                kind = header["type"]
+                if kind == "hello":
+                    worker = coordinator._register(header.get("worker"))
+                    send(self.request, coordinator._specification(worker))
+                elif kind == "request":
+                    send(self.request, coordinator._lease(worker))
+                elif kind == "result":
+                    coordinator._complete(worker,
+                                          header["unit"],
+                                          header["lease"],
+                                          _unpack(payload))
+                    send(self.request, {"type": "ack"})
+                else:
+                    send(self.request, {"type": "error",
+                                        "message": "unknown " + kind})
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            if worker is not None:
+                coordinator._disconnect(worker)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class Coordinator:
+    """
+    Serves the work units of a `sweep.Sweep` of a `monte_carlo.WellModel`
+    to workers (see `run_worker`) over plain TCP, so a sweep can use several
+    machines without any broker.
+
+    Units are leased: a unit whose result does not arrive within
+    ``_lease_timeout`` seconds (a lost or stuck worker), or whose worker
+    disconnects, goes back to the queue. Results are recorded in the sweep
+    journal, so an interrupted coordinator resumes where it stopped and
+    `sweep.read_results` reads the partial results at any time. Results of
+    a unit that arrive twice are only recorded once.
+
+    Args:
+        _directory (str): Sweep directory (see `sweep.Sweep`).
+        _axes (dict): Swept inputs.
+        _well (dict): `monte_carlo.WellModel` arguments (without the leading
+            underscore).
+        _unit_size (int, optional): Grid points per unit.
+        _segments (int, optional): Tubing segments of the model.
+        _host (str, optional): Address to listen on.
+        _port (int, optional): Port to listen on (0 picks a free one, see
+            `address`).
+        _lease_timeout (double, optional): Seconds before a leased unit is
+            handed out again.
+    """
+    def __init__(self,
+                 _directory,
+                 _axes,
+                 _well,
+                 _unit_size=1000,
+                 _segments=20,
+                 _host="127.0.0.1",
+                 _port=0,
+                 _lease_timeout=60.0):
+        self.well = dict(_well)
+        self.segments = _segments
+        self.lease_timeout = _lease_timeout
+        self.sweep = sweep.Sweep(_directory,
+                                 _axes,
+                                 well_model(self.well, _segments),
+                                 _unit_size)
+        self._condition = threading.Condition()
+        self._pending = collections.deque(self.sweep.pending())
+        self._completed = set(self.sweep.completed())
+        self._leases = {}
+        self.workers = {}
+        self.reassigned = 0
+        self._server = _Server((_host, _port), _Handler)
+        self._server.coordinator = self
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    @property
+    def done(self):
+        with self._condition:
+            return len(self._completed) == self.sweep.units
+
+    def start(self):
+        """
+        Starts serving in a background thread.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, _timeout=None):
+        """
+        Blocks until every unit is recorded (or ``_timeout`` seconds pass).
+
+        Returns:
+            Whether the sweep is complete.
+        """
+        deadline = None if _timeout is None else time.monotonic() + _timeout
+        with self._condition:
+            while len(self._completed) < self.sweep.units:
+                self._expire()
+                remaining = 1.0
+                if deadline is not None:
+                    remaining = min(remaining, deadline - time.monotonic())
+                    if remaining <= 0:
+                        return False
+                self._condition.wait(remaining)
+            return True
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *_exception):
+        self.close()
+
+    def statistics(self):
+        """
+        Returns the progress and the throughput of every worker: units and
+        rows done, seconds spent on them (from lease to result) and rows per
+        second.
+        """
+        with self._condition:
+            workers = {}
+            for worker, stats in self.workers.items():
+                stats = dict(stats)
+                stats["rows_per_second"] = (
+                    stats["rows"] / stats["busy"] if stats["busy"] else 0.0
+                )
+                workers[worker] = stats
+            return {
+                "units": self.sweep.units,
+                "completed": len(self._completed),
+                "leased": len(self._leases),
+                "reassigned": self.reassigned,
+                "workers": workers,
+            }
+
+    def _register(self, _worker):
+        with self._condition:
+            worker = _worker or uuid.uuid4().hex[:8]
+            while worker in self.workers and self.workers[worker]["online"]:
+                worker += "+"
+            self.workers.setdefault(worker, {"units": 0,
+                                             "rows": 0,
+                                             "busy": 0.0})
+            self.workers[worker]["online"] = True
+            return worker
+
+    def _specification(self, _worker):
+        return {
+            "type": "specification",
+            "worker": _worker,
+            "axes": {name: np.asarray(values, dtype=float).tolist()
+                     for name, values in self.sweep.axes.items()},
+            "unit_size": self.sweep.unit_size,
+            "well": self.well,
+            "segments": self.segments,
+        }
+
+    def _requeue(self, _units):
+        for unit in sorted(_units, reverse=True):
+            del self._leases[unit]
+            if unit not in self._completed:
+                self._pending.appendleft(unit)
+                self.reassigned += 1
+
+    def _expire(self):
+        now = time.monotonic()
+        self._requeue([unit for unit, lease in self._leases.items()
+                       if lease["deadline"] < now])
+
+    def _lease(self, _worker):
+        with self._condition:
+            self._expire()
+            while self._pending and self._pending[0] in self._completed:
+                self._pending.popleft()
+            if self._pending:
+                unit = self._pending.popleft()
+                now = time.monotonic()
+                lease = uuid.uuid4().hex
+                self._leases[unit] = {"worker": _worker,
+                                      "lease": lease,
+                                      "start": now,
+                                      "deadline": now + self.lease_timeout}
+                return {"type": "unit", "unit": unit, "lease": lease}
+            if self._leases:
+                # Everything is leased: ask again in case a lease expires
+                return {"type": "wait", "seconds": min(
+                    1.0, self.lease_timeout / 4)}
+            return {"type": "done"}
+
+    def _complete(self, _worker, _unit, _lease, _results):
+        with self._condition:
+            lease = self._leases.get(_unit)
+            start = (lease["start"] if lease and lease["lease"] == _lease
+                     else None)
+            if lease is not None and start is not None:
+                del self._leases[_unit]
+            if _unit in self._completed:
+                return
+            self.sweep._record(_unit, _results)
+            self._completed.add(_unit)
+            stats = self.workers[_worker]
+            stats["units"] += 1
+            stats["rows"] += int(_results["index"].size)
+            if start is not None:
+                stats["busy"] += time.monotonic() - start
+            self._condition.notify_all()
+
+    def _disconnect(self, _worker):
+        with self._condition:
+            self.workers[_worker]["online"] = False
+            self._requeue([unit for unit, lease in self._leases.items()
+                           if lease["worker"] == _worker])
+            self._condition.notify_all()
+
+
+def run_worker(_host, _port, _worker=None, _max_units=None):
+    """
+    Connects to a `Coordinator` and evaluates the units it hands out until
+    the sweep is done.
+
+    Args:
+        _host (str): Coordinator address.
+        _port (int): Coordinator port.
+        _worker (str, optional): Worker name used in the statistics.
+        _max_units (int, optional): Stops after this many units.
+
+    Returns:
+        The number of units evaluated.
+    """
+    units = 0
+    with socket.create_connection((_host, _port)) as connection:
+        send(connection, {"type": "hello", "worker": _worker})
+        specification, _ = receive(connection)
+        model = well_model(specification["well"], specification["segments"])
+        axes = specification["axes"]
+        while _max_units is None or units < _max_units:
+            try:
+                send(connection, {"type": "request"})
+                message, _ = receive(connection)
+            except ConnectionError:
+                # The coordinator stops serving once the sweep is complete
+                break
+            if message["type"] == "done":
+                break
+            if message["type"] == "wait":
+                time.sleep(message["seconds"])
+                continue
+            _, results = sweep.evaluate_unit(axes,
+                                             specification["unit_size"],
+                                             model,
+                                             message["unit"])
+            send(connection,
+                 {"type": "result",
+                  "unit": message["unit"],
+                  "lease": message["lease"]},
+                 _pack(results))
+            receive(connection)
+            units += 1
+    return units
@@ -0,0 +1,281 @@
+"""
+Columnar
+"""
+import numpy as np
+
+from . import formulas
+
+
+FLOW_PATTERNS = [pattern.name for pattern in formulas.FlowPattern]
+
+FLOW_PATTERN_COLUMNS = ("flow_pattern",)
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            "Columnar export requires pyarrow (pip install pyarrow)."
+        ) from None
+    return pyarrow
+
+
+def _parquet():
+    _pyarrow()
+    import pyarrow.parquet
+    return pyarrow.parquet
+
+
+def flow_pattern_array(_flow_patterns):
+    """
+    Returns `FlowPattern` values (the int8 codes of `vectorized`) as an Arrow
+    dictionary array of pattern names. Zero codes (no pattern) become nulls.
+    """
+    pa = _pyarrow()
+    codes = np.asarray(_flow_patterns, dtype=np.int8).ravel()
+    mask = codes == 0
+    return pa.DictionaryArray.from_arrays(
+        pa.array(codes - 1, mask=mask if mask.any() else None),
+        pa.array(FLOW_PATTERNS)
+    )
+
+
+def _array(_name, _values):
+    """
+    Converts a NumPy column to Arrow. Contiguous numeric arrays share their
+    buffer with the Arrow array; 2-D arrays become fixed size lists (one row
+    per leading index) and flow pattern codes become dictionary arrays.
+    """
+    pa = _pyarrow()
+    values = np.asarray(_values)
+    if _name in FLOW_PATTERN_COLUMNS:
+        flat = flow_pattern_array(values)
+    else:
+        flat = pa.array(np.ascontiguousarray(values).ravel())
+    if values.ndim == 2:
+        return pa.FixedSizeListArray.from_arrays(flat, values.shape[1])
+    return flat
+
+
+class ResultBuilder:
+    """
+    Accumulates result arrays as Arrow record batches. Every `append` adds
+    one batch whose columns are given as keyword arguments (arrays of the
+    same length or scalars, which are broadcast); the first batch fixes the
+    schema.
+    """
+    def __init__(self):
+        self.batches = []
+
+    @property
+    def rows(self):
+        return sum(batch.num_rows for batch in self.batches)
+
+    def append(self, **_columns):
+        pa = _pyarrow()
+        size = max(np.shape(values)[0] if np.ndim(values) else 1
+                   for values in _columns.values())
+        arrays = []
+        for name, values in _columns.items():
+            if not np.ndim(values):
+                values = np.full(size, values)
+            arrays.append(_array(name, values))
+        batch = pa.RecordBatch.from_arrays(arrays, names=list(_columns))
+        if self.batches and batch.schema != self.batches[0].schema:
+            raise ValueError("Batch schema differs from the first batch.")
+        self.batches.append(batch)
+        return batch
+
+    def table(self):
+        """
+        Returns the batches as a `pyarrow.Table` (without copying them).
+        """
+        pa = _pyarrow()
+        return pa.Table.from_batches(self.batches)
+
+    def write(self, _path, _compression="zstd"):
+        """
+        Writes the batches to a Parquet file (see `write_parquet`).
+        """
+        write_parquet(self.table(), _path, _compression)
+
+
+class TraverseBuilder(ResultBuilder):
+    """
+    Builds a long table of traverses with one row per case and node:
+    ``case``, ``node``, ``length`` (cumulative, :math:`ft`), ``pressure``
+    and the ``flow_pattern`` of the segment ending at the node (null at the
+    first node), plus any per case column.
+    """
+    def __init__(self, _lengths):
+        super().__init__()
+        self.lengths = np.concatenate(([0.0], np.cumsum(_lengths)))
+        self.cases = 0
+
+    def append_traverse(self, _pressures, _flow_patterns, **_cases):
+        """
+        Appends the result of `vectorized.traverse`.
+
+        Args:
+            _pressures (ndarray): ``(cases, nodes)`` node pressures.
+            _flow_patterns (ndarray): ``(cases, segments)`` flow patterns.
+            **_cases: Per case columns (arrays with one value per case, or
+                scalars), repeated over the nodes of each case.
+        """
+        pressures = np.atleast_2d(_pressures)
+        cases, nodes = pressures.shape
+        patterns = np.zeros((cases, nodes), dtype=np.int8)
+        patterns[:, 1:] = _flow_patterns
+        case = np.arange(self.cases, self.cases + cases)
+        self.cases += cases
+        columns = {
+            "case": np.repeat(case, nodes),
+            "node": np.tile(np.arange(nodes, dtype=np.int32), cases),
+            "length": np.tile(self.lengths, cases),
+            "pressure": pressures.ravel(),
+            "flow_pattern": patterns.ravel(),
+        }
+        for name, values in _cases.items():
+            columns[name] = (np.repeat(values, nodes) if np.ndim(values)
+                             else values)
+        return self.append(**columns)
+
+
+class VLPBuilder(ResultBuilder):
+    """
+    Builds a long table of vertical lift performance curves with one row per
+    grid point: a column per grid axis and the ``bottomhole_pressure``.
+    """
+    def append_table(self, _bottomhole_pressures, **_axes):
+        """
+        Appends a VLP table.
+
+        Args:
+            _bottomhole_pressures (ndarray): Bottomhole pressures
+                (:math:`psig`) over the grid, one dimension per axis in
+                argument order.
+            **_axes: 1-D arrays of the grid values (e.g. ``liquid_flow_rate``,
+                ``water_cut`` and ``production_gas_liquid_ratio``).
+        """
+        pressures = np.asarray(_bottomhole_pressures, dtype=float)
+        grids = np.meshgrid(*_axes.values(), indexing="ij")
+        if grids[0].shape != pressures.shape:
+            raise ValueError("Pressure shape {} does not match the axes {}."
+                             .format(pressures.shape, grids[0].shape))
+        columns = {name: grid.ravel() for name, grid in zip(_axes, grids)}
+        columns["bottomhole_pressure"] = pressures.ravel()
+        return self.append(**columns)
+
+
+class MonteCarloBuilder(ResultBuilder):
+    """
+    Builds a table of Monte Carlo samples with one row per sample: ``chunk``,
+    the sampled inputs and the model outputs. Per segment outputs (such as
+    the ``flow_pattern`` of `monte_carlo.WellModel`) become fixed size list
+    columns.
+    """
+    def append_chunk(self, _chunk, _samples, _outputs):
+        columns = {"chunk": np.int32(_chunk)}
+        columns.update(_samples)
+        columns.update(_outputs)
+        return self.append(**columns)
+
+
+def write_parquet(_table, _path, _compression="zstd"):
+    """
+    Writes a table to Parquet. Flow pattern (dictionary) columns keep their
+    dictionary encoding and are read back as dictionaries; floats are stored
+    plain, which compresses better than dictionary pages for continuous
+    values.
+    """
+    pq = _parquet()
+    pq.write_table(_table,
+                   _path,
+                   compression=_compression,
+                   use_dictionary=_dictionary_columns(_table.schema))
+
+
+def _dictionary_columns(_schema):
+    """
+    Returns the Parquet column paths of the dictionary fields of a schema
+    (including the elements of list fields), or False if there are none.
+    """
+    pa = _pyarrow()
+    paths = []
+    for field in _schema:
+        path = field.name
+        value_type = field.type
+        while pa.types.is_fixed_size_list(value_type):
+            path += ".list.element"
+            value_type = value_type.value_type
+        if pa.types.is_dictionary(value_type):
+            paths.append(path)
+    return paths or False
+
+
+def write_monte_carlo(_path,
+                      _distributions,
+                      _model,
+                      _samples,
+                      _chunk_size=100000,
+                      _seed=0,
+                      _compression="zstd"):
+    """
+    Streams every sample of a Monte Carlo run to Parquet, one row group per
+    chunk, so memory does not grow with the number of samples. Chunks are
+    sampled exactly as in `monte_carlo.monte_carlo` with the same seed.
+
+    Returns:
+        The number of rows written.
+    """
+    from . import monte_carlo
+
+    pq = _parquet()
+    writer = None
+    rows = 0
+    try:
+        for chunk in range(-(-_samples // _chunk_size)):
+            size = min(_chunk_size, _samples - chunk * _chunk_size)
+            generator = monte_carlo.chunk_generator(_seed, chunk)
+            samples = {name: _distributions[name].sample(generator, size)
+                       for name in sorted(_distributions)}
+            builder = MonteCarloBuilder()
+            batch = builder.append_chunk(chunk, samples, _model(samples))
+            if writer is None:
+                writer = pq.ParquetWriter(
+                    _path,
+                    batch.schema,
+                    compression=_compression,
+                    use_dictionary=_dictionary_columns(batch.schema)
+                )
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def read(_path, _columns=None, _filters=None):
+    """
+    Reads a result file, loading only the requested columns (and the row
+    groups that may match ``_filters``, in `pyarrow.parquet.read_table`
+    form).
+
+    Returns:
+        A `pyarrow.Table`.
+    """
+    pq = _parquet()
+    return pq.read_table(_path, columns=_columns, filters=_filters)
+
+
+def iter_batches(_path, _columns=None, _batch_size=65536):
+    """
+    Lazily reads a result file batch by batch, loading only the requested
+    columns.
+    """
+    pq = _parquet()
+    parquet_file = pq.ParquetFile(_path)
+    yield from parquet_file.iter_batches(batch_size=_batch_size,
+                                         columns=_columns)
@@ -77,7 +77,8 @@ def mixture_bubble_point(_temperature,
                          _gas_specific_gravity,
                          _oil_api_gravity,
                          _water_cut,
-                         _production_gas_liquid_ratio):
+                         _production_gas_liquid_ratio,
+                         _max_iterations=200):
     """
     Calculates the mixture's bubble point based on the water cut and the
     prouction gas liquid ratio.
@@ -87,6 +88,9 @@ def mixture_bubble_point(_temperature,
         _production_gas_liquid_ratio: Production gas liquid ratio, GLR_p (in
                                       the same unit as Rso and Rsw, suggestion:
                                       scf/stb).
+        _max_iterations: Maximum number of bisection iterations. It is only
+                         reached when the bubble point lies outside the
+                         searched range (0 to 100000 psig).
 
     Returns:
         The mixture's bubble point Pb (psi).
@@ -95,7 +99,9 @@ def mixture_bubble_point(_temperature,
     pressure_high = 100000.0
     bubble_point = 0.0
     error = 1.0
-    while abs(error) > 1e-10:
+    iterations = 0
+    while abs(error) > 1e-10 and iterations < _max_iterations:
+        iterations += 1
         bubble_point = (pressure_low + pressure_high)/2
         rso = gas_solubility_in_oil(bubble_point,
                                     pressure_high,
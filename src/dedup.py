@@ -0,0 +1,260 @@
+"""
+Dedup
+"""
+import numpy as np
+
+from . import vectorized
+
+
+BUBBLE_POINT_ARGUMENTS = (
+    "temperature",
+    "gas_specific_gravity",
+    "oil_api_gravity",
+    "water_cut",
+    "production_gas_liquid_ratio",
+)
+
+PVT_ARGUMENTS = (
+    "pressure",
+    "temperature",
+    "bubble_point",
+    "oil_api_gravity",
+    "gas_specific_gravity",
+    "water_specific_gravity",
+    "water_cut",
+    "production_gas_liquid_ratio",
+)
+
+GRADIENT_ARGUMENTS = PVT_ARGUMENTS + (
+    "liquid_flow_rate",
+    "diameter",
+    "inclination",
+    "rugosity",
+)
+
+
+def _mix(_hashes):
+    # splitmix64 finalizer
+    _hashes = _hashes ^ (_hashes >> np.uint64(30))
+    _hashes = _hashes * np.uint64(0xbf58476d1ce4e5b9)
+    _hashes = _hashes ^ (_hashes >> np.uint64(27))
+    _hashes = _hashes * np.uint64(0x94d049bb133111eb)
+    return _hashes ^ (_hashes >> np.uint64(31))
+
+
+def unique_rows(_columns):
+    """
+    Finds the distinct rows of equally long 1-D ``float64`` columns. Rows
+    are hashed (64-bit, one pass per column) and grouped by hash; the
+    grouping is checked against the values and redone with an exact sort in
+    the unlikely case of a hash collision.
+
+    Returns:
+        A tuple ``(index, inverse)``: the first row of every distinct row
+        and, for every row, the position of its distinct row (so
+        ``column[index][inverse]`` equals ``column``).
+    """
+    # Adding zero turns -0.0 into 0.0, so both get the same bits
+    columns = [np.ascontiguousarray(column, dtype=float) + 0.0
+               for column in _columns]
+    hashes = np.zeros(len(columns[0]), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for column in columns:
+            hashes = _mix(hashes ^ column.view(np.uint64))
+    _, index, inverse = np.unique(hashes, return_index=True,
+                                  return_inverse=True)
+    if all(np.array_equal(column[index][inverse], column, equal_nan=True)
+           for column in columns):
+        return index, inverse
+    order = np.lexsort(columns[::-1])
+    # A row starts a group when any of its columns differs from the previous
+    starts = np.zeros(len(order), dtype=bool)
+    starts[0] = True
+    for column in columns:
+        ordered = column[order]
+        same = ((ordered[1:] == ordered[:-1]) |
+                (np.isnan(ordered[1:]) & np.isnan(ordered[:-1])))
+        starts[1:] |= ~same
+    groups = np.cumsum(starts) - 1
+    inverse = np.empty(len(order), dtype=np.intp)
+    inverse[order] = groups
+    return order[starts], inverse
+
+
+def quantize(_values, _step):
+    """
+    Rounds values to the nearest multiple of ``_step``.
+    """
+    return np.round(np.asarray(_values, dtype=float) / _step) * _step
+
+
+class Deduplicator:
+    """
+    Batch front-end that evaluates a vectorized function only once per
+    distinct input row and scatters the results back to the original order.
+    Batches built from well-test histories repeat the same fluid,
+    temperature and rounded pressure many times, and every repetition would
+    otherwise cost a full bubble point solve and correlation chain.
+
+    Inputs named in ``_quantization`` are first rounded to a multiple of
+    their step (e.g. ``{"pressure": 1.0, "temperature": 0.5}``), so nearly
+    equal rows are merged; the results are those of the rounded inputs.
+    Scalar arguments are shared by every row and take no part in the
+    comparison.
+
+    Args:
+        _quantization (dict, optional): Rounding step of inputs by argument
+            name (without the leading underscore).
+
+    Attributes:
+        rows (int): Rows received since creation.
+        unique (int): Rows actually evaluated.
+        last (tuple): ``(rows, unique)`` of the last call.
+    """
+    def __init__(self, _quantization=None):
+        self.quantization = dict(_quantization or {})
+        self.rows = 0
+        self.unique = 0
+        self.last = (0, 0)
+
+    @property
+    def ratio(self):
+        """
+        Rows received per row evaluated (1 without any repetition).
+        """
+        return self.rows / self.unique if self.unique else 1.0
+
+    def reset(self):
+        self.rows = 0
+        self.unique = 0
+        self.last = (0, 0)
+
+    def evaluate(self, _function, _names, _values):
+        """
+        Calls ``_function`` with the distinct rows of its per row arguments
+        (``_values``, in ``_names`` order) and scatters the results (an
+        array, a tuple or a dict of arrays) back to every row.
+        """
+        values = [quantize(value, self.quantization[name])
+                  if name in self.quantization else value
+                  for name, value in zip(_names, _values)]
+        arrays = [np.asarray(value) for value in values]
+        shape = np.broadcast_shapes(*(array.shape for array in arrays))
+        size = int(np.prod(shape))
+        varying = [i for i, array in enumerate(arrays) if array.ndim]
+        if not varying:
+            self.last = (1, 1)
+            self.rows += 1
+            self.unique += 1
+            return _function(*values)
+        columns = [np.broadcast_to(arrays[i], shape).ravel() for i in varying]
+        index, inverse = unique_rows(columns)
+        arguments = list(values)
+        for i, column in zip(varying, columns):
+            arguments[i] = column[index]
+        result = _function(*arguments)
+
+        self.last = (size, len(index))
+        self.rows += size
+        self.unique += len(index)
+
+        def scatter(_result):
+            result = np.asarray(_result)
+            if not result.ndim:
+                return _result
+            return result[inverse].reshape(shape + result.shape[1:])
+
+        if isinstance(result, dict):
+            return {name: scatter(value) for name, value in result.items()}
+        if isinstance(result, tuple):
+            return tuple(scatter(value) for value in result)
+        return scatter(result)
+
+    def mixture_bubble_point(self,
+                             _temperature,
+                             _gas_specific_gravity,
+                             _oil_api_gravity,
+                             _water_cut,
+                             _production_gas_liquid_ratio):
+        """
+        Deduplicated `vectorized.mixture_bubble_point`.
+        """
+        return self.evaluate(vectorized.mixture_bubble_point,
+                             BUBBLE_POINT_ARGUMENTS,
+                             (_temperature,
+                              _gas_specific_gravity,
+                              _oil_api_gravity,
+                              _water_cut,
+                              _production_gas_liquid_ratio))
+
+    def _bubble_point(self, _values):
+        # Bubble points of the rows that have none, deduplicated on the
+        # fluid and temperature only
+        named = dict(zip(PVT_ARGUMENTS, _values))
+        return self.mixture_bubble_point(
+            *(named[name] for name in BUBBLE_POINT_ARGUMENTS))
+
+    def fluid_properties(self,
+                         _pressure,
+                         _temperature,
+                         _bubble_point,
+                         _oil_api_gravity,
+                         _gas_specific_gravity,
+                         _water_specific_gravity,
+                         _water_cut,
+                         _production_gas_liquid_ratio):
+        """
+        Deduplicated `vectorized.fluid_properties`. A ``_bubble_point`` of
+        None is computed with `mixture_bubble_point` first.
+        """
+        values = [_pressure,
+                  _temperature,
+                  _bubble_point,
+                  _oil_api_gravity,
+                  _gas_specific_gravity,
+                  _water_specific_gravity,
+                  _water_cut,
+                  _production_gas_liquid_ratio]
+        if _bubble_point is None:
+            values[2] = self._bubble_point(values)
+        return self.evaluate(vectorized.fluid_properties, PVT_ARGUMENTS,
+                             values)
+
+    def pressure_gradient(self,
+                          _pressure,
+                          _temperature,
+                          _bubble_point,
+                          _oil_api_gravity,
+                          _gas_specific_gravity,
+                          _water_specific_gravity,
+                          _water_cut,
+                          _production_gas_liquid_ratio,
+                          _liquid_flow_rate,
+                          _diameter,
+                          _inclination,
+                          _rugosity,
+                          _friction_table=None):
+        """
+        Deduplicated single segment `vectorized.pressure_gradient`. A
+        ``_bubble_point`` of None is computed with `mixture_bubble_point`
+        first.
+        """
+        values = [_pressure,
+                  _temperature,
+                  _bubble_point,
+                  _oil_api_gravity,
+                  _gas_specific_gravity,
+                  _water_specific_gravity,
+                  _water_cut,
+                  _production_gas_liquid_ratio,
+                  _liquid_flow_rate,
+                  _diameter,
+                  _inclination,
+                  _rugosity]
+        if _bubble_point is None:
+            values[2] = self._bubble_point(values[:8])
+
+        def gradient(*_arguments):
+            return vectorized.pressure_gradient(*_arguments, _friction_table)
+
+        return self.evaluate(gradient, GRADIENT_ARGUMENTS, values)
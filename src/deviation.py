@@ -0,0 +1,380 @@
+"""
+Deviation
+"""
+import math
+
+import numpy as np
+
+from . import correlations
+from . import formulas
+from . import pvt
+from . import traverse
+from . import vectorized
+
+
+METHODS = ("papay", "hall_yarborough", "dranchuk_abou_kassem")
+DEFAULT_METHOD = "dranchuk_abou_kassem"
+
+# Dranchuk and Abou-Kassem fit of the Standing and Katz chart
+DAK = (0.3265, -1.0700, -0.5339, 0.01569, -0.05165, 0.5475, -0.7361, 0.1844,
+       0.1056, 0.6134, 0.7210)
+
+
+def pseudo_critical_properties(_gas_specific_gravity):
+    """
+    Calculates the pseudo-critical temperature and pressure of a natural gas
+    using Standing's correlations (the ones in
+    `correlations.gas_deviation_factor`).
+
+    Returns:
+        A tuple ``(temperature, pressure)`` in :math:`°R` and :math:`psia`.
+    """
+    temperature = (168. +
+                   325. * _gas_specific_gravity -
+                   12.5 * _gas_specific_gravity ** 2)
+    pressure = (677. +
+                15.0 * _gas_specific_gravity -
+                37.5 * _gas_specific_gravity ** 2)
+    return temperature, pressure
+
+
+def _exp(_value):
+    # math.exp on scalars, which is much cheaper than the ufunc
+    return np.exp(_value) if pvt._is_array(_value) else math.exp(_value)
+
+
+def _hall_yarborough_residual(_density, _reduced_pressure, _inverse):
+    # Residual of the Hall and Yarborough equation in the reduced density y
+    # and its derivative
+    t = _inverse
+    y = _density
+    term_a = 0.06125 * t * _exp(-1.2 * (1 - t) ** 2) * _reduced_pressure
+    term_b = 14.76 * t - 9.76 * t ** 2 + 4.58 * t ** 3
+    term_c = 90.7 * t - 242.2 * t ** 2 + 42.4 * t ** 3
+    exponent = 2.18 + 2.82 * t
+    residual = (-term_a +
+                (y + y ** 2 + y ** 3 - y ** 4) / (1 - y) ** 3 -
+                term_b * y ** 2 +
+                term_c * y ** exponent)
+    derivative = ((1 + 4 * y + 4 * y ** 2 - 4 * y ** 3 + y ** 4) /
+                  (1 - y) ** 4 -
+                  2 * term_b * y +
+                  exponent * term_c * y ** (exponent - 1))
+    return residual, derivative
+
+
+def _dranchuk_abou_kassem_z(_density, _reduced_temperature):
+    # Z from the reduced density and its derivative
+    a1, a2, a3, a4, a5, a6, a7, a8, a9, a10, a11 = DAK
+    t = _reduced_temperature
+    rho = _density
+    first = a1 + a2 / t + a3 / t ** 3 + a4 / t ** 4 + a5 / t ** 5
+    second = a6 + a7 / t + a8 / t ** 2
+    fifth = a9 * (a7 / t + a8 / t ** 2)
+    decay = _exp(-a11 * rho ** 2)
+    z = (1 +
+         first * rho +
+         second * rho ** 2 -
+         fifth * rho ** 5 +
+         a10 / t ** 3 * (rho ** 2 + a11 * rho ** 4) * decay)
+    derivative = (first +
+                  2 * second * rho -
+                  5 * fifth * rho ** 4 +
+                  a10 / t ** 3 * decay *
+                  (2 * rho + 2 * a11 * rho ** 3 - 2 * a11 ** 2 * rho ** 5))
+    return z, derivative
+
+
+def _dranchuk_abou_kassem_residual(_density,
+                                   _reduced_pressure,
+                                   _reduced_temperature):
+    # Residual of Z(rho) = 0.27 Ppr / (rho Tpr) and its derivative
+    z, derivative = _dranchuk_abou_kassem_z(_density, _reduced_temperature)
+    ideal = 0.27 * _reduced_pressure / _reduced_temperature
+    return (z - ideal / _density,
+            derivative + ideal / _density ** 2)
+
+
+def _newton(_residual,
+            _density,
+            _parameters,
+            _upper,
+            _tolerance,
+            _max_iterations):
+    # Newton iteration on the reduced density, kept inside (0, _upper) by
+    # halving the distance to the violated bound; converged elements leave
+    # the active set. Returns the densities and the element iterations.
+    if not pvt._is_array(_density):
+        density = float(_density)
+        for iteration in range(1, _max_iterations + 1):
+            residual, derivative = _residual(density, *_parameters)
+            step = residual / derivative
+            new_density = density - step
+            if not 0 < new_density < _upper:
+                new_density = (density / 2 if new_density <= 0
+                               else (density + _upper) / 2)
+            if abs(new_density - density) <= _tolerance * new_density:
+                return new_density, iteration
+            density = new_density
+        return density, _max_iterations
+
+    density = np.array(_density, dtype=float)
+    parameters = [np.broadcast_to(value, density.shape)
+                  for value in _parameters]
+    iterations = 0
+    index = np.flatnonzero(np.ones(density.shape, dtype=bool))
+    flat = density.reshape(-1)
+    flat_parameters = [value.reshape(-1) for value in parameters]
+    for _ in range(_max_iterations):
+        if not index.size:
+            break
+        iterations += index.size
+        current = flat[index]
+        residual, derivative = _residual(
+            current, *(value[index] for value in flat_parameters))
+        new_density = current - residual / derivative
+        new_density = np.where(new_density <= 0, current / 2, new_density)
+        new_density = np.where(new_density >= _upper,
+                               (current + _upper) / 2, new_density)
+        flat[index] = new_density
+        index = index[np.abs(new_density - current) >
+                      _tolerance * new_density]
+    return density, iterations
+
+
+def _solve(_reduced_pressure,
+           _reduced_temperature,
+           _method,
+           _density,
+           _tolerance,
+           _max_iterations):
+    # Returns Z, the reduced density of the method and the iterations
+    if _method == "hall_yarborough":
+        inverse = 1 / _reduced_temperature
+        scale = (0.06125 * inverse * _exp(-1.2 * (1 - inverse) ** 2) *
+                 _reduced_pressure)
+        # Ideal gas start (Z = 1)
+        start = scale if _density is None else _density
+        start = (np.minimum(start, 0.9) if pvt._is_array(start)
+                 else min(start, 0.9))
+        density, iterations = _newton(_hall_yarborough_residual,
+                                      start,
+                                      (_reduced_pressure, inverse),
+                                      1.0,
+                                      _tolerance,
+                                      _max_iterations)
+        return scale / density, density, iterations
+    if _method == "dranchuk_abou_kassem":
+        ideal = 0.27 * _reduced_pressure / _reduced_temperature
+        start = ideal if _density is None else _density
+        density, iterations = _newton(_dranchuk_abou_kassem_residual,
+                                      start,
+                                      (_reduced_pressure,
+                                       _reduced_temperature),
+                                      np.inf,
+                                      _tolerance,
+                                      _max_iterations)
+        return ideal / density, density, iterations
+    if _method == "papay":
+        ratio = _reduced_pressure / _reduced_temperature
+        z = 1 - ratio * (0.3675 - 0.04188423 * ratio)
+        return z, 0.27 * ratio / z, 0
+    raise ValueError("unknown Z-factor method: {}".format(_method))
+
+
+def deviation_factor(_pressure,
+                     _temperature,
+                     _gas_specific_gravity,
+                     _method=DEFAULT_METHOD,
+                     _density=None,
+                     _tolerance=1e-12,
+                     _max_iterations=50):
+    """
+    Calculates the gas deviation factor Z with an implicit equation of state
+    fitted to the Standing and Katz chart, solved by Newton's method with
+    analytic derivatives. Arrays are solved together and every element stops
+    iterating once its relative density step is below ``_tolerance``.
+
+    Args:
+        _pressure: Pressure at which the gas is (psig).
+        _temperature: Temperature (fahrenheit degrees).
+        _gas_specific_gravity: Gas' specific gravity (doesn't have an unit).
+        _method (str, optional): ``"dranchuk_abou_kassem"``,
+            ``"hall_yarborough"`` or ``"papay"`` (explicit, as in
+            `correlations.gas_deviation_factor`).
+        _density (optional): Initial reduced density (of the method), e.g.
+            the one returned for the previous segment of a traverse. The
+            ideal gas density is used by default.
+        _tolerance (double, optional): Relative step that ends the iteration.
+        _max_iterations (int, optional): Maximum number of Newton iterations.
+
+    Returns:
+        A tuple ``(deviation_factor, reduced_density)``; the reduced density
+        is the warm start of the next call.
+    """
+    critical_temperature, critical_pressure = pseudo_critical_properties(
+        _gas_specific_gravity)
+    z, density, _ = _solve((_pressure + 14.7) / critical_pressure,
+                           (_temperature + 460) / critical_temperature,
+                           _method,
+                           _density,
+                           _tolerance,
+                           _max_iterations)
+    return z, density
+
+
+def gas_deviation_factor(_pressure,
+                         _temperature,
+                         _gas_specific_gravity,
+                         _method=DEFAULT_METHOD):
+    """
+    Calculates the gas deviation factor Z (see `deviation_factor`).
+
+    Returns:
+        The gas deviation factor.
+    """
+    return deviation_factor(_pressure,
+                            _temperature,
+                            _gas_specific_gravity,
+                            _method)[0]
+
+
+def gas_formation_volume_factor(_pressure,
+                                _temperature,
+                                _gas_specific_gravity,
+                                _in_cubic_feet=True,
+                                _method=DEFAULT_METHOD):
+    """
+    Version of `correlations.gas_formation_volume_factor` with the deviation
+    factors of ``_method`` (see `deviation_factor`).
+    """
+    z = gas_deviation_factor(_pressure,
+                             _temperature,
+                             _gas_specific_gravity,
+                             _method)
+    standard_z = gas_deviation_factor(0., 60., _gas_specific_gravity,
+                                      _method)
+    conversion_factor = 0.028269 if _in_cubic_feet else 0.00503475
+    return (conversion_factor *
+            (_temperature + 460) / (_pressure + 14.7) *
+            z / standard_z)
+
+
+class DeviationPVT(pvt.CorrelationPVT):
+    """
+    PVT source of the correlations (see `pvt.CorrelationPVT`) with the gas
+    formation volume factor, density and viscosity computed from the
+    implicit deviation factor of ``_method`` instead of Papay's.
+
+    The reduced density of the last call is the initial guess of the next
+    one with the same shape, so the pressure iterations and consecutive
+    segments of a traverse start next to their solution and take a couple
+    of Newton iterations. An instance therefore belongs to one traverse at a
+    time (a warm start from another one only costs iterations).
+
+    Args:
+        _method (str, optional): Deviation factor method (see
+            `deviation_factor`).
+        _warm_start (bool, optional): Whether to start from the last reduced
+            density.
+
+    Attributes:
+        statistics (dict): ``solves`` of the deviation factor and Newton
+            ``iterations``, summed over the elements.
+    """
+    def __init__(self, _method=DEFAULT_METHOD, _warm_start=True):
+        if _method not in METHODS:
+            raise ValueError("unknown Z-factor method: {}".format(_method))
+        self.method = _method
+        self.warm_start = _warm_start
+        self.statistics = {"solves": 0, "iterations": 0}
+        self._density = None
+        self._standard = {}
+
+    def _standard_factor(self, _gas_specific_gravity):
+        # Deviation factor at standard conditions, per gas gravity
+        key = (None if pvt._is_array(_gas_specific_gravity)
+               else _gas_specific_gravity)
+        if key is not None and key in self._standard:
+            return self._standard[key]
+        critical_temperature, critical_pressure = pseudo_critical_properties(
+            _gas_specific_gravity)
+        z, _, _ = _solve(14.7 / critical_pressure,
+                         520. / critical_temperature,
+                         self.method, None, 1e-12, 50)
+        if key is not None:
+            self._standard[key] = z
+        return z
+
+    def gas_properties(self, _pressure, _temperature, _gas_specific_gravity):
+        """
+        Returns the deviation factor, the gas formation volume factor
+        (:math:`bbl/scf`), density (:math:`lbm/ft^3`) and viscosity
+        (:math:`cp`).
+        """
+        critical_temperature, critical_pressure = pseudo_critical_properties(
+            _gas_specific_gravity)
+        reduced_pressure = (_pressure + 14.7) / critical_pressure
+        reduced_temperature = (_temperature + 460) / critical_temperature
+        arrays = (pvt._is_array(reduced_pressure) or
+                  pvt._is_array(reduced_temperature))
+        # Scalars are told apart without NumPy, as in `pvt.CorrelationPVT`
+        density = self._density if self.warm_start else None
+        if arrays:
+            if np.shape(density) != np.broadcast_shapes(
+                    np.shape(reduced_pressure),
+                    np.shape(reduced_temperature)):
+                density = None
+        elif pvt._is_array(density):
+            density = None
+        z, density, iterations = _solve(reduced_pressure,
+                                        reduced_temperature,
+                                        self.method,
+                                        density,
+                                        1e-12,
+                                        50)
+        self._density = density
+        self.statistics["solves"] += int(np.size(z)) if arrays else 1
+        self.statistics["iterations"] += iterations
+
+        factor = ((_temperature + 460) / (_pressure + 14.7) *
+                  z / self._standard_factor(_gas_specific_gravity))
+        bg_ft = 0.028269 * factor
+        gas_density = formulas.gas_density(_gas_specific_gravity, bg_ft)
+        if arrays:
+            gas_viscosity = vectorized.gas_viscosity(_temperature,
+                                                     _gas_specific_gravity,
+                                                     gas_density)
+        else:
+            gas_viscosity = correlations.gas_viscosity(_temperature,
+                                                       _gas_specific_gravity,
+                                                       gas_density)
+        return z, 0.00503475 * factor, gas_density, gas_viscosity
+
+    def fluid_properties(self,
+                         _pressure,
+                         _temperature,
+                         _bubble_point,
+                         _oil_api_gravity,
+                         _gas_specific_gravity,
+                         _water_specific_gravity,
+                         _water_cut,
+                         _production_gas_liquid_ratio):
+        # The correlations chain around the implicit gas properties, so the
+        # Papay ones are never evaluated
+        arguments = (_pressure,
+                     _temperature,
+                     _bubble_point,
+                     _oil_api_gravity,
+                     _gas_specific_gravity,
+                     _water_specific_gravity,
+                     _water_cut,
+                     _production_gas_liquid_ratio)
+        _, bg_bbl, gas_density, gas_viscosity = self.gas_properties(
+            _pressure, _temperature, _gas_specific_gravity)
+        chain = (vectorized if any(pvt._is_array(value)
+                                   for value in arguments) else traverse)
+        return chain._fluid_properties(*arguments,
+                                       bg_bbl,
+                                       gas_density,
+                                       gas_viscosity)
@@ -0,0 +1,246 @@
+"""
+Flow map
+"""
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from . import formulas
+from . import vectorized
+
+DISTRIBUTED = vectorized.DISTRIBUTED
+INTERMITTENT = vectorized.INTERMITTENT
+TRANSITION = vectorized.TRANSITION
+SEGREGATED = vectorized.SEGREGATED
+DOWNWARD = vectorized.DOWNWARD
+
+# RGB color of each `FlowPattern` value in flow pattern images
+PALETTE = np.array([
+    (0, 0, 0),
+    (214, 39, 40),  # distributed
+    (31, 119, 180),  # intermittent
+    (255, 127, 14),  # transition
+    (44, 160, 44),  # segregated
+    (148, 103, 189),  # downward
+], dtype=np.uint8)
+
+
+class FlowMap:
+    """
+    Beggs and Brill flow pattern and liquid holdup surfaces over a grid of
+    no slip liquid fractions (columns) and Froude numbers (rows).
+
+    Attributes:
+        no_slip_liquid_fractions (ndarray): Column values, :math:`\\lambda_L`.
+        froude_numbers (ndarray): Row values, :math:`N_{Fr}`.
+        flow_pattern (ndarray): ``int8`` `FlowPattern` values.
+        horz_liquid_holdup (ndarray): Horizontal liquid holdup.
+        liquid_holdup (ndarray): Inclination corrected liquid holdup, or
+            None when no inclination was given.
+    """
+    def __init__(self,
+                 _no_slip_liquid_fractions,
+                 _froude_numbers,
+                 _flow_pattern,
+                 _horz_liquid_holdup,
+                 _liquid_holdup=None):
+        self.no_slip_liquid_fractions = _no_slip_liquid_fractions
+        self.froude_numbers = _froude_numbers
+        self.flow_pattern = _flow_pattern
+        self.horz_liquid_holdup = _horz_liquid_holdup
+        self.liquid_holdup = _liquid_holdup
+
+    @property
+    def shape(self):
+        return self.flow_pattern.shape
+
+    def pattern_fractions(self):
+        """
+        Returns the fraction of the map covered by each `FlowPattern`.
+        """
+        counts = np.bincount(np.asarray(self.flow_pattern).ravel(),
+                             minlength=len(PALETTE))
+        return {pattern: float(counts[pattern.value] / counts.sum())
+                for pattern in formulas.FlowPattern}
+
+
+class _Columns:
+    """
+    Everything of a map that depends only on the no slip liquid fraction,
+    computed once per column and shared by every row tile.
+    """
+    def __init__(self, _no_slip_liquid_fractions):
+        fractions = _no_slip_liquid_fractions
+        self.fractions = fractions
+        (self.fr1,
+         self.fr2,
+         self.fr3,
+         self.fr4) = formulas.transition_froude_numbers(fractions)
+        self.distributed_limit = np.minimum(self.fr1, self.fr4)
+        # a * lambda ** b of the horizontal holdup of each pattern
+        self.holdup_terms = {
+            pattern: constants[0] * fractions ** constants[1]
+            for pattern, constants in (
+                (DISTRIBUTED, vectorized._HORZ_CONSTANTS[DISTRIBUTED]),
+                (INTERMITTENT, vectorized._HORZ_CONSTANTS[INTERMITTENT]),
+                (SEGREGATED, vectorized._HORZ_CONSTANTS[SEGREGATED]),
+            )
+        }
+
+
+def _tile(_columns, _froude_numbers):
+    """
+    Classifies a tile of rows and computes its horizontal holdup. Only the
+    Froude number dependent factors are evaluated per row; every pixel costs
+    a few comparisons, products and a selection.
+    """
+    froude = _froude_numbers[:, None]
+    fractions = _columns.fractions
+    pattern = np.full((froude.size, fractions.size), SEGREGATED,
+                      dtype=np.int8)
+    pattern[froude > _columns.fr2] = TRANSITION
+    pattern[froude > _columns.fr3] = INTERMITTENT
+    # Fr > Fr1 or Fr > Fr4, i.e. Fr > min(Fr1, Fr4)
+    pattern[froude > _columns.distributed_limit] = DISTRIBUTED
+
+    def holdup(_pattern):
+        term_c = vectorized._HORZ_CONSTANTS[_pattern][2]
+        return np.maximum(_columns.holdup_terms[_pattern] *
+                          froude ** -term_c, fractions)
+
+    answer = holdup(SEGREGATED)
+    intermittent = holdup(INTERMITTENT)
+    transition = pattern == TRANSITION
+    if transition.any():
+        weight = ((_columns.fr3 - froude) / (_columns.fr3 - _columns.fr2))
+        blend = np.maximum(weight * answer + (1 - weight) * intermittent,
+                           fractions)
+        np.copyto(answer, blend, where=transition)
+    np.copyto(answer, intermittent, where=pattern == INTERMITTENT)
+    np.copyto(answer, holdup(DISTRIBUTED), where=pattern == DISTRIBUTED)
+    return pattern, answer
+
+
+def _allocate(_directory, _name, _shape, _dtype):
+    if _directory is None:
+        return np.empty(_shape, dtype=_dtype)
+    return np.lib.format.open_memmap(
+        os.path.join(_directory, _name + ".npy"),
+        mode="w+",
+        dtype=_dtype,
+        shape=_shape
+    )
+
+
+def flow_map(_no_slip_liquid_fractions,
+             _froude_numbers,
+             _inclination=None,
+             _liquid_velocity_number=1.0,
+             _dtype=np.float32,
+             _tile_rows=512,
+             _directory=None):
+    """
+    Computes a flow pattern and liquid holdup map. The transition Froude
+    numbers are computed once per :math:`\\lambda_L` column and the grid is
+    classified with vectorized comparisons, ``_tile_rows`` rows at a time so
+    the temporary arrays stay small for very large maps.
+
+    Args:
+        _no_slip_liquid_fractions (array): Column values (between 0 and 1).
+        _froude_numbers (array): Row values.
+        _inclination (double, optional): If given, the inclination corrected
+            holdup is also computed for this inclination (degrees, negative
+            when downhill).
+        _liquid_velocity_number (double, optional): Liquid velocity number
+            used in the inclination correction.
+        _dtype (dtype, optional): Type of the holdup surfaces (``float32``
+            by default, halving their size).
+        _tile_rows (int, optional): Rows computed at a time.
+        _directory (str, optional): If given, the surfaces are ``.npy``
+            files in this directory (``flow_pattern``, ``horz_liquid_holdup``
+            and ``liquid_holdup``), memory mapped and filled tile by tile, so
+            maps larger than memory can be generated.
+
+    Returns:
+        A `FlowMap`.
+    """
+    fractions = np.asarray(_no_slip_liquid_fractions, dtype=float)
+    froude_numbers = np.asarray(_froude_numbers, dtype=float)
+    shape = (froude_numbers.size, fractions.size)
+    if _directory is not None:
+        os.makedirs(_directory, exist_ok=True)
+    pattern = _allocate(_directory, "flow_pattern", shape, np.int8)
+    horz_holdup = _allocate(_directory, "horz_liquid_holdup", shape, _dtype)
+    holdup = None
+    if _inclination is not None:
+        holdup = _allocate(_directory, "liquid_holdup", shape, _dtype)
+
+    columns = _Columns(fractions)
+    for start in range(0, shape[0], _tile_rows):
+        rows = slice(start, start + _tile_rows)
+        tile_pattern, tile_holdup = _tile(columns, froude_numbers[rows])
+        pattern[rows] = tile_pattern
+        horz_holdup[rows] = tile_holdup
+        if holdup is not None:
+            holdup[rows] = vectorized.liquid_holdup_with_incl(
+                tile_holdup,
+                (np.full_like(tile_pattern, DOWNWARD) if _inclination < 0
+                 else tile_pattern),
+                froude_numbers[rows, None],
+                fractions,
+                _liquid_velocity_number,
+                _inclination
+            )
+    for array in (pattern, horz_holdup, holdup):
+        if isinstance(array, np.memmap):
+            array.flush()
+    return FlowMap(fractions, froude_numbers, pattern, horz_holdup, holdup)
+
+
+def _png_chunk(_kind, _data):
+    chunk = _kind + _data
+    return (struct.pack(">I", len(_data)) + chunk +
+            struct.pack(">I", zlib.crc32(chunk) & 0xffffffff))
+
+
+def write_png(_path, _pixels):
+    """
+    Writes an 8 bit grayscale ``(rows, columns)`` or RGB
+    ``(rows, columns, 3)`` array as a PNG image (no imaging library
+    needed). The first row is the top of the image.
+    """
+    pixels = np.ascontiguousarray(_pixels, dtype=np.uint8)
+    height, width = pixels.shape[:2]
+    color = 2 if pixels.ndim == 3 else 0
+    rows = pixels.reshape(height, -1)
+    raw = np.empty((height, rows.shape[1] + 1), dtype=np.uint8)
+    raw[:, 0] = 0  # no filter
+    raw[:, 1:] = rows
+    with open(_path, "wb") as output:
+        output.write(b"\x89PNG\r\n\x1a\n")
+        output.write(_png_chunk(b"IHDR", struct.pack(
+            ">IIBBBBB", width, height, 8, color, 0, 0, 0)))
+        output.write(_png_chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+        output.write(_png_chunk(b"IEND", b""))
+
+
+def flow_pattern_image(_path, _flow_map):
+    """
+    Writes the flow patterns of a `FlowMap` as a PNG image (colors from
+    `PALETTE`), with the Froude number increasing upwards.
+    """
+    write_png(_path, PALETTE[np.asarray(_flow_map.flow_pattern)[::-1]])
+
+
+def holdup_image(_path, _flow_map, _inclined=False):
+    """
+    Writes a holdup surface of a `FlowMap` as a grayscale PNG image (black
+    for no liquid, white for full liquid), with the Froude number increasing
+    upwards.
+    """
+    surface = (_flow_map.liquid_holdup if _inclined
+               else _flow_map.horz_liquid_holdup)
+    levels = np.rint(np.clip(np.asarray(surface)[::-1], 0, 1) * 255)
+    write_png(_path, levels)
@@ -0,0 +1,505 @@
+"""
+Flow meter
+"""
+import json
+import os
+import selectors
+import threading
+import time
+
+import numpy as np
+
+from . import vectorized
+
+
+WELL_DEFAULTS = {
+    "oil_api_gravity": 30.0,
+    "gas_specific_gravity": 0.7,
+    "water_specific_gravity": 1.07,
+    "water_cut": 0.0,
+    "production_gas_liquid_ratio": 100.0,
+    "rugosity": 0.0006,
+    "minimum_rate": 10.0,
+    "maximum_rate": 20000.0,
+}
+
+WELL_FIELDS = (
+    "depth",
+    "diameter",
+    "wellhead_temperature",
+    "bottomhole_temperature",
+    "oil_api_gravity",
+    "gas_specific_gravity",
+    "water_specific_gravity",
+    "water_cut",
+    "production_gas_liquid_ratio",
+    "rugosity",
+    "minimum_rate",
+    "maximum_rate",
+)
+
+RECORD_FIELDS = ("well", "time", "wellhead_pressure", "gauge_pressure")
+
+
+class FlowMeter:
+    """
+    Virtual flow meter: estimates the liquid rate of every well from its
+    wellhead pressure and downhole gauge pressure by inverting the Beggs and
+    Brill traverse (`vectorized.traverse` from the wellhead down to the
+    gauge).
+
+    Measurements are handed to `submit` (from any thread) and estimated by
+    `step`, which solves every well with a pending measurement in the same
+    vectorized iterations. Only the newest pending measurement of a well is
+    kept (older ones are coalesced), and measurements older than the last
+    estimated one are dropped, so a burst costs one solve per well. Each
+    well's solve starts from its previous estimate. A solve stops at the
+    latency deadline (``_max_latency`` seconds after the oldest pending
+    measurement arrived) and publishes its best estimate as not converged.
+
+    The modelled gauge pressure jumps where the flow pattern changes, so a
+    measurement may have no matching rate. Its solve stops once the bracket
+    is narrower than ``_rate_tolerance`` and the well is reported as
+    bracketed (and converged).
+
+    Args:
+        _wells (dict): Description of every well by name: `WELL_FIELDS`
+            (``depth`` is the gauge depth in :math:`ft`; `WELL_DEFAULTS`
+            fill the missing ones). ``wellhead_temperature`` may come with
+            the measurements instead.
+        _segments (int, optional): Tubing segments.
+        _tolerance (double, optional): Pressure match tolerance
+            (:math:`psi`).
+        _max_iterations (int, optional): Largest number of secant
+            iterations per solve.
+        _max_latency (double, optional): Latency budget in seconds.
+        _pvt (optional): PVT source of the bubble points and fluid
+            properties instead of the correlations (see `pvt`).
+        _rate_tolerance (double, optional): Bracket width (:math:`bpd`)
+            below which a well is bracketed.
+    """
+    def __init__(self,
+                 _wells,
+                 _segments=20,
+                 _tolerance=0.5,
+                 _max_iterations=20,
+                 _max_latency=1.0,
+                 _pvt=None,
+                 _rate_tolerance=1.0):
+        self.names = list(_wells)
+        self._index = {name: i for i, name in enumerate(self.names)}
+        configurations = []
+        for name in self.names:
+            configuration = dict(WELL_DEFAULTS)
+            configuration["wellhead_temperature"] = np.nan
+            configuration.update(_wells[name])
+            missing = [field for field in WELL_FIELDS
+                       if field not in configuration]
+            if missing:
+                raise KeyError("Well {}: missing {}.".format(
+                    name, ", ".join(missing)))
+            configurations.append(configuration)
+        self.wells = {field: np.array([configuration[field]
+                                       for configuration in configurations],
+                                      dtype=float)
+                      for field in WELL_FIELDS}
+        self.segments = _segments
+        self.tolerance = _tolerance
+        self.max_iterations = _max_iterations
+        self.rate_tolerance = _rate_tolerance
+        self.max_latency = _max_latency
+        self.pvt = _pvt
+
+        self.rates = np.full(len(self.names), np.nan)
+        self.times = np.full(len(self.names), -np.inf)
+        self.estimates = {}
+        self.statistics = {"received": 0,
+                           "coalesced": 0,
+                           "stale": 0,
+                           "rejected": 0,
+                           "solves": 0,
+                           "traverses": 0}
+        self._pending = {}
+        self._condition = threading.Condition()
+
+    def submit(self, _record):
+        """
+        Queues a measurement: a dict (or its JSON) with the `RECORD_FIELDS`
+        (``gauge_pressure`` in :math:`psig`, ``time`` in seconds) and
+        optionally the ``wellhead_temperature``.
+
+        Returns:
+            Whether the measurement was queued (unknown wells, invalid
+            records and measurements older than the well's last estimate are
+            counted and dropped).
+        """
+        received = time.monotonic()
+        try:
+            record = (json.loads(_record) if isinstance(_record, (str, bytes))
+                      else dict(_record))
+            index = self._index[record["well"]]
+            measurement = (float(record["time"]),
+                           float(record["wellhead_pressure"]),
+                           float(record["gauge_pressure"]),
+                           float(record.get("wellhead_temperature", np.nan)))
+        except (KeyError, TypeError, ValueError):
+            with self._condition:
+                self.statistics["rejected"] += 1
+            return False
+        with self._condition:
+            self.statistics["received"] += 1
+            previous = self._pending.get(index)
+            if (measurement[0] <= self.times[index] or
+                    (previous is not None and
+                     measurement[0] <= previous[1][0])):
+                self.statistics["stale"] += 1
+                return False
+            if previous is not None:
+                self.statistics["coalesced"] += 1
+                # The first arrival time keeps the latency deadline honest
+                received = previous[0]
+                coalesced = previous[2] + 1
+            else:
+                coalesced = 0
+            self._pending[index] = (received, measurement, coalesced)
+            self._condition.notify_all()
+        return True
+
+    def pending(self):
+        with self._condition:
+            return len(self._pending)
+
+    def bottomhole_pressures(self, _index, _rates, _wellhead_pressures,
+                             _wellhead_temperatures):
+        """
+        Models the gauge pressure of wells ``_index`` (repeats allowed) at
+        the given rates in one `vectorized.traverse`.
+        """
+        wells = {field: values[_index] for field, values in self.wells.items()}
+        temperature = np.where(np.isnan(_wellhead_temperatures),
+                               wells["wellhead_temperature"],
+                               _wellhead_temperatures)
+        fractions = np.linspace(0.0, 1.0, self.segments + 1)
+        temperatures = (
+            temperature[:, None] +
+            (wells["bottomhole_temperature"] - temperature)[:, None] *
+            fractions
+        )
+        length = wells["depth"] / self.segments
+        self.statistics["traverses"] += 1
+        with np.errstate(all="ignore"):
+            pressures, _ = vectorized.traverse(
+                _wellhead_pressures,
+                [length] * self.segments,
+                [90.0] * self.segments,
+                temperatures,
+                wells["oil_api_gravity"],
+                wells["gas_specific_gravity"],
+                wells["water_specific_gravity"],
+                wells["water_cut"],
+                wells["production_gas_liquid_ratio"],
+                _rates,
+                wells["diameter"],
+                wells["rugosity"],
+                _against_flow=True,
+                _pvt=self.pvt
+            )
+        return pressures[:, -1]
+
+    def _brackets(self, _index, _measurements, _grid):
+        # Residuals on a rate grid per well, in one traverse
+        size, points = _grid.shape
+        residuals = self.bottomhole_pressures(
+            np.repeat(_index, points),
+            _grid.ravel(),
+            np.repeat(_measurements[:, 1], points),
+            np.repeat(_measurements[:, 3], points)
+        ).reshape(size, points) - _measurements[:, 2][:, None]
+        return residuals
+
+    def invert(self, _index, _measurements, _initial, _deadline=None):
+        """
+        Solves the rates of wells ``_index`` whose modelled gauge pressure
+        matches the measured one.
+
+        A rate grid around the initial estimate (or over the whole rate
+        range without one) is evaluated first; the sign change closest to
+        the initial estimate (the highest rate one on a cold start, the
+        stable branch of the tubing curve) brackets an Illinois iteration,
+        which stops at a matching rate or once the bracket is narrower than
+        the rate tolerance (a jump of the modelled pressure).
+
+        Args:
+            _index (array): Well indexes.
+            _measurements (array): ``(wells, 4)`` rows of time, wellhead
+                pressure, gauge pressure and wellhead temperature.
+            _initial (array): Initial rate per well (NaN for a cold start).
+            _deadline (double, optional): `time.monotonic` deadline.
+
+        Returns:
+            A tuple ``(rates, residuals, iterations, converged, bracketed)``
+            of arrays (rates are NaN where the range holds no solution;
+            bracketed wells count as converged).
+        """
+        size = len(_index)
+        minimum = self.wells["minimum_rate"][_index]
+        maximum = self.wells["maximum_rate"][_index]
+        warm = np.isfinite(_initial)
+        low = np.full(size, np.nan)
+        high = np.full(size, np.nan)
+        low_residual = np.full(size, np.nan)
+        high_residual = np.full(size, np.nan)
+
+        def search(_selection, _grid, _target):
+            residuals = self._brackets(_index[_selection],
+                                       _measurements[_selection],
+                                       _grid)
+            change = np.sign(residuals[:, :-1]) != np.sign(residuals[:, 1:])
+            change &= np.isfinite(residuals[:, :-1] * residuals[:, 1:])
+            found = change.any(axis=1)
+            middle = np.sqrt(_grid[:, :-1] * _grid[:, 1:])
+            distance = np.where(change, np.abs(np.log(middle /
+                                                      _target[:, None])),
+                                np.inf)
+            choice = np.argmin(distance, axis=1)
+            rows = np.flatnonzero(_selection)[found]
+            columns = choice[found]
+            low[rows] = _grid[found, columns]
+            high[rows] = _grid[found, columns + 1]
+            low_residual[rows] = residuals[found, columns]
+            high_residual[rows] = residuals[found, columns + 1]
+
+        if warm.any():
+            spread = np.exp(np.linspace(-0.3, 0.3, 5))
+            grid = np.clip(_initial[warm][:, None] * spread,
+                           minimum[warm][:, None],
+                           maximum[warm][:, None])
+            search(warm, grid, _initial[warm])
+        cold = np.isnan(low)
+        if cold.any():
+            grid = np.exp(np.linspace(np.log(minimum[cold]),
+                                      np.log(maximum[cold]),
+                                      16, axis=1))
+            target = np.where(np.isfinite(_initial[cold]), _initial[cold],
+                              maximum[cold])
+            search(cold, grid, target)
+
+        rates = np.full(size, np.nan)
+        residuals = np.full(size, np.nan)
+        iterations = np.zeros(size, dtype=int)
+        active = np.flatnonzero(np.isfinite(low))
+        # A grid point may already match
+        for bound, residual in ((low, low_residual), (high, high_residual)):
+            exact = np.abs(residual[active]) < self.tolerance
+            rates[active[exact]] = bound[active[exact]]
+            residuals[active[exact]] = residual[active[exact]]
+            active = active[~exact]
+        side = np.zeros(size, dtype=np.int8)
+        for iteration in range(self.max_iterations):
+            if not active.size:
+                break
+            if _deadline is not None and time.monotonic() > _deadline:
+                break
+            a, b = low[active], high[active]
+            fa, fb = low_residual[active], high_residual[active]
+            rate = (a * fb - b * fa) / (fb - fa)
+            residual = self.bottomhole_pressures(
+                _index[active], rate, _measurements[active, 1],
+                _measurements[active, 3]) - _measurements[active, 2]
+            rates[active] = rate
+            residuals[active] = residual
+            iterations[active] = iteration + 1
+
+            same = np.sign(residual) == np.sign(fa)
+            # Illinois modification: halve the stale end point residual
+            high_residual[active] = np.where(same & (side[active] == 1),
+                                             fb / 2, fb)
+            low_residual[active] = np.where(~same & (side[active] == -1),
+                                            fa / 2, fa)
+            low[active] = np.where(same, rate, a)
+            low_residual[active] = np.where(same, residual,
+                                            low_residual[active])
+            high[active] = np.where(same, b, rate)
+            high_residual[active] = np.where(same, high_residual[active],
+                                             residual)
+            side[active] = np.where(same, 1, -1)
+            width = high[active] - low[active]
+            active = active[(np.abs(residual) >= self.tolerance) &
+                            (width >= self.rate_tolerance)]
+
+        converged = np.abs(residuals) < self.tolerance
+        # Out of time: the best bracket end is the estimate
+        unfinished = np.isfinite(low) & ~converged & np.isnan(rates)
+        rates[unfinished] = np.where(
+            np.abs(low_residual[unfinished]) < np.abs(
+                high_residual[unfinished]),
+            low[unfinished], high[unfinished])
+        # The modelled pressure jumps inside the bracket, which holds the
+        # last estimate
+        bracketed = ~converged & (high - low < self.rate_tolerance)
+        converged |= bracketed
+        return rates, residuals, iterations, converged, bracketed
+
+    def step(self, _timeout=None):
+        """
+        Waits up to ``_timeout`` seconds for pending measurements and
+        estimates all of them in one solve.
+
+        Returns:
+            The list of new estimates (dicts with the ``well``, ``time``,
+            ``liquid_flow_rate`` in :math:`bpd`, the gauge pressure
+            ``residual``, ``iterations``, ``converged``, ``bracketed``,
+            ``coalesced`` measurements and the ``latency`` in seconds).
+        """
+        with self._condition:
+            if not self._pending:
+                self._condition.wait(_timeout)
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return []
+        index = np.array(list(pending), dtype=int)
+        measurements = np.array([pending[i][1] for i in index])
+        received = np.array([pending[i][0] for i in index])
+        rates, residuals, iterations, converged, bracketed = self.invert(
+            index, measurements, self.rates[index],
+            received.min() + self.max_latency)
+        self.statistics["solves"] += 1
+
+        now = time.monotonic()
+        estimates = []
+        for k, i in enumerate(index.tolist()):
+            if np.isfinite(rates[k]):
+                self.rates[i] = rates[k]
+            self.times[i] = measurements[k, 0]
+            estimate = {
+                "well": self.names[i],
+                "time": float(measurements[k, 0]),
+                "liquid_flow_rate": float(rates[k]),
+                "residual": float(residuals[k]),
+                "iterations": int(iterations[k]),
+                "converged": bool(converged[k]),
+                "bracketed": bool(bracketed[k]),
+                "coalesced": pending[i][2],
+                "latency": now - pending[i][0],
+            }
+            self.estimates[self.names[i]] = estimate
+            estimates.append(estimate)
+        return estimates
+
+    def run(self, _source, _publish, _stop=None, _poll=0.1):
+        """
+        Feeds the measurements of ``_source`` (an iterable of records, e.g.
+        `tail` or `socket_records`) from a background thread and publishes
+        every estimate with ``_publish`` until the source ends (and every
+        measurement is estimated) or ``_stop`` (a `threading.Event`) is set.
+        """
+        finished = threading.Event()
+
+        def feed():
+            try:
+                for record in _source:
+                    self.submit(record)
+                    if _stop is not None and _stop.is_set():
+                        break
+            finally:
+                finished.set()
+                with self._condition:
+                    self._condition.notify_all()
+
+        reader = threading.Thread(target=feed, daemon=True)
+        reader.start()
+        while not (_stop is not None and _stop.is_set()):
+            for estimate in self.step(_poll):
+                _publish(estimate)
+            if finished.is_set() and not self.pending():
+                break
+        reader.join(_poll)
+
+
+def tail(_path, _stop=None, _poll=0.2, _from_start=True):
+    """
+    Yields the lines appended to a file, like ``tail -f``, until ``_stop``
+    (a `threading.Event`) is set. A line is only yielded once its newline
+    arrived. A truncated or replaced file is read again from its start.
+    """
+    handle = None
+    identity = None
+    buffer = b""
+    try:
+        while _stop is None or not _stop.is_set():
+            if handle is None:
+                try:
+                    handle = open(_path, "rb")
+                except FileNotFoundError:
+                    time.sleep(_poll)
+                    continue
+                identity = os.fstat(handle.fileno()).st_ino
+                if not _from_start:
+                    handle.seek(0, os.SEEK_END)
+                buffer = b""
+            data = handle.read()
+            if data:
+                buffer += data
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    if line.strip():
+                        yield line.decode()
+                continue
+            try:
+                status = os.stat(_path)
+            except FileNotFoundError:
+                status = None
+            if (status is None or status.st_ino != identity or
+                    status.st_size < handle.tell()):
+                handle.close()
+                handle = None
+                _from_start = True
+                continue
+            time.sleep(_poll)
+    finally:
+        if handle is not None:
+            handle.close()
+
+
+def socket_records(_server, _stop=None, _poll=0.2):
+    """
+    Yields the lines sent by the clients of a listening socket (e.g. from
+    `socket.create_server`), one measurement per line, until ``_stop`` (a
+    `threading.Event`) is set. Clients may connect and disconnect at any
+    time.
+    """
+    selector = selectors.DefaultSelector()
+    _server.setblocking(False)
+    selector.register(_server, selectors.EVENT_READ)
+    buffers = {}
+    try:
+        while _stop is None or not _stop.is_set():
+            for key, _ in selector.select(_poll):
+                if key.fileobj is _server:
+                    client, _ = _server.accept()
+                    client.setblocking(False)
+                    selector.register(client, selectors.EVENT_READ)
+                    buffers[client] = b""
+                    continue
+                client = key.fileobj
+                try:
+                    data = client.recv(65536)
+                except (BlockingIOError, InterruptedError):
+                    continue
+                except OSError:
+                    data = b""
+                if not data:
+                    selector.unregister(client)
+                    client.close()
+                    lines = [buffers.pop(client)]
+                else:
+                    *lines, buffers[client] = (buffers[client] +
+                                               data).split(b"\n")
+                for line in lines:
+                    if line.strip():
+                        yield line.decode()
+    finally:
+        for client in buffers:
+            selector.unregister(client)
+            client.close()
+        selector.close()
@@ -0,0 +1,337 @@
+"""
+Forecast
+"""
+import numpy as np
+
+from . import correlations
+from . import traverse
+
+
+class ProductionForecast:
+    """
+    Quasi-steady production forecast of a vertical producer with a linear
+    IPR. Every time step solves the operating point (tubing curve against the
+    IPR) for the current reservoir pressure, productivity index, water cut
+    and GLR, which usually drift slowly between steps, so each solve reuses
+    the previous one:
+
+    * a step whose inputs equal the previous step's returns its result
+      without any computation;
+    * the operating point iteration starts from the previous rate (secant
+      method), falling back to a bracketing (Illinois) solve from scratch
+      when it fails;
+    * every traverse starts each segment's pressure drop iteration from the
+      drop found in the last traverse;
+    * segment bubble points are kept while the water cut and GLR stay within
+      ``_fluid_tolerance`` (relative) of the values they were computed
+      with, and so are the PVT properties of each segment while its average
+      pressure also stays within ``_pressure_tolerance``.
+
+    `statistics` counts the work done and avoided.
+
+    Args:
+        _wellhead_pressure (double): Wellhead pressure (:math:`psig`).
+        _wellhead_temperature (double): Wellhead temperature (fahrenheit
+            degrees).
+        _bottomhole_temperature (double): Bottomhole temperature (fahrenheit
+            degrees).
+        _depth (double): Well depth (:math:`ft`).
+        _diameter (double): Tubing diameter (:math:`in`).
+        _segments (int, optional): Number of tubing segments.
+        _tolerance (double, optional): Operating point tolerance on the
+            bottomhole pressure (:math:`psi`).
+        _max_iterations (int, optional): Maximum operating point iterations.
+        _fluid_tolerance (double, optional): Relative change of water cut
+            and GLR within which bubble points and PVT properties are reused.
+        _pressure_tolerance (double, optional): Pressure change
+            (:math:`psi`) within which a segment's PVT properties are reused.
+        _warm_start (boolean, optional): Whether to reuse previous steps at
+            all. Disabling it gives the cold reference forecast.
+        _pvt (optional): PVT source of the bubble points and fluid
+            properties instead of the correlations (see `pvt`).
+    """
+    def __init__(self,
+                 _wellhead_pressure,
+                 _wellhead_temperature,
+                 _bottomhole_temperature,
+                 _depth,
+                 _diameter,
+                 _oil_api_gravity=30.0,
+                 _gas_specific_gravity=0.7,
+                 _water_specific_gravity=1.07,
+                 _rugosity=0.0006,
+                 _segments=20,
+                 _tolerance=0.1,
+                 _max_iterations=30,
+                 _fluid_tolerance=1e-3,
+                 _pressure_tolerance=0.5,
+                 _warm_start=True,
+                 _pvt=None):
+        self.wellhead_pressure = _wellhead_pressure
+        self.depth = _depth
+        self.diameter = _diameter
+        self.oil_api_gravity = _oil_api_gravity
+        self.gas_specific_gravity = _gas_specific_gravity
+        self.water_specific_gravity = _water_specific_gravity
+        self.rugosity = _rugosity
+        self.segments = _segments
+        self.tolerance = _tolerance
+        self.max_iterations = _max_iterations
+        self.fluid_tolerance = _fluid_tolerance
+        self.pressure_tolerance = _pressure_tolerance
+        self.warm_start = _warm_start
+        self.pvt = _pvt
+
+        temperatures = traverse.linear_temperatures(_wellhead_temperature,
+                                                    _bottomhole_temperature,
+                                                    _segments)
+        self.temperatures = [
+            (temperatures[i] + temperatures[i + 1]) / 2
+            for i in range(_segments)
+        ]
+        self.length = _depth / _segments
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets every cached state and zeroes `statistics`.
+        """
+        self._inputs = None
+        self._result = None
+        self._fluid = None
+        self._bubble_points = None
+        self._properties = [None] * self.segments
+        self._drops = [0.0] * self.segments
+        self.statistics = {
+            "steps": 0,
+            "skipped": 0,
+            "solves": 0,
+            "warm_solves": 0,
+            "traverses": 0,
+            "bubble_point_evaluations": 0,
+            "bubble_point_reuses": 0,
+            "property_evaluations": 0,
+            "property_reuses": 0,
+        }
+
+    def _set_fluid(self, _water_cut, _production_gas_liquid_ratio):
+        if self.warm_start and self._fluid is not None:
+            water_cut, ratio = self._fluid
+            if (abs(_water_cut - water_cut) <=
+                    self.fluid_tolerance * max(water_cut, 1e-2) and
+                    abs(_production_gas_liquid_ratio - ratio) <=
+                    self.fluid_tolerance * max(ratio, 1.0)):
+                self.statistics["bubble_point_reuses"] += self.segments
+                return
+        self._fluid = (_water_cut, _production_gas_liquid_ratio)
+        self._bubble_points = [
+            (self.pvt or correlations).mixture_bubble_point(
+                temperature,
+                self.gas_specific_gravity,
+                self.oil_api_gravity,
+                _water_cut,
+                _production_gas_liquid_ratio
+            )
+            for temperature in self.temperatures
+        ]
+        self._properties = [None] * self.segments
+        self.statistics["bubble_point_evaluations"] += self.segments
+
+    def _segment_properties(self, _segment, _pressure):
+        cached = self._properties[_segment]
+        if (self.warm_start and cached is not None and
+                abs(cached[0] - _pressure) <= self.pressure_tolerance):
+            self.statistics["property_reuses"] += 1
+            return cached[1]
+        water_cut, ratio = self._fluid
+        properties = traverse.fluid_properties(
+            _pressure,
+            self.temperatures[_segment],
+            self._bubble_points[_segment],
+            self.oil_api_gravity,
+            self.gas_specific_gravity,
+            self.water_specific_gravity,
+            water_cut,
+            ratio,
+            self.pvt
+        )
+        self._properties[_segment] = (_pressure, properties)
+        self.statistics["property_evaluations"] += 1
+        return properties
+
+    def _traverse(self, _liquid_flow_rate, _water_cut):
+        """
+        Marches from the wellhead down with `traverse.traverse`'s fixed point
+        iteration, starting every segment from its last pressure drop.
+        """
+        self.statistics["traverses"] += 1
+        pressures = [self.wellhead_pressure]
+        patterns = []
+        pressure_drop = 0.0
+        for i in range(self.segments):
+            pressure = pressures[-1]
+            if self.warm_start:
+                pressure_drop = self._drops[i]
+            for _ in range(20):
+                properties = self._segment_properties(
+                    i, pressure + pressure_drop / 2)
+                gravitational, frictional, pattern = (
+                    traverse.gradient_from_properties(properties,
+                                                      _liquid_flow_rate,
+                                                      _water_cut,
+                                                      self.diameter,
+                                                      90.0,
+                                                      self.rugosity)
+                )
+                new_pressure_drop = -(gravitational + frictional) * self.length
+                converged = abs(new_pressure_drop - pressure_drop) < 1e-3
+                pressure_drop = new_pressure_drop
+                if converged:
+                    break
+            self._drops[i] = pressure_drop
+            pressures.append(pressure + pressure_drop)
+            patterns.append(pattern)
+        return pressures, patterns
+
+    def _operating_point(self, _reservoir_pressure, _productivity_index,
+                         _water_cut):
+        evaluations = {}
+
+        def residual(_rate):
+            pressures, patterns = self._traverse(_rate, _water_cut)
+            evaluations[_rate] = (pressures, patterns)
+            return pressures[-1] - (_reservoir_pressure -
+                                    _rate / _productivity_index)
+
+        def result(_rate):
+            pressures, patterns = evaluations[_rate]
+            return _rate, pressures, patterns
+
+        open_flow = _productivity_index * _reservoir_pressure
+        if self.warm_start and self._result is not None:
+            # Secant iteration from the previous operating point
+            rate_old = self._result["liquid_flow_rate"]
+            if 0 < rate_old < open_flow:
+                self.statistics["warm_solves"] += 1
+                error_old = residual(rate_old)
+                if abs(error_old) <= self.tolerance:
+                    return result(rate_old)
+                rate = min(rate_old * 1.01 + 1.0, open_flow)
+                for _ in range(self.max_iterations):
+                    error = residual(rate)
+                    if abs(error) <= self.tolerance:
+                        return result(rate)
+                    if error == error_old:
+                        break
+                    rate_new = rate - error * (rate - rate_old) / (
+                        error - error_old)
+                    if not 0 < rate_new < open_flow:
+                        break
+                    rate_old, error_old, rate = rate, error, rate_new
+
+        # Illinois iteration between 1% of the absolute open flow and the
+        # absolute open flow, as in `monte_carlo.WellModel`.
+        rate_low = 0.01 * open_flow
+        rate_high = open_flow
+        error_low = residual(rate_low)
+        error_high = residual(rate_high)
+        if not error_low < 0 < error_high:
+            return 0.0, None, None
+        side = 0
+        for _ in range(self.max_iterations):
+            rate = ((rate_low * error_high - rate_high * error_low) /
+                    (error_high - error_low))
+            error = residual(rate)
+            # A collapsed bracket means the root sits on a jump of the
+            # tubing curve (flow pattern boundary)
+            if abs(error) <= self.tolerance or rate_high - rate_low < 1e-3:
+                break
+            if error < 0:
+                if side == -1:
+                    error_high /= 2
+                rate_low, error_low, side = rate, error, -1
+            else:
+                if side == 1:
+                    error_low /= 2
+                rate_high, error_high, side = rate, error, 1
+        return result(rate)
+
+    def step(self,
+             _reservoir_pressure,
+             _productivity_index,
+             _water_cut,
+             _production_gas_liquid_ratio):
+        """
+        Solves the operating point of one time step.
+
+        Args:
+            _reservoir_pressure (double): Average reservoir pressure
+                (:math:`psig`).
+            _productivity_index (double): Productivity index
+                (:math:`bpd/psi`).
+            _water_cut (double): Water cut, WC.
+            _production_gas_liquid_ratio (double): Production gas liquid
+                ratio, :math:`GLR_p` (:math:`scf/stb`).
+
+        Returns:
+            A dict with the ``liquid_flow_rate`` (:math:`bpd`), the
+            ``bottomhole_pressure`` (:math:`psig`), the node ``pressures``
+            and the segment ``flow_patterns`` of the tubing. Dead wells have
+            a zero rate, the reservoir pressure at the bottom and no profile.
+        """
+        inputs = (_reservoir_pressure, _productivity_index, _water_cut,
+                  _production_gas_liquid_ratio)
+        self.statistics["steps"] += 1
+        if self.warm_start and inputs == self._inputs:
+            self.statistics["skipped"] += 1
+            return self._result
+
+        self.statistics["solves"] += 1
+        self._set_fluid(_water_cut, _production_gas_liquid_ratio)
+        rate, pressures, patterns = self._operating_point(
+            _reservoir_pressure,
+            _productivity_index,
+            _water_cut
+        )
+        result = {
+            "liquid_flow_rate": rate,
+            "bottomhole_pressure": (pressures[-1] if pressures
+                                    else _reservoir_pressure),
+            "pressures": pressures,
+            "flow_patterns": patterns,
+        }
+        self._inputs = inputs
+        self._result = result
+        return result
+
+    def run(self,
+            _reservoir_pressures,
+            _productivity_indexes,
+            _water_cuts,
+            _production_gas_liquid_ratios):
+        """
+        Steps through a schedule. Every argument is an array with one value
+        per time step, or a constant.
+
+        Returns:
+            A dict with the ``liquid_flow_rate`` and ``bottomhole_pressure``
+            arrays.
+        """
+        schedule = np.broadcast_arrays(
+            np.asarray(_reservoir_pressures, dtype=float),
+            np.asarray(_productivity_indexes, dtype=float),
+            np.asarray(_water_cuts, dtype=float),
+            np.asarray(_production_gas_liquid_ratios, dtype=float)
+        )
+        steps = schedule[0].size
+        rates = np.empty(steps)
+        bottomhole = np.empty(steps)
+        for i, inputs in enumerate(zip(*(values.ravel().tolist()
+                                         for values in schedule))):
+            result = self.step(*inputs)
+            rates[i] = result["liquid_flow_rate"]
+            bottomhole[i] = result["bottomhole_pressure"]
+        return {
+            "liquid_flow_rate": rates,
+            "bottomhole_pressure": bottomhole,
+        }
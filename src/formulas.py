@@ -5,6 +5,12 @@ from enum import Enum
 import math
 
 
+# Smallest inclined liquid holdup. The downward inclination correction
+# reaches zero on steep descents, where `friction_factor` divides by the
+# holdup squared.
+MIN_LIQUID_HOLDUP = 1e-6
+
+
 class FlowPattern(Enum):
     distributed = 1
     intermittent = 2
@@ -531,7 +537,8 @@ def liquid_holdup_with_incl(_horz_liquid_holdup,
             degrees.
 
     Returns:
-        The liquid fraction considering slippage for any inclination.
+        The liquid fraction considering slippage for any inclination, at
+        least `MIN_LIQUID_HOLDUP`.
     """
     constants = {
         FlowPattern.segregated:   (0.011, -3.7680, 3.5390, -1.6140),
@@ -563,7 +570,7 @@ def liquid_holdup_with_incl(_horz_liquid_holdup,
             0.333 * (math.sin(1.8 * inclination_rad) ** 3)
         )
     )
-    return max(0, min(1, _horz_liquid_holdup * phi_parameter))
+    return max(MIN_LIQUID_HOLDUP, min(1, _horz_liquid_holdup * phi_parameter))
 
 
 def gravitational_pressure_gradient(_mixture_specific_gravity,
@@ -613,8 +620,9 @@ def friction_factor(_no_slip_liquid_fraction,
                     _liquid_holdup,
                     _moody_friction_factor):
     term_y = _no_slip_liquid_fraction / (_liquid_holdup ** 2)
-    term_s = math.log(2.2 * term_y - 1.2)
-    if term_y < 1.0 or term_y > 1.2:
+    if 1.0 <= term_y <= 1.2:
+        term_s = math.log(2.2 * term_y - 1.2)
+    else:
         term_s = (
             math.log(term_y) /
             (
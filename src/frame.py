@@ -0,0 +1,206 @@
+"""
+Frame
+"""
+import numpy as np
+
+from . import correlations
+from . import formulas
+from . import vectorized
+
+
+INPUTS = (
+    "pressure",
+    "temperature",
+    "oil_api_gravity",
+    "gas_specific_gravity",
+    "water_specific_gravity",
+    "water_cut",
+    "production_gas_liquid_ratio",
+    "liquid_flow_rate",
+    "diameter",
+    "inclination",
+    "rugosity",
+)
+
+PVT_INPUTS = INPUTS[:7]
+
+FLOW_PATTERNS = [pattern.name for pattern in formulas.FlowPattern]
+
+
+def _column(_frame, _columns, _name):
+    """
+    Returns the input ``_name`` as a float array (the column's own buffer
+    when it already holds float64 values) or as a scalar when ``_columns``
+    maps it to a constant.
+    """
+    source = _columns.get(_name, _name)
+    if isinstance(source, str):
+        return _frame[source].to_numpy(dtype=float, copy=False)
+    return float(source)
+
+
+def _inputs(_frame, _columns, _names):
+    columns = dict(_columns or {})
+    missing = [
+        columns.get(name, name) for name in _names
+        if isinstance(columns.get(name, name), str) and
+        columns.get(name, name) not in _frame.columns
+    ]
+    if missing:
+        raise KeyError("Missing input columns: {}.".format(
+            ", ".join(missing)))
+    values = {name: _column(_frame, columns, name) for name in _names}
+    bubble_point = columns.get("bubble_point", "bubble_point")
+    if not isinstance(bubble_point, str) or bubble_point in _frame.columns:
+        values["bubble_point"] = _column(_frame, columns, "bubble_point")
+    else:
+        values["bubble_point"] = vectorized.mixture_bubble_point(
+            values["temperature"],
+            values["gas_specific_gravity"],
+            values["oil_api_gravity"],
+            values["water_cut"],
+            values["production_gas_liquid_ratio"]
+        )
+    return values
+
+
+def _full(_values, _size, _dtype=float):
+    values = np.asarray(_values, dtype=_dtype)
+    if values.shape == (_size,):
+        return values
+    return np.full(_size, values, dtype=_dtype)
+
+
+def _properties(_values):
+    pressure = _values["pressure"]
+    temperature = _values["temperature"]
+    bubble_point = _values["bubble_point"]
+    properties = vectorized.fluid_properties(
+        pressure,
+        temperature,
+        bubble_point,
+        _values["oil_api_gravity"],
+        _values["gas_specific_gravity"],
+        _values["water_specific_gravity"],
+        _values["water_cut"],
+        _values["production_gas_liquid_ratio"]
+    )
+    properties.update({
+        "bubble_point": bubble_point,
+        "oil_compressibility": vectorized.oil_compressibility(
+            pressure,
+            bubble_point,
+            temperature,
+            properties["gas_solubility_in_oil"],
+            _values["gas_specific_gravity"],
+            _values["oil_api_gravity"]
+        ),
+        "water_compressibility": vectorized.water_compressibility(
+            pressure,
+            bubble_point,
+            temperature,
+            properties["gas_solubility_in_water"]
+        ),
+        "gas_deviation_factor": vectorized.gas_deviation_factor(
+            pressure,
+            temperature,
+            _values["gas_specific_gravity"]
+        ),
+        "dead_oil_viscosity": vectorized.dead_oil_viscosity(
+            temperature,
+            _values["oil_api_gravity"]
+        ),
+        "dead_oil_surface_tension":
+            correlations.dead_oil_gas_surface_tension(
+                temperature,
+                _values["oil_api_gravity"]
+            ),
+    })
+    return properties
+
+
+def _assign(_frame, _results, _prefix, _inplace):
+    import pandas as pd
+
+    size = len(_frame)
+    columns = {}
+    for name, values in _results.items():
+        if name == "flow_pattern":
+            columns[_prefix + name] = pd.Categorical.from_codes(
+                _full(values, size, np.int8) - 1,
+                categories=FLOW_PATTERNS
+            )
+        else:
+            columns[_prefix + name] = _full(values, size)
+    if _inplace:
+        for name, values in columns.items():
+            _frame[name] = values
+        return _frame
+    return _frame.assign(**columns)
+
+
+def fluid_properties(_frame, _columns=None, _prefix="", _inplace=False):
+    """
+    Evaluates the PVT properties of every row of a `pandas.DataFrame` at once
+    with the `vectorized` functions (no per row ``apply``).
+
+    Args:
+        _frame (DataFrame): Input frame.
+        _columns (dict, optional): Maps each input name in `PVT_INPUTS`
+            (``pressure``, ``temperature``, ``oil_api_gravity``,
+            ``gas_specific_gravity``, ``water_specific_gravity``,
+            ``water_cut`` and ``production_gas_liquid_ratio``) to a column
+            name or to a constant. Unmapped inputs are read from the column
+            of the same name. A ``bubble_point`` column is used when present
+            and computed otherwise.
+        _prefix (str, optional): Prefix of the output column names.
+        _inplace (boolean, optional): Adds the columns to ``_frame`` instead
+            of returning a new frame.
+
+    Returns:
+        A frame with a column for the bubble point, each key of
+        `traverse.fluid_properties`, both compressibilities, the gas
+        deviation factor, the dead oil viscosity and the dead oil surface
+        tension.
+    """
+    values = _inputs(_frame, _columns, PVT_INPUTS)
+    return _assign(_frame, _properties(values), _prefix, _inplace)
+
+
+def pressure_gradient(_frame,
+                      _columns=None,
+                      _prefix="",
+                      _inplace=False,
+                      _friction_table=None):
+    """
+    Evaluates the PVT properties and the Beggs and Brill gradient of every
+    row of a `pandas.DataFrame` at once.
+
+    Args:
+        _frame (DataFrame): Input frame.
+        _columns (dict, optional): Maps each input name in `INPUTS` to a
+            column name or to a constant (see `fluid_properties`).
+        _prefix (str, optional): Prefix of the output column names.
+        _inplace (boolean, optional): Adds the columns to ``_frame`` instead
+            of returning a new frame.
+        _friction_table (FrictionTable, optional): Moody friction factor
+            table (see `vectorized.gradient_from_properties`).
+
+    Returns:
+        A frame with the `fluid_properties` columns plus one column per
+        `vectorized.gradient_intermediates` key. ``flow_pattern`` is a
+        categorical of `FlowPattern` names.
+    """
+    values = _inputs(_frame, _columns, INPUTS)
+    properties = _properties(values)
+    results = dict(properties)
+    results.update(vectorized.gradient_intermediates(
+        properties,
+        values["liquid_flow_rate"],
+        values["water_cut"],
+        values["diameter"],
+        values["inclination"],
+        values["rugosity"],
+        _friction_table
+    ))
+    return _assign(_frame, results, _prefix, _inplace)
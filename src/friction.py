@@ -0,0 +1,163 @@
+"""
+Friction
+"""
+import math
+
+import numpy as np
+
+from . import formulas
+from . import vectorized
+
+
+class FrictionTable:
+    """
+    Lookup table of the Moody friction factor (`formulas.moody_friction_factor`)
+    for a fixed relative roughness. The friction factor is tabulated on a
+    log-spaced Reynolds grid and interpolated with a monotone
+    (Fritsch-Carlson) cubic in :math:`\\ln Re`. The grid is refined until the
+    relative error, checked against the exact formula at several points
+    inside every interval, is below ``_tolerance``. Reynolds numbers outside
+    the table fall back to the exact formula.
+
+    Args:
+        _rugosity (double): Relative pipe roughness (no unit).
+        _tolerance (double, optional): Relative error bound.
+        _reynolds_min (double, optional): Lowest tabulated Reynolds number.
+        _reynolds_max (double, optional): Highest tabulated Reynolds number.
+        _max_points (int, optional): Largest grid allowed during refinement.
+
+    Raises:
+        ValueError: If ``_max_points`` points do not reach ``_tolerance``.
+    """
+    def __init__(self,
+                 _rugosity,
+                 _tolerance=1e-6,
+                 _reynolds_min=10.,
+                 _reynolds_max=1e9,
+                 _max_points=200000):
+        self.rugosity = _rugosity
+        self.tolerance = _tolerance
+        self.reynolds_min = _reynolds_min
+        self.reynolds_max = _reynolds_max
+
+        points = 64
+        while True:
+            self._build(points)
+            self.max_error = self._check_error()
+            if self.max_error <= _tolerance:
+                break
+            if points >= _max_points:
+                raise ValueError(
+                    "Friction table error {:.3g} above the tolerance {:.3g} "
+                    "with {} points.".format(self.max_error, _tolerance,
+                                             points))
+            points *= 2
+        self.points = points
+
+    def _build(self, _points):
+        x = np.linspace(math.log(self.reynolds_min),
+                        math.log(self.reynolds_max),
+                        _points)
+        y = vectorized.moody_friction_factor(np.exp(x), self.rugosity)
+        step = x[1] - x[0]
+        secant = np.diff(y) / step
+
+        # Fritsch-Carlson slopes: harmonic mean of neighbouring secants, zero
+        # at local extrema, so the interpolant never overshoots the data.
+        slope = np.empty(_points)
+        slope[0] = secant[0]
+        slope[-1] = secant[-1]
+        product = secant[:-1] * secant[1:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            harmonic = 2 * product / (secant[:-1] + secant[1:])
+        slope[1:-1] = np.where(product > 0, harmonic, 0.0)
+
+        # Hermite polynomial in the local coordinate t (0 <= t < 1)
+        delta = np.diff(y)
+        start = slope[:-1] * step
+        end = slope[1:] * step
+        self.coefficients = (
+            y[:-1].copy(),
+            start,
+            3 * delta - 2 * start - end,
+            start + end - 2 * delta
+        )
+        self.origin = x[0]
+        self.inverse_step = 1 / step
+        self.intervals = _points - 1
+        self._coefficients = list(zip(*(column.tolist()
+                                        for column in self.coefficients)))
+
+    def _check_error(self, _samples=8):
+        t = (np.arange(_samples) + 0.5) / _samples
+        x = (self.origin +
+             (np.arange(self.intervals)[:, None] + t) / self.inverse_step)
+        reynolds = np.exp(x).ravel()
+        exact = vectorized.moody_friction_factor(reynolds, self.rugosity)
+        return float(np.max(np.abs(self.evaluate(reynolds) / exact - 1)))
+
+    def __call__(self, _reynolds):
+        """
+        Returns the Moody friction factor for a scalar Reynolds number.
+        """
+        position = (math.log(_reynolds) - self.origin) * self.inverse_step
+        index = int(position)
+        if position < 0 or index >= self.intervals:
+            return formulas.moody_friction_factor(_reynolds, self.rugosity)
+        t = position - index
+        c0, c1, c2, c3 = self._coefficients[index]
+        return c0 + t * (c1 + t * (c2 + t * c3))
+
+    def evaluate(self, _reynolds):
+        """
+        Returns the Moody friction factor for an array of Reynolds numbers.
+        """
+        reynolds = np.asarray(_reynolds, dtype=float)
+        position = (np.log(reynolds) - self.origin) * self.inverse_step
+        inside = (position >= 0) & (position < self.intervals)
+        index = np.where(inside, position, 0).astype(np.intp)
+        t = position - index
+        c0, c1, c2, c3 = (column[index] for column in self.coefficients)
+        answer = c0 + t * (c1 + t * (c2 + t * c3))
+        if not inside.all():
+            outside = ~inside
+            answer[outside] = vectorized.moody_friction_factor(
+                reynolds[outside],
+                self.rugosity
+            )
+        return answer
+
+
+_TABLES = {}
+
+
+def friction_table(_rugosity, _tolerance=1e-6):
+    """
+    Returns the cached `FrictionTable` of a relative roughness, building it
+    on first use.
+    """
+    key = (float(_rugosity), _tolerance)
+    table = _TABLES.get(key)
+    if table is None:
+        table = FrictionTable(_rugosity, _tolerance)
+        _TABLES[key] = table
+    return table
+
+
+def clear_friction_tables():
+    """
+    Drops every cached `FrictionTable`.
+    """
+    _TABLES.clear()
+
+
+def moody_friction_factor(_reynolds, _rugosity):
+    """
+    Table-backed drop-in replacement for `formulas.moody_friction_factor`
+    (scalar) and `vectorized.moody_friction_factor` (arrays) with a relative
+    error below :math:`10^{-6}`.
+    """
+    table = friction_table(_rugosity)
+    if np.ndim(_reynolds):
+        return table.evaluate(_reynolds)
+    return table(_reynolds)
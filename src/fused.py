@@ -0,0 +1,168 @@
+"""
+Fused
+"""
+import os
+import time
+
+import numpy as np
+
+
+BACKENDS = ("numpy", "numexpr", "auto")
+
+# Each expression is the `vectorized` function written as a single numexpr
+# kernel, which evaluates it block by block (in cache) on several threads
+# instead of allocating one temporary array per operator. Powers of ten are
+# written as exponentials, which numexpr evaluates faster.
+EXPRESSIONS = {
+    "live_oil_viscosity": (
+        "where(pressure > bubble_point,"
+        " live * ((pressure + 14.7) / (bubble_point + 14.7)) **"
+        " (2.6 * (pressure + 14.7) ** 1.187 *"
+        " exp(-11.513 - 8.98e-5 * (pressure + 14.7))),"
+        " live)"
+    ).replace(
+        "live",
+        "(10.715 * (solubility + 100) ** (-0.515) *"
+        " (exp(2.302585092994046 *"
+        " exp(2.302585092994046 * (3.0324 - 0.02023 * api)) /"
+        " temperature ** 1.163) - 1)"
+        " ** (5.44 * (solubility + 150) ** (-0.338)))"
+    ),
+    "gas_viscosity": (
+        "(9.4 + 0.02 * (28.97 * gravity)) * (temperature + 460.) ** 1.5 /"
+        " (209. + 19. * (28.97 * gravity) + temperature + 460) * 1e-4 *"
+        " exp((3.5 + 986 / (temperature + 460) + 0.01 * (28.97 * gravity)) *"
+        " (density / 62.4) ** (2.4 - 0.2 * (3.5 + 986 / (temperature + 460)"
+        " + 0.01 * (28.97 * gravity))))"
+    ),
+    "water_compressibility": (
+        "where(pressure >= bubble_point,"
+        " ((3.8546 - 1.34e-4 * (pressure + 14.7)) +"
+        " (-0.01052 + 4.77e-7 * (pressure + 14.7)) * temperature +"
+        " (3.9267e-5 - 8.8e-10 * (pressure + 14.7)) * temperature ** 2) *"
+        " (1 + 8.9e-3 * solubility) / 1e6,"
+        " 0.0)"
+    ),
+    "moody_friction_factor": (
+        "8 * ((8 / reynolds) ** 12 + 1 / (("
+        "(2.457 * log(1 / ((7 / reynolds) ** 0.9 + 0.27 * rugosity))) ** 16 +"
+        " (37530 / reynolds) ** 16) ** 1.5)) ** (1 / 12.)"
+    ),
+}
+
+_BACKEND = os.environ.get("MFSIM_BACKEND", "numpy")
+
+
+def _numexpr():
+    try:
+        import numexpr
+    except ImportError:
+        return None
+    return numexpr
+
+
+def available():
+    """
+    Returns whether numexpr is installed.
+    """
+    return _numexpr() is not None
+
+
+def set_backend(_backend):
+    """
+    Selects the backend of the fused functions for every call that does not
+    pass its own: ``"numpy"`` (the default, also set by the
+    ``MFSIM_BACKEND`` environment variable), ``"numexpr"`` or ``"auto"``
+    (numexpr when installed). numexpr falls back to NumPy when it is not
+    installed.
+
+    Returns:
+        The previous setting.
+    """
+    global _BACKEND
+    if _backend not in BACKENDS:
+        raise ValueError("Unknown backend {!r}, expected one of {}.".format(
+            _backend, ", ".join(BACKENDS)))
+    previous, _BACKEND = _BACKEND, _backend
+    return previous
+
+
+def backend(_backend=None):
+    """
+    Resolves the backend used for a call: ``_backend`` or the global one,
+    ``"numpy"`` when numexpr is selected but not installed.
+    """
+    name = _BACKEND if _backend is None else _backend
+    if name == "numpy":
+        return name
+    if name not in BACKENDS:
+        raise ValueError("Unknown backend {!r}, expected one of {}.".format(
+            name, ", ".join(BACKENDS)))
+    return "numexpr" if available() else "numpy"
+
+
+def evaluate(_name, **_arrays):
+    """
+    Evaluates the fused expression ``_name`` of `EXPRESSIONS` with numexpr.
+    """
+    arrays = {name: np.asarray(values, dtype=float)
+              for name, values in _arrays.items()}
+    return _numexpr().evaluate(EXPRESSIONS[_name], local_dict=arrays)
+
+
+def benchmark(_size=1000000, _repeats=3, _seed=0):
+    """
+    Times every fused function with both backends on ``_size`` random
+    elements (the best of ``_repeats`` runs).
+
+    Returns:
+        A dict of ``{"numpy": seconds, "numexpr": seconds, "speedup":
+        ratio, "max_relative_difference": value}`` by function name
+        (``numexpr`` entries are None when it is not installed).
+    """
+    from . import vectorized
+
+    rng = np.random.default_rng(_seed)
+    pressure = rng.uniform(50., 5000., _size)
+    bubble_point = rng.uniform(500., 3000., _size)
+    temperature = rng.uniform(80., 250., _size)
+    arguments = {
+        "live_oil_viscosity": (pressure, bubble_point, temperature,
+                               rng.uniform(10., 1000., _size),
+                               rng.uniform(15., 45., _size)),
+        "gas_viscosity": (temperature, rng.uniform(0.6, 1.2, _size),
+                          rng.uniform(0.5, 15., _size)),
+        "water_compressibility": (pressure, bubble_point, temperature,
+                                  rng.uniform(0., 20., _size)),
+        "moody_friction_factor": (np.exp(rng.uniform(np.log(100.),
+                                                      np.log(1e7), _size)),
+                                  0.0006),
+    }
+    results = {}
+    for name, values in arguments.items():
+        function = getattr(vectorized, name)
+        timings = {}
+        outputs = {}
+        for name_of_backend in ("numpy", "numexpr"):
+            if name_of_backend == "numexpr" and not available():
+                timings[name_of_backend] = None
+                continue
+            best = float("inf")
+            for _ in range(_repeats):
+                start = time.perf_counter()
+                outputs[name_of_backend] = function(
+                    *values, _backend=name_of_backend)
+                best = min(best, time.perf_counter() - start)
+            timings[name_of_backend] = best
+        result = dict(timings)
+        result["speedup"] = None
+        result["max_relative_difference"] = None
+        if timings["numexpr"] is not None:
+            result["speedup"] = timings["numpy"] / timings["numexpr"]
+            with np.errstate(all="ignore"):
+                difference = np.abs(outputs["numexpr"] - outputs["numpy"]) / (
+                    np.abs(outputs["numpy"]))
+            result["max_relative_difference"] = float(
+                np.nanmax(difference))
+        results[name] = result
+    return results
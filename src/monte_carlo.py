@@ -0,0 +1,520 @@
+"""
+Monte Carlo
+"""
+import functools
+import math
+import multiprocessing
+
+import numpy as np
+
+from . import formulas
+from . import vectorized
+
+
+class Constant:
+    """
+    Degenerate distribution that always returns the same value.
+    """
+    def __init__(self, _value):
+        self.value = _value
+
+    def sample(self, _generator, _size):
+        return np.full(_size, float(self.value))
+
+
+class Uniform:
+    """
+    Uniform distribution between ``_low`` and ``_high``.
+    """
+    def __init__(self, _low, _high):
+        self.low = _low
+        self.high = _high
+
+    def sample(self, _generator, _size):
+        return _generator.uniform(self.low, self.high, _size)
+
+
+class Triangular:
+    """
+    Triangular distribution between ``_low`` and ``_high`` peaking at
+    ``_mode``.
+    """
+    def __init__(self, _low, _mode, _high):
+        self.low = _low
+        self.mode = _mode
+        self.high = _high
+
+    def sample(self, _generator, _size):
+        return _generator.triangular(self.low, self.mode, self.high, _size)
+
+
+class Normal:
+    """
+    Normal distribution, optionally truncated to ``[_low, _high]`` (values
+    outside the interval are redrawn).
+    """
+    def __init__(self, _mean, _std, _low=-math.inf, _high=math.inf):
+        self.mean = _mean
+        self.std = _std
+        self.low = _low
+        self.high = _high
+
+    def sample(self, _generator, _size):
+        values = _generator.normal(self.mean, self.std, _size)
+        invalid = (values < self.low) | (values > self.high)
+        while invalid.any():
+            values[invalid] = _generator.normal(self.mean,
+                                                self.std,
+                                                np.count_nonzero(invalid))
+            invalid = (values < self.low) | (values > self.high)
+        return values
+
+
+class LogNormal:
+    """
+    Log-normal distribution whose logarithm has mean ``_mu`` and standard
+    deviation ``_sigma``.
+    """
+    def __init__(self, _mu, _sigma):
+        self.mu = _mu
+        self.sigma = _sigma
+
+    def sample(self, _generator, _size):
+        return _generator.lognormal(self.mu, self.sigma, _size)
+
+
+class RunningMoments:
+    """
+    Streaming count, mean, variance and extrema. Chunks are combined with the
+    pairwise form of Welford's algorithm (Chan et al.), so memory does not
+    depend on the number of samples.
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.sum_of_squares = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def update(self, _values):
+        values = np.asarray(_values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return
+        other = RunningMoments()
+        other.count = values.size
+        other.mean = float(values.mean())
+        other.sum_of_squares = float(((values - other.mean) ** 2).sum())
+        other.minimum = float(values.min())
+        other.maximum = float(values.max())
+        self.merge(other)
+
+    def merge(self, _other):
+        if not _other.count:
+            return
+        count = self.count + _other.count
+        delta = _other.mean - self.mean
+        self.mean += delta * _other.count / count
+        self.sum_of_squares += (_other.sum_of_squares +
+                                delta ** 2 * self.count * _other.count / count)
+        self.count = count
+        self.minimum = min(self.minimum, _other.minimum)
+        self.maximum = max(self.maximum, _other.maximum)
+
+    @property
+    def variance(self):
+        if self.count < 2:
+            return 0.0
+        return self.sum_of_squares / (self.count - 1)
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class TDigest:
+    """
+    Merging t-digest for streaming quantile estimation. Values are merged in
+    batches: centroids and new values are sorted together and grouped along
+    the arcsine scale function, which keeps at most about ``_compression / 2``
+    centroids with small ones at the tails.
+    """
+    def __init__(self, _compression=500):
+        self.compression = _compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.count = 0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def update(self, _values):
+        values = np.asarray(_values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+        self._compress(values, np.ones(values.size))
+
+    def merge(self, _other):
+        if not _other.count:
+            return
+        self.minimum = min(self.minimum, _other.minimum)
+        self.maximum = max(self.maximum, _other.maximum)
+        self._compress(_other.means, _other.weights)
+
+    def _compress(self, _means, _weights):
+        means = np.concatenate((self.means, _means))
+        weights = np.concatenate((self.weights, _weights))
+        order = np.argsort(means, kind="stable")
+        means = means[order]
+        weights = weights[order]
+
+        total = weights.sum()
+        left_quantile = (np.cumsum(weights) - weights) / total
+        scale = (self.compression / (2 * math.pi) *
+                 np.arcsin(2 * left_quantile - 1))
+        groups = np.floor(scale - scale[0]).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+        self.count = int(round(total))
+
+    def quantile(self, _quantile):
+        """
+        Estimates the value below which the fraction ``_quantile`` (between 0
+        and 1) of the samples lies.
+        """
+        if not self.count:
+            return math.nan
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(
+            _quantile * self.count,
+            np.r_[0.0, centers, self.count],
+            np.r_[self.minimum, self.means, self.maximum]
+        ))
+
+
+class FlowPatternHistogram:
+    """
+    Streaming count of segments per `FlowPattern`.
+    """
+    def __init__(self):
+        self.counts = np.zeros(len(formulas.FlowPattern) + 1, dtype=np.int64)
+
+    def update(self, _flow_patterns):
+        self.counts += np.bincount(np.asarray(_flow_patterns).ravel(),
+                                   minlength=self.counts.size)
+
+    def merge(self, _other):
+        self.counts += _other.counts
+
+    def fractions(self):
+        """
+        Returns a dict with the fraction of segments in each `FlowPattern`.
+        """
+        total = max(int(self.counts.sum()), 1)
+        return {pattern: float(self.counts[pattern.value] / total)
+                for pattern in formulas.FlowPattern}
+
+
+class MonteCarloResult:
+    """
+    Streaming statistics of every model output: `RunningMoments` and
+    `TDigest` per output name plus a `FlowPatternHistogram`.
+    """
+    def __init__(self, _compression=500):
+        self.compression = _compression
+        self.samples = 0
+        self.moments = {}
+        self.digests = {}
+        self.histogram = FlowPatternHistogram()
+
+    def update(self, _outputs):
+        for name, values in _outputs.items():
+            if name == "flow_pattern":
+                self.histogram.update(values)
+                continue
+            if name not in self.moments:
+                self.moments[name] = RunningMoments()
+                self.digests[name] = TDigest(self.compression)
+            self.moments[name].update(values)
+            self.digests[name].update(values)
+
+    def merge(self, _other):
+        self.samples += _other.samples
+        for name in _other.moments:
+            if name not in self.moments:
+                self.moments[name] = RunningMoments()
+                self.digests[name] = TDigest(self.compression)
+            self.moments[name].merge(_other.moments[name])
+            self.digests[name].merge(_other.digests[name])
+        self.histogram.merge(_other.histogram)
+
+    def quantile(self, _name, _quantile):
+        return self.digests[_name].quantile(_quantile)
+
+    def percentiles(self, _name):
+        """
+        Returns the P10, P50 and P90 of an output. Percentiles follow the
+        cumulative convention (P10 is exceeded by 90% of the samples).
+        """
+        return {
+            "P10": self.quantile(_name, 0.1),
+            "P50": self.quantile(_name, 0.5),
+            "P90": self.quantile(_name, 0.9),
+        }
+
+
+class WellModel:
+    """
+    Vectorized Beggs and Brill model of a vertical producer. Any constructor
+    argument (without the leading underscore) can be overridden by a sampled
+    input of the same name.
+
+    If ``_reservoir_pressure`` and ``_productivity_index`` are given, the
+    liquid rate is the operating point of a linear IPR and the tubing curve,
+    solved with a vectorized Illinois iteration; otherwise the supplied
+    ``_liquid_flow_rate`` is used.
+
+    ``_pvt`` replaces the correlations of the bubble points and fluid
+    properties (see `pvt`).
+    """
+    def __init__(self,
+                 _wellhead_pressure,
+                 _wellhead_temperature,
+                 _bottomhole_temperature,
+                 _depth,
+                 _diameter,
+                 _oil_api_gravity=30.0,
+                 _gas_specific_gravity=0.7,
+                 _water_specific_gravity=1.07,
+                 _water_cut=0.0,
+                 _production_gas_liquid_ratio=100.0,
+                 _rugosity=0.0006,
+                 _liquid_flow_rate=None,
+                 _reservoir_pressure=None,
+                 _productivity_index=None,
+                 _segments=20,
+                 _tolerance=0.5,
+                 _max_iterations=30,
+                 _pvt=None):
+        self.parameters = {
+            "wellhead_pressure": _wellhead_pressure,
+            "wellhead_temperature": _wellhead_temperature,
+            "bottomhole_temperature": _bottomhole_temperature,
+            "depth": _depth,
+            "diameter": _diameter,
+            "oil_api_gravity": _oil_api_gravity,
+            "gas_specific_gravity": _gas_specific_gravity,
+            "water_specific_gravity": _water_specific_gravity,
+            "water_cut": _water_cut,
+            "production_gas_liquid_ratio": _production_gas_liquid_ratio,
+            "rugosity": _rugosity,
+            "liquid_flow_rate": _liquid_flow_rate,
+            "reservoir_pressure": _reservoir_pressure,
+            "productivity_index": _productivity_index,
+        }
+        self.segments = _segments
+        self.tolerance = _tolerance
+        self.max_iterations = _max_iterations
+        self.pvt = _pvt
+
+    def _traverse(self, _parameters, _liquid_flow_rate):
+        fractions = np.linspace(0.0, 1.0, self.segments + 1)
+        temperatures = (
+            _parameters["wellhead_temperature"][:, None] +
+            (_parameters["bottomhole_temperature"] -
+             _parameters["wellhead_temperature"])[:, None] * fractions
+        )
+        return vectorized.traverse(
+            _parameters["wellhead_pressure"],
+            [_parameters["depth"] / self.segments] * self.segments,
+            [90.0] * self.segments,
+            temperatures,
+            _parameters["oil_api_gravity"],
+            _parameters["gas_specific_gravity"],
+            _parameters["water_specific_gravity"],
+            _parameters["water_cut"],
+            _parameters["production_gas_liquid_ratio"],
+            _liquid_flow_rate,
+            _parameters["diameter"],
+            _parameters["rugosity"],
+            _against_flow=True,
+            _pvt=self.pvt,
+            _cache=False
+        )
+
+    def _operating_point(self, _parameters):
+        reservoir_pressure = _parameters["reservoir_pressure"]
+        productivity_index = _parameters["productivity_index"]
+        size = reservoir_pressure.size
+        flow_rate = np.zeros(size)
+        pressure = reservoir_pressure.copy()
+        patterns = np.zeros((size, self.segments), dtype=np.int8)
+
+        def residual(_rate, _index):
+            subset = {name: value[_index]
+                      for name, value in _parameters.items()}
+            pressures, _patterns = self._traverse(subset, _rate)
+            inflow = (reservoir_pressure[_index] -
+                      _rate / productivity_index[_index])
+            return pressures[:, -1] - inflow, pressures[:, -1], _patterns
+
+        # The tubing curve is above the IPR at the absolute open flow and
+        # below it at small rates for every well that is able to flow.
+        index = np.arange(size)
+        rate_high = productivity_index * reservoir_pressure
+        rate_low = 0.01 * rate_high
+        error_high, _, _ = residual(rate_high, index)
+        error_low, _, _ = residual(rate_low, index)
+        flowing = (error_low < 0) & (error_high > 0)
+
+        index = np.flatnonzero(flowing)
+        rate_low = rate_low[index]
+        rate_high = rate_high[index]
+        error_low = error_low[index]
+        error_high = error_high[index]
+        side = np.zeros(index.size, dtype=np.int8)
+        for _ in range(self.max_iterations):
+            if not index.size:
+                break
+            rate = ((rate_low * error_high - rate_high * error_low) /
+                    (error_high - error_low))
+            error, bottomhole, rate_patterns = residual(rate, index)
+            flow_rate[index] = rate
+            pressure[index] = bottomhole
+            patterns[index] = rate_patterns
+
+            below = error < 0
+            # Illinois modification: halve the stale end point error
+            error_high = np.where(below & (side == -1),
+                                  error_high / 2, error_high)
+            error_low = np.where(~below & (side == 1),
+                                 error_low / 2, error_low)
+            rate_low = np.where(below, rate, rate_low)
+            error_low = np.where(below, error, error_low)
+            rate_high = np.where(below, rate_high, rate)
+            error_high = np.where(below, error_high, error)
+            side = np.where(below, -1, 1).astype(np.int8)
+
+            active = np.abs(error) > self.tolerance
+            index = index[active]
+            rate_low = rate_low[active]
+            rate_high = rate_high[active]
+            error_low = error_low[active]
+            error_high = error_high[active]
+            side = side[active]
+        return flow_rate, pressure, patterns
+
+    def __call__(self, _samples, _cache=None):
+        """
+        Evaluates the model for a chunk of sampled inputs.
+
+        Args:
+            _samples (dict): Arrays of sampled inputs, keyed by parameter name.
+            _cache (ResultCache, optional): Result cache consulted first, the
+                enabled one by default (``False`` skips it, see `cache`).
+
+        Returns:
+            A dict with the ``bottomhole_pressure`` (:math:`psig`), the
+            ``liquid_flow_rate`` (:math:`bpd`) and the ``flow_pattern`` of
+            every segment.
+        """
+        arguments = dict(locals())
+        cache = vectorized._CACHE if _cache is None else _cache
+        if cache:
+            del arguments["_cache"]
+            return cache.call("well_model", WellModel.__call__, arguments)
+        size = len(next(iter(_samples.values())))
+        parameters = dict(self.parameters)
+        parameters.update(_samples)
+        parameters = {
+            name: np.broadcast_to(np.asarray(value, dtype=float), size)
+            for name, value in parameters.items() if value is not None
+        }
+        if "productivity_index" in parameters:
+            flow_rate, pressure, patterns = self._operating_point(parameters)
+        else:
+            flow_rate = parameters["liquid_flow_rate"]
+            pressures, patterns = self._traverse(parameters, flow_rate)
+            pressure = pressures[:, -1]
+        return {
+            "bottomhole_pressure": pressure,
+            "liquid_flow_rate": flow_rate,
+            "flow_pattern": patterns,
+        }
+
+
+def chunk_generator(_seed, _chunk):
+    """
+    Returns the random generator of a chunk. It only depends on the seed and
+    on the chunk index, so chunks can be evaluated in any order or process.
+    """
+    return np.random.default_rng(
+        np.random.SeedSequence(_seed, spawn_key=(_chunk,))
+    )
+
+
+def simulate_chunk(_distributions, _model, _samples, _chunk_size, _seed,
+                   _compression, _chunk):
+    """
+    Samples and evaluates a single chunk, returning its `MonteCarloResult`.
+    """
+    size = min(_chunk_size, _samples - _chunk * _chunk_size)
+    generator = chunk_generator(_seed, _chunk)
+    samples = {name: _distributions[name].sample(generator, size)
+               for name in sorted(_distributions)}
+    result = MonteCarloResult(_compression)
+    result.samples = size
+    result.update(_model(samples))
+    return result
+
+
+def monte_carlo(_distributions,
+                _model,
+                _samples,
+                _chunk_size=100000,
+                _seed=0,
+                _processes=None,
+                _compression=500):
+    """
+    Propagates input uncertainty through a vectorized model in chunks,
+    keeping only streaming statistics so memory does not grow with the number
+    of samples.
+
+    Args:
+        _distributions (dict): Distribution of each uncertain input, keyed by
+            the model parameter name (e.g. ``oil_api_gravity``).
+        _model (callable): Receives a dict of sampled arrays and returns a
+            dict of output arrays (see `WellModel`).
+        _samples (int): Total number of samples.
+        _chunk_size (int, optional): Number of samples evaluated at once.
+        _seed (int, optional): Base seed. Each chunk derives its own stream
+            from it (see `chunk_generator`).
+        _processes (int, optional): If given, chunks are evaluated by a
+            process pool of this size. Chunk results are always combined in
+            chunk order, so the statistics do not depend on it.
+        _compression (int, optional): t-digest compression.
+
+    Returns:
+        A `MonteCarloResult`.
+    """
+    chunks = range(math.ceil(_samples / _chunk_size))
+    simulate = functools.partial(simulate_chunk,
+                                 _distributions,
+                                 _model,
+                                 _samples,
+                                 _chunk_size,
+                                 _seed,
+                                 _compression)
+    result = MonteCarloResult(_compression)
+    if _processes is None:
+        for chunk in chunks:
+            result.merge(simulate(chunk))
+    else:
+        with multiprocessing.Pool(_processes) as pool:
+            for chunk_result in pool.imap(simulate, chunks):
+                result.merge(chunk_result)
+    return result
@@ -0,0 +1,923 @@
+"""
+Network
+"""
+import math
+
+import numpy as np
+
+from . import formulas
+from . import vectorized
+
+
+WELL = "well"
+JUNCTION = "junction"
+SINK = "sink"
+
+
+class NetworkSolution:
+    """
+    Converged (or last) state of a `Network` solve.
+
+    Attributes:
+        pressures (dict): Pressure (:math:`psig`) of every node.
+        rates (dict): Liquid rate (:math:`bpd`) of every pipe and well.
+        bottomhole_pressures (dict): Flowing bottomhole pressure
+            (:math:`psig`) of every well.
+        iterations (int): Newton iterations performed.
+        converged (boolean): Whether every node, pipe and well is converged
+            or bracketed.
+        residual (double): Largest absolute residual, except the IPR match
+            of bracketed wells.
+        status (dict): ``"converged"``, ``"bracketed"`` (wells whose rate
+            lies within the rate tolerance of a jump of their tubing curve
+            across the IPR) or ``"unconverged"`` for every free node and pipe.
+    """
+    def __init__(self, _pressures, _rates, _bottomhole_pressures,
+                 _iterations, _converged, _residual, _status):
+        self.pressures = _pressures
+        self.rates = _rates
+        self.bottomhole_pressures = _bottomhole_pressures
+        self.iterations = _iterations
+        self.converged = _converged
+        self.residual = _residual
+        self.status = _status
+
+
+class Network:
+    """
+    Surface gathering network of wells, pipes and junctions that flows into
+    one or more sinks at fixed pressure (e.g. separators). Pipes are directed
+    from upstream to downstream and must form an acyclic graph.
+
+    The unknowns are the pressure of every well and junction node and the
+    liquid rate of every pipe and well. The equations are the pipe pressure
+    drops (Beggs and Brill traverse along the flow, including
+    `FlowPattern.downward` holdup on downhill segments), the mass balance at
+    every node and, for every well, the match between its tubing curve and a
+    linear IPR. They are solved together with a damped Newton method on a
+    sparse Jacobian. Pipe and well traverses are evaluated in one vectorized
+    batch per iteration, together with the perturbed cases that give their
+    sensitivities to pressure and rate. Mass balance and IPR sensitivities are
+    analytic. The fluid carried by each pipe is the rate-weighted mixture of
+    the streams reaching its upstream node, updated at every iteration.
+
+    Args:
+        _pipe_segments (int, optional): Minimum number of segments each pipe
+            is split into.
+        _well_segments (int, optional): Number of tubing segments per well.
+        _pvt (optional): PVT source of the bubble points and fluid
+            properties of every well and pipe instead of the correlations
+            (see `pvt`).
+    """
+    def __init__(self, _pipe_segments=10, _well_segments=20, _pvt=None):
+        self.pipe_segments = _pipe_segments
+        self.well_segments = _well_segments
+        self.pvt = _pvt
+        self.nodes = {}
+        self.pipes = {}
+        self.wells = {}
+        self.sink_pressures = {}
+
+    def _add_node(self, _name, _kind):
+        if _name in self.nodes:
+            raise ValueError("Node '{}' already exists.".format(_name))
+        self.nodes[_name] = _kind
+
+    def add_sink(self, _name, _pressure):
+        """
+        Adds a node at fixed pressure (:math:`psig`).
+        """
+        self._add_node(_name, SINK)
+        self.sink_pressures[_name] = _pressure
+
+    def add_junction(self, _name):
+        """
+        Adds a node whose pressure is solved for (e.g. a manifold).
+        """
+        self._add_node(_name, JUNCTION)
+
+    def add_well(self,
+                 _name,
+                 _reservoir_pressure,
+                 _productivity_index,
+                 _depth,
+                 _diameter,
+                 _oil_api_gravity,
+                 _gas_specific_gravity,
+                 _water_specific_gravity,
+                 _water_cut,
+                 _production_gas_liquid_ratio,
+                 _rugosity=0.0006,
+                 _wellhead_temperature=100.,
+                 _bottomhole_temperature=180.):
+        """
+        Adds a vertical producer. Its wellhead is a node named ``_name``.
+
+        Args:
+            _reservoir_pressure (double): Average reservoir pressure
+                (:math:`psig`).
+            _productivity_index (double): Productivity index
+                (:math:`bpd/psi`).
+            _depth (double): Well depth (:math:`ft`).
+            _diameter (double): Tubing diameter (:math:`in`).
+        """
+        self._add_node(_name, WELL)
+        self.wells[_name] = {
+            "reservoir_pressure": _reservoir_pressure,
+            "productivity_index": _productivity_index,
+            "depth": _depth,
+            "diameter": _diameter,
+            "oil_api_gravity": _oil_api_gravity,
+            "gas_specific_gravity": _gas_specific_gravity,
+            "water_specific_gravity": _water_specific_gravity,
+            "water_cut": _water_cut,
+            "production_gas_liquid_ratio": _production_gas_liquid_ratio,
+            "rugosity": _rugosity,
+            "wellhead_temperature": _wellhead_temperature,
+            "bottomhole_temperature": _bottomhole_temperature,
+        }
+
+    def add_pipe(self,
+                 _name,
+                 _upstream,
+                 _downstream,
+                 _lengths,
+                 _inclinations,
+                 _diameter,
+                 _rugosity=0.0006,
+                 _temperature=100.):
+        """
+        Adds a pipe between two existing nodes.
+
+        Args:
+            _lengths (list): Length of each pipe segment (:math:`ft`).
+            _inclinations (list): Inclination of each segment with the
+                horizontal along the flow (degrees, negative downhill).
+            _diameter (double): Pipe diameter (:math:`in`).
+            _temperature (double, optional): Fluid temperature (fahrenheit
+                degrees).
+        """
+        for node in (_upstream, _downstream):
+            if node not in self.nodes:
+                raise ValueError("Unknown node '{}'.".format(node))
+        if self.nodes[_upstream] == SINK:
+            raise ValueError("Pipes cannot leave a sink.")
+        if len(_lengths) != len(_inclinations):
+            raise ValueError("Pipe needs one inclination per segment.")
+        self.pipes[_name] = {
+            "upstream": _upstream,
+            "downstream": _downstream,
+            "lengths": list(_lengths),
+            "inclinations": list(_inclinations),
+            "diameter": _diameter,
+            "rugosity": _rugosity,
+            "temperature": _temperature,
+        }
+
+    def _topological_order(self):
+        incoming = {name: 0 for name in self.nodes}
+        outgoing = {name: [] for name in self.nodes}
+        for name, pipe in self.pipes.items():
+            incoming[pipe["downstream"]] += 1
+            outgoing[pipe["upstream"]].append(name)
+        order = [name for name, count in incoming.items() if count == 0]
+        for node in order:
+            for pipe in outgoing[node]:
+                downstream = self.pipes[pipe]["downstream"]
+                incoming[downstream] -= 1
+                if incoming[downstream] == 0:
+                    order.append(downstream)
+        if len(order) != len(self.nodes):
+            raise ValueError("Network pipes must not form a cycle.")
+        for node, kind in self.nodes.items():
+            if kind != SINK and not outgoing[node]:
+                raise ValueError("Node '{}' has no outlet.".format(node))
+        return order, outgoing
+
+    def _setup(self):
+        self.order, self.outgoing = self._topological_order()
+        self.free_nodes = [node for node in self.order
+                           if self.nodes[node] != SINK]
+        self.pipe_names = list(self.pipes)
+        self.well_names = list(self.wells)
+        self.node_index = {node: i for i, node in enumerate(self.free_nodes)}
+        self.pipe_index = {
+            pipe: len(self.free_nodes) + i
+            for i, pipe in enumerate(self.pipe_names)
+        }
+        self.well_index = {
+            well: len(self.free_nodes) + len(self.pipe_names) + i
+            for i, well in enumerate(self.well_names)
+        }
+        self.size = (len(self.free_nodes) + len(self.pipe_names) +
+                     len(self.well_names))
+
+        # Pipes are padded with zero length segments to a common count
+        segments = max([self.pipe_segments] +
+                       [len(pipe["lengths"]) for pipe in self.pipes.values()])
+        self.pipe_lengths = np.zeros((len(self.pipe_names), segments))
+        self.pipe_inclinations = np.zeros((len(self.pipe_names), segments))
+        for i, name in enumerate(self.pipe_names):
+            pipe = self.pipes[name]
+            count = len(pipe["lengths"])
+            split = max(1, math.ceil(self.pipe_segments / count))
+            lengths = np.repeat(np.asarray(pipe["lengths"], float) / split,
+                                split)
+            inclinations = np.repeat(pipe["inclinations"], split)
+            if lengths.size > segments:
+                lengths = np.asarray(pipe["lengths"], float)
+                inclinations = np.asarray(pipe["inclinations"], float)
+            self.pipe_lengths[i, :lengths.size] = lengths
+            self.pipe_inclinations[i, :lengths.size] = inclinations
+        self.pipe_diameters, self.pipe_rugosities, self.pipe_temperatures = (
+            np.array([self.pipes[name][key] for name in self.pipe_names],
+                     dtype=float)
+            for key in ("diameter", "rugosity", "temperature")
+        )
+
+        self.well_parameters = {
+            key: np.array([self.wells[well][key] for well in self.well_names],
+                          dtype=float)
+            for key in next(iter(self.wells.values()))
+        } if self.wells else {}
+        # Well fluids and temperatures are fixed, so the bubble point of
+        # every tubing segment is computed once per solve.
+        if self.wells:
+            parameters = self.well_parameters
+            fractions = np.linspace(0.0, 1.0, self.well_segments + 1)
+            self.well_temperatures = (
+                parameters["wellhead_temperature"][:, None] +
+                (parameters["bottomhole_temperature"] -
+                 parameters["wellhead_temperature"])[:, None] * fractions
+            )
+            source = self.pvt or vectorized
+            self.well_bubble_points = source.mixture_bubble_point(
+                (self.well_temperatures[:, 1:] +
+                 self.well_temperatures[:, :-1]) / 2,
+                parameters["gas_specific_gravity"][:, None],
+                parameters["oil_api_gravity"][:, None],
+                parameters["water_cut"][:, None],
+                parameters["production_gas_liquid_ratio"][:, None]
+            )
+
+    def _compositions(self, _state):
+        # Stream totals: liquid, oil, water, gas and the gravity weighted
+        # oil, water and gas volumes.
+        totals = {node: np.zeros(7) for node in self.nodes}
+        for well in self.well_names:
+            parameters = self.wells[well]
+            rate = max(_state[self.well_index[well]], 1e-6)
+            water_cut = parameters["water_cut"]
+            gas = parameters["production_gas_liquid_ratio"]
+            oil_specific_gravity = formulas.specific_gravity_from_api(
+                parameters["oil_api_gravity"]
+            )
+            totals[well] += rate * np.array([
+                1.0,
+                1 - water_cut,
+                water_cut,
+                gas,
+                (1 - water_cut) * oil_specific_gravity,
+                water_cut * parameters["water_specific_gravity"],
+                gas * parameters["gas_specific_gravity"],
+            ])
+        compositions = {}
+        for node in self.order:
+            total = totals[node]
+            liquid = max(total[0], 1e-12)
+            composition = total / liquid
+            for pipe in self.outgoing[node]:
+                compositions[pipe] = composition
+                rate = max(_state[self.pipe_index[pipe]], 1e-6)
+                totals[self.pipes[pipe]["downstream"]] += rate * composition
+
+        fluid = np.array([compositions[pipe] for pipe in self.pipe_names])
+        fluid = fluid.reshape(len(self.pipe_names), 7)
+        oil = np.maximum(fluid[:, 1], 1e-12)
+        water = np.maximum(fluid[:, 2], 1e-12)
+        gas = np.maximum(fluid[:, 3], 1e-12)
+        oil_specific_gravity = np.where(fluid[:, 1] > 1e-12,
+                                        fluid[:, 4] / oil, 0.876)
+        compositions = {
+            "water_cut": fluid[:, 2],
+            "production_gas_liquid_ratio": fluid[:, 3],
+            "oil_api_gravity": 141.5 / oil_specific_gravity - 131.5,
+            "water_specific_gravity": np.where(fluid[:, 2] > 1e-12,
+                                               fluid[:, 5] / water, 1.0),
+            "gas_specific_gravity": np.where(fluid[:, 3] > 1e-12,
+                                             fluid[:, 6] / gas, 0.7),
+        }
+        # Pipes are isothermal: one bubble point per pipe
+        source = self.pvt or vectorized
+        compositions["bubble_point"] = source.mixture_bubble_point(
+            np.array([self.pipes[pipe]["temperature"]
+                      for pipe in self.pipe_names], dtype=float),
+            compositions["gas_specific_gravity"],
+            compositions["oil_api_gravity"],
+            compositions["water_cut"],
+            compositions["production_gas_liquid_ratio"]
+        )
+        return compositions
+
+    def _pipe_traverse(self, _pipes, _pressures, _rates, _fluid,
+                       _against_flow=False):
+        """
+        Returns the pressure at the far end of the pipes with indices
+        ``_pipes`` (which may repeat), marching along or against the flow.
+        """
+        lengths = self.pipe_lengths[_pipes]
+        inclinations = self.pipe_inclinations[_pipes]
+        if _against_flow:
+            lengths = lengths[:, ::-1]
+            inclinations = inclinations[:, ::-1]
+        temperatures = self.pipe_temperatures[_pipes]
+        pressures, _ = vectorized.traverse(
+            _pressures,
+            list(lengths.T),
+            list(inclinations.T),
+            np.repeat(temperatures[:, None], lengths.shape[1] + 1, axis=1),
+            _fluid["oil_api_gravity"][_pipes],
+            _fluid["gas_specific_gravity"][_pipes],
+            _fluid["water_specific_gravity"][_pipes],
+            _fluid["water_cut"][_pipes],
+            _fluid["production_gas_liquid_ratio"][_pipes],
+            _rates,
+            self.pipe_diameters[_pipes],
+            self.pipe_rugosities[_pipes],
+            _against_flow=_against_flow,
+            _tolerance=1e-6,
+            _bubble_points=np.repeat(_fluid["bubble_point"][_pipes][:, None],
+                                     lengths.shape[1], axis=1),
+            _pvt=self.pvt
+        )
+        return pressures[:, -1]
+
+    def _bottomhole_pressures(self, _wells, _wellhead_pressures, _rates):
+        """
+        Returns the flowing bottomhole pressure of the wells with indices
+        ``_wells`` (which may repeat).
+        """
+        parameters = {key: value[_wells]
+                      for key, value in self.well_parameters.items()}
+        pressures, _ = vectorized.traverse(
+            _wellhead_pressures,
+            [parameters["depth"] / self.well_segments] * self.well_segments,
+            [90.0] * self.well_segments,
+            self.well_temperatures[_wells],
+            parameters["oil_api_gravity"],
+            parameters["gas_specific_gravity"],
+            parameters["water_specific_gravity"],
+            parameters["water_cut"],
+            parameters["production_gas_liquid_ratio"],
+            _rates,
+            parameters["diameter"],
+            parameters["rugosity"],
+            _against_flow=True,
+            _tolerance=1e-6,
+            _bubble_points=self.well_bubble_points[_wells],
+            _pvt=self.pvt
+        )
+        return pressures[:, -1]
+
+    def _pressure(self, _state, _node):
+        if self.nodes[_node] == SINK:
+            return self.sink_pressures[_node]
+        return _state[self.node_index[_node]]
+
+    def _evaluate(self, _state, _jacobian=True, _pinned=None):
+        """
+        Returns the residual vector, the Jacobian as COO triplets (``None``
+        when ``_jacobian`` is false) and the well bottomhole pressures. The
+        rate of the wells in ``_pinned`` (a dict from their index in the state
+        to a rate) is held at that rate instead of matching the IPR.
+        """
+        pinned = _pinned or {}
+        residual = np.zeros(self.size)
+        rows = []
+        cols = []
+        values = []
+
+        # Mass balance at every free node
+        for node in self.free_nodes:
+            rows.append(self.node_index[node])
+            cols.append(self.node_index[node])
+            values.append(0.0)
+        for pipe in self.pipe_names:
+            column = self.pipe_index[pipe]
+            rate = _state[column]
+            upstream = self.pipes[pipe]["upstream"]
+            downstream = self.pipes[pipe]["downstream"]
+            residual[self.node_index[upstream]] -= rate
+            rows.append(self.node_index[upstream])
+            cols.append(column)
+            values.append(-1.0)
+            if downstream in self.node_index:
+                residual[self.node_index[downstream]] += rate
+                rows.append(self.node_index[downstream])
+                cols.append(column)
+                values.append(1.0)
+        for well in self.well_names:
+            column = self.well_index[well]
+            residual[self.node_index[well]] += _state[column]
+            rows.append(self.node_index[well])
+            cols.append(column)
+            values.append(1.0)
+
+        # Pipe pressure drops, marched against the flow from the outlet
+        # (which never falls below vacuum, unlike the march along the flow
+        # through an undersized pipe): base, pressure and rate perturbed
+        # cases
+        if self.pipe_names:
+            count = len(self.pipe_names)
+            inlet = np.array([self._pressure(_state,
+                                             self.pipes[pipe]["upstream"])
+                              for pipe in self.pipe_names])
+            outlet = np.array([self._pressure(_state,
+                                              self.pipes[pipe]["downstream"])
+                               for pipe in self.pipe_names])
+            rates = _state[[self.pipe_index[pipe] for pipe in self.pipe_names]]
+            pressure_step = 1e-3 * (outlet + 14.7)
+            rate_step = 1e-3 * rates
+            repeat = 3 if _jacobian else 1
+            inlets = self._pipe_traverse(
+                np.tile(np.arange(count), repeat),
+                np.concatenate((outlet, outlet + pressure_step, outlet)
+                               [:repeat]),
+                np.concatenate((rates, rates, rates + rate_step)[:repeat]),
+                self._compositions(_state),
+                _against_flow=True
+            ).reshape(repeat, count)
+            for i, pipe in enumerate(self.pipe_names):
+                row = self.pipe_index[pipe]
+                residual[row] = inlet[i] - inlets[0, i]
+                if not _jacobian:
+                    continue
+                rows.append(row)
+                cols.append(row)
+                values.append((inlets[0, i] - inlets[2, i]) / rate_step[i])
+                upstream = self.pipes[pipe]["upstream"]
+                rows.append(row)
+                cols.append(self.node_index[upstream])
+                values.append(1.0)
+                downstream = self.pipes[pipe]["downstream"]
+                if downstream in self.node_index:
+                    rows.append(row)
+                    cols.append(self.node_index[downstream])
+                    values.append((inlets[0, i] - inlets[1, i]) /
+                                  pressure_step[i])
+
+        # Wells: tubing curve against the IPR
+        bottomhole = np.empty(0)
+        if self.well_names:
+            wellhead = _state[[self.node_index[well]
+                               for well in self.well_names]]
+            rates = _state[[self.well_index[well]
+                            for well in self.well_names]]
+            pressure_step = 1e-3 * (wellhead + 14.7)
+            rate_step = 1e-3 * rates
+            repeat = 3 if _jacobian else 1
+            pressures = self._bottomhole_pressures(
+                np.tile(np.arange(len(self.well_names)), repeat),
+                np.concatenate((wellhead, wellhead + pressure_step, wellhead)
+                               [:repeat]),
+                np.concatenate((rates, rates, rates + rate_step)[:repeat])
+            ).reshape(repeat, -1)
+            bottomhole = pressures[0]
+            productivity_index = self.well_parameters["productivity_index"]
+            inflow = (self.well_parameters["reservoir_pressure"] -
+                      rates / productivity_index)
+            for i, well in enumerate(self.well_names):
+                row = self.well_index[well]
+                if row in pinned:
+                    residual[row] = _state[row] - pinned[row]
+                    if _jacobian:
+                        rows.append(row)
+                        cols.append(row)
+                        values.append(1.0)
+                    continue
+                residual[row] = bottomhole[i] - inflow[i]
+                if not _jacobian:
+                    continue
+                rows.append(row)
+                cols.append(row)
+                values.append((pressures[2, i] - bottomhole[i]) /
+                              rate_step[i] + 1 / productivity_index[i])
+                rows.append(row)
+                cols.append(self.node_index[well])
+                values.append((pressures[1, i] - bottomhole[i]) /
+                              pressure_step[i])
+        jacobian = (rows, cols, values) if _jacobian else None
+        return residual, jacobian, bottomhole
+
+    def _initial_state(self, _fraction=0.5, _min_fraction=2 ** -10,
+                       _steps=6):
+        """
+        Returns an initial state where every well produces ``_fraction`` of
+        its rate at a rough drawdown, with the node pressures marched against
+        the flow. When the network cannot carry that flow (a residual is not
+        finite, e.g. an undersized trunkline marched below vacuum) or most
+        wells cannot deliver it at the marched wellhead pressures, the
+        fraction is bisected on a log scale, down to ``_min_fraction``, for
+        the largest flow that the network carries and the wells deliver.
+        """
+        state = self._initial_rates_and_pressures(_fraction)
+        if self._deliverable(state):
+            return state
+        low = math.log(_min_fraction)
+        high = math.log(_fraction)
+        best = None
+        for _ in range(_steps):
+            middle = (low + high) / 2
+            candidate = self._initial_rates_and_pressures(math.exp(middle))
+            if self._deliverable(candidate):
+                low = middle
+                best = candidate
+            else:
+                high = middle
+        if best is None:
+            best = self._initial_rates_and_pressures(math.exp(low))
+        return best
+
+    def _deliverable(self, _state):
+        # Whether every residual is finite and most wells' tubing curve is
+        # below their IPR (they could produce more)
+        residual = self._evaluate(_state, _jacobian=False)[0]
+        if not np.all(np.isfinite(residual)):
+            return False
+        rows = [self.well_index[well] for well in self.well_names]
+        return not rows or np.median(residual[rows]) <= 0
+
+    def _initial_rates_and_pressures(self, _fraction):
+        state = np.zeros(self.size)
+        sink_pressure = min(self.sink_pressures.values())
+        for well in self.well_names:
+            parameters = self.wells[well]
+            drawdown = max(parameters["reservoir_pressure"] - sink_pressure -
+                           0.3 * parameters["depth"],
+                           0.1 * parameters["reservoir_pressure"])
+            state[self.well_index[well]] = (
+                _fraction * parameters["productivity_index"] * drawdown
+            )
+        # Rates add up along the flow and split evenly at diverging nodes
+        arriving = {node: 0.0 for node in self.nodes}
+        for well in self.well_names:
+            arriving[well] += state[self.well_index[well]]
+        for node in self.order:
+            for pipe in self.outgoing[node]:
+                rate = max(arriving[node] / len(self.outgoing[node]), 1.0)
+                state[self.pipe_index[pipe]] = rate
+                arriving[self.pipes[pipe]["downstream"]] += rate
+        # Node pressures are marched against the flow from the sinks along
+        # the first outlet of every node, one batch per distance (in pipes)
+        # from the sinks, so that the initial pipe residuals vanish.
+        fluid = self._compositions(state)
+        levels = {}
+        for node in reversed(self.order):
+            if self.nodes[node] == SINK:
+                levels[node] = 0
+            else:
+                pipe = self.outgoing[node][0]
+                levels[node] = levels[self.pipes[pipe]["downstream"]] + 1
+        for level in range(1, max(levels.values(), default=0) + 1):
+            nodes = [node for node in self.free_nodes
+                     if levels[node] == level]
+            pipes = [self.outgoing[node][0] for node in nodes]
+            indices = np.array([self.pipe_names.index(pipe)
+                                for pipe in pipes])
+            pressures = self._pipe_traverse(
+                indices,
+                np.array([self._pressure(state,
+                                         self.pipes[pipe]["downstream"])
+                          for pipe in pipes]),
+                state[[self.pipe_index[pipe] for pipe in pipes]],
+                fluid,
+                _against_flow=True
+            )
+            for node, pressure in zip(nodes, pressures):
+                state[self.node_index[node]] = pressure
+        return state
+
+    def _clamp(self, _state):
+        state = _state.copy()
+        nodes = len(self.free_nodes)
+        state[:nodes] = np.maximum(state[:nodes], 0.0)
+        state[nodes:] = np.maximum(state[nodes:], 1.0)
+        return state
+
+    def _newton(self, _state, _pinned, _pressure_tolerance, _rate_tolerance,
+                _max_iterations, _stall_iterations):
+        """
+        Damped Newton iterations from ``_state`` with the wells in ``_pinned``
+        held at their rate. Returns the state with the smallest residual norm,
+        its residual, bottomhole pressures and the iterations performed.
+        """
+        nodes = len(self.free_nodes)
+        state = _state
+        residual, jacobian, bottomhole = self._evaluate(state,
+                                                        _pinned=_pinned)
+        iterations = 0
+        best = best_norm = np.inf
+        best_state = (state, residual, bottomhole)
+        stalled = 0
+        while True:
+            converged = (
+                np.all(np.abs(residual[:nodes]) <= _rate_tolerance) and
+                np.all(np.abs(residual[nodes:]) <= _pressure_tolerance)
+            )
+            norm = np.linalg.norm(residual)
+            if norm < 0.75 * best:
+                best = norm
+                stalled = 0
+            else:
+                stalled += 1
+            if norm < best_norm:
+                best_norm = norm
+                best_state = (state, residual, bottomhole)
+            if (converged or iterations >= _max_iterations or
+                    stalled >= _stall_iterations):
+                break
+            iterations += 1
+            step = solve_sparse(jacobian, -residual, self.size)
+            # Every pressure (absolute) and rate may at most halve or double
+            # per iteration. The limited step is backtracked on the residual
+            # norm and only the accepted state needs the sensitivities.
+            offset = np.where(np.arange(self.size) < nodes, 14.7, 0.0)
+            step = np.clip(step,
+                           -0.5 * (state + offset),
+                           state + offset)
+            damping = 1.0
+            candidate = self._clamp(state + step)
+            result = self._evaluate(candidate, _pinned=_pinned)
+            candidate_norm = np.linalg.norm(result[0])
+            while not candidate_norm < norm and damping > 1 / 32:
+                damping /= 2
+                candidate = self._clamp(state + damping * step)
+                result = self._evaluate(candidate, _jacobian=False,
+                                        _pinned=_pinned)
+                candidate_norm = np.linalg.norm(result[0])
+            if not candidate_norm < norm:
+                break
+            state = candidate
+            residual, jacobian, bottomhole = result
+            if jacobian is None:
+                residual, jacobian, bottomhole = self._evaluate(
+                    state, _pinned=_pinned)
+        state, residual, bottomhole = best_state
+        return state, residual, bottomhole, iterations
+
+    def _well_residuals(self, _wells, _wellhead_pressures, _rates):
+        """
+        Returns the tubing curve minus the IPR of the wells with indices
+        ``_wells`` (which may repeat).
+        """
+        parameters = self.well_parameters
+        return (self._bottomhole_pressures(_wells, _wellhead_pressures,
+                                           _rates) -
+                parameters["reservoir_pressure"][_wells] +
+                _rates / parameters["productivity_index"][_wells])
+
+    def _section(self, _wells, _wellhead_pressures, _start, _start_value,
+                 _points):
+        """
+        Evaluates the residual of the wells with indices ``_wells`` at the
+        rates ``_points`` (one row per well, moving away from ``_start``) in
+        one batch.
+
+        Returns:
+            A tuple ``(near, near_value, far, far_value, found)``: the first
+            pair of consecutive rates, from ``_start``, across which the
+            residual changes sign (the last point twice when there is none),
+            the residual at both and whether there is one.
+        """
+        count, size = _points.shape
+        values = self._well_residuals(np.repeat(_wells, size),
+                                      np.repeat(_wellhead_pressures, size),
+                                      _points.ravel()).reshape(count, size)
+        crossed = np.sign(values) != np.sign(_start_value)[:, None]
+        found = crossed.any(axis=1)
+        rows = np.arange(count)
+        far = np.where(found, np.argmax(crossed, axis=1), size - 1)
+        near = far - found
+        return (np.where(near < 0, _start, _points[rows, near]),
+                np.where(near < 0, _start_value, values[rows, near]),
+                _points[rows, far],
+                values[rows, far],
+                found)
+
+    def _brackets(self, _wells, _wellhead_pressures, _rates, _width,
+                  _expansions=10, _points=8):
+        """
+        Searches, at fixed wellhead pressure, the rates around ``_rates``
+        between which the residual of the wells with indices ``_wells``
+        changes sign, and narrows them down to ``_width``. Each step
+        evaluates several rates per well in one batch: rates geometrically
+        further away, then ``_points`` rates evenly spaced in the bracket.
+
+        Returns:
+            A tuple ``(residual, low, high, low_value, high_value, found)``:
+            the residual at ``_rates``, the ends of the brackets, the
+            residual at both and whether one was found.
+        """
+        count = len(_wells)
+        half = 0.5 * _width
+        values = self._well_residuals(
+            np.tile(_wells, 3),
+            np.tile(_wellhead_pressures, 3),
+            np.concatenate((np.maximum(_rates - half, 1.0), _rates,
+                            _rates + half))
+        ).reshape(3, count)
+        residual = values[1]
+        low = np.maximum(_rates - half, 1.0)
+        high = _rates + half
+        low_value = values[0]
+        high_value = values[2]
+        found = np.sign(low_value) != np.sign(high_value)
+
+        # Expand geometrically towards the root (the residual increases with
+        # the rate) from the near end of the bracket
+        active = np.flatnonzero(~found)
+        if active.size:
+            upward = residual[active] < 0
+            near = np.where(upward, high[active], low[active])
+            near_value = np.where(upward, high_value[active],
+                                  low_value[active])
+            distances = half * 4.0 ** np.arange(1, _expansions + 1)
+            points = np.maximum(near[:, None] + np.where(
+                upward, 1.0, -1.0)[:, None] * distances, 1.0)
+            near, near_value, far, far_value, crossed = self._section(
+                _wells[active], _wellhead_pressures[active], near,
+                near_value, points)
+            low[active] = np.where(upward, near, far)
+            high[active] = np.where(upward, far, near)
+            low_value[active] = np.where(upward, near_value, far_value)
+            high_value[active] = np.where(upward, far_value, near_value)
+            found[active] = crossed
+
+        # Narrow down
+        fractions = np.arange(1, _points + 1) / (_points + 1)
+        active = np.flatnonzero(found & (high - low > _width))
+        while active.size:
+            near, near_value, far, far_value, crossed = self._section(
+                _wells[active], _wellhead_pressures[active], low[active],
+                low_value[active],
+                low[active, None] + (high - low)[active, None] * fractions)
+            low[active] = near
+            low_value[active] = near_value
+            high[active] = np.where(crossed, far, high[active])
+            high_value[active] = np.where(crossed, far_value,
+                                          high_value[active])
+            active = active[high[active] - low[active] > _width]
+        return residual, low, high, low_value, high_value, found
+
+    def solve(self,
+              _pressure_tolerance=0.01,
+              _rate_tolerance=0.01,
+              _max_iterations=50,
+              _stall_iterations=1,
+              _bracket_rounds=10):
+        """
+        Solves the network.
+
+        Beggs and Brill holdup is discontinuous across flow pattern
+        boundaries, so a well's tubing curve may jump across its IPR with no
+        exact root. Newton stops at the first iteration that does not reduce
+        the residual norm by 25%. The rate of every well whose equation is
+        still unmet is then bracketed, at fixed wellhead pressure, between
+        two rates at most half ``_rate_tolerance`` apart where its residual
+        changes sign. Wells whose residual jumps across that bracket are held
+        at its middle while Newton solves the rest of the network again, the
+        others restart from it. This repeats until every held rate is within
+        ``_rate_tolerance`` of its bracket at the new wellhead pressure. Such
+        wells are reported as ``"bracketed"`` and count as converged.
+
+        Pipe pressure drops are marched against the flow, from the outlet,
+        and the initial well rates are cut down until the network carries
+        them (see `_initial_state`), so undersized pipes do not march below
+        vacuum.
+
+        Args:
+            _pressure_tolerance (double, optional): Largest pressure residual
+                accepted (:math:`psi`).
+            _rate_tolerance (double, optional): Largest mass balance residual
+                accepted (:math:`bpd`).
+            _max_iterations (int, optional): Maximum Newton iterations, over
+                all rounds.
+            _stall_iterations (int, optional): Iterations without a 25%
+                reduction of the residual norm after which Newton stops.
+            _bracket_rounds (int, optional): Maximum Newton solves with
+                bracketed well rates held.
+
+        Returns:
+            A `NetworkSolution`.
+        """
+        self._setup()
+        nodes = len(self.free_nodes)
+        wells = np.arange(len(self.well_names))
+        well_rows = np.array([self.well_index[well]
+                              for well in self.well_names], dtype=int)
+        well_nodes = np.array([self.node_index[well]
+                               for well in self.well_names], dtype=int)
+        state = self._initial_state()
+        pinned = {}
+        bracketed = {}
+        iterations = 0
+        for round_ in range(_bracket_rounds + 1):
+            state, residual, bottomhole, count = self._newton(
+                state, pinned, _pressure_tolerance, _rate_tolerance,
+                _max_iterations - iterations, _stall_iterations)
+            iterations += count
+            # Wells whose equation is unmet, and the held ones (their
+            # bracket moves with the wellhead pressure)
+            check = np.array([
+                i for i in wells
+                if well_rows[i] in pinned or
+                abs(residual[well_rows[i]]) > _pressure_tolerance
+            ], dtype=int)
+            if not check.size:
+                bracketed = {}
+                break
+            (well_residual, low, high, low_value, high_value,
+             found) = self._brackets(check, state[well_nodes[check]],
+                                     state[well_rows[check]],
+                                     _rate_tolerance / 2)
+            rates = state[well_rows[check]]
+            residual = residual.copy()
+            residual[well_rows[check]] = well_residual
+            # The residual changes by more than the pressure tolerance within
+            # a bracket narrower than the rate tolerance: the tubing curve
+            # jumps across the IPR. Wells with a smooth root only restart
+            # Newton from it, held they would follow the wellhead pressure
+            # round after round.
+            jump = found & (np.abs(high_value - low_value) >
+                            _pressure_tolerance)
+            inside = jump & (np.abs(rates - (low + high) / 2) <=
+                             _rate_tolerance)
+            bracketed = {int(well_rows[i]): float(rate) for i, rate, held
+                         in zip(check, rates, inside) if held}
+            moved = {int(well_rows[i]): float((a + b) / 2) for i, a, b, held
+                     in zip(check, low, high, found & ~inside) if held}
+            if (not moved or round_ == _bracket_rounds or
+                    iterations >= _max_iterations):
+                break
+            pinned = dict(bracketed)
+            pinned.update({row: rate for row, rate, held in zip(
+                well_rows[check], (low + high) / 2, jump & ~inside) if held})
+            state = state.copy()
+            for row, rate in moved.items():
+                state[row] = rate
+
+        # Free nodes on their mass balance, pipes on their pressure drop and
+        # wells on both their mass balance and their IPR match
+        met = np.abs(residual) <= np.where(np.arange(self.size) < nodes,
+                                           _rate_tolerance,
+                                           _pressure_tolerance)
+        status = {node: met[self.node_index[node]]
+                  for node in self.free_nodes}
+        status.update({pipe: met[self.pipe_index[pipe]]
+                       for pipe in self.pipe_names})
+        status = {key: "converged" if value else "unconverged"
+                  for key, value in status.items()}
+        unbracketed = np.ones(self.size, dtype=bool)
+        for i, well in enumerate(self.well_names):
+            if not met[well_rows[i]]:
+                if well_rows[i] in bracketed and met[well_nodes[i]]:
+                    status[well] = "bracketed"
+                    unbracketed[well_rows[i]] = False
+                else:
+                    status[well] = "unconverged"
+        pressures = dict(self.sink_pressures)
+        for node in self.free_nodes:
+            pressures[node] = float(state[self.node_index[node]])
+        rates = {pipe: float(state[self.pipe_index[pipe]])
+                 for pipe in self.pipe_names}
+        rates.update({well: float(state[self.well_index[well]])
+                      for well in self.well_names})
+        return NetworkSolution(
+            pressures,
+            rates,
+            {well: float(bottomhole[i])
+             for i, well in enumerate(self.well_names)},
+            iterations,
+            all(value != "unconverged" for value in status.values()),
+            (float(np.max(np.abs(residual[unbracketed])))
+             if unbracketed.any() else 0.0),
+            status
+        )
+
+
+def solve_sparse(_jacobian, _right_hand_side, _size):
+    """
+    Solves a linear system given in COO triplets ``(rows, cols, values)``.
+    Duplicated entries are summed. Uses SciPy's sparse LU when it is
+    installed and a dense solve otherwise.
+    """
+    rows, cols, values = _jacobian
+    try:
+        from scipy import sparse
+        from scipy.sparse import linalg
+    except ImportError:
+        matrix = np.zeros((_size, _size))
+        np.add.at(matrix, (rows, cols), values)
+        return np.linalg.solve(matrix, _right_hand_side)
+    matrix = sparse.csc_matrix((values, (rows, cols)), shape=(_size, _size))
+    return linalg.spsolve(matrix, _right_hand_side)
@@ -0,0 +1,643 @@
+"""
+PVT
+"""
+import bisect
+
+import numpy as np
+
+from . import correlations
+from . import formulas
+from . import traverse
+from . import vectorized
+
+
+# Conversions of the black-oil table keywords (FIELD units: psia, Mscf/stb,
+# rb/Mscf) to the units used everywhere else (psig, scf/stb, bbl/scf)
+ATMOSPHERIC_PRESSURE = 14.7
+SCF_PER_MSCF = 1000.0
+WATER_DENSITY = 62.4
+AIR_DENSITY = 0.0764106
+
+KEYWORDS = ("PVTO", "PVDG", "PVTW", "DENSITY")
+
+
+class CorrelationPVT:
+    """
+    PVT source of the correlations in `correlations` (Standing, Vasquez and
+    Beggs, Gould, Papay, Beggs and Robinson, Lee...), which is what every
+    function taking a ``_pvt`` argument uses when it is None. Scalars go
+    through `traverse.fluid_properties` and arrays through
+    `vectorized.fluid_properties`.
+    """
+    def mixture_bubble_point(self,
+                             _temperature,
+                             _gas_specific_gravity,
+                             _oil_api_gravity,
+                             _water_cut,
+                             _production_gas_liquid_ratio):
+        arguments = (_temperature,
+                     _gas_specific_gravity,
+                     _oil_api_gravity,
+                     _water_cut,
+                     _production_gas_liquid_ratio)
+        if any(_is_array(value) for value in arguments):
+            return vectorized.mixture_bubble_point(*arguments)
+        return correlations.mixture_bubble_point(*arguments)
+
+    def fluid_properties(self,
+                         _pressure,
+                         _temperature,
+                         _bubble_point,
+                         _oil_api_gravity,
+                         _gas_specific_gravity,
+                         _water_specific_gravity,
+                         _water_cut,
+                         _production_gas_liquid_ratio):
+        arguments = (_pressure,
+                     _temperature,
+                     _bubble_point,
+                     _oil_api_gravity,
+                     _gas_specific_gravity,
+                     _water_specific_gravity,
+                     _water_cut,
+                     _production_gas_liquid_ratio)
+        if any(_is_array(value) for value in arguments):
+            return vectorized.fluid_properties(*arguments)
+        return traverse.fluid_properties(*arguments)
+
+
+def _is_array(_value):
+    # Much cheaper than np.ndim on the scalar path
+    return hasattr(_value, "__len__")
+
+
+class _Axis:
+    """
+    Ascending interpolation points. `locate` returns the interval and the
+    local coordinate of a value (scalar or array), extrapolating the first
+    and last intervals. Evenly spaced points are located arithmetically
+    instead of by binary search.
+    """
+    def __init__(self, _points):
+        self.points = np.asarray(_points, dtype=float)
+        steps = np.diff(self.points)
+        if self.points.size < 2 or np.any(steps <= 0):
+            raise ValueError("Table points must be strictly increasing.")
+        self._points = self.points.tolist()
+        self.last = self.points.size - 2
+        self.inverse_step = None
+        if np.allclose(steps, steps[0], rtol=1e-12, atol=0.0):
+            self.inverse_step = 1 / steps[0]
+
+    def locate(self, _values):
+        if _is_array(_values):
+            values = np.asarray(_values, dtype=float)
+            if self.inverse_step is not None:
+                position = (values - self.points[0]) * self.inverse_step
+                index = np.clip(np.floor(position), 0, self.last).astype(
+                    np.intp)
+                return index, position - index
+            index = np.clip(
+                np.searchsorted(self.points, values, side="right") - 1,
+                0, self.last)
+            start = self.points[index]
+            return index, (values - start) / (self.points[index + 1] - start)
+        index = min(max(bisect.bisect_right(self._points, _values) - 1, 0),
+                    self.last)
+        start = self._points[index]
+        return index, (_values - start) / (self._points[index + 1] - start)
+
+
+def _lerp(_values, _index, _fraction):
+    start = _values[_index]
+    return start + _fraction * (_values[_index + 1] - start)
+
+
+def _bilinear(_table, _row, _row_fraction, _column, _column_fraction):
+    # Flat indices of the four corners, cheaper than 2-D fancy indexing
+    columns = _table.shape[1]
+    flat = _table.ravel()
+    corner = _row * columns + _column
+    lower = _lerp(flat, corner, _column_fraction)
+    upper = _lerp(flat, corner + columns, _column_fraction)
+    return lower + _row_fraction * (upper - lower)
+
+
+class BlackOilTable:
+    """
+    Black-oil PVT tables (the PVTO, PVDG and PVTW keywords of reservoir
+    simulators) and their interpolators, a PVT source that replaces the
+    correlations wherever a ``_pvt`` argument is accepted (see
+    `traverse.fluid_properties` and `vectorized.fluid_properties`).
+
+    The oil table holds one record per solution gas oil ratio: its first row
+    is the saturated oil at the bubble point and the next rows, if any, the
+    undersaturated oil at higher pressures. Records without undersaturated
+    rows use the branch of the next record that has one (the previous one
+    for the last records). Below the bubble point, :math:`R_{so}`,
+    :math:`B_o` and :math:`\\mu_o` are interpolated linearly in pressure on
+    the saturated rows; above it, :math:`B_o` and :math:`\\mu_o` are the
+    saturated values at the bubble point times the ratio of the
+    undersaturated branch at the same pressure above the bubble point,
+    interpolated between the two records around the bubble point. The gas
+    table is interpolated linearly in :math:`1/B_g` and
+    :math:`1/(B_g \\mu_g)`, and the water follows the PVTW expansions around
+    the reference pressure. Values outside the tables are extrapolated
+    linearly. The tables are isothermal, and the water is dead
+    (:math:`R_{sw} = 0`) as in any black-oil model.
+
+    Args:
+        _oil (list): Records ``(solution_gas_oil_ratio, pressures,
+            formation_volume_factors, viscosities)`` in :math:`scf/stb`,
+            :math:`psig`, :math:`bbl/stb` and :math:`cp`.
+        _gas (tuple): ``(pressures, formation_volume_factors, viscosities)``
+            in :math:`psig`, :math:`bbl/scf` and :math:`cp`.
+        _water (tuple): ``(reference_pressure, formation_volume_factor,
+            compressibility, viscosity, viscosibility)`` in :math:`psig`,
+            :math:`bbl/stb`, :math:`psi^{-1}`, :math:`cp` and
+            :math:`psi^{-1}`.
+        _densities (tuple, optional): Stock tank ``(oil, water, gas)``
+            densities (:math:`lbm/ft^3`). When given, they set the fluid
+            gravities instead of the ones passed to `fluid_properties`.
+        _temperature (double, optional): Temperature of the tables
+            (fahrenheit degrees), only kept for reference.
+    """
+    def __init__(self,
+                 _oil,
+                 _gas,
+                 _water,
+                 _densities=None,
+                 _temperature=None):
+        self.oil = sorted(
+            ((float(ratio),
+              np.asarray(pressures, dtype=float),
+              np.asarray(factors, dtype=float),
+              np.asarray(viscosities, dtype=float))
+             for ratio, pressures, factors, viscosities in _oil),
+            key=lambda _record: _record[0]
+        )
+        self.gas = tuple(np.asarray(values, dtype=float) for values in _gas)
+        self.water = tuple(float(value) for value in _water)
+        self.densities = (None if _densities is None
+                          else tuple(float(value) for value in _densities))
+        self.temperature = _temperature
+
+        saturated = np.array([(pressures[0], ratio, factors[0], viscosities[0])
+                              for ratio, pressures, factors, viscosities
+                              in self.oil])
+        self.saturated = _Axis(saturated[:, 0])
+        self.ratios = _Axis(saturated[:, 1])
+        self.saturated_ratio = saturated[:, 1]
+        self.saturated_factor = saturated[:, 2]
+        self.saturated_viscosity = saturated[:, 3]
+        self._build_branches()
+
+        pressures, factors, viscosities = self.gas
+        self.gas_pressures = _Axis(pressures)
+        self.inverse_gas_factor = 1 / factors
+        self.inverse_gas_mobility = 1 / (factors * viscosities)
+
+        if self.densities is None:
+            self.oil_specific_gravity = None
+            self.oil_api_gravity = None
+            self.water_specific_gravity = None
+            self.gas_specific_gravity = None
+        else:
+            oil, water, gas = self.densities
+            self.oil_specific_gravity = formulas.density_to_specific_gravity(
+                oil)
+            self.oil_api_gravity = 141.5 / self.oil_specific_gravity - 131.5
+            self.water_specific_gravity = (
+                formulas.density_to_specific_gravity(water))
+            self.gas_specific_gravity = gas / AIR_DENSITY
+
+    def _build_branches(self):
+        # Undersaturated branches as (pressure above bubble point, ratio to
+        # the saturated value) of every record
+        branches = [
+            (pressures[1:] - pressures[0],
+             factors[1:] / factors[0],
+             viscosities[1:] / viscosities[0])
+            for _, pressures, factors, viscosities in self.oil
+        ]
+        with_data = [i for i, branch in enumerate(branches) if branch[0].size]
+        if with_data:
+            for i, branch in enumerate(branches):
+                if not branch[0].size:
+                    following = [j for j in with_data if j > i]
+                    branches[i] = branches[following[0] if following
+                                           else with_data[-1]]
+        offsets = np.unique(np.concatenate(
+            [[0.0]] + [branch[0] for branch in branches]))
+        if offsets.size == 1:
+            offsets = np.array([0.0, 1.0])
+
+        # Every branch resampled on the union of the offsets, which is exact
+        # for piecewise linear branches
+        factor_ratios = np.ones((len(branches), offsets.size))
+        viscosity_ratios = np.ones((len(branches), offsets.size))
+        for i, (branch_offsets, factors, viscosities) in enumerate(branches):
+            if not branch_offsets.size:
+                continue
+            axis = _Axis(np.concatenate([[0.0], branch_offsets]))
+            index, fraction = axis.locate(offsets)
+            factor_ratios[i] = _lerp(np.concatenate([[1.0], factors]),
+                                     index, fraction)
+            viscosity_ratios[i] = _lerp(np.concatenate([[1.0], viscosities]),
+                                        index, fraction)
+        self.offsets = _Axis(offsets)
+        self.factor_ratios = factor_ratios
+        self.viscosity_ratios = viscosity_ratios
+
+    def bubble_point(self, _solution_gas_oil_ratio):
+        """
+        Returns the bubble point (:math:`psig`) of an oil with the given
+        solution gas oil ratio (:math:`scf/stb`).
+        """
+        index, fraction = self.ratios.locate(_solution_gas_oil_ratio)
+        return _lerp(self.saturated.points, index, fraction)
+
+    def mixture_bubble_point(self,
+                             _temperature,
+                             _gas_specific_gravity,
+                             _oil_api_gravity,
+                             _water_cut,
+                             _production_gas_liquid_ratio):
+        """
+        Tabulated `correlations.mixture_bubble_point`: the pressure at which
+        the oil dissolves all the produced gas (the water is dead). The
+        temperature and gravities are ignored.
+        """
+        arguments = (_temperature,
+                     _gas_specific_gravity,
+                     _oil_api_gravity,
+                     _water_cut,
+                     _production_gas_liquid_ratio)
+        if any(_is_array(value) for value in arguments):
+            shape = np.broadcast(*arguments).shape
+            water_cut = np.broadcast_to(
+                np.asarray(_water_cut, dtype=float), shape)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ratio = np.where(water_cut < 1,
+                                 _production_gas_liquid_ratio /
+                                 (1 - water_cut),
+                                 0.0)
+            return self.bubble_point(ratio)
+        if _water_cut >= 1:
+            return self.bubble_point(0.0)
+        return self.bubble_point(_production_gas_liquid_ratio /
+                                 (1 - _water_cut))
+
+    def oil_properties(self, _pressure, _bubble_point):
+        """
+        Returns the solution gas oil ratio (:math:`scf/stb`), formation
+        volume factor (:math:`bbl/stb`) and viscosity (:math:`cp`) of the
+        oil.
+        """
+        record, weight = self.saturated.locate(_bubble_point)
+        if _is_array(_pressure) or _is_array(_bubble_point):
+            saturation = np.minimum(_pressure, _bubble_point)
+            above = np.maximum(np.subtract(_pressure, _bubble_point), 0.0)
+            weight = np.clip(weight, 0.0, 1.0)
+        else:
+            saturation = min(_pressure, _bubble_point)
+            above = max(_pressure - _bubble_point, 0.0)
+            weight = min(max(weight, 0.0), 1.0)
+        index, fraction = self.saturated.locate(saturation)
+        ratio = _lerp(self.saturated_ratio, index, fraction)
+        factor = _lerp(self.saturated_factor, index, fraction)
+        viscosity = _lerp(self.saturated_viscosity, index, fraction)
+
+        # Undersaturated ratios between the records around the bubble point
+        offset, position = self.offsets.locate(above)
+        factor = factor * _bilinear(self.factor_ratios, record, weight,
+                                    offset, position)
+        viscosity = viscosity * _bilinear(self.viscosity_ratios, record,
+                                          weight, offset, position)
+        return ratio, factor, viscosity
+
+    def gas_properties(self, _pressure):
+        """
+        Returns the gas formation volume factor (:math:`bbl/scf`) and
+        viscosity (:math:`cp`).
+        """
+        index, fraction = self.gas_pressures.locate(_pressure)
+        inverse_factor = _lerp(self.inverse_gas_factor, index, fraction)
+        inverse_mobility = _lerp(self.inverse_gas_mobility, index, fraction)
+        return 1 / inverse_factor, inverse_factor / inverse_mobility
+
+    def water_properties(self, _pressure):
+        """
+        Returns the water formation volume factor (:math:`bbl/stb`) and
+        viscosity (:math:`cp`).
+        """
+        (reference_pressure, reference_factor, compressibility,
+         reference_viscosity, viscosibility) = self.water
+        x = compressibility * (_pressure - reference_pressure)
+        y = -viscosibility * (_pressure - reference_pressure)
+        factor = reference_factor / (1 + x + x * x / 2)
+        viscosity = (reference_factor * reference_viscosity /
+                     ((1 + y + y * y / 2) * factor))
+        return factor, viscosity
+
+    def fluid_properties(self,
+                         _pressure,
+                         _temperature,
+                         _bubble_point,
+                         _oil_api_gravity,
+                         _gas_specific_gravity,
+                         _water_specific_gravity,
+                         _water_cut,
+                         _production_gas_liquid_ratio):
+        """
+        Tabulated `traverse.fluid_properties` (scalars) and
+        `vectorized.fluid_properties` (arrays), with the same keys. The
+        temperature only enters the surface tensions.
+        """
+        if self.densities is not None:
+            _oil_api_gravity = self.oil_api_gravity
+            _gas_specific_gravity = self.gas_specific_gravity
+            _water_specific_gravity = self.water_specific_gravity
+        is_array = any(_is_array(value) for value in (
+            _pressure, _temperature, _bubble_point, _oil_api_gravity,
+            _gas_specific_gravity, _water_specific_gravity, _water_cut,
+            _production_gas_liquid_ratio))
+        functions = vectorized if is_array else formulas
+        oil_specific_gravity = formulas.specific_gravity_from_api(
+            _oil_api_gravity)
+        rso, bo, oil_viscosity = self.oil_properties(_pressure,
+                                                     _bubble_point)
+        rsw = np.zeros(np.shape(rso)) if is_array else 0.0
+        bg_bbl, gas_viscosity = self.gas_properties(_pressure)
+        bw, water_viscosity = self.water_properties(_pressure)
+        dead_oil_surface_tension = correlations.dead_oil_gas_surface_tension(
+            _temperature,
+            _oil_api_gravity
+        )
+        return {
+            "gas_solubility_in_oil": rso,
+            "gas_solubility_in_water": rsw,
+            "oil_formation_volume_factor": bo,
+            "water_formation_volume_factor": bw,
+            "gas_formation_volume_factor": bg_bbl,
+            "oil_density": formulas.live_oil_density(oil_specific_gravity,
+                                                     _gas_specific_gravity,
+                                                     rso,
+                                                     bo,
+                                                     _water_cut),
+            "water_density": formulas.live_water_density(
+                _water_specific_gravity,
+                _gas_specific_gravity,
+                rsw,
+                bw,
+                _water_cut
+            ),
+            "gas_density": formulas.gas_density(_gas_specific_gravity,
+                                                bg_bbl,
+                                                False),
+            "oil_viscosity": oil_viscosity,
+            "water_viscosity": water_viscosity,
+            "gas_viscosity": gas_viscosity,
+            "oil_surface_tension": (
+                vectorized if is_array else correlations
+            ).live_oil_gas_surface_tension(dead_oil_surface_tension, rso),
+            "water_surface_tension": correlations.water_gas_surface_tension(),
+            "free_gas_liquid_ratio": functions.free_gas_liquid_ratio(
+                _pressure,
+                _bubble_point,
+                rso,
+                rsw,
+                _water_cut,
+                _production_gas_liquid_ratio
+            ),
+        }
+
+    @classmethod
+    def from_correlations(cls,
+                          _temperature,
+                          _oil_api_gravity,
+                          _gas_specific_gravity,
+                          _water_specific_gravity=1.07,
+                          _pressures=None):
+        """
+        Tabulates the correlations for a fluid at a temperature: one oil
+        record per pressure of ``_pressures`` taken as the bubble point,
+        each with an undersaturated branch over the same pressure span, gas
+        rows at ``_pressures`` and the water expanded around their middle
+        (dead water, at a zero bubble point).
+
+        Args:
+            _temperature (double): Temperature (fahrenheit degrees).
+            _oil_api_gravity (double): Oil's API gravity (API degrees).
+            _gas_specific_gravity (double): Gas' specific gravity (no unit).
+            _water_specific_gravity (double, optional): Water's specific
+                gravity (no unit).
+            _pressures (array, optional): Increasing table pressures
+                (:math:`psig`), 0 to 6000 every 200 by default.
+
+        Returns:
+            A `BlackOilTable`.
+        """
+        pressures = (np.linspace(0.0, 6000.0, 31) if _pressures is None
+                     else np.asarray(_pressures, dtype=float))
+        oil_specific_gravity = formulas.specific_gravity_from_api(
+            _oil_api_gravity)
+
+        bubble_points = pressures[:, None]
+        branch = bubble_points + (pressures - pressures[0])
+        rso = vectorized.gas_solubility_in_oil(bubble_points,
+                                               bubble_points,
+                                               _temperature,
+                                               _gas_specific_gravity,
+                                               _oil_api_gravity)
+        factors = vectorized.oil_formation_volume_factor(
+            branch,
+            bubble_points,
+            _temperature,
+            rso,
+            _gas_specific_gravity,
+            oil_specific_gravity,
+            vectorized.oil_compressibility(branch,
+                                           bubble_points,
+                                           _temperature,
+                                           rso,
+                                           _gas_specific_gravity,
+                                           _oil_api_gravity)
+        )
+        viscosities = vectorized.live_oil_viscosity(branch,
+                                                    bubble_points,
+                                                    _temperature,
+                                                    rso,
+                                                    _oil_api_gravity)
+        oil = [(rso[i, 0], branch[i], factors[i], viscosities[i])
+               for i in range(pressures.size)]
+
+        gas_factors = vectorized.gas_formation_volume_factor(
+            pressures, _temperature, _gas_specific_gravity, False)
+        gas_viscosities = vectorized.gas_viscosity(
+            _temperature,
+            _gas_specific_gravity,
+            formulas.gas_density(_gas_specific_gravity, gas_factors, False)
+        )
+
+        def water(_pressure):
+            rsw = correlations.gas_solubility_in_water(0.0, 0.0, _temperature)
+            factor = correlations.water_formation_volume_factor(
+                _pressure,
+                0.0,
+                _temperature,
+                correlations.water_compressibility(_pressure, 0.0,
+                                                   _temperature, rsw)
+            )
+            return factor, correlations.water_viscosity(_pressure,
+                                                        _temperature)
+
+        reference = float((pressures[0] + pressures[-1]) / 2)
+        factor, viscosity = water(reference)
+        below_factor, below_viscosity = water(reference - 1.0)
+        above_factor, above_viscosity = water(reference + 1.0)
+        compressibility = -np.log(above_factor / below_factor) / 2
+        viscosibility = np.log(above_factor * above_viscosity /
+                               (below_factor * below_viscosity)) / 2
+
+        return cls(oil,
+                   (pressures, gas_factors, gas_viscosities),
+                   (reference, factor, compressibility, viscosity,
+                    viscosibility),
+                   (WATER_DENSITY * oil_specific_gravity,
+                    WATER_DENSITY * _water_specific_gravity,
+                    AIR_DENSITY * _gas_specific_gravity),
+                   _temperature)
+
+    @classmethod
+    def from_keywords(cls, _keywords):
+        """
+        Builds the tables from parsed keywords (see `parse`) in FIELD units.
+        Only the first region of every keyword is used.
+        """
+        missing = [name for name in ("PVTO", "PVDG", "PVTW")
+                   if not _keywords.get(name)]
+        if missing:
+            raise ValueError("Missing PVT keywords: {}.".format(
+                ", ".join(missing)))
+        oil = []
+        for record in _keywords["PVTO"]:
+            if not record:
+                break
+            if (len(record) - 1) % 3:
+                raise ValueError("Incomplete PVTO record: {}.".format(record))
+            rows = np.asarray(record[1:], dtype=float).reshape(-1, 3)
+            oil.append((record[0] * SCF_PER_MSCF,
+                        rows[:, 0] - ATMOSPHERIC_PRESSURE,
+                        rows[:, 1],
+                        rows[:, 2]))
+        record = _keywords["PVDG"][0]
+        if len(record) % 3:
+            raise ValueError("Incomplete PVDG record.")
+        rows = np.asarray(record, dtype=float).reshape(-1, 3)
+        gas = (rows[:, 0] - ATMOSPHERIC_PRESSURE,
+               rows[:, 1] / SCF_PER_MSCF,
+               rows[:, 2])
+        record = list(_keywords["PVTW"][0]) + [0.0] * 5
+        water = (record[0] - ATMOSPHERIC_PRESSURE,) + tuple(record[1:5])
+        densities = _keywords.get("DENSITY")
+        return cls(oil, gas, water, densities[0] if densities else None)
+
+    def keywords(self):
+        """
+        Returns the tables as keyword records in FIELD units (the inverse of
+        `from_keywords`).
+        """
+        pvto = []
+        for ratio, pressures, factors, viscosities in self.oil:
+            rows = np.column_stack([pressures + ATMOSPHERIC_PRESSURE,
+                                    factors,
+                                    viscosities])
+            pvto.append([ratio / SCF_PER_MSCF] + rows.ravel().tolist())
+        pressures, factors, viscosities = self.gas
+        pvdg = np.column_stack([pressures + ATMOSPHERIC_PRESSURE,
+                                factors * SCF_PER_MSCF,
+                                viscosities]).ravel().tolist()
+        water = list(self.water)
+        water[0] += ATMOSPHERIC_PRESSURE
+        keywords = {"PVTO": pvto, "PVDG": [pvdg], "PVTW": [water]}
+        if self.densities is not None:
+            keywords["DENSITY"] = [list(self.densities)]
+        return keywords
+
+    def dumps(self):
+        """
+        Returns the tables as simulator deck text (DENSITY, PVTW, PVDG and
+        PVTO keywords in FIELD units), which `parse` reads back.
+        """
+        keywords = self.keywords()
+        lines = ["-- Black-oil PVT tables (FIELD units)"]
+        if self.temperature is not None:
+            lines.append("-- Temperature: {:.10g} F".format(self.temperature))
+
+        def row(_values, _indent=""):
+            return _indent + " ".join("{:.10g}".format(value)
+                                      for value in _values)
+
+        if "DENSITY" in keywords:
+            lines += ["DENSITY", "-- oil water gas (lb/ft3)",
+                      row(keywords["DENSITY"][0]) + " /", ""]
+        lines += ["PVTW", "-- Pref Bw Cw Vw Cv",
+                  row(keywords["PVTW"][0]) + " /", ""]
+        lines += ["PVDG", "-- P Bg Vg"]
+        pvdg = keywords["PVDG"][0]
+        lines += [row(pvdg[i:i + 3]) for i in range(0, len(pvdg), 3)]
+        lines += ["/", "", "PVTO", "-- Rs P Bo Vo"]
+        for record in keywords["PVTO"]:
+            rows = [record[i:i + 3] for i in range(1, len(record), 3)]
+            lines.append(row([record[0]] + rows[0]))
+            lines += [row(values, " " * 17) for values in rows[1:]]
+            lines[-1] += " /"
+        lines += ["/", ""]
+        return "\n".join(lines)
+
+    def write(self, _path):
+        with open(_path, "w") as output:
+            output.write(self.dumps())
+
+
+def parse(_text):
+    """
+    Reads the records of simulator deck keywords: every keyword maps to its
+    list of records, each a list of numbers (a ``/`` ends a record and ``--``
+    starts a comment). The data of keywords other than `KEYWORDS` is
+    skipped; defaulted values (``n*``) are not supported.
+    """
+    keywords = {}
+    records = None
+    record = []
+    for line in _text.splitlines():
+        for token in line.split("--")[0].replace("/", " / ").split():
+            if token == "/":
+                if records is not None:
+                    records.append(record)
+                record = []
+                continue
+            try:
+                record.append(float(token))
+                continue
+            except ValueError:
+                pass
+            if "*" in token:
+                raise ValueError(
+                    "Defaulted values are not supported: {}.".format(token))
+            records = None
+            record = []
+            name = token.upper()
+            if name in KEYWORDS:
+                records = keywords.setdefault(name, [])
+    return keywords
+
+
+def read(_path):
+    """
+    Reads a `BlackOilTable` from a deck file with the PVTO, PVDG, PVTW and
+    (optionally) DENSITY keywords in FIELD units.
+    """
+    with open(_path) as deck:
+        return BlackOilTable.from_keywords(parse(deck.read()))
@@ -0,0 +1,333 @@
+"""
+Shared
+"""
+import functools
+import math
+import multiprocessing
+import weakref
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from . import batch
+from . import friction
+
+
+_ALIGNMENT = 64
+
+
+class SharedHandle:
+    """
+    Picklable reference to a `SharedArrays` block: the shared memory name,
+    the layout of its arrays and some plain metadata. This is all a task
+    message needs to carry.
+    """
+    def __init__(self, _name, _layout, _metadata=None):
+        self.name = _name
+        self.layout = _layout
+        self.metadata = _metadata or {}
+
+
+def _close(_memory):
+    try:
+        _memory.close()
+    except BufferError:
+        # Arrays still referenced elsewhere keep the mapping alive until
+        # they are garbage collected
+        pass
+
+
+def _unlink(_memory):
+    _close(_memory)
+    try:
+        _memory.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _open(_name):
+    """
+    Attaches to an existing block without registering it with the resource
+    tracker, which would otherwise destroy the owner's block when a worker
+    exits (or drop the owner's registration, shared after a fork).
+    """
+    try:
+        return shared_memory.SharedMemory(_name, track=False)
+    except TypeError:
+        # Python < 3.13 has no ``track`` argument
+        register = resource_tracker.register
+        resource_tracker.register = lambda *_args: None
+        try:
+            return shared_memory.SharedMemory(_name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedArrays:
+    """
+    Named NumPy arrays packed into a single `multiprocessing.shared_memory`
+    block. The creating process owns the block and counts its references
+    (`acquire`, `release`); the block is unlinked when the count drops to
+    zero, when the owner is garbage collected or exits, and, if the owner
+    crashes, by the multiprocessing resource tracker. Other processes
+    `attach` to it by name and read the arrays without copying them.
+
+    Use `create` rather than the constructor.
+    """
+    def __init__(self, _memory, _layout, _metadata, _owner, _writable=()):
+        self.memory = _memory
+        self.layout = _layout
+        self.metadata = _metadata
+        self.owner = _owner
+        self.references = 1
+        self.arrays = {}
+        for name, dtype, shape, offset in _layout:
+            array = np.ndarray(shape, dtype=np.dtype(dtype),
+                               buffer=_memory.buf, offset=offset)
+            if not _owner and name not in _writable:
+                array.flags.writeable = False
+            self.arrays[name] = array
+        if _owner:
+            self._finalizer = weakref.finalize(self, _unlink, _memory)
+
+    @classmethod
+    def create(cls, _arrays, _metadata=None):
+        """
+        Copies arrays into a new shared block.
+
+        Args:
+            _arrays (dict): Arrays keyed by name.
+            _metadata (dict, optional): Plain picklable values carried by
+                the `handle`.
+
+        Returns:
+            The owning `SharedArrays`, with one reference.
+        """
+        layout = []
+        size = 0
+        arrays = {name: np.ascontiguousarray(values)
+                  for name, values in _arrays.items()}
+        for name, values in arrays.items():
+            size = -(-size // _ALIGNMENT) * _ALIGNMENT
+            layout.append((name, values.dtype.str, values.shape, size))
+            size += values.nbytes
+        memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        shared = cls(memory, tuple(layout), dict(_metadata or {}), True)
+        for name, values in arrays.items():
+            shared.arrays[name][...] = values
+        return shared
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    @property
+    def handle(self):
+        return SharedHandle(self.memory.name, self.layout, self.metadata)
+
+    @property
+    def nbytes(self):
+        return self.memory.size
+
+    def __getitem__(self, _name):
+        return self.arrays[_name]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exception):
+        self.release()
+
+    def acquire(self):
+        """
+        Adds a reference to the block.
+        """
+        self.references += 1
+        return self
+
+    def release(self):
+        """
+        Drops a reference. The last one closes the block (and unlinks it if
+        this process owns it).
+        """
+        self.references -= 1
+        if self.references <= 0:
+            self.close()
+
+    def close(self):
+        self.arrays = {}
+        if self.owner:
+            self._finalizer()
+        else:
+            _close(self.memory)
+
+
+_ATTACHED = {}
+
+_FRICTION_TABLES = {}
+
+_CATALOGS = {}
+
+
+def attach(_handle):
+    """
+    Attaches to a shared block. Blocks stay attached in this process (one
+    mapping per block, however many tasks use it) until `detach`.
+
+    Returns:
+        A `SharedArrays` with read-only arrays.
+    """
+    shared = _ATTACHED.get(_handle.name)
+    if shared is None:
+        shared = SharedArrays(_open(_handle.name),
+                              _handle.layout,
+                              _handle.metadata,
+                              False,
+                              _handle.metadata.get("writable", ()))
+        _ATTACHED[_handle.name] = shared
+    return shared
+
+
+def detach(_name=None):
+    """
+    Closes the attached block ``_name``, or every attached block.
+    """
+    names = list(_ATTACHED) if _name is None else [_name]
+    for name in names:
+        _FRICTION_TABLES.pop(name, None)
+        _CATALOGS.pop(name, None)
+        shared = _ATTACHED.pop(name, None)
+        if shared is not None:
+            shared.close()
+
+
+def share_friction_table(_table):
+    """
+    Places a `friction.FrictionTable` in shared memory.
+    """
+    return SharedArrays.create(
+        {"c{}".format(i): column
+         for i, column in enumerate(_table.coefficients)},
+        {
+            "rugosity": _table.rugosity,
+            "tolerance": _table.tolerance,
+            "reynolds_min": _table.reynolds_min,
+            "reynolds_max": _table.reynolds_max,
+            "max_error": _table.max_error,
+            "points": _table.points,
+            "origin": _table.origin,
+            "inverse_step": _table.inverse_step,
+        }
+    )
+
+
+def attach_friction_table(_handle):
+    """
+    Returns a `friction.FrictionTable` whose coefficient arrays live in the
+    shared block (built once per process).
+    """
+    table = _FRICTION_TABLES.get(_handle.name)
+    if table is None:
+        shared = attach(_handle)
+        table = friction.FrictionTable.__new__(friction.FrictionTable)
+        table.__dict__.update(shared.metadata)
+        table.coefficients = tuple(shared["c{}".format(i)]
+                                   for i in range(4))
+        table.intervals = table.points - 1
+        # The scalar lookup reads Python floats
+        table._coefficients = list(zip(*(column.tolist()
+                                        for column in table.coefficients)))
+        _FRICTION_TABLES[_handle.name] = table
+    return table
+
+
+def share_batch(_batch, _outputs=()):
+    """
+    Places a `batch.WellBatch` and the fluid parameters of its catalog in
+    shared memory. The PVT source and bubble point settings of the catalog
+    are carried by the handle.
+
+    Args:
+        _batch (WellBatch): Wells to share.
+        _outputs (tuple, optional): Names of per well ``float`` output
+            arrays to allocate in the block, writable by the workers.
+    """
+    arrays = {"fluid": _batch.fluid}
+    arrays.update({name: getattr(_batch, name)
+                   for name in batch.WellBatch.FIELDS})
+    arrays.update({"fluid_" + name: values
+                   for name, values in _batch.catalog.arrays.items()})
+    arrays.update({name: np.full(len(_batch), np.nan) for name in _outputs})
+    catalog = _batch.catalog
+    return SharedArrays.create(arrays, {
+        "writable": tuple(_outputs),
+        "pvt": catalog.pvt,
+        "temperature_step": catalog.temperature_step,
+        "max_bubble_points": catalog.max_bubble_points,
+    })
+
+
+def attach_batch(_handle, _catalog=None):
+    """
+    Returns the shared `batch.WellBatch` of a handle. Its arrays are views
+    of the shared block. The fluid catalog is rebuilt from the shared fluid
+    parameters (with the PVT source of the shared batch) unless a
+    ``_catalog`` with the same fluids is given.
+    """
+    shared = attach(_handle)
+    if _catalog is None:
+        _catalog = batch.FluidCatalog(
+            shared.metadata.get("pvt"),
+            shared.metadata.get("temperature_step"),
+            shared.metadata.get("max_bubble_points", 1 << 18))
+        for fluid in zip(*(shared["fluid_" + name].tolist()
+                           for name in batch.FLUID_FIELDS)):
+            _catalog.add(*fluid)
+    wells = batch.WellBatch.__new__(batch.WellBatch)
+    wells.catalog = _catalog
+    wells.fluid = shared["fluid"]
+    for name in batch.WellBatch.FIELDS:
+        setattr(wells, name, shared[name])
+    return wells
+
+
+def _bottomhole_pressure_task(_handle, _segments, _range):
+    # Workers keep the catalog of each batch, with its bubble points
+    catalog = _CATALOGS.get(_handle.name)
+    wells = attach_batch(_handle, catalog)
+    _CATALOGS[_handle.name] = wells.catalog
+    start, stop = _range
+    output = attach(_handle)["bottomhole_pressure"]
+    output[start:stop] = wells.subset(slice(start, stop)).bottomhole_pressure(
+        _segments)
+
+
+def bottomhole_pressure(_batch, _segments=20, _processes=None,
+                        _chunk_size=1000):
+    """
+    Computes `batch.WellBatch.bottomhole_pressure` with a process pool. The
+    batch is shared once; each task message only holds the handle and a
+    ``(start, stop)`` range, and workers write their results straight into a
+    shared output array.
+
+    Returns:
+        The flowing bottomhole pressure of every well (:math:`psig`).
+    """
+    with share_batch(_batch, ("bottomhole_pressure",)) as shared:
+        task = functools.partial(_bottomhole_pressure_task, shared.handle,
+                                 _segments)
+        with multiprocessing.Pool(_processes) as pool:
+            for _ in pool.imap_unordered(task, chunks(len(_batch),
+                                                      _chunk_size)):
+                pass
+        return shared["bottomhole_pressure"].copy()
+
+
+def chunks(_size, _chunk_size):
+    """
+    Returns the ``(start, stop)`` ranges splitting ``_size`` items in
+    chunks.
+    """
+    return [(i * _chunk_size, min((i + 1) * _chunk_size, _size))
+            for i in range(math.ceil(_size / _chunk_size))]
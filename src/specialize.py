@@ -0,0 +1,390 @@
+"""
+Specialize
+"""
+import math
+
+from . import correlations
+from . import formulas
+
+
+_TEMPLATE = '''
+def pressure_gradient(_pressure,
+                      _temperature,
+                      _bubble_point,
+                      _liquid_flow_rate,
+                      _diameter,
+                      _inclination,
+                      _rugosity,
+                      _friction_table=None):
+    absolute_pressure = _pressure + 14.7
+    rankine = _temperature + 460
+    temperature_2 = _temperature ** 2
+    saturated = _pressure >= _bubble_point
+    above = _pressure > _bubble_point
+    if above:
+        solubility_pressure = _bubble_point + 14.7
+    else:
+        solubility_pressure = absolute_pressure
+
+    # Gas solubilities
+    rso = {gas_specific_gravity} * (
+        (solubility_pressure / 18.2 + 1.4) *
+        10 ** ({oil_api_term} - 0.00091 * _temperature)
+    ) ** 1.2048
+    temperature_3 = _temperature ** 3
+    term_a = (8.15839 -
+              6.12265e-2 * _temperature +
+              1.91663e-4 * temperature_2 -
+              2.1654e-7 * temperature_3)
+    term_b = (1.01021e-2 -
+              7.44241e-5 * _temperature +
+              3.05553e-7 * temperature_2 -
+              2.94883e-10 * temperature_3)
+    term_c = (-9.02505 +
+              0.130237 * _temperature -
+              8.53425e-4 * temperature_2 +
+              2.34122e-6 * temperature_3 -
+              2.37049e-9 * (_temperature ** 4)) * {ten_to_minus_7}
+    rsw = (term_a + term_b * solubility_pressure +
+           term_c * solubility_pressure ** 2)
+
+    # Gas formation volume factor (Papay Z factor)
+    reduced_ratio = (
+        (absolute_pressure / {pseudo_critical_pressure}) /
+        (rankine / {pseudo_critical_temperature})
+    )
+    deviation_factor = 1 - reduced_ratio * (0.3675 -
+                                            0.04188423 * reduced_ratio)
+    bg_ft = (0.028269 * rankine / absolute_pressure *
+             deviation_factor / {standard_deviation_factor})
+    bg_bbl = (0.00503475 * rankine / absolute_pressure *
+              deviation_factor / {standard_deviation_factor})
+
+    # Formation volume factors
+    oil_compressibility = 0.
+    water_compressibility = 0.
+    if saturated:
+        oil_compressibility = (
+            (-1433 + 5 * rso + 17.2 * _temperature -
+             {gas_compressibility_term} + {oil_compressibility_term}) /
+            (absolute_pressure * {ten_to_5})
+        )
+        water_compressibility = (
+            ((3.8546 - 1.34e-4 * absolute_pressure) +
+             (-0.01052 + 4.77e-7 * absolute_pressure) * _temperature +
+             (3.9267e-5 - 8.8e-10 * absolute_pressure) * temperature_2) *
+            (1 + 8.9e-3 * rsw) / 1e6
+        )
+    bo = 0.9759 + 12e-5 * (rso * {gravity_ratio} + 1.25 * _temperature) ** 1.2
+    if above:
+        bo = bo * math.exp(oil_compressibility * (_bubble_point - _pressure))
+    bw = (1.0 +
+          1.2e-4 * (_temperature - 60) +
+          1.0e-6 * (_temperature - 60) ** 2)
+    if saturated:
+        bw = bw - 3.33e-6 * (_bubble_point + 14.7)
+        bw = bw * math.exp(water_compressibility *
+                           (_bubble_point - _pressure))
+    else:
+        bw = bw - 3.33e-6 * absolute_pressure
+
+    # Densities
+    gas_density = {gas_density_term} / bg_ft
+    oil_density = (
+        ({oil_density_term} + {gas_solution_term} * rso * {oil_cut}) /
+        (5.615 * bo)
+    )
+    water_density = (
+        ({water_density_term} + {gas_solution_term} * rsw * {water_cut}) /
+        (5.615 * bw)
+    )
+
+    # Viscosities
+    dead_oil_viscosity = (
+        10 ** ({dead_oil_term} / (_temperature ** 1.163)) - 1
+    )
+    oil_viscosity = (10.715 *
+                     (rso + 100) ** (-0.515) *
+                     dead_oil_viscosity ** (5.44 * (rso + 150) ** (-0.338)))
+    if above:
+        oil_viscosity = (
+            oil_viscosity *
+            (absolute_pressure / (_bubble_point + 14.7)) ** (
+                2.6 * absolute_pressure ** 1.187 * math.exp(
+                    -11.513 - 8.98e-5 * absolute_pressure
+                )
+            )
+        )
+    water_viscosity = (
+        109.574 * _temperature ** (-1.12166) * (
+            0.9994 + 4.0295e-5 * absolute_pressure +
+            3.1062e-9 * absolute_pressure ** 2
+        )
+    )
+    x_exponent = 3.5 + 986 / rankine + {molecular_weight_term}
+    gas_viscosity = (
+        {gas_viscosity_term} * (rankine ** 1.5) /
+        ({gas_viscosity_denominator} + _temperature + 460) *
+        {ten_to_minus_4} * math.exp(
+            x_exponent * (gas_density / 62.4) ** (2.4 - 0.2 * x_exponent)
+        )
+    )
+
+    # Surface tension and free gas
+    oil_surface_tension = (
+        (1.17013 - 1.694e-3 * _temperature) * {surface_tension_term} * (
+            0.056379 + 0.94362 * math.exp(-3.8491e-3 * rso)
+        )
+    )
+    if saturated:
+        free_gas_liquid_ratio = 0
+    else:
+        free_gas_liquid_ratio = ({production_gas_liquid_ratio} -
+                                 rso * {oil_cut} -
+                                 rsw * {water_cut})
+
+    # Beggs and Brill gradient
+    area = math.pi * (_diameter / 12) ** 2
+    oil_velocity = 4 * (
+        {oil_cut} * _liquid_flow_rate * bo * 5.614583 / 86400
+    ) / area
+    gas_velocity = 4 * (
+        free_gas_liquid_ratio * _liquid_flow_rate * bg_bbl * 5.614583 / 86400
+    ) / area
+    water_velocity = 4 * (
+        {water_cut} * _liquid_flow_rate * bw * 5.614583 / 86400
+    ) / area
+    mixture_velocity = oil_velocity + gas_velocity + water_velocity
+    liquid_velocity = oil_velocity + water_velocity
+    no_slip = liquid_velocity / mixture_velocity
+    water_fraction = water_velocity / liquid_velocity
+    froude = 0.37267 * (mixture_velocity ** 2) / _diameter
+
+    fr1 = 316.0 * no_slip ** 0.302
+    fr2 = 0.0009252 * no_slip ** -2.4684
+    fr3 = 0.1 * no_slip ** -1.4516
+    fr4 = 0.5 * no_slip ** -6.738
+    if froude > fr1 or froude > fr4:
+        pattern = DISTRIBUTED
+        holdup = max(1.065 * no_slip ** 0.5824 / froude ** 0.0609, no_slip)
+    elif froude > fr3:
+        pattern = INTERMITTENT
+        holdup = max(0.845 * no_slip ** 0.5351 / froude ** 0.0173, no_slip)
+    elif froude > fr2:
+        pattern = TRANSITION
+        term_a = (fr3 - froude) / (fr3 - fr2)
+        holdup = max(
+            term_a * max(0.980 * no_slip ** 0.4846 / froude ** 0.0868,
+                         no_slip) +
+            (1 - term_a) * max(0.845 * no_slip ** 0.5351 /
+                               froude ** 0.0173, no_slip),
+            no_slip
+        )
+    else:
+        pattern = SEGREGATED
+        holdup = max(0.980 * no_slip ** 0.4846 / froude ** 0.0868, no_slip)
+
+    liquid_density = (oil_density * (1 - water_fraction) +
+                      water_density * water_fraction)
+    liquid_surface_tension = (oil_surface_tension * (1 - water_fraction) +
+                              {water_surface_tension} * water_fraction)
+    velocity_number = (1.938 * liquid_velocity *
+                       (liquid_density / liquid_surface_tension) ** 0.25)
+
+    inclination = _inclination * math.pi / 180
+    if _inclination < 0:
+        c_parameter = max(0, (1 - no_slip) * math.log(
+            4.700 * no_slip ** -0.3692 * velocity_number ** 0.1244 *
+            froude ** -0.5056
+        ))
+    elif pattern is SEGREGATED:
+        c_parameter = max(0, (1 - no_slip) * math.log(
+            0.011 * no_slip ** -3.7680 * velocity_number ** 3.5390 *
+            froude ** -1.6140
+        ))
+    elif pattern is INTERMITTENT:
+        c_parameter = max(0, (1 - no_slip) * math.log(
+            2.960 * no_slip ** 0.3050 * velocity_number ** -0.4473 *
+            froude ** 0.0978
+        ))
+    else:
+        c_parameter = 0
+    sine = math.sin(1.8 * inclination)
+    holdup = max({min_liquid_holdup}, min(1, holdup * (
+        1 + c_parameter * (sine - 0.333 * (sine ** 3))
+    )))
+
+    liquid_viscosity = (oil_viscosity * (1 - water_fraction) +
+                        water_viscosity * water_fraction)
+    gas_fraction = 1 - no_slip
+    viscosity_no_slip = (liquid_viscosity * (1 - gas_fraction) +
+                         gas_viscosity * gas_fraction)
+    density_no_slip = (liquid_density * (1 - gas_fraction) +
+                       gas_density * gas_fraction)
+    gas_holdup = 1 - holdup
+    density_holdup = (liquid_density * (1 - gas_holdup) +
+                      gas_density * gas_holdup)
+
+    reynolds = (124 * density_no_slip * abs(mixture_velocity) * _diameter /
+                viscosity_no_slip)
+    if _friction_table is None:
+        moody = 8 * (
+            (8 / reynolds) ** 12 +
+            1 / ((
+                (2.457 * math.log(
+                    1 / ((7 / reynolds) ** 0.9 + 0.27 * _rugosity)
+                )) ** 16 +
+                (37530 / reynolds) ** 16
+            ) ** 1.5)
+        ) ** {one_twelfth}
+    else:
+        moody = _friction_table(reynolds)
+    term_y = no_slip / (holdup ** 2)
+    if 1.0 <= term_y <= 1.2:
+        term_s = math.log(2.2 * term_y - 1.2)
+    else:
+        log_y = math.log(term_y)
+        term_s = log_y / (-0.0523 + 3.182 * log_y - 0.8725 * (log_y ** 2) +
+                          0.01853 * (log_y ** 4))
+    friction_factor = moody * math.exp(term_s)
+
+    gravitational = -0.433 * (density_holdup / 62.4) * math.sin(inclination)
+    mixture_flow_rate = (area * mixture_velocity / 4) * 86400 / 5.614583
+    frictional = (-1.1471e-5 * friction_factor * (density_no_slip / 62.4) *
+                  mixture_flow_rate ** 2 / (_diameter ** 5))
+    return gravitational, frictional, pattern
+'''
+
+
+def _constants(_oil_api_gravity,
+               _gas_specific_gravity,
+               _water_specific_gravity,
+               _water_cut,
+               _production_gas_liquid_ratio):
+    # Every constant is evaluated exactly as in `correlations` and
+    # `formulas`, so that the specialized chain rounds identically.
+    api = _oil_api_gravity
+    gas = _gas_specific_gravity
+    oil_specific_gravity = formulas.specific_gravity_from_api(api)
+    molecular_weight = 28.97 * gas
+    return {
+        "gas_specific_gravity": gas,
+        "oil_api_term": 0.0125 * api,
+        "ten_to_minus_7": 10 ** -7,
+        "ten_to_minus_4": 10 ** (-4),
+        "ten_to_5": 10 ** 5,
+        "pseudo_critical_temperature": 168. + 325. * gas - 12.5 * gas ** 2,
+        "pseudo_critical_pressure": 677. + 15.0 * gas - 37.5 * gas ** 2,
+        "standard_deviation_factor": correlations.gas_deviation_factor(
+            0, 60.0, gas
+        ),
+        "gas_compressibility_term": 1180 * gas,
+        "oil_compressibility_term": 12.61 * api,
+        "gravity_ratio": math.sqrt(gas / oil_specific_gravity),
+        "gas_density_term": 0.0764106 * gas,
+        "oil_density_term": 350 * oil_specific_gravity,
+        "water_density_term": 350 * _water_specific_gravity,
+        "gas_solution_term": 0.0764 * gas,
+        "oil_cut": 1 - _water_cut,
+        "water_cut": _water_cut,
+        "dead_oil_term": 10 ** (3.0324 - 0.02023 * api),
+        "molecular_weight_term": 0.01 * molecular_weight,
+        "gas_viscosity_term": 9.4 + 0.02 * molecular_weight,
+        "gas_viscosity_denominator": 209. + 19. * molecular_weight,
+        "surface_tension_term": 38.085 - 0.259 * api,
+        "water_surface_tension": correlations.water_gas_surface_tension(),
+        "production_gas_liquid_ratio": _production_gas_liquid_ratio,
+        "one_twelfth": 1 / 12,
+        "min_liquid_holdup": formulas.MIN_LIQUID_HOLDUP,
+    }
+
+
+def generate(_oil_api_gravity,
+             _gas_specific_gravity,
+             _water_specific_gravity,
+             _water_cut,
+             _production_gas_liquid_ratio):
+    """
+    Generates the source of a `traverse.pressure_gradient` specialized for
+    one fluid. Every subexpression that only depends on the fluid is folded
+    into a literal and the ones shared between properties (e.g.
+    ``_pressure + 14.7``, the Papay Z factor, the pipe area or the
+    transition Froude numbers) are evaluated once. The operations keep the
+    order of `correlations` and `formulas`, hence the results are identical
+    to the generic chain.
+
+    Returns:
+        The Python source of a ``pressure_gradient(_pressure, _temperature,
+        _bubble_point, _liquid_flow_rate, _diameter, _inclination, _rugosity,
+        _friction_table=None)`` function.
+    """
+    constants = _constants(_oil_api_gravity,
+                           _gas_specific_gravity,
+                           _water_specific_gravity,
+                           _water_cut,
+                           _production_gas_liquid_ratio)
+    return _TEMPLATE.format(**{
+        name: "({!r})".format(float(value))
+        for name, value in constants.items()
+    })
+
+
+def compile_kernel(_oil_api_gravity,
+                   _gas_specific_gravity,
+                   _water_specific_gravity,
+                   _water_cut,
+                   _production_gas_liquid_ratio):
+    """
+    Compiles the source from `generate`. The returned function takes the
+    arguments of `traverse.pressure_gradient` except the fluid ones, returns
+    the same ``(gravitational, frictional, flow_pattern)`` tuple and keeps
+    its source in the ``source`` attribute.
+    """
+    source = generate(_oil_api_gravity,
+                      _gas_specific_gravity,
+                      _water_specific_gravity,
+                      _water_cut,
+                      _production_gas_liquid_ratio)
+    namespace = {
+        "math": math,
+        "DISTRIBUTED": formulas.FlowPattern.distributed,
+        "INTERMITTENT": formulas.FlowPattern.intermittent,
+        "TRANSITION": formulas.FlowPattern.transition,
+        "SEGREGATED": formulas.FlowPattern.segregated,
+    }
+    exec(compile(source, "<specialized pressure_gradient>", "exec"),
+         namespace)
+    kernel = namespace["pressure_gradient"]
+    kernel.source = source
+    return kernel
+
+
+_KERNELS = {}
+
+
+def kernel(_oil_api_gravity,
+           _gas_specific_gravity,
+           _water_specific_gravity,
+           _water_cut,
+           _production_gas_liquid_ratio):
+    """
+    Returns the cached specialized gradient of a fluid (see
+    `compile_kernel`), compiling it on first use.
+    """
+    key = (float(_oil_api_gravity),
+           float(_gas_specific_gravity),
+           float(_water_specific_gravity),
+           float(_water_cut),
+           float(_production_gas_liquid_ratio))
+    function = _KERNELS.get(key)
+    if function is None:
+        function = compile_kernel(*key)
+        _KERNELS[key] = function
+    return function
+
+
+def clear_kernels():
+    """
+    Drops every cached specialized gradient.
+    """
+    _KERNELS.clear()
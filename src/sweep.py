@@ -0,0 +1,258 @@
+"""
+Sweep
+"""
+import functools
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+
+import numpy as np
+
+from . import cache
+
+
+JOURNAL = "journal.jsonl"
+
+
+def _fingerprint(_axes, _unit_size, _model):
+    """
+    Hashes everything that determines the work units and their results, so a
+    journal is never resumed by a different sweep.
+    """
+    model = dict(vars(_model)) if hasattr(_model, "__dict__") else {}
+    # A PVT source is described by its contents, not its identity
+    if model.get("pvt") is not None:
+        model["pvt"] = cache.canonical(model["pvt"])
+    else:
+        model.pop("pvt", None)
+    description = json.dumps({
+        "axes": {name: np.asarray(values, dtype=float).tolist()
+                 for name, values in _axes.items()},
+        "unit_size": _unit_size,
+        "model": type(_model).__qualname__,
+        "parameters": repr(sorted(model.items())),
+    }, sort_keys=True)
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+def _atomic_write(_path, _write):
+    """
+    Writes a file through a temporary file in the same directory that
+    replaces ``_path`` only once it is complete and on disk.
+    """
+    directory = os.path.dirname(os.path.abspath(_path))
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as output:
+            _write(output)
+            output.flush()
+            os.fsync(output.fileno())
+        os.replace(temporary, _path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _append_line(_path, _record):
+    """
+    Appends a record as a JSON line. A line left incomplete by a crash is
+    terminated first, so the record never gets glued to it.
+    """
+    line = (json.dumps(_record, sort_keys=True) + "\n").encode()
+    descriptor = os.open(_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        size = os.fstat(descriptor).st_size
+        if size and os.pread(descriptor, 1, size - 1) != b"\n":
+            line = b"\n" + line
+        os.write(descriptor, line)
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def read_journal(_directory):
+    """
+    Reads a sweep journal, skipping the lines left incomplete by a crash.
+
+    Returns:
+        A tuple ``(header, units)`` with the header record (None if there is
+        no journal yet) and a dict of the completed unit records keyed by
+        unit index.
+    """
+    path = os.path.join(_directory, JOURNAL)
+    header = None
+    units = {}
+    if not os.path.exists(path):
+        return header, units
+    with open(path, "rb") as journal:
+        for line in journal:
+            if not line.endswith(b"\n"):
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if header is None:
+                header = record
+            else:
+                units[record["unit"]] = record
+    return header, units
+
+
+def read_results(_directory):
+    """
+    Loads the results of every completed unit of a sweep, which may still be
+    running, in unit order.
+
+    Returns:
+        A dict of arrays: the flat grid ``index`` of every point, its input
+        values and the model outputs.
+    """
+    _, units = read_journal(_directory)
+    parts = []
+    for unit in sorted(units):
+        path = os.path.join(_directory, units[unit]["file"])
+        with np.load(path) as data:
+            parts.append({name: data[name] for name in data.files})
+    if not parts:
+        return {}
+    return {name: np.concatenate([part[name] for part in parts])
+            for name in parts[0]}
+
+
+def unit_inputs(_axes, _unit_size, _unit):
+    """
+    Returns the grid points of a work unit: a contiguous range of the flat
+    (C ordered) index of the cartesian product of the axes.
+    """
+    shape = tuple(len(values) for values in _axes.values())
+    size = math.prod(shape)
+    index = np.arange(_unit * _unit_size, min((_unit + 1) * _unit_size, size))
+    positions = np.unravel_index(index, shape)
+    inputs = {
+        name: np.asarray(values, dtype=float)[position]
+        for (name, values), position in zip(_axes.items(), positions)
+    }
+    inputs["index"] = index
+    return inputs
+
+
+def evaluate_unit(_axes, _unit_size, _model, _unit):
+    """
+    Evaluates a work unit, returning ``(unit, results)``.
+    """
+    inputs = unit_inputs(_axes, _unit_size, _unit)
+    samples = {name: values for name, values in inputs.items()
+               if name != "index"}
+    results = dict(inputs)
+    results.update(_model(samples))
+    return _unit, results
+
+
+class Sweep:
+    """
+    Checkpointed sweep of a vectorized model (see `monte_carlo.WellModel`)
+    over the cartesian product of some input axes.
+
+    The grid is split into deterministic work units of ``_unit_size``
+    consecutive points. Each finished unit is saved to its own ``.npz`` file
+    (written atomically) and then recorded in an append-only journal, so an
+    interrupted sweep resumes with `run` skipping every recorded unit, and
+    `results` (or `read_results` from another process) returns the completed
+    part at any time. The first journal line identifies the sweep; resuming
+    a directory that holds a different sweep raises `ValueError`.
+
+    Args:
+        _directory (str): Directory of the journal and unit files. It is
+            created if needed.
+        _axes (dict): 1-D array of values of each swept input, keyed by the
+            model parameter name.
+        _model (callable): Receives a dict of input arrays and returns a dict
+            of output arrays.
+        _unit_size (int, optional): Number of grid points per work unit.
+    """
+    def __init__(self, _directory, _axes, _model, _unit_size=1000):
+        self.directory = _directory
+        self.axes = dict(_axes)
+        self.model = _model
+        self.unit_size = _unit_size
+        self.size = math.prod(len(values) for values in self.axes.values())
+        self.units = math.ceil(self.size / _unit_size)
+        self.fingerprint = _fingerprint(self.axes, _unit_size, _model)
+
+        os.makedirs(_directory, exist_ok=True)
+        header, _ = read_journal(_directory)
+        if header is None:
+            _append_line(self._journal, {
+                "fingerprint": self.fingerprint,
+                "size": self.size,
+                "units": self.units,
+            })
+        elif header.get("fingerprint") != self.fingerprint:
+            raise ValueError(
+                "{} holds the journal of a different sweep.".format(
+                    _directory))
+
+    @property
+    def _journal(self):
+        return os.path.join(self.directory, JOURNAL)
+
+    def completed(self):
+        """
+        Returns the sorted indexes of the completed units.
+        """
+        return sorted(read_journal(self.directory)[1])
+
+    def pending(self):
+        """
+        Returns the sorted indexes of the units left to evaluate.
+        """
+        completed = set(self.completed())
+        return [unit for unit in range(self.units) if unit not in completed]
+
+    def _record(self, _unit, _results):
+        name = "unit-{:06d}.npz".format(_unit)
+        _atomic_write(os.path.join(self.directory, name),
+                      lambda output: np.savez(output, **_results))
+        _append_line(self._journal, {
+            "unit": _unit,
+            "file": name,
+            "rows": int(_results["index"].size),
+        })
+
+    def run(self, _processes=None, _max_units=None):
+        """
+        Evaluates the pending units, recording each one as soon as it is
+        done.
+
+        Args:
+            _processes (int, optional): If given, units are evaluated by a
+                process pool of this size (the model must be picklable).
+                Only this process writes the journal.
+            _max_units (int, optional): Stops after this many units.
+
+        Returns:
+            The number of units evaluated.
+        """
+        units = self.pending()[:_max_units]
+        evaluate = functools.partial(evaluate_unit,
+                                     self.axes,
+                                     self.unit_size,
+                                     self.model)
+        if _processes is None:
+            for unit in units:
+                self._record(*evaluate(unit))
+        else:
+            with multiprocessing.Pool(_processes) as pool:
+                for unit, results in pool.imap_unordered(evaluate, units):
+                    self._record(unit, results)
+        return len(units)
+
+    def results(self):
+        """
+        Returns the results of the completed units (see `read_results`).
+        """
+        return read_results(self.directory)
@@ -0,0 +1,205 @@
+"""
+Terrain
+"""
+import math
+import time
+
+import numpy as np
+
+from . import traverse
+
+
+class TerrainProfile:
+    """
+    Flowline elevation profile given as (distance, elevation) points, e.g.
+    exported from a GIS survey. Every pair of consecutive points is a
+    straight segment whose length is measured along the pipe and whose
+    inclination is taken along the flow (from the first point towards the
+    last), so descending segments have negative inclinations and get the
+    `FlowPattern.downward` holdup in the traverse. ``lengths`` and
+    ``inclinations`` can also be given to `network.Network.add_pipe`.
+
+    Args:
+        _distances (list): Horizontal distance of each point (:math:`ft`),
+            strictly increasing.
+        _elevations (list): Elevation of each point (:math:`ft`).
+    """
+    def __init__(self, _distances, _elevations):
+        distances = np.asarray(_distances, dtype=float)
+        elevations = np.asarray(_elevations, dtype=float)
+        if distances.ndim != 1 or distances.shape != elevations.shape:
+            raise ValueError("Profile needs one elevation per distance.")
+        if distances.size < 2:
+            raise ValueError("Profile needs at least two points.")
+        if np.any(np.diff(distances) <= 0):
+            raise ValueError("Profile distances must be strictly increasing.")
+        self.distances = distances
+        self.elevations = elevations
+
+        run = np.diff(distances)
+        rise = np.diff(elevations)
+        self.lengths = np.hypot(run, rise)
+        self.inclinations = np.degrees(np.arctan2(rise, run))
+
+    @property
+    def segments(self):
+        """
+        Number of segments in the profile.
+        """
+        return self.lengths.size
+
+    @property
+    def length(self):
+        """
+        Total pipe length (:math:`ft`).
+        """
+        return float(self.lengths.sum())
+
+    def compress(self, _tolerance=0.5):
+        """
+        Returns a profile with fewer points. Consecutive segments are merged
+        into one chord while the inclination of each of them differs from the
+        chord's by less than ``_tolerance`` degrees and has the same sign, so
+        uphill, horizontal and downhill stretches are never mixed. Kept points
+        belong to the original profile, hence the total elevation change is
+        unchanged.
+
+        Args:
+            _tolerance (double, optional): Largest inclination difference
+                (degrees) inside a merged segment.
+
+        Returns:
+            A `TerrainProfile`.
+        """
+        distances = self.distances.tolist()
+        elevations = self.elevations.tolist()
+        inclinations = self.inclinations.tolist()
+        signs = np.sign(self.inclinations).tolist()
+        kept = [0]
+        start = 0
+        lowest = highest = inclinations[0]
+        for end in range(1, self.segments):
+            low = min(lowest, inclinations[end])
+            high = max(highest, inclinations[end])
+            chord = math.degrees(math.atan2(
+                elevations[end + 1] - elevations[start],
+                distances[end + 1] - distances[start]
+            ))
+            if (signs[end] == signs[start] and
+                    high - chord < _tolerance and chord - low < _tolerance):
+                lowest, highest = low, high
+            else:
+                kept.append(end)
+                start = end
+                lowest = highest = inclinations[end]
+        kept.append(self.segments)
+        return TerrainProfile(self.distances[kept], self.elevations[kept])
+
+    def traverse(self,
+                 _pressure,
+                 _inlet_temperature,
+                 _outlet_temperature,
+                 _oil_api_gravity,
+                 _gas_specific_gravity,
+                 _water_specific_gravity,
+                 _water_cut,
+                 _production_gas_liquid_ratio,
+                 _liquid_flow_rate,
+                 _diameter,
+                 _rugosity,
+                 _tolerance=1e-3,
+                 _max_iterations=20,
+                 _friction_table=None,
+                 _pvt=None):
+        """
+        Marches `traverse.traverse` along the profile, from its first point
+        (inlet) to its last. The temperature varies linearly with the pipe
+        length between ``_inlet_temperature`` and ``_outlet_temperature``
+        (fahrenheit degrees). Remaining arguments are those of
+        `traverse.traverse`.
+
+        Returns:
+            A tuple ``(pressures, flow_patterns)`` with the pressure at every
+            profile point and the flow pattern of every segment.
+        """
+        position = np.concatenate(([0.0], np.cumsum(self.lengths)))
+        temperatures = (
+            _inlet_temperature +
+            (_outlet_temperature - _inlet_temperature) *
+            position / position[-1]
+        )
+        return traverse.traverse(
+            _pressure,
+            self.lengths.tolist(),
+            self.inclinations.tolist(),
+            temperatures.tolist(),
+            _oil_api_gravity,
+            _gas_specific_gravity,
+            _water_specific_gravity,
+            _water_cut,
+            _production_gas_liquid_ratio,
+            _liquid_flow_rate,
+            _diameter,
+            _rugosity,
+            _tolerance=_tolerance,
+            _max_iterations=_max_iterations,
+            _friction_table=_friction_table,
+            _pvt=_pvt
+        )
+
+
+class CompressionReport:
+    """
+    Cost and accuracy of traversing a compressed `TerrainProfile` instead of
+    the original one.
+
+    Attributes:
+        original_segments (int): Segments in the original profile.
+        compressed_segments (int): Segments in the compressed profile.
+        savings (double): Fraction of segment evaluations avoided.
+        original_pressure (double): Outlet pressure along the original
+            profile (:math:`psig`).
+        compressed_pressure (double): Outlet pressure along the compressed
+            profile (:math:`psig`).
+        pressure_error (double): ``compressed_pressure - original_pressure``
+            (:math:`psi`).
+        original_time (double): Original traverse wall time (s).
+        compressed_time (double): Compressed traverse wall time (s).
+    """
+    def __init__(self, _original_segments, _compressed_segments,
+                 _original_pressure, _compressed_pressure,
+                 _original_time, _compressed_time):
+        self.original_segments = _original_segments
+        self.compressed_segments = _compressed_segments
+        self.savings = 1 - _compressed_segments / _original_segments
+        self.original_pressure = _original_pressure
+        self.compressed_pressure = _compressed_pressure
+        self.pressure_error = _compressed_pressure - _original_pressure
+        self.original_time = _original_time
+        self.compressed_time = _compressed_time
+
+
+def compression_report(_profile, _tolerance, *_args, **_kwargs):
+    """
+    Traverses ``_profile`` before and after `TerrainProfile.compress` with
+    ``_tolerance`` and compares them. Remaining arguments are passed to
+    `TerrainProfile.traverse`.
+
+    Returns:
+        A `CompressionReport`.
+    """
+    compressed = _profile.compress(_tolerance)
+    start = time.perf_counter()
+    original_pressures, _ = _profile.traverse(*_args, **_kwargs)
+    original_time = time.perf_counter() - start
+    start = time.perf_counter()
+    compressed_pressures, _ = compressed.traverse(*_args, **_kwargs)
+    compressed_time = time.perf_counter() - start
+    return CompressionReport(
+        _profile.segments,
+        compressed.segments,
+        original_pressures[-1],
+        compressed_pressures[-1],
+        original_time,
+        compressed_time
+    )
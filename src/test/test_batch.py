@@ -0,0 +1,138 @@
+"""
+Batch test
+"""
+
+import numpy as np
+import pytest
+from src import batch
+from src import correlations
+from src import deviation
+from src import traverse
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    catalog = batch.FluidCatalog()
+    catalog.add(30., 0.75, 1.07, 0.3, 600.)
+    catalog.add(22., 0.65, 1.02, 0.0, 150.)
+    catalog.add(40., 0.85, 1.10, 0.6, 1200.)
+    return catalog
+
+
+@pytest.fixture(scope="module")
+def wells(catalog):
+    rng = np.random.default_rng(5)
+    size = 300
+    return batch.WellBatch(catalog,
+                           rng.integers(0, 3, size),
+                           rng.uniform(100., 300., size),
+                           100.,
+                           rng.choice([170., 190.], size),
+                           rng.uniform(4000., 8000., size),
+                           2.441,
+                           rng.uniform(300., 2000., size))
+
+
+def test_catalog_deduplicates(catalog):
+    assert catalog.add(30., 0.75, 1.07, 0.3, 600.) == 0
+    assert len(catalog) == 3
+    assert catalog.fluid(1)["oil_api_gravity"] == 22.
+    gathered = catalog.gather(np.array([2, 0, 2]))
+    assert list(gathered["water_cut"]) == [0.6, 0.3, 0.6]
+
+
+def test_structure_of_arrays(wells):
+    assert len(wells) == 300
+    assert wells.fluid.dtype == np.int32
+    for name in batch.WellBatch.FIELDS:
+        values = getattr(wells, name)
+        assert values.shape == (300,)
+        assert values.flags.c_contiguous
+    subset = wells.subset(wells.fluid == 1)
+    assert (subset.fluid == 1).all()
+    assert subset.catalog is wells.catalog
+
+
+def test_bubble_points_once_per_fluid_and_temperature(catalog):
+    catalog = batch.FluidCatalog()
+    for fluid in range(4):
+        catalog.add(25. + fluid, 0.7)
+    indexes = np.repeat(np.arange(4), 1000)
+    temperatures = np.tile([120., 150.], 2000)
+    values = catalog.bubble_points(indexes, temperatures)
+    assert catalog.bubble_point_evaluations == 8
+    assert values[1] == pytest.approx(correlations.mixture_bubble_point(
+        150., 0.7, 25., 0.0, 100.))
+    catalog.bubble_points(indexes[:10], temperatures[:10])
+    assert catalog.bubble_point_evaluations == 8
+
+
+def test_bubble_points_bounded():
+    catalog = batch.FluidCatalog(_max_bubble_points=100)
+    catalog.add(25., 0.7)
+    temperatures = np.linspace(100., 200., 80)
+    catalog.bubble_points(0, temperatures)
+    catalog.bubble_points(0, temperatures[:10])
+    assert catalog.bubble_point_evaluations == 80
+    # Exceeding the bound replaces the kept pairs with those of the call
+    values = catalog.bubble_points(0, temperatures + 0.5)
+    assert catalog.bubble_point_evaluations == 160
+    catalog.bubble_points(0, temperatures[:10])
+    assert catalog.bubble_point_evaluations == 170
+    assert values[3] == pytest.approx(correlations.mixture_bubble_point(
+        temperatures[3] + 0.5, 0.7, 25., 0.0, 100.))
+
+
+def test_bubble_points_temperature_step():
+    catalog = batch.FluidCatalog(_temperature_step=0.5)
+    catalog.add(25., 0.7)
+    values = catalog.bubble_points(0, [120.1, 119.9, 120.2, 135.3])
+    assert catalog.bubble_point_evaluations == 2
+    assert values[0] == values[2] == pytest.approx(
+        correlations.mixture_bubble_point(120., 0.7, 25., 0.0, 100.))
+    assert values[3] == pytest.approx(correlations.mixture_bubble_point(
+        135.5, 0.7, 25., 0.0, 100.))
+
+
+def test_traverse_matches_scalar(wells, catalog):
+    pressures, patterns = wells.traverse(10)
+    assert pressures.shape == (300, 11)
+    assert patterns.shape == (300, 10)
+    for i in range(0, 300, 37):
+        fluid = catalog.fluid(wells.fluid[i])
+        expected = traverse.bottomhole_pressure(
+            wells.wellhead_pressure[i], 100., wells.bottomhole_temperature[i],
+            wells.depth[i], *fluid.values(), wells.liquid_flow_rate[i],
+            2.441, 0.0006, 10)
+        assert pressures[i, -1] == pytest.approx(expected, rel=1e-9)
+
+
+def test_invalid_fluid_index(catalog):
+    with pytest.raises(IndexError):
+        batch.WellBatch(catalog, [0, 3], 150., 100., 180., 6000., 2.441,
+                        1000.)
+
+
+def test_kernel(catalog):
+    kernel = catalog.kernel(0)
+    expected = traverse.pressure_gradient(1000., 150., 2000., 30., 0.75,
+                                          1.07, 0.3, 600., 1000., 2.441, 90.,
+                                          0.0006)
+    assert kernel(1000., 150., 2000., 1000., 2.441, 90., 0.0006) == expected
+
+
+def test_pvt_source():
+    source = deviation.DeviationPVT("hall_yarborough")
+    catalog = batch.FluidCatalog(source)
+    catalog.add(30., 0.75, 1.07, 0.3, 600.)
+    wells = batch.WellBatch(catalog, [0, 0], 150., 100., 180.,
+                            [5000., 7000.], 2.441, 1000.)
+    pressures, _ = wells.traverse(10)
+    for i, depth in enumerate((5000., 7000.)):
+        expected = traverse.bottomhole_pressure(150., 100., 180., depth, 30.,
+                                                0.75, 1.07, 0.3, 600.,
+                                                1000., 2.441, 0.0006, 10,
+                                                source)
+        assert pressures[i, -1] == pytest.approx(expected, rel=1e-6)
+    with pytest.raises(ValueError):
+        catalog.kernel(0)
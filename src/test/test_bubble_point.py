@@ -0,0 +1,107 @@
+"""
+Bubble point test
+"""
+
+import numpy as np
+import pytest
+from src import bubble_point
+from src import correlations
+from src import vectorized
+
+
+@pytest.fixture(scope="module")
+def table():
+    # A well-test table: 3 fluids, 3 temperatures and dense ratios
+    rng = np.random.default_rng(7)
+    size = 3000
+    fluid = rng.integers(3, size=size)
+    return (rng.choice([120., 150., 180.], size),
+            np.array([0.65, 0.75, 0.9])[fluid],
+            np.array([22., 33., 45.])[fluid],
+            np.array([0., 0.3, 0.8])[fluid],
+            rng.uniform(20., 2500., size))
+
+
+def test_solubility_derivative():
+    pressure = np.array([0., 500., 3000., 20000.])
+    _, derivative = bubble_point.solubility(pressure, 150., 0.7, 30., 0.4)
+    upper, _ = bubble_point.solubility(pressure + 1e-3, 150., 0.7, 30., 0.4)
+    lower, _ = bubble_point.solubility(pressure - 1e-3, 150., 0.7, 30., 0.4)
+    np.testing.assert_allclose(derivative, (upper - lower) / 2e-3, rtol=1e-6)
+
+
+def test_matches_bisection(table):
+    solver = bubble_point.OrderedBubblePoints()
+    result = solver.solve(*table)
+    expected = vectorized.mixture_bubble_point(*table)
+    np.testing.assert_allclose(result, expected, rtol=1e-11, atol=1e-8)
+    assert solver.statistics["rows"] == 3000
+    assert solver.statistics["groups"] == 9
+    assert solver.statistics["iterations"] < 3 * 3000
+    assert solver.speedup > 10
+
+
+def test_naive_iterations(monkeypatch, table):
+    solver = bubble_point.OrderedBubblePoints()
+    solver.solve(*table)
+    evaluations = []
+    solubility = vectorized.gas_solubility_in_oil
+    monkeypatch.setattr(
+        vectorized, "gas_solubility_in_oil",
+        lambda *_arguments: evaluations.append(np.size(_arguments[0])) or
+        solubility(*_arguments))
+    vectorized.mixture_bubble_point(*table)
+    assert solver.statistics["naive_iterations"] == pytest.approx(
+        sum(evaluations), rel=0.05)
+
+
+def test_repeated_rows_are_nearly_free(table):
+    solver = bubble_point.OrderedBubblePoints()
+    solver.solve(*table)
+    iterations = solver.statistics["iterations"]
+    solver.reset()
+    result = solver.solve(*(np.tile(column, 3) for column in table))
+    assert solver.statistics["iterations"] < 1.01 * iterations
+    np.testing.assert_array_equal(result[:3000], result[3000:6000])
+
+
+def test_outside_the_bracket():
+    ratio = np.array([-10., 0., 1., 50., 500., 1e5, 1e7])
+    for water_cut in (0., 0.5, 1.):
+        result = bubble_point.mixture_bubble_point(150., 0.7, 30., water_cut,
+                                                   ratio)
+        expected = vectorized.mixture_bubble_point(
+            np.full(ratio.size, 150.), 0.7, 30., water_cut, ratio)
+        np.testing.assert_allclose(result, expected, rtol=1e-11, atol=1e-8)
+
+
+def test_high_water_cut():
+    # The solubility falls back below these ratios at the top of the
+    # bracket, which holds two bubble points
+    rng = np.random.default_rng(3)
+    size = 2000
+    table = (rng.uniform(100., 300., size),
+             rng.uniform(0.6, 1.0, size),
+             rng.uniform(15., 45., size),
+             rng.uniform(0.9, 1., size),
+             rng.uniform(20., 400., size))
+    solver = bubble_point.OrderedBubblePoints()
+    result = solver.solve(*table)
+    expected = vectorized.mixture_bubble_point(*table)
+    np.testing.assert_allclose(result, expected, rtol=1e-11, atol=1e-8)
+    assert solver.statistics["bisections"] > 0
+    assert bubble_point.mixture_bubble_point(
+        237.6, 0.75, 20.36, 0.943, 242.) == pytest.approx(
+            correlations.mixture_bubble_point(237.6, 0.75, 20.36, 0.943,
+                                              242.))
+
+
+def test_shapes():
+    ratio = np.array([[100., 300.], [200., 400.]])
+    result = bubble_point.mixture_bubble_point(150., 0.7, 30., 0.2, ratio)
+    assert result.shape == (2, 2)
+    assert result[1, 0] == pytest.approx(
+        correlations.mixture_bubble_point(150., 0.7, 30., 0.2, 200.))
+    assert bubble_point.mixture_bubble_point(150., 0.7, 30., 0.2, 300.) == \
+        pytest.approx(correlations.mixture_bubble_point(150., 0.7, 30., 0.2,
+                                                        300.))
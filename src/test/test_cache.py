@@ -0,0 +1,132 @@
+"""
+Cache test
+"""
+
+import multiprocessing
+
+import numpy as np
+from src import cache
+from src import formulas
+from src import monte_carlo
+from src import pvt
+from src import specialize
+from src import traverse
+from src import vectorized
+
+ARGUMENTS = (200., [400.] * 20, [90.] * 20, [150.] * 21, 30., 0.7, 1.07, 0.,
+             300., 1500., 2.5, 0.0006)
+
+
+def store_results(_path, _offset):
+    results = cache.ResultCache(_path)
+    for i in range(10):
+        results.put(cache.key("test", {"i": _offset + i}), "test",
+                    (np.full(100, _offset + i),))
+    return results.statistics["stores"]
+
+
+def test_traverse(tmp_path):
+    expected = traverse.traverse(*ARGUMENTS, _against_flow=True)
+    with cache.ResultCache(str(tmp_path / "cache.sqlite")) as results:
+        first = traverse.traverse(*ARGUMENTS, _against_flow=True)
+        second = traverse.traverse(*ARGUMENTS, _against_flow=True)
+        assert traverse._CACHE is results
+    assert traverse._CACHE is None
+    assert first == expected
+    assert second == expected
+    assert isinstance(second[1][0], formulas.FlowPattern)
+    assert results.statistics == {"hits": 1, "misses": 1, "stores": 1,
+                                  "evictions": 0}
+    assert results.hit_rate == 0.5
+
+
+def test_vectorized_traverse_and_well_model(tmp_path):
+    rates = np.array([500., 1500., 3000.])
+    arguments = (ARGUMENTS[:8] + (np.full(3, 300.), rates) +
+                 ARGUMENTS[10:])
+    expected = vectorized.traverse(*arguments, _against_flow=True)
+    model = monte_carlo.WellModel(200., 100., 180., 8000., 2.5)
+    expected_model = model({"liquid_flow_rate": rates})
+    results = cache.enable(str(tmp_path / "cache.sqlite"))
+    try:
+        for _ in range(2):
+            pressures, patterns = vectorized.traverse(*arguments,
+                                                      _against_flow=True)
+            np.testing.assert_array_equal(pressures, expected[0])
+            np.testing.assert_array_equal(patterns, expected[1])
+            result = model({"liquid_flow_rate": rates})
+            for name, values in expected_model.items():
+                np.testing.assert_array_equal(result[name], values)
+        # Another model is another key
+        model.segments = 10
+        model({"liquid_flow_rate": rates})
+    finally:
+        cache.disable()
+    assert vectorized._CACHE is None
+    assert results.statistics["hits"] == 2
+    assert results.statistics["misses"] == 3
+
+
+def test_keys():
+    assert cache.key("traverse", {"a": 1, "b": [1, 2]}) == \
+        cache.key("traverse", {"b": np.array([1., 2.]), "a": 1.0})
+    assert cache.key("traverse", {"a": 0.0}) == cache.key("traverse",
+                                                          {"a": -0.0})
+    assert cache.key("traverse", {"a": 1.0}) != cache.key("traverse",
+                                                          {"a": 1.0 + 1e-15})
+    assert cache.key("traverse", {"a": 1}) != cache.key("other", {"a": 1})
+    table = pvt.BlackOilTable.from_correlations(150., 30., 0.7)
+    assert cache.key("traverse", {"pvt": table}) == cache.key(
+        "traverse", {"pvt": pvt.BlackOilTable.from_correlations(150., 30.,
+                                                                0.7)})
+    assert cache.key("traverse", {"pvt": table}) != cache.key(
+        "traverse", {"pvt": pvt.BlackOilTable.from_correlations(150., 31.,
+                                                                0.7)})
+    assert cache.key("traverse", {"kernel": len}) is None
+
+
+def test_uncacheable_calls_bypass(tmp_path):
+    with cache.ResultCache(str(tmp_path / "cache.sqlite")) as results:
+        kernel = specialize.kernel(*ARGUMENTS[4:9])
+        pressures, _ = traverse.traverse(*ARGUMENTS, _against_flow=True,
+                                         _kernel=kernel)
+        assert results.statistics == dict.fromkeys(cache.STATISTICS, 0)
+        traverse.traverse(*ARGUMENTS, _against_flow=True, _cache=False)
+        assert results.statistics["misses"] == 0
+    assert pressures == traverse.traverse(*ARGUMENTS, _against_flow=True)[0]
+
+
+def test_eviction(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    results = cache.ResultCache(path, _max_bytes=2500)
+    keys = [cache.key("test", {"i": i}) for i in range(4)]
+    for i in range(3):
+        results.put(keys[i], "test", (np.full(100, float(i)),))
+    # Each result takes about 1 kB, so only two of them are kept
+    assert results.get(keys[0], "test") is None
+    # The second result was used last, so the third one goes next
+    assert results.get(keys[1], "test")[0][0] == 1.
+    results.put(keys[3], "test", (np.full(100, 3.),))
+    assert results.statistics["evictions"] == 2
+    assert results.get(keys[2], "test") is None
+    assert results.get(keys[3], "test")[0][0] == 3.
+    totals = results.totals()
+    assert totals["bytes"] <= 2500
+    assert totals["entries"] == 2
+    results.clear()
+    assert cache.ResultCache(path).totals()["entries"] == 0
+
+
+def test_concurrent_processes(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    context = multiprocessing.get_context("fork")
+    with context.Pool(4) as pool:
+        stores = pool.starmap(store_results,
+                              [(path, 10 * i) for i in range(8)])
+    assert sum(stores) == 80
+    results = cache.ResultCache(path)
+    totals = results.totals()
+    assert totals["entries"] == 80
+    assert totals["stores"] == 80
+    assert results.get(cache.key("test", {"i": 57}), "test")[0][0] == 57.
+    assert results.totals()["hit_rate"] == 1.0
@@ -0,0 +1,106 @@
+"""
+Calibration test
+"""
+
+import numpy as np
+import pytest
+from src import calibration
+from src import deviation
+
+WELL = {
+    "depth": 8000.,
+    "wellhead_temperature": 100.,
+    "bottomhole_temperature": 200.,
+    "diameter": 2.441,
+    "production_gas_liquid_ratio": 400.,
+    "water_cut": 0.3,
+}
+
+RATES = np.array([300., 800., 1500., 2500., 3500.])
+
+
+def measurements(_multipliers, _names=("holdup", "friction")):
+    data = {"liquid_flow_rate": RATES,
+            "wellhead_pressure": np.full(RATES.size, 200.),
+            "bottomhole_pressure": np.zeros(RATES.size)}
+    model = calibration.Calibration(WELL, data, _names, _segments=5)
+    data["bottomhole_pressure"] = model.bottomhole_pressures(_multipliers)[0]
+    return data
+
+
+def test_neutral_multipliers_match_plain_traverse():
+    data = measurements([1.0, 1.0])
+    model = calibration.Calibration(WELL, data, ("holdup", "friction",
+                                                 "bubble_point"),
+                                    _segments=5)
+    assert model.objective([[1.0, 1.0, 1.0]])[0] == pytest.approx(0.0,
+                                                                 abs=1e-9)
+    # Holdup and friction multipliers raise the bottomhole pressure
+    pressures = model.bottomhole_pressures([[1.0, 1.0, 1.0],
+                                            [1.3, 1.0, 1.0],
+                                            [1.0, 1.5, 1.0]])
+    assert (pressures[1] > pressures[0]).all()
+    assert (pressures[2] > pressures[0]).all()
+
+
+def test_pvt_source():
+    source = deviation.DeviationPVT("hall_yarborough")
+    data = measurements([1.0, 1.0])
+    model = calibration.Calibration(WELL, data, ("holdup", "bubble_point"),
+                                    _segments=5, _pvt=source)
+    pressures = model.bottomhole_pressures([[1.0, 1.0]])[0]
+    # The measurements were modelled with the correlations
+    assert not np.allclose(pressures, data["bottomhole_pressure"], atol=1.)
+    data = dict(data, bottomhole_pressure=pressures)
+    model = calibration.Calibration(WELL, data, ("holdup", "bubble_point"),
+                                    _segments=5, _pvt=source)
+    assert model.objective([[1.0, 1.0]])[0] == pytest.approx(0.0, abs=1e-9)
+
+
+def test_fit_recovers_multipliers():
+    model = calibration.Calibration(WELL, measurements([1.2, 0.8]), _segments=5)
+    result = model.fit(_generations=40, _seed=1)
+    assert result.parameters["holdup"] == pytest.approx(1.2, abs=0.01)
+    assert result.parameters["friction"] == pytest.approx(0.8, abs=0.05)
+    assert result.error < 1.0
+    assert np.abs(result.residuals).max() < 2.0
+    assert result.history == sorted(result.history, reverse=True)
+    assert len(result.history) == result.generations
+
+
+def test_pvt_tuning():
+    names = ("holdup", "bubble_point")
+    model = calibration.Calibration(WELL, measurements([1.1, 1.15], names), names,
+                                    _segments=5)
+    result = model.fit(_generations=40, _seed=2)
+    # The bubble point and the holdup partly compensate each other, so only
+    # the match is checked
+    assert result.error < 2.0
+    assert result.error < model.objective([[1.0, 1.0]])[0] / 10
+
+
+def test_population_is_evaluated_once_and_cached():
+    model = calibration.Calibration(WELL, measurements([1.0, 1.0]), _segments=5)
+    vectors = np.array([[1.0, 1.0], [1.1, 0.9], [1.0, 1.0]])
+    errors = model.objective(vectors)
+    assert model.evaluations == 2
+    assert model.cache_hits == 1
+    assert errors[0] == errors[2]
+    assert np.array_equal(model.objective(vectors[:2]), errors[:2])
+    assert model.evaluations == 2
+    assert model.cache_hits == 3
+    model.clear_cache()
+    model.objective(vectors[:1])
+    assert model.evaluations == 3
+
+
+def test_per_test_fields_and_bounds():
+    data = measurements([1.0, 1.0])
+    data["water_cut"] = np.linspace(0.1, 0.5, RATES.size)
+    model = calibration.Calibration(WELL, data, {"holdup": (0.9, 1.1)},
+                                    _segments=5)
+    assert len(model) == RATES.size
+    result = model.fit(_population=8, _generations=3)
+    assert 0.9 <= result.parameters["holdup"] <= 1.1
+    with pytest.raises(ValueError):
+        calibration.Calibration(WELL, data, ("viscosity",))
@@ -0,0 +1,241 @@
+"""
+CLI test
+"""
+
+import csv
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+from src import cli
+from src import correlations
+from src import traverse
+
+WELL = {
+    "wellhead_pressure": 150.,
+    "wellhead_temperature": 100.,
+    "bottomhole_temperature": 180.,
+    "depth": 6000.,
+    "diameter": 2.441,
+    "water_cut": 0.3,
+    "production_gas_liquid_ratio": 600.,
+}
+
+
+def run(_capsys, *_argv):
+    assert cli.main(list(_argv)) == 0
+    return list(csv.DictReader(io.StringIO(_capsys.readouterr().out)))
+
+
+@pytest.fixture
+def cases(tmp_path):
+    path = tmp_path / "cases.csv"
+    path.write_text("pressure,temperature,water_cut\n"
+                    "1500,150,0.3\n"
+                    "500,120,0.0\n")
+    return str(path)
+
+
+def test_bubble_point(capsys, cases):
+    rows = run(capsys, "bubble-point", cases, "--set",
+               "production_gas_liquid_ratio=600")
+    expected = correlations.mixture_bubble_point(150., 0.7, 30., 0.3, 600.)
+    assert float(rows[0]["bubble_point"]) == pytest.approx(expected)
+    assert len(rows) == 2
+
+
+def test_pvt(capsys, cases):
+    rows = run(capsys, "pvt", cases)
+    bubble_point = float(rows[1]["bubble_point"])
+    expected = traverse.fluid_properties(500., 120., bubble_point, 30., 0.7,
+                                         1.07, 0.0, 100.)
+    for name, value in expected.items():
+        assert float(rows[1][name]) == pytest.approx(value)
+
+
+def test_gradient(capsys, cases):
+    rows = run(capsys, "gradient", cases, "-s", "liquid_flow_rate=1000",
+               "-s", "diameter=2.441")
+    bubble_point = correlations.mixture_bubble_point(150., 0.7, 30., 0.3,
+                                                     100.)
+    gravitational, frictional, pattern = traverse.pressure_gradient(
+        1500., 150., bubble_point, 30., 0.7, 1.07, 0.3, 100., 1000., 2.441,
+        90., 0.0006)
+    assert float(rows[0]["gravitational_pressure_gradient"]) == \
+        pytest.approx(gravitational)
+    assert float(rows[0]["frictional_pressure_gradient"]) == \
+        pytest.approx(frictional)
+    assert rows[0]["flow_pattern"] == pattern.name
+
+
+def test_traverse_and_vlp(capsys, tmp_path):
+    path = tmp_path / "well.json"
+    path.write_text(json.dumps(dict(WELL, liquid_flow_rate=1000.)))
+    rows = run(capsys, "traverse", str(path), "--segments", "10")
+    assert len(rows) == 11
+    expected = traverse.bottomhole_pressure(150., 100., 180., 6000., 30., 0.7,
+                                            1.07, 0.3, 600., 1000., 2.441,
+                                            0.0006, 10)
+    assert float(rows[-1]["pressure"]) == pytest.approx(expected)
+    rows = run(capsys, "vlp", str(path), "--rates", "500,1000",
+               "--segments", "10")
+    assert float(rows[1]["bottomhole_pressure"]) == pytest.approx(expected,
+                                                                  abs=1.0)
+
+
+def test_pvt_tables(capsys, tmp_path, cases):
+    from src import pvt
+
+    path = str(tmp_path / "fluid.inc")
+    table = pvt.BlackOilTable.from_correlations(150., 30., 0.7, 1.07)
+    table.write(path)
+    rows = run(capsys, "pvt", cases, "--pvt", path)
+    bubble_point = table.mixture_bubble_point(150., 0.7, 30., 0.3, 100.)
+    assert float(rows[0]["bubble_point"]) == pytest.approx(bubble_point)
+    expected = table.fluid_properties(1500., 150., bubble_point, 30., 0.7,
+                                      1.07, 0.3, 100.)
+    for name, value in expected.items():
+        assert float(rows[0][name]) == pytest.approx(value)
+
+
+def test_z_factor(capsys, tmp_path):
+    from src import deviation
+
+    path = tmp_path / "well.json"
+    path.write_text(json.dumps(dict(WELL, liquid_flow_rate=1000.)))
+    rows = run(capsys, "traverse", str(path), "--segments", "10",
+               "--z-factor", "hall_yarborough")
+    pressures, _ = traverse.traverse(
+        150., [600.] * 10, [90.] * 10,
+        traverse.linear_temperatures(100., 180., 10), 30., 0.7, 1.07, 0.3,
+        600., 1000., 2.441, 0.0006, _against_flow=True,
+        _pvt=deviation.DeviationPVT("hall_yarborough"))
+    assert float(rows[-1]["pressure"]) == pytest.approx(pressures[-1])
+    with pytest.raises(SystemExit):
+        cli.main(["traverse", str(path), "--z-factor", "papay", "--pvt",
+                  str(path)])
+
+
+def test_well_model_pvt(capsys, tmp_path):
+    from src import deviation
+    from src import monte_carlo
+
+    path = tmp_path / "well.json"
+    path.write_text(json.dumps(dict(WELL, liquid_flow_rate=1000.)))
+    rows = run(capsys, "vlp", str(path), "--rates", "500,1000",
+               "--segments", "10", "--z-factor", "hall_yarborough")
+    model = monte_carlo.WellModel(
+        150., 100., 180., 6000., 2.441, 30., 0.7, 1.07, 0.3, 600.,
+        _segments=10, _pvt=deviation.DeviationPVT("hall_yarborough"))
+    expected = model({"liquid_flow_rate": np.array([500., 1000.])})
+    assert [float(row["bottomhole_pressure"]) for row in rows] == \
+        pytest.approx(expected["bottomhole_pressure"].tolist())
+
+    specification = tmp_path / "sweep.json"
+    specification.write_text(json.dumps({
+        "well": dict(WELL, liquid_flow_rate=1000.),
+        "axes": {"liquid_flow_rate": [500., 1000.]},
+    }))
+    rows = run(capsys, "sweep", str(specification), "--directory",
+               str(tmp_path / "sweep"), "--segments", "10", "--z-factor",
+               "hall_yarborough")
+    assert [float(row["bottomhole_pressure"]) for row in rows] == \
+        pytest.approx(expected["bottomhole_pressure"].tolist())
+    with pytest.raises(SystemExit):
+        cli.main(["sweep", str(specification), "--directory",
+                  str(tmp_path / "served"), "--serve", "0",
+                  "--z-factor", "hall_yarborough"])
+
+
+def test_result_cache(capsys, tmp_path):
+    from src import cache
+
+    path = tmp_path / "well.json"
+    path.write_text(json.dumps(dict(WELL, liquid_flow_rate=1000.)))
+    database = str(tmp_path / "cache.sqlite")
+    for _ in range(2):
+        rows = run(capsys, "traverse", str(path), "--cache", database)
+        vlp_rows = run(capsys, "vlp", str(path), "--rates", "500,1000",
+                       "--cache", database)
+    assert rows == run(capsys, "traverse", str(path))
+    assert vlp_rows == run(capsys, "vlp", str(path), "--rates", "500,1000")
+    totals = cache.ResultCache(database).totals()
+    assert (totals["hits"], totals["misses"], totals["entries"]) == (2, 2, 2)
+
+
+def test_npy_output(tmp_path, cases):
+    output = str(tmp_path / "out.npy")
+    cli.main(["bubble-point", cases, "-o", output])
+    records = np.load(output)
+    assert records.dtype.names == ("temperature", "bubble_point")
+    assert records["temperature"].tolist() == [150., 120.]
+
+
+def test_sweep(capsys, tmp_path):
+    path = tmp_path / "sweep.json"
+    path.write_text(json.dumps({
+        "well": WELL,
+        "axes": {"liquid_flow_rate": [500., 1000.], "water_cut": [0., .5]},
+        "unit_size": 3,
+    }))
+    directory = str(tmp_path / "journal")
+    rows = run(capsys, "sweep", str(path), "--directory", directory,
+               "--segments", "5", "-s", "liquid_flow_rate=800")
+    assert len(rows) == 4
+    assert rows[3]["flow_pattern_4"] in ("distributed", "intermittent",
+                                         "transition", "segregated")
+    assert os.path.exists(os.path.join(directory, "journal.jsonl"))
+
+
+def test_sweep_served_to_workers(capsys, tmp_path):
+    path = tmp_path / "sweep.json"
+    path.write_text(json.dumps({
+        "well": WELL,
+        "axes": {"liquid_flow_rate": [500., 1000.], "water_cut": [0., .5]},
+        "unit_size": 2,
+    }))
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    worker = threading.Thread(target=_worker, args=(port,))
+    worker.start()
+    assert cli.main(["sweep", str(path), "--directory",
+                     str(tmp_path / "journal"), "--segments", "5",
+                     "--serve", "127.0.0.1:{}".format(port)]) == 0
+    worker.join(30)
+    output = capsys.readouterr()
+    assert len(list(csv.DictReader(io.StringIO(output.out)))) == 4
+    assert "worker w: 2 units" in output.err
+
+
+def _worker(_port):
+    for _ in range(100):
+        try:
+            return cli.main(["worker", "127.0.0.1", str(_port),
+                             "--name", "w"])
+        except SystemExit:
+            time.sleep(0.05)  # the coordinator is not listening yet
+
+
+def test_missing_input(capsys, cases):
+    with pytest.raises(SystemExit) as error:
+        cli.main(["gradient", cases])
+    assert error.value.code == 2
+    assert "missing liquid_flow_rate, diameter" in capsys.readouterr().err
+
+
+def test_simple_commands_do_not_import_numpy(cases):
+    script = ("import sys; from src import cli; "
+              "cli.main(['bubble-point', {!r}]); "
+              "assert 'numpy' not in sys.modules".format(cases))
+    root = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    subprocess.run([sys.executable, "-c", script], cwd=root, check=True,
+                   stdout=subprocess.DEVNULL)
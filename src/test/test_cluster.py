@@ -0,0 +1,115 @@
+"""
+Cluster test
+"""
+
+import multiprocessing
+import socket
+import time
+
+import numpy as np
+from src import cluster
+from src import sweep
+
+AXES = {
+    "liquid_flow_rate": [500., 1000., 1500., 2000.],
+    "water_cut": [0.0, 0.3, 0.6],
+}
+
+WELL = {
+    "wellhead_pressure": 200.,
+    "wellhead_temperature": 100.,
+    "bottomhole_temperature": 180.,
+    "depth": 6000.,
+    "diameter": 2.441,
+    "production_gas_liquid_ratio": 500.,
+}
+
+
+def test_messages():
+    first, second = socket.socketpair()
+    with first, second:
+        cluster.send(first, {"type": "result", "unit": 3}, b"\x00" * 70000)
+        header, payload = cluster.receive(second)
+    assert header == {"type": "result", "unit": 3, "bytes": 70000}
+    assert payload == b"\x00" * 70000
+
+
+def test_workers_complete_the_sweep(tmp_path):
+    directory = str(tmp_path / "sweep")
+    with cluster.Coordinator(directory, AXES, WELL, _unit_size=2,
+                             _segments=5) as coordinator:
+        host, port = coordinator.address
+        workers = [multiprocessing.Process(target=cluster.run_worker,
+                                           args=(host, port, name))
+                   for name in ("a", "b")]
+        for worker in workers:
+            worker.start()
+        assert coordinator.wait(60)
+        for worker in workers:
+            worker.join(10)
+        statistics = coordinator.statistics()
+    assert statistics["completed"] == 6
+    assert set(statistics["workers"]) == {"a", "b"}
+    assert sum(stats["units"] for stats in
+               statistics["workers"].values()) == 6
+    for stats in statistics["workers"].values():
+        if stats["units"]:
+            assert stats["rows_per_second"] > 0
+
+    results = sweep.read_results(directory)
+    model = cluster.well_model(WELL, 5)
+    expected = model({name: results[name] for name in AXES})
+    assert list(results["index"]) == list(range(12))
+    assert np.array_equal(results["bottomhole_pressure"],
+                          expected["bottomhole_pressure"])
+
+
+def test_lost_worker_lease_is_reassigned(tmp_path):
+    directory = str(tmp_path / "sweep")
+    with cluster.Coordinator(directory, AXES, WELL, _unit_size=6,
+                             _segments=5,
+                             _lease_timeout=0.5) as coordinator:
+        host, port = coordinator.address
+        # A worker that takes a unit and hangs without answering
+        stuck = socket.create_connection((host, port))
+        cluster.send(stuck, {"type": "hello", "worker": "stuck"})
+        cluster.receive(stuck)
+        cluster.send(stuck, {"type": "request"})
+        lease, _ = cluster.receive(stuck)
+        assert lease["type"] == "unit"
+
+        start = time.monotonic()
+        assert cluster.run_worker(host, port, "healthy") == 2
+        assert time.monotonic() - start >= 0.4
+        assert coordinator.wait(10)
+        statistics = coordinator.statistics()
+        stuck.close()
+    assert statistics["reassigned"] == 1
+    assert statistics["workers"]["healthy"]["units"] == 2
+    assert statistics["workers"]["stuck"]["units"] == 0
+
+
+def test_disconnected_worker_lease_is_reassigned(tmp_path):
+    directory = str(tmp_path / "sweep")
+    with cluster.Coordinator(directory, AXES, WELL, _unit_size=6,
+                             _segments=5,
+                             _lease_timeout=60.) as coordinator:
+        host, port = coordinator.address
+        with socket.create_connection((host, port)) as lost:
+            cluster.send(lost, {"type": "hello", "worker": "lost"})
+            cluster.receive(lost)
+            cluster.send(lost, {"type": "request"})
+            cluster.receive(lost)
+        assert cluster.run_worker(host, port) == 2
+        assert coordinator.done
+
+
+def test_resume(tmp_path):
+    directory = str(tmp_path / "sweep")
+    with cluster.Coordinator(directory, AXES, WELL, _unit_size=3,
+                             _segments=5) as coordinator:
+        assert cluster.run_worker(*coordinator.address, _max_units=1) == 1
+    with cluster.Coordinator(directory, AXES, WELL, _unit_size=3,
+                             _segments=5) as coordinator:
+        assert cluster.run_worker(*coordinator.address) == 3
+        assert coordinator.wait(1)
@@ -0,0 +1,122 @@
+"""
+Columnar test
+"""
+
+import numpy as np
+import pytest
+from src import columnar
+from src import formulas
+from src import monte_carlo
+from src import traverse
+from src import vectorized
+
+pa = pytest.importorskip("pyarrow")
+
+LENGTHS = [300.] * 10
+
+
+@pytest.fixture(scope="module")
+def traverses():
+    rates = np.array([500., 1000., 2000.])
+    pressures, patterns = vectorized.traverse(
+        150., LENGTHS, [90.] * 10,
+        traverse.linear_temperatures(100., 180., 10),
+        30., 0.75, 1.07, 0.3, np.full(3, 600.), rates, 2.441, 0.0006,
+        _against_flow=True)
+    return rates, pressures, patterns
+
+
+def test_arrays_are_not_copied():
+    values = np.linspace(0., 1., 100)
+    array = columnar._array("pressure", values)
+    assert array.buffers()[1].address == values.ctypes.data
+
+
+def test_flow_pattern_array():
+    array = columnar.flow_pattern_array(np.array([1, 4, 0], dtype=np.int8))
+    assert pa.types.is_dictionary(array.type)
+    assert array.to_pylist() == ["distributed", "segregated", None]
+
+
+def test_traverse_builder(traverses, tmp_path):
+    rates, pressures, patterns = traverses
+    builder = columnar.TraverseBuilder(LENGTHS)
+    builder.append_traverse(pressures, patterns, liquid_flow_rate=rates)
+    builder.append_traverse(pressures[:1], patterns[:1],
+                            liquid_flow_rate=rates[0])
+    assert builder.rows == 4 * 11
+    path = tmp_path / "traverse.parquet"
+    builder.write(path)
+    table = columnar.read(path)
+    assert table.column("case").to_pylist()[-1] == 3
+    assert table.column("length").to_pylist()[:2] == [0., 300.]
+    assert np.array_equal(table.column("pressure").to_numpy()[:33],
+                          pressures.ravel())
+    assert pa.types.is_dictionary(table.schema.field("flow_pattern").type)
+    names = table.column("flow_pattern").to_pylist()
+    assert names[0] is None
+    assert names[1] == formulas.FlowPattern(patterns[0, 0]).name
+
+
+def test_vlp_builder(tmp_path):
+    rates = np.array([500., 1000.])
+    ratios = np.array([200., 400., 800.])
+    grid = rates[:, None] + ratios
+    builder = columnar.VLPBuilder()
+    builder.append_table(grid, liquid_flow_rate=rates,
+                         production_gas_liquid_ratio=ratios)
+    table = builder.table()
+    assert table.column("bottomhole_pressure").to_pylist() == \
+        list(grid.ravel())
+    assert table.column("liquid_flow_rate").to_pylist() == [500.] * 3 + \
+        [1000.] * 3
+    with pytest.raises(ValueError):
+        builder.append_table(grid.T, liquid_flow_rate=rates,
+                             production_gas_liquid_ratio=ratios)
+
+
+def test_schema_mismatch():
+    builder = columnar.ResultBuilder()
+    builder.append(pressure=np.ones(3))
+    with pytest.raises(ValueError):
+        builder.append(temperature=np.ones(3))
+
+
+def test_monte_carlo(tmp_path):
+    distributions = {
+        "oil_api_gravity": monte_carlo.Uniform(25, 35),
+        "water_cut": monte_carlo.Triangular(0.1, 0.3, 0.6),
+    }
+    model = monte_carlo.WellModel(200., 100., 180., 6000., 2.441,
+                                  _liquid_flow_rate=800., _segments=4)
+    path = tmp_path / "monte_carlo.parquet"
+    rows = columnar.write_monte_carlo(path, distributions, model, 250,
+                                      _chunk_size=100, _seed=4)
+    assert rows == 250
+    batches = list(columnar.iter_batches(path,
+                                         _columns=["bottomhole_pressure"]))
+    assert batches[0].schema.names == ["bottomhole_pressure"]
+    pressures = np.concatenate([batch.column(0).to_numpy()
+                                for batch in batches])
+    result = monte_carlo.monte_carlo(distributions, model, 250,
+                                     _chunk_size=100, _seed=4)
+    assert pressures.mean() == pytest.approx(
+        result.moments["bottomhole_pressure"].mean)
+    table = columnar.read(path, _filters=[("chunk", "=", 2)])
+    assert table.num_rows == 50
+    assert table.schema.field("flow_pattern").type.list_size == 4
+
+
+def test_flow_patterns_are_dictionary_encoded(traverses, tmp_path):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    _, pressures, patterns = traverses
+    builder = columnar.TraverseBuilder(LENGTHS)
+    builder.append_traverse(pressures, patterns)
+    path = tmp_path / "traverse.parquet"
+    builder.write(path)
+    metadata = parquet.ParquetFile(path).metadata.row_group(0)
+    encodings = {metadata.column(i).path_in_schema:
+                 metadata.column(i).encodings
+                 for i in range(metadata.num_columns)}
+    assert "RLE_DICTIONARY" in encodings["flow_pattern"]
+    assert "RLE_DICTIONARY" not in encodings["pressure"]
@@ -0,0 +1,123 @@
+"""
+Dedup test
+"""
+
+import numpy as np
+import pytest
+from src import dedup
+from src import vectorized
+
+
+@pytest.fixture(scope="module")
+def rows():
+    # 300 rows drawn from 4 fluids, 5 temperatures and 6 pressures
+    rng = np.random.default_rng(5)
+    size = 300
+    fluid = rng.integers(4, size=size)
+    return {
+        "pressure": rng.choice([200., 500., 900., 1500., 2500., 4000.], size),
+        "temperature": rng.choice([100., 130., 160., 190., 220.], size),
+        "oil_api_gravity": np.array([20., 28., 35., 42.])[fluid],
+        "gas_specific_gravity": np.array([0.65, 0.7, 0.8, 0.9])[fluid],
+        "water_cut": np.array([0., 0.2, 0.5, 0.1])[fluid],
+        "production_gas_liquid_ratio": np.array([80., 150., 300., 600.])[fluid],
+    }
+
+
+def bubble_point_arguments(_rows):
+    return (_rows["temperature"],
+            _rows["gas_specific_gravity"],
+            _rows["oil_api_gravity"],
+            _rows["water_cut"],
+            _rows["production_gas_liquid_ratio"])
+
+
+def test_unique_rows():
+    first = np.array([1., 2., 1., 0., -0., np.nan, np.nan, 1.])
+    second = np.array([3., 3., 3., 5., 5., 7., 7., 4.])
+    index, inverse = dedup.unique_rows([first, second])
+    assert len(index) == 5
+    for column in (first, second):
+        np.testing.assert_array_equal(column[index][inverse], column + 0.0)
+
+
+def test_unique_rows_with_hash_collision(monkeypatch):
+    # Every row gets the same hash, so the exact fallback has to split them
+    monkeypatch.setattr(dedup, "_mix", lambda _hashes: _hashes * 0)
+    first = np.array([1., 2., 1., 3., 2.])
+    second = np.array([0., 0., 0., 1., 1.])
+    index, inverse = dedup.unique_rows([first, second])
+    assert len(index) == 4
+    np.testing.assert_array_equal(first[index][inverse], first)
+    np.testing.assert_array_equal(second[index][inverse], second)
+
+
+def test_mixture_bubble_point(rows):
+    deduplicator = dedup.Deduplicator()
+    result = deduplicator.mixture_bubble_point(*bubble_point_arguments(rows))
+    expected = vectorized.mixture_bubble_point(*bubble_point_arguments(rows))
+    np.testing.assert_array_equal(result, expected)
+    assert deduplicator.last[0] == 300
+    assert deduplicator.last[1] <= 20
+    assert deduplicator.ratio == 300 / deduplicator.last[1]
+
+
+def test_fluid_properties(rows):
+    deduplicator = dedup.Deduplicator()
+    result = deduplicator.fluid_properties(
+        rows["pressure"], rows["temperature"], None,
+        rows["oil_api_gravity"], rows["gas_specific_gravity"], 1.07,
+        rows["water_cut"], rows["production_gas_liquid_ratio"])
+    bubble_point = vectorized.mixture_bubble_point(
+        *bubble_point_arguments(rows))
+    expected = vectorized.fluid_properties(
+        rows["pressure"], rows["temperature"], bubble_point,
+        rows["oil_api_gravity"], rows["gas_specific_gravity"], 1.07,
+        rows["water_cut"], rows["production_gas_liquid_ratio"])
+    assert result.keys() == expected.keys()
+    for name, values in expected.items():
+        np.testing.assert_array_equal(
+            np.broadcast_to(result[name], (300,)),
+            np.broadcast_to(values, (300,)))
+    # One bubble point call and one properties call
+    assert deduplicator.rows == 600
+    assert deduplicator.unique < 140
+
+
+def test_pressure_gradient(rows):
+    deduplicator = dedup.Deduplicator()
+    arguments = (rows["pressure"], rows["temperature"], None,
+                 rows["oil_api_gravity"], rows["gas_specific_gravity"], 1.07,
+                 rows["water_cut"], rows["production_gas_liquid_ratio"],
+                 1000., 2.5, 90., 0.0006)
+    gravitational, frictional, pattern = deduplicator.pressure_gradient(
+        *arguments)
+    bubble_point = vectorized.mixture_bubble_point(
+        *bubble_point_arguments(rows))
+    expected = vectorized.pressure_gradient(*arguments[:2], bubble_point,
+                                            *arguments[3:])
+    np.testing.assert_array_equal(gravitational, expected[0])
+    np.testing.assert_array_equal(frictional, expected[1])
+    np.testing.assert_array_equal(pattern, expected[2])
+
+
+def test_quantization():
+    deduplicator = dedup.Deduplicator({"pressure": 10.0})
+    pressure = np.array([1001., 999., 1004.9, 1006., 2000.])
+    properties = deduplicator.fluid_properties(
+        pressure, 150., 2000., 30., 0.7, 1.07, 0., 100.)
+    assert deduplicator.last == (5, 3)
+    expected = vectorized.fluid_properties(
+        np.array([1000., 1000., 1000., 1010., 2000.]),
+        150., 2000., 30., 0.7, 1.07, 0., 100.)
+    np.testing.assert_array_equal(properties["oil_density"],
+                                  expected["oil_density"])
+
+
+def test_shape_and_scalars():
+    deduplicator = dedup.Deduplicator()
+    result = deduplicator.evaluate(lambda _x, _y: _x * _y, ("x", "y"),
+                                   (np.array([[1., 2.], [1., 2.]]), 3.))
+    np.testing.assert_array_equal(result, [[3., 6.], [3., 6.]])
+    assert deduplicator.last == (4, 2)
+    assert deduplicator.evaluate(lambda _x: _x + 1, ("x",), (1.,)) == 2.
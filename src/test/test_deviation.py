@@ -0,0 +1,154 @@
+"""
+Deviation test
+"""
+
+import numpy as np
+import pytest
+from src import cache
+from src import correlations
+from src import deviation
+from src import pvt
+from src import traverse
+from src import vectorized
+
+IMPLICIT = ("hall_yarborough", "dranchuk_abou_kassem")
+
+ARGUMENTS = (200., [400.] * 20, [90.] * 20, [150.] * 21, 30., 0.7, 1.07, 0.,
+             300., 1500., 2.5, 0.0006)
+
+
+def reduced_conditions(_reduced_pressure, _reduced_temperature):
+    # Gauge pressure and temperature of a 0.7 gas at reduced conditions
+    temperature, pressure = deviation.pseudo_critical_properties(0.7)
+    return (_reduced_pressure * pressure - 14.7,
+            _reduced_temperature * temperature - 460)
+
+
+@pytest.mark.parametrize("method", IMPLICIT)
+def test_standing_katz_chart(method):
+    # Values read from the Standing and Katz chart
+    for reduced_pressure, reduced_temperature, expected in (
+            (2.0, 1.5, 0.82), (5.0, 1.5, 0.81), (10.0, 2.0, 1.14),
+            (1.0, 1.2, 0.79), (0.5, 2.0, 0.98)):
+        z = deviation.gas_deviation_factor(
+            *reduced_conditions(reduced_pressure, reduced_temperature), 0.7,
+            method)
+        assert z == pytest.approx(expected, abs=0.015)
+
+
+def test_methods_agree():
+    pressure, temperature = reduced_conditions(
+        *np.meshgrid(np.linspace(0.2, 15., 60), np.linspace(1.2, 3., 40)))
+    hall_yarborough = deviation.gas_deviation_factor(pressure, temperature,
+                                                     0.7, IMPLICIT[0])
+    dranchuk_abou_kassem = deviation.gas_deviation_factor(
+        pressure, temperature, 0.7, IMPLICIT[1])
+    assert hall_yarborough.shape == (40, 60)
+    np.testing.assert_allclose(hall_yarborough, dranchuk_abou_kassem,
+                               rtol=0.02)
+
+
+@pytest.mark.parametrize("method", IMPLICIT)
+def test_scalars_match_arrays(method):
+    pressure = np.linspace(0., 12000., 50)
+    temperature = np.linspace(80., 300., 50)
+    z, density = deviation.deviation_factor(pressure, temperature, 0.7,
+                                            method)
+    for i in range(0, 50, 7):
+        assert deviation.deviation_factor(pressure[i], temperature[i], 0.7,
+                                          method) == \
+            pytest.approx((z[i], density[i]), rel=1e-12)
+    # A warm start converges to the same root
+    warm, _ = deviation.deviation_factor(pressure, temperature, 0.7, method,
+                                         density * 1.05)
+    np.testing.assert_allclose(warm, z, rtol=1e-12)
+
+
+def test_papay():
+    pressure = np.array([0., 1000., 3000.])
+    assert deviation.gas_deviation_factor(pressure, 150., 0.7, "papay") == \
+        pytest.approx(correlations.gas_deviation_factor(pressure, 150., 0.7))
+    assert deviation.gas_formation_volume_factor(1000., 150., 0.7, False,
+                                                 "papay") == \
+        pytest.approx(correlations.gas_formation_volume_factor(
+            1000., 150., 0.7, False))
+    expected = traverse.fluid_properties(1500., 150., 2000., 30., 0.7, 1.07,
+                                         0.2, 300.)
+    result = deviation.DeviationPVT("papay").fluid_properties(
+        1500., 150., 2000., 30., 0.7, 1.07, 0.2, 300.)
+    assert result == pytest.approx(expected, rel=1e-12)
+    with pytest.raises(ValueError):
+        deviation.DeviationPVT("standing")
+
+
+def test_gas_properties():
+    source = deviation.DeviationPVT()
+    z, factor, density, viscosity = source.gas_properties(3000., 150., 0.7)
+    assert z == pytest.approx(deviation.gas_deviation_factor(3000., 150.,
+                                                             0.7))
+    assert factor == pytest.approx(deviation.gas_formation_volume_factor(
+        3000., 150., 0.7, False))
+    assert density == pytest.approx(
+        0.0764106 * 0.7 / deviation.gas_formation_volume_factor(3000., 150.,
+                                                                0.7))
+    assert viscosity == pytest.approx(correlations.gas_viscosity(150., 0.7,
+                                                                 density))
+
+
+def test_fluid_properties_skip_papay(monkeypatch):
+    expected = pvt.CorrelationPVT().fluid_properties(1500., 150., 2000., 30.,
+                                                     0.7, 1.07, 0.2, 300.)
+    array_expected = vectorized.fluid_properties(
+        np.array([1500., 2500.]), 150., 2000., 30., 0.7, 1.07, 0.2, 300.)
+
+    def papay(*_):
+        raise AssertionError("Papay gas properties evaluated")
+
+    for module in (correlations, vectorized):
+        monkeypatch.setattr(module, "gas_formation_volume_factor", papay)
+    source = deviation.DeviationPVT()
+    result = source.fluid_properties(1500., 150., 2000., 30., 0.7, 1.07, 0.2,
+                                     300.)
+    assert list(result) == list(expected)
+    z, factor, density, viscosity = source.gas_properties(1500., 150., 0.7)
+    assert result["gas_formation_volume_factor"] == factor
+    assert result["gas_density"] == density
+    assert result["gas_viscosity"] == viscosity
+    assert result["oil_formation_volume_factor"] == \
+        expected["oil_formation_volume_factor"]
+    # The scalar path stays on Python floats
+    assert type(z) is float and type(viscosity) is float
+    arrays = source.fluid_properties(np.array([1500., 2500.]), 150., 2000.,
+                                     30., 0.7, 1.07, 0.2, 300.)
+    assert arrays["gas_density"][0] == pytest.approx(density, rel=1e-12)
+    np.testing.assert_allclose(arrays["oil_density"],
+                               array_expected["oil_density"], rtol=1e-12)
+
+
+def test_traverse_warm_start():
+    cold = deviation.DeviationPVT(_warm_start=False)
+    expected, _ = traverse.traverse(*ARGUMENTS, _against_flow=True,
+                                    _pvt=cold)
+    warm = deviation.DeviationPVT()
+    pressures, patterns = traverse.traverse(*ARGUMENTS, _against_flow=True,
+                                            _pvt=warm)
+    assert pressures == pytest.approx(expected, rel=1e-10)
+    assert warm.statistics["solves"] == cold.statistics["solves"]
+    assert warm.statistics["iterations"] < 0.85 * cold.statistics[
+        "iterations"]
+    # The Z-factor changes the bottomhole pressure by about 2%
+    assert pressures[-1] == pytest.approx(
+        traverse.traverse(*ARGUMENTS, _against_flow=True)[0][-1], rel=0.04)
+    arrays, array_patterns = vectorized.traverse(
+        *ARGUMENTS[:8], np.array([300., 300.]), *ARGUMENTS[9:],
+        _against_flow=True, _pvt=deviation.DeviationPVT())
+    np.testing.assert_allclose(arrays[:, -1], pressures[-1], rtol=1e-9)
+    assert array_patterns[0].tolist() == [pattern.value
+                                          for pattern in patterns]
+
+
+def test_cache_keys():
+    assert cache.key("traverse", {"pvt": deviation.DeviationPVT()}) != \
+        cache.key("traverse", {"pvt": pvt.CorrelationPVT()})
+    assert cache.key("traverse", {"pvt": deviation.DeviationPVT()}) == \
+        cache.key("traverse", {"pvt": deviation.DeviationPVT()})
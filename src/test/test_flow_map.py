@@ -0,0 +1,87 @@
+"""
+Flow map test
+"""
+
+import zlib
+
+import numpy as np
+import pytest
+from src import flow_map
+from src import formulas
+from src import vectorized
+
+
+@pytest.fixture(scope="module")
+def axes():
+    return np.linspace(0.001, 1.0, 60), np.geomspace(1e-3, 1e3, 50)
+
+
+def test_matches_scalar_formulas(axes):
+    fractions, froude_numbers = axes
+    result = flow_map.flow_map(fractions, froude_numbers, _dtype=float,
+                               _tile_rows=7)
+    assert result.shape == (50, 60)
+    for i in range(0, 50, 3):
+        for j in range(0, 60, 5):
+            pattern = formulas.flow_pattern(froude_numbers[i], fractions[j])
+            assert result.flow_pattern[i, j] == pattern.value
+            assert result.horz_liquid_holdup[i, j] == pytest.approx(
+                formulas.horz_liquid_holdup(pattern, froude_numbers[i],
+                                            fractions[j]), 1e-12)
+
+
+@pytest.mark.parametrize("inclination", [30., -20.])
+def test_inclined_holdup(axes, inclination):
+    fractions, froude_numbers = axes
+    result = flow_map.flow_map(fractions, froude_numbers, inclination,
+                               _liquid_velocity_number=2.0, _dtype=float)
+    froude, fraction = np.meshgrid(froude_numbers, fractions, indexing="ij")
+    pattern = vectorized.flow_pattern(froude, fraction)
+    holdup = vectorized.horz_liquid_holdup(pattern, froude, fraction)
+    expected = vectorized.liquid_holdup_with_incl(
+        holdup,
+        pattern if inclination > 0 else np.full_like(pattern,
+                                                     flow_map.DOWNWARD),
+        froude, fraction, 2.0, inclination)
+    assert np.allclose(result.liquid_holdup, expected, rtol=1e-12)
+
+
+def test_float32_and_fractions(axes):
+    result = flow_map.flow_map(*axes)
+    assert result.horz_liquid_holdup.dtype == np.float32
+    assert result.liquid_holdup is None
+    fractions = result.pattern_fractions()
+    assert sum(fractions.values()) == pytest.approx(1.0)
+    assert fractions[formulas.FlowPattern.downward] == 0.0
+    assert all(fractions[pattern] > 0 for pattern in (
+        formulas.FlowPattern.distributed,
+        formulas.FlowPattern.intermittent,
+        formulas.FlowPattern.transition,
+        formulas.FlowPattern.segregated))
+
+
+def test_memory_mapped_tiles(axes, tmp_path):
+    directory = str(tmp_path / "map")
+    result = flow_map.flow_map(*axes, 45., _tile_rows=8,
+                               _directory=directory)
+    in_memory = flow_map.flow_map(*axes, 45.)
+    for name in ("flow_pattern", "horz_liquid_holdup", "liquid_holdup"):
+        stored = np.load(str(tmp_path / "map" / (name + ".npy")))
+        assert np.array_equal(stored, getattr(in_memory, name))
+        assert np.array_equal(stored, getattr(result, name))
+
+
+def test_images(axes, tmp_path):
+    result = flow_map.flow_map(*axes, 10.)
+    path = tmp_path / "patterns.png"
+    flow_map.flow_pattern_image(str(path), result)
+    data = path.read_bytes()
+    assert data.startswith(b"\x89PNG\r\n\x1a\n")
+    width, height = np.frombuffer(data[16:24], dtype=">u4")
+    assert (height, width) == result.shape
+    start = data.index(b"IDAT") + 4
+    raw = np.frombuffer(zlib.decompress(data[start:data.index(b"IEND") - 8]),
+                        dtype=np.uint8).reshape(height, -1)
+    top = raw[0, 1:].reshape(width, 3)
+    assert (top == flow_map.PALETTE[result.flow_pattern[-1]]).all()
+    flow_map.holdup_image(str(tmp_path / "holdup.png"), result, True)
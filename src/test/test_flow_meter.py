@@ -0,0 +1,179 @@
+"""
+Flow meter test
+"""
+
+import json
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+from src import deviation
+from src import flow_meter
+
+WELLS = {
+    "A": {"depth": 7000., "diameter": 2.441, "wellhead_temperature": 100.,
+          "bottomhole_temperature": 190., "water_cut": 0.3,
+          "production_gas_liquid_ratio": 400.},
+    "B": {"depth": 9000., "diameter": 3.0, "wellhead_temperature": 110.,
+          "bottomhole_temperature": 210.,
+          "production_gas_liquid_ratio": 800.},
+}
+
+WELLHEAD_PRESSURES = {"A": 200., "B": 300.}
+
+
+@pytest.fixture
+def meter():
+    return flow_meter.FlowMeter(WELLS, _segments=5)
+
+
+def record(_meter, _well, _time, _rate):
+    index = _meter.names.index(_well)
+    gauge = _meter.bottomhole_pressures(np.array([index]),
+                                        np.array([_rate]),
+                                        np.array([WELLHEAD_PRESSURES[_well]]),
+                                        np.array([np.nan]))[0]
+    return {"well": _well, "time": _time,
+            "wellhead_pressure": WELLHEAD_PRESSURES[_well],
+            "gauge_pressure": gauge}
+
+
+def test_rates_are_recovered_and_warm_started(meter):
+    assert meter.submit(record(meter, "A", 1., 1500.))
+    assert meter.submit(json.dumps(record(meter, "B", 1., 3000.)))
+    estimates = {estimate["well"]: estimate for estimate in meter.step(0)}
+    assert estimates["A"]["liquid_flow_rate"] == pytest.approx(1500., rel=0.01)
+    assert estimates["B"]["liquid_flow_rate"] == pytest.approx(3000., rel=0.01)
+    assert all(estimate["converged"] for estimate in estimates.values())
+    assert not any(estimate["bracketed"] for estimate in estimates.values())
+
+    meter.submit(record(meter, "A", 2., 1600.))
+    estimate, = meter.step(0)
+    assert estimate["liquid_flow_rate"] == pytest.approx(1600., rel=0.01)
+    assert meter.estimates["A"] is estimate
+    assert meter.estimates["B"]["time"] == 1.
+    assert meter.step(0) == []
+
+
+def test_pvt_source():
+    source = deviation.DeviationPVT("hall_yarborough")
+    meter = flow_meter.FlowMeter(WELLS, _segments=5, _pvt=source)
+    default = flow_meter.FlowMeter(WELLS, _segments=5)
+    arguments = (np.array([0]), np.array([1500.]), np.array([200.]),
+                 np.array([np.nan]))
+    assert meter.bottomhole_pressures(*arguments)[0] != pytest.approx(
+        default.bottomhole_pressures(*arguments)[0], abs=1.)
+    assert meter.submit(record(meter, "A", 1., 1500.))
+    estimate, = meter.step(0)
+    assert estimate["liquid_flow_rate"] == pytest.approx(1500., rel=0.01)
+
+
+def test_bursts_are_coalesced(meter):
+    for second in range(1, 6):
+        meter.submit(record(meter, "A", float(second), 1000. + 100 * second))
+    assert not meter.submit(record(meter, "A", 2.5, 900.))
+    assert meter.pending() == 1
+    estimate, = meter.step(0)
+    assert estimate["coalesced"] == 4
+    assert estimate["time"] == 5.
+    assert estimate["liquid_flow_rate"] == pytest.approx(1500., rel=0.01)
+    # Older than the last estimate
+    assert not meter.submit(record(meter, "A", 4., 900.))
+    assert meter.statistics["stale"] == 2
+    assert meter.statistics["solves"] == 1
+
+
+def test_invalid_records_are_rejected(meter):
+    assert not meter.submit({"well": "Z", "time": 1., "wellhead_pressure": 1.,
+                             "gauge_pressure": 2.})
+    assert not meter.submit({"well": "A", "time": 1.})
+    assert not meter.submit("{not json")
+    assert meter.statistics["rejected"] == 3
+    assert meter.pending() == 0
+
+
+def test_latency_deadline(meter):
+    meter.max_latency = 0.0
+    meter.submit(record(meter, "A", 1., 1500.))
+    estimate, = meter.step(0)
+    # The rate grid is evaluated, then the deadline stops the iterations
+    assert estimate["iterations"] == 0
+    assert 500. < estimate["liquid_flow_rate"] < 4000.
+
+
+def test_pressure_gap_is_bracketed():
+    wells = {"A": dict(WELLS["A"], depth=6000., bottomhole_temperature=180.)}
+    meter = flow_meter.FlowMeter(wells, _max_latency=60.)
+    # The flow pattern changes between these rates
+    low, high = meter.bottomhole_pressures(np.array([0, 0]),
+                                           np.array([1237., 1237.25]),
+                                           np.array([200., 200.]),
+                                           np.array([np.nan, np.nan]))
+    assert high - low > 5.
+    meter.submit({"well": "A", "time": 1., "wellhead_pressure": 200.,
+                  "gauge_pressure": (low + high) / 2})
+    estimate, = meter.step(0)
+    assert estimate["bracketed"] and estimate["converged"]
+    assert abs(estimate["residual"]) > meter.tolerance
+    assert estimate["liquid_flow_rate"] == pytest.approx(1237.1, abs=1.)
+    assert estimate["iterations"] < meter.max_iterations
+
+
+def test_missing_well_field():
+    with pytest.raises(KeyError):
+        flow_meter.FlowMeter({"A": {"depth": 1000.}})
+
+
+def test_tailed_file(meter, tmp_path):
+    path = tmp_path / "measurements.jsonl"
+    stop = threading.Event()
+    published = []
+
+    def publish(_estimate):
+        published.append(_estimate)
+        if len(published) == 2:
+            stop.set()
+
+    thread = threading.Thread(target=meter.run, args=(
+        flow_meter.tail(str(path), stop, 0.01), publish, stop, 0.01))
+    thread.start()
+    with open(path, "w") as output:
+        line = json.dumps(record(meter, "A", 1., 1200.)) + "\n"
+        output.write(line[:10])
+        output.flush()
+        time.sleep(0.05)
+        output.write(line[10:])
+        output.flush()
+        time.sleep(0.05)
+        output.write(json.dumps(record(meter, "B", 1., 2500.)) + "\n")
+    thread.join(30)
+    assert not thread.is_alive()
+    rates = {estimate["well"]: estimate["liquid_flow_rate"]
+             for estimate in published}
+    assert rates["A"] == pytest.approx(1200., rel=0.01)
+    assert rates["B"] == pytest.approx(2500., rel=0.01)
+
+
+def test_socket_records(tmp_path):
+    stop = threading.Event()
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        lines = []
+
+        def collect():
+            for line in flow_meter.socket_records(server, stop, 0.01):
+                lines.append(line)
+
+        thread = threading.Thread(target=collect)
+        thread.start()
+        for client in range(2):
+            with socket.create_connection(server.getsockname()) as sender:
+                sender.sendall(b'{"well": "A", "time": %d}\n{"well"' % client)
+                sender.sendall(b': "B"}')
+        deadline = time.monotonic() + 10
+        while len(lines) < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stop.set()
+        thread.join(10)
+    assert [json.loads(line)["well"] for line in lines] == ["A", "B"] * 2
@@ -0,0 +1,97 @@
+"""
+Forecast test
+"""
+
+import numpy as np
+import pytest
+from src import deviation
+from src import forecast
+from src import traverse
+
+WELL = (150., 100., 180., 6000., 2.441)
+
+
+@pytest.fixture(scope="module")
+def schedule():
+    steps = 60
+    reservoir_pressure = np.repeat(np.linspace(3500., 3300., steps // 3), 3)
+    water_cut = np.repeat(np.linspace(0.1, 0.2, steps // 10), 10)
+    ratio = np.repeat(np.linspace(500., 550., steps // 10), 10)
+    return reservoir_pressure, 0.8, water_cut, ratio
+
+
+def test_step_matches_ipr_and_traverse():
+    model = forecast.ProductionForecast(*WELL, _warm_start=False)
+    result = model.step(3500., 0.8, 0.1, 500.)
+    rate = result["liquid_flow_rate"]
+    bottomhole = traverse.bottomhole_pressure(150., 100., 180., 6000., 30.,
+                                              0.7, 1.07, 0.1, 500., rate,
+                                              2.441, 0.0006, 20)
+    assert result["bottomhole_pressure"] == pytest.approx(bottomhole,
+                                                          abs=0.01)
+    assert bottomhole == pytest.approx(3500. - rate / 0.8, abs=0.1)
+    assert len(result["pressures"]) == 21
+    assert len(result["flow_patterns"]) == 20
+
+
+def test_pvt_source():
+    source = deviation.DeviationPVT("hall_yarborough")
+    model = forecast.ProductionForecast(*WELL, _warm_start=False,
+                                        _pvt=source)
+    result = model.step(3500., 0.8, 0.1, 500.)
+    rate = result["liquid_flow_rate"]
+    bottomhole = traverse.bottomhole_pressure(150., 100., 180., 6000., 30.,
+                                              0.7, 1.07, 0.1, 500., rate,
+                                              2.441, 0.0006, 20, source)
+    assert result["bottomhole_pressure"] == pytest.approx(bottomhole,
+                                                          abs=0.01)
+    default = forecast.ProductionForecast(*WELL, _warm_start=False)
+    assert default.step(3500., 0.8, 0.1, 500.)["liquid_flow_rate"] != \
+        pytest.approx(rate, abs=1.)
+
+
+def test_unchanged_steps_are_skipped():
+    model = forecast.ProductionForecast(*WELL)
+    first = model.step(3500., 0.8, 0.1, 500.)
+    second = model.step(3500., 0.8, 0.1, 500.)
+    assert second is first
+    assert model.statistics["steps"] == 2
+    assert model.statistics["skipped"] == 1
+    assert model.statistics["solves"] == 1
+
+
+def test_warm_start_matches_cold(schedule):
+    warm = forecast.ProductionForecast(*WELL)
+    cold = forecast.ProductionForecast(*WELL, _warm_start=False)
+    warm_result = warm.run(*schedule)
+    cold_result = cold.run(*schedule)
+    assert np.allclose(warm_result["liquid_flow_rate"],
+                       cold_result["liquid_flow_rate"], atol=0.5)
+    assert np.allclose(warm_result["bottomhole_pressure"],
+                       cold_result["bottomhole_pressure"], atol=0.5)
+    statistics = warm.statistics
+    assert statistics["skipped"] == 36
+    assert statistics["warm_solves"] == statistics["solves"] - 1
+    assert statistics["traverses"] < cold.statistics["traverses"] / 2
+    assert statistics["bubble_point_evaluations"] == 20 * 6
+    assert statistics["property_reuses"] > 0
+    assert (statistics["property_evaluations"] <
+            cold.statistics["property_evaluations"] / 5)
+
+
+def test_dead_well():
+    model = forecast.ProductionForecast(*WELL)
+    result = model.step(1500., 0.8, 0.5, 100.)
+    assert result["liquid_flow_rate"] == 0.0
+    assert result["bottomhole_pressure"] == 1500.
+    result = model.step(3500., 0.8, 0.1, 500.)
+    assert result["liquid_flow_rate"] > 0
+
+
+def test_reset():
+    model = forecast.ProductionForecast(*WELL)
+    model.step(3500., 0.8, 0.1, 500.)
+    model.reset()
+    assert model.statistics["steps"] == 0
+    model.step(3500., 0.8, 0.1, 500.)
+    assert model.statistics["skipped"] == 0
@@ -0,0 +1,99 @@
+"""
+Frame test
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from src import correlations
+from src import frame
+from src import traverse
+
+COLUMNS = {
+    "pressure": "p",
+    "oil_api_gravity": "api",
+    "gas_specific_gravity": 0.75,
+    "diameter": 2.441,
+    "inclination": 90.,
+    "rugosity": 0.0006,
+}
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(3)
+    size = 200
+    return pd.DataFrame({
+        "p": rng.uniform(100., 4000., size),
+        "temperature": rng.uniform(80., 200., size),
+        "api": rng.uniform(20., 40., size),
+        "water_specific_gravity": 1.07,
+        "water_cut": rng.uniform(0., 0.8, size),
+        "production_gas_liquid_ratio": rng.uniform(100., 1500., size),
+        "liquid_flow_rate": rng.uniform(200., 3000., size),
+    })
+
+
+def test_matches_scalar_chain(data):
+    result = frame.pressure_gradient(data, COLUMNS)
+    assert len(result) == len(data)
+    for i in range(0, len(data), 20):
+        row = data.iloc[i]
+        bubble_point = correlations.mixture_bubble_point(
+            row.temperature, 0.75, row.api, row.water_cut,
+            row.production_gas_liquid_ratio)
+        gravitational, frictional, pattern = traverse.pressure_gradient(
+            row.p, row.temperature, bubble_point, row.api, 0.75, 1.07,
+            row.water_cut, row.production_gas_liquid_ratio,
+            row.liquid_flow_rate, 2.441, 90., 0.0006)
+        assert result.bubble_point.iloc[i] == pytest.approx(bubble_point)
+        assert result.gravitational_pressure_gradient.iloc[i] == \
+            pytest.approx(gravitational)
+        assert result.frictional_pressure_gradient.iloc[i] == \
+            pytest.approx(frictional)
+        assert result.flow_pattern.iloc[i] == pattern.name
+
+
+def test_fluid_properties(data):
+    result = frame.fluid_properties(data, COLUMNS, _prefix="pvt_")
+    row = data.iloc[0]
+    bubble_point = result.pvt_bubble_point.iloc[0]
+    expected = traverse.fluid_properties(
+        row.p, row.temperature, bubble_point, row.api, 0.75, 1.07,
+        row.water_cut, row.production_gas_liquid_ratio)
+    for name, value in expected.items():
+        assert result["pvt_" + name].iloc[0] == pytest.approx(value)
+    assert "pvt_gas_deviation_factor" in result
+    assert "flow_pattern" not in result
+    assert "pvt_gas_solubility_in_oil" not in data
+
+
+def test_flow_pattern_is_categorical(data):
+    result = frame.pressure_gradient(data, COLUMNS)
+    assert isinstance(result.flow_pattern.dtype, pd.CategoricalDtype)
+    assert list(result.flow_pattern.cat.categories) == frame.FLOW_PATTERNS
+
+
+def test_bubble_point_column(data):
+    given = data.assign(bubble_point=1000.)
+    result = frame.fluid_properties(given, COLUMNS)
+    assert (result.bubble_point == 1000.).all()
+
+
+def test_inputs_are_not_copied(data):
+    values = frame._inputs(data, COLUMNS, frame.INPUTS)
+    assert np.shares_memory(values["pressure"], data["p"].to_numpy())
+    assert values["gas_specific_gravity"] == 0.75
+
+
+def test_inplace(data):
+    copy = data.copy()
+    result = frame.fluid_properties(copy, COLUMNS, _inplace=True)
+    assert result is copy
+    assert "oil_density" in copy
+
+
+def test_missing_columns(data):
+    with pytest.raises(KeyError, match="diameter"):
+        frame.pressure_gradient(data, {"pressure": "p", "oil_api_gravity":
+                                       "api", "gas_specific_gravity": 0.75})
@@ -0,0 +1,77 @@
+"""
+Friction test
+"""
+
+import math
+import numpy as np
+import pytest
+from src import formulas
+from src import friction
+from src import traverse
+from src import vectorized
+
+
+@pytest.fixture(scope="module")
+def table():
+    return friction.FrictionTable(0.000902255639097744, 1e-6)
+
+
+def test_error_bound(table):
+    reynolds = np.exp(np.random.default_rng(3).uniform(math.log(10),
+                                                       math.log(1e9),
+                                                       200000))
+    exact = vectorized.moody_friction_factor(reynolds, table.rugosity)
+    assert table.max_error <= table.tolerance
+    assert np.max(np.abs(table.evaluate(reynolds) / exact - 1)) <= 1e-6
+
+
+def test_tolerance_not_met():
+    with pytest.raises(ValueError):
+        friction.FrictionTable(0.0006, 1e-12, _max_points=1024)
+
+
+def test_scalar_lookup(table):
+    for reynolds in (50., 2100., 3500., 10.3e3, 2.5e5, 7.7e7):
+        exact = formulas.moody_friction_factor(reynolds, table.rugosity)
+        assert table(reynolds) == pytest.approx(exact, 1e-6)
+
+
+def test_fallback_outside_table(table):
+    for reynolds in (1., 5., 2e9):
+        exact = formulas.moody_friction_factor(reynolds, table.rugosity)
+        assert table(reynolds) == exact
+    values = table.evaluate(np.array([5., 2e9]))
+    assert list(values) == list(vectorized.moody_friction_factor(
+        np.array([5., 2e9]),
+        table.rugosity
+    ))
+
+
+def test_vectorized_exact():
+    reynolds = [12., 1500., 4000., 2.2e4, 3e6]
+    expected = [formulas.moody_friction_factor(value, 0.0006)
+                for value in reynolds]
+    result = vectorized.moody_friction_factor(np.array(reynolds), 0.0006)
+    assert list(result) == pytest.approx(expected, 1e-14)
+
+
+def test_friction_table_cache():
+    friction.clear_friction_tables()
+    first = friction.friction_table(0.0006)
+    assert friction.friction_table(0.0006) is first
+    assert friction.friction_table(0.0007) is not first
+    assert friction.moody_friction_factor(1e5, 0.0006) == first(1e5)
+
+
+def test_traverse_with_table(table):
+    arguments = (
+        200.,
+        [500.] * 10,
+        [90.] * 10,
+        traverse.linear_temperatures(100., 175., 10),
+        25., 0.65, 1.07, 0.3, 300., 600., 1.995, table.rugosity
+    )
+    exact, _ = traverse.traverse(*arguments, _against_flow=True)
+    tabled, _ = traverse.traverse(*arguments, _against_flow=True,
+                                  _friction_table=table)
+    assert tabled == pytest.approx(exact, 1e-6)
@@ -0,0 +1,100 @@
+"""
+Fused test
+"""
+
+import numpy as np
+import pytest
+from src import fused
+from src import vectorized
+
+
+@pytest.fixture(scope="module")
+def inputs():
+    rng = np.random.default_rng(3)
+    size = 10000
+    return {
+        "pressure": rng.uniform(50., 5000., size),
+        "bubble_point": rng.uniform(500., 3000., size),
+        "temperature": rng.uniform(80., 250., size),
+        "solubility": rng.uniform(10., 1000., size),
+        "api": rng.uniform(15., 45., size),
+        "gravity": rng.uniform(0.6, 1.2, size),
+        "density": rng.uniform(0.5, 15., size),
+        "reynolds": np.exp(rng.uniform(np.log(100.), np.log(1e7), size)),
+    }
+
+
+def calls(_inputs):
+    return {
+        "live_oil_viscosity": (_inputs["pressure"], _inputs["bubble_point"],
+                               _inputs["temperature"], _inputs["solubility"],
+                               _inputs["api"]),
+        "gas_viscosity": (_inputs["temperature"], _inputs["gravity"],
+                          _inputs["density"]),
+        "water_compressibility": (_inputs["pressure"],
+                                  _inputs["bubble_point"],
+                                  _inputs["temperature"],
+                                  _inputs["solubility"] / 50),
+        "moody_friction_factor": (_inputs["reynolds"], 0.0006),
+    }
+
+
+@pytest.mark.parametrize("name", sorted(fused.EXPRESSIONS))
+def test_numexpr_matches_numpy(inputs, name):
+    pytest.importorskip("numexpr")
+    function = getattr(vectorized, name)
+    arguments = calls(inputs)[name]
+    expected = function(*arguments, _backend="numpy")
+    result = function(*arguments, _backend="numexpr")
+    assert np.allclose(result, expected, rtol=1e-13, atol=0)
+    # Elements below the bubble point are zero, as with NumPy
+    if name == "water_compressibility":
+        below = inputs["pressure"] < inputs["bubble_point"]
+        assert (result[below] == 0).all()
+
+
+def test_global_backend(inputs):
+    pytest.importorskip("numexpr")
+    arguments = (inputs["pressure"], inputs["temperature"],
+                 inputs["bubble_point"], inputs["api"], 0.75, 1.07, 0.3, 600.)
+    expected = vectorized.fluid_properties(*arguments)
+    previous = fused.set_backend("numexpr")
+    try:
+        assert fused.backend() == "numexpr"
+        assert fused.backend("numpy") == "numpy"
+        result = vectorized.fluid_properties(*arguments)
+    finally:
+        fused.set_backend(previous)
+    assert fused.backend() == "numpy"
+    for name in ("oil_viscosity", "gas_viscosity",
+                 "water_formation_volume_factor"):
+        assert np.allclose(result[name], expected[name], rtol=1e-13)
+
+
+def test_fallback_without_numexpr(inputs, monkeypatch):
+    monkeypatch.setattr(fused, "_numexpr", lambda: None)
+    assert not fused.available()
+    assert fused.backend("numexpr") == "numpy"
+    assert fused.backend("auto") == "numpy"
+    arguments = calls(inputs)["moody_friction_factor"]
+    assert np.array_equal(
+        vectorized.moody_friction_factor(*arguments, _backend="numexpr"),
+        vectorized.moody_friction_factor(*arguments, _backend="numpy"))
+    assert fused.benchmark(100, 1)["gas_viscosity"]["numexpr"] is None
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        fused.set_backend("cuda")
+    with pytest.raises(ValueError):
+        fused.backend("cuda")
+
+
+def test_benchmark():
+    pytest.importorskip("numexpr")
+    results = fused.benchmark(1000, 1)
+    assert set(results) == set(fused.EXPRESSIONS)
+    for result in results.values():
+        assert result["numpy"] > 0 and result["numexpr"] > 0
+        assert result["speedup"] == result["numpy"] / result["numexpr"]
+        assert result["max_relative_difference"] < 1e-13
@@ -0,0 +1,132 @@
+"""
+Monte Carlo test
+"""
+
+import numpy as np
+import pytest
+from src import deviation
+from src import monte_carlo
+from src import traverse
+
+
+@pytest.fixture(scope="module")
+def distributions():
+    return {
+        "oil_api_gravity": monte_carlo.Uniform(25, 35),
+        "gas_specific_gravity": monte_carlo.Normal(0.7, 0.05, 0.6, 0.8),
+        "water_cut": monte_carlo.Triangular(0.1, 0.3, 0.6),
+        "production_gas_liquid_ratio": monte_carlo.LogNormal(5.5, 0.3),
+        "rugosity": monte_carlo.Constant(0.0006),
+    }
+
+
+@pytest.fixture(scope="module")
+def model():
+    return monte_carlo.WellModel(200., 100., 180., 6000., 2.441,
+                                 _liquid_flow_rate=800., _segments=8)
+
+
+def test_running_moments():
+    values = np.random.default_rng(1).normal(10, 2, 10001)
+    moments = monte_carlo.RunningMoments()
+    for chunk in np.array_split(values, 7):
+        moments.update(chunk)
+    assert moments.count == values.size
+    assert moments.mean == pytest.approx(values.mean())
+    assert moments.variance == pytest.approx(values.var(ddof=1))
+    assert moments.minimum == values.min()
+    assert moments.maximum == values.max()
+
+
+def test_tdigest():
+    values = np.random.default_rng(2).lognormal(0, 1, 200000)
+    digest = monte_carlo.TDigest()
+    for chunk in np.array_split(values, 20):
+        digest.update(chunk)
+    assert digest.count == values.size
+    assert digest.means.size <= digest.compression
+    for quantile in (0.01, 0.1, 0.5, 0.9, 0.99):
+        expected = np.quantile(values, quantile)
+        assert digest.quantile(quantile) == pytest.approx(expected, 1e-2)
+
+
+def test_chunk_generator():
+    first = monte_carlo.chunk_generator(3, 5).random(4)
+    second = monte_carlo.chunk_generator(3, 5).random(4)
+    other = monte_carlo.chunk_generator(3, 6).random(4)
+    assert list(first) == list(second)
+    assert list(first) != list(other)
+
+
+def test_well_model(model):
+    samples = {"oil_api_gravity": np.array([25., 35.]),
+               "water_cut": np.array([0.1, 0.5])}
+    outputs = model(samples)
+    for i in range(2):
+        expected = traverse.traverse(
+            200.,
+            [6000. / 8] * 8,
+            [90.] * 8,
+            traverse.linear_temperatures(100., 180., 8),
+            samples["oil_api_gravity"][i],
+            0.7,
+            1.07,
+            samples["water_cut"][i],
+            100.,
+            800.,
+            2.441,
+            0.0006,
+            _against_flow=True
+        )[0][-1]
+        assert outputs["bottomhole_pressure"][i] == pytest.approx(expected)
+    assert outputs["flow_pattern"].shape == (2, 8)
+
+
+def test_well_model_operating_point():
+    model = monte_carlo.WellModel(200., 100., 180., 6000., 2.441,
+                                  _reservoir_pressure=3000.,
+                                  _productivity_index=1.5,
+                                  _segments=8)
+    outputs = model({"water_cut": np.array([0.2, 0.4])})
+    inflow = 3000. - outputs["liquid_flow_rate"] / 1.5
+    assert outputs["bottomhole_pressure"] == pytest.approx(inflow, abs=0.5)
+    assert (outputs["liquid_flow_rate"] > 0).all()
+
+
+def test_well_model_pvt_source():
+    source = deviation.DeviationPVT("hall_yarborough")
+    model = monte_carlo.WellModel(200., 100., 180., 6000., 2.441,
+                                  _liquid_flow_rate=800., _segments=8,
+                                  _pvt=source)
+    outputs = model({"water_cut": np.array([0.1, 0.5])})
+    for i, water_cut in enumerate((0.1, 0.5)):
+        expected = traverse.bottomhole_pressure(200., 100., 180., 6000., 30.,
+                                                0.7, 1.07, water_cut, 100.,
+                                                800., 2.441, 0.0006, 8,
+                                                source)
+        assert outputs["bottomhole_pressure"][i] == pytest.approx(
+            expected, abs=0.5)
+
+
+def test_monte_carlo(distributions, model):
+    result = monte_carlo.monte_carlo(distributions, model, 1000,
+                                     _chunk_size=300, _seed=11)
+    assert result.samples == 1000
+    assert result.moments["bottomhole_pressure"].count == 1000
+    percentiles = result.percentiles("bottomhole_pressure")
+    assert percentiles["P10"] < percentiles["P50"] < percentiles["P90"]
+    assert result.histogram.counts.sum() == 1000 * 8
+    assert sum(result.histogram.fractions().values()) == pytest.approx(1)
+
+
+def test_monte_carlo_is_reproducible(distributions, model):
+    serial = monte_carlo.monte_carlo(distributions, model, 600,
+                                     _chunk_size=200, _seed=5)
+    parallel = monte_carlo.monte_carlo(distributions, model, 600,
+                                       _chunk_size=200, _seed=5,
+                                       _processes=2)
+    assert (serial.moments["bottomhole_pressure"].mean ==
+            parallel.moments["bottomhole_pressure"].mean)
+    assert (serial.percentiles("bottomhole_pressure") ==
+            parallel.percentiles("bottomhole_pressure"))
+    assert list(serial.histogram.counts) == list(parallel.histogram.counts)
@@ -0,0 +1,190 @@
+"""
+Network test
+"""
+
+import numpy as np
+import pytest
+from src import deviation
+from src import network
+from src import traverse
+
+
+WELLS = [
+    ("w0", 4000., 1.0, 6000., 30., 0.2, 500.),
+    ("w1", 3800., 0.8, 5500., 28., 0.1, 650.),
+    ("w2", 4200., 1.5, 6500., 33., 0.3, 400.),
+]
+
+# Two of these wells have their tubing curve jump across the IPR
+JUMP_WELLS = [
+    ("w0", 4015., 1.04, 5869., 29.9, 0.297, 558.),
+    ("w1", 4070., 1.03, 6180., 28.6, 0.110, 612.5),
+    ("w2", 3804., 1.49, 6327., 31.9, 0.110, 452.),
+    ("w3", 4140., 1.10, 6127., 28.6, 0.137, 524.),
+]
+
+
+def build(_wells, _trunk_diameter=10.0):
+    net = network.Network()
+    net.add_sink("separator", 150.)
+    net.add_junction("manifold")
+    net.add_pipe("trunkline", "manifold", "separator",
+                 [2000., 2000., 2000.], [2., -3., 0.], _trunk_diameter)
+    for name, pressure, index, depth, api, water_cut, ratio in _wells:
+        net.add_well(name, pressure, index, depth, 2.441, api, 0.7, 1.07,
+                     water_cut, ratio)
+        net.add_pipe("f" + name, name, "manifold",
+                     [500., 500.], [-2., 1.], 3.0)
+    return net
+
+
+@pytest.fixture(scope="module")
+def solved():
+    net = build(WELLS)
+    return net, net.solve()
+
+
+def test_converges(solved):
+    _, solution = solved
+    assert solution.converged
+    assert solution.residual < 0.01
+    assert solution.pressures["separator"] == 150.
+    assert set(solution.status.values()) == {"converged"}
+
+
+def test_bracketed_wells():
+    net = build(JUMP_WELLS)
+    solution = net.solve()
+    assert solution.converged
+    assert solution.residual < 0.01
+    bracketed = [key for key, value in solution.status.items()
+                 if value == "bracketed"]
+    assert bracketed and set(bracketed) <= set(net.well_names)
+    for well in bracketed:
+        # The residual changes sign, by far more than the tolerance, within
+        # the rate tolerance of the solved rate
+        index = net.well_names.index(well)
+        rate = solution.rates[well]
+        residuals = net._well_residuals(
+            np.array([index, index]),
+            np.full(2, solution.pressures[well]),
+            np.array([rate - 0.01, rate + 0.01]))
+        assert residuals[0] < -0.01 and residuals[1] > 0.01
+        assert solution.rates["f" + well] == pytest.approx(rate, abs=0.01)
+
+
+def test_undersized_trunkline(solved):
+    # The unconstrained well rates march a 2" trunkline below vacuum
+    net = build(WELLS, 2.0)
+    solution = net.solve()
+    assert solution.converged
+    assert solution.residual < 0.01
+    assert set(solution.status.values()) == {"converged"}
+    total = sum(solution.rates[well[0]] for well in WELLS)
+    assert solution.rates["trunkline"] == pytest.approx(total, abs=0.01)
+    # The backpressure chokes the wells well below their 10" trunk rates
+    assert solution.pressures["manifold"] > 1000.
+    assert total < 0.5 * solved[1].rates["trunkline"]
+
+
+def test_mass_balance(solved):
+    _, solution = solved
+    total = sum(solution.rates[well[0]] for well in WELLS)
+    assert solution.rates["trunkline"] == pytest.approx(total, abs=0.01)
+    for well in WELLS:
+        assert solution.rates["f" + well[0]] == pytest.approx(
+            solution.rates[well[0]], abs=0.01)
+
+
+def test_wells_on_ipr(solved):
+    net, solution = solved
+    for name, pressure, index, *_ in WELLS:
+        inflow = pressure - solution.rates[name] / index
+        assert solution.bottomhole_pressures[name] == pytest.approx(
+            inflow, abs=0.01)
+        parameters = net.wells[name]
+        bottomhole = traverse.bottomhole_pressure(
+            solution.pressures[name],
+            parameters["wellhead_temperature"],
+            parameters["bottomhole_temperature"],
+            parameters["depth"],
+            parameters["oil_api_gravity"],
+            parameters["gas_specific_gravity"],
+            parameters["water_specific_gravity"],
+            parameters["water_cut"],
+            parameters["production_gas_liquid_ratio"],
+            solution.rates[name],
+            parameters["diameter"],
+            parameters["rugosity"],
+            net.well_segments
+        )
+        assert bottomhole == pytest.approx(
+            solution.bottomhole_pressures[name], abs=1.)
+
+
+def test_pipe_pressure_drop(solved):
+    net, solution = solved
+    fluid = net._compositions(np.array(
+        [solution.pressures[node] for node in net.free_nodes] +
+        [solution.rates[pipe] for pipe in net.pipe_names] +
+        [solution.rates[well] for well in net.well_names]
+    ))
+    index = net.pipe_names.index("trunkline")
+    outlet = net._pipe_traverse(np.array([index]),
+                                np.array([solution.pressures["manifold"]]),
+                                np.array([solution.rates["trunkline"]]),
+                                fluid)
+    assert outlet[0] == pytest.approx(150., abs=0.01)
+    assert solution.pressures["manifold"] > 150.
+
+
+def test_invalid_networks():
+    net = network.Network()
+    net.add_sink("separator", 100.)
+    net.add_junction("a")
+    net.add_junction("b")
+    net.add_pipe("ab", "a", "b", [100.], [0.], 4.0)
+    net.add_pipe("ba", "b", "a", [100.], [0.], 4.0)
+    with pytest.raises(ValueError):
+        net.solve()
+    with pytest.raises(ValueError):
+        net.add_pipe("out", "separator", "a", [100.], [0.], 4.0)
+    with pytest.raises(ValueError):
+        net.add_junction("a")
+
+
+def test_solve_sparse():
+    rows = [0, 0, 1, 1, 1]
+    cols = [0, 1, 0, 1, 1]
+    values = [2., 1., 1., 1., 2.]
+    solution = network.solve_sparse((rows, cols, values),
+                                    np.array([3., 4.]), 2)
+    assert np.allclose(solution, np.linalg.solve([[2., 1.], [1., 3.]],
+                                                 [3., 4.]))
+
+
+def test_pvt_source():
+    source = deviation.DeviationPVT("hall_yarborough")
+    net = build(WELLS[:1])
+    net.pvt = source
+    solution = net.solve()
+    assert solution.converged
+    parameters = net.wells["w0"]
+    bottomhole = traverse.bottomhole_pressure(
+        solution.pressures["w0"],
+        parameters["wellhead_temperature"],
+        parameters["bottomhole_temperature"],
+        parameters["depth"],
+        parameters["oil_api_gravity"],
+        parameters["gas_specific_gravity"],
+        parameters["water_specific_gravity"],
+        parameters["water_cut"],
+        parameters["production_gas_liquid_ratio"],
+        solution.rates["w0"],
+        parameters["diameter"],
+        parameters["rugosity"],
+        net.well_segments,
+        source
+    )
+    assert bottomhole == pytest.approx(
+        solution.bottomhole_pressures["w0"], abs=1.)
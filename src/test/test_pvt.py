@@ -0,0 +1,182 @@
+"""
+PVT test
+"""
+
+import numpy as np
+import pytest
+from src import correlations
+from src import pvt
+from src import traverse
+from src import vectorized
+
+DECK = """
+-- Lab tables, FIELD units
+RUNSPEC
+TITLE
+  test deck /
+
+DENSITY
+-- oil water gas
+  53.0 64.0 0.06 /
+
+PVTW
+  3000 1.02 3.0E-6 0.5 0.0 /
+
+PVDG
+-- P Bg Vg
+   14.7  200.0  0.012
+  1014.7   2.5  0.014
+  3014.7   0.8  0.022 /
+
+PVTO
+-- Rs   P      Bo    Vo
+  0.01  14.7  1.05  2.5 /
+  0.2   1014.7 1.15 1.2
+        3014.7 1.12 1.4 /
+  0.5   2514.7 1.30 0.8 /
+  0.8   4014.7 1.45 0.6
+        6014.7 1.42 0.7 /
+/
+"""
+
+
+@pytest.fixture(scope="module")
+def deck_table():
+    return pvt.BlackOilTable.from_keywords(pvt.parse(DECK))
+
+
+@pytest.fixture(scope="module")
+def correlation_table():
+    pressures = np.concatenate([[0., 25., 50., 100., 150.],
+                                np.arange(200., 6001., 100.)])
+    return pvt.BlackOilTable.from_correlations(150., 30., 0.7, 1.07,
+                                               pressures)
+
+
+def test_parse(deck_table):
+    keywords = pvt.parse(DECK)
+    assert set(keywords) == {"DENSITY", "PVTW", "PVDG", "PVTO"}
+    assert len(keywords["PVTO"]) == 5
+    assert keywords["PVTO"][-1] == []
+    assert deck_table.saturated.points.tolist() == pytest.approx(
+        [0., 1000., 2500., 4000.])
+    assert deck_table.saturated_ratio.tolist() == [10., 200., 500., 800.]
+    assert deck_table.gas_specific_gravity == pytest.approx(0.06 / 0.0764106)
+
+
+def test_saturated_oil(deck_table):
+    ratio, factor, viscosity = deck_table.oil_properties(500., 2500.)
+    assert ratio == pytest.approx(105.)
+    assert factor == pytest.approx(1.10)
+    assert viscosity == pytest.approx(1.85)
+    assert deck_table.bubble_point(350.) == pytest.approx(1750.)
+
+
+def test_undersaturated_oil(deck_table):
+    # On a record with its own branch
+    ratio, factor, viscosity = deck_table.oil_properties(2000., 1000.)
+    assert ratio == pytest.approx(200.)
+    assert factor == pytest.approx(1.15 * (1 + 0.5 * (1.12 / 1.15 - 1)))
+    assert viscosity == pytest.approx(1.2 * (1 + 0.5 * (1.4 / 1.2 - 1)))
+    # Records without a branch borrow the next one: the 500 scf/stb record
+    # uses the 800 scf/stb branch
+    _, factor, _ = deck_table.oil_properties(3500., 2500.)
+    assert factor == pytest.approx(1.30 * (1 + 0.5 * (1.42 / 1.45 - 1)))
+    # Between records the branches are interpolated
+    _, factor, _ = deck_table.oil_properties(2750., 1750.)
+    lower = 1 + 0.5 * (1.12 / 1.15 - 1)
+    upper = 1 + 0.5 * (1.42 / 1.45 - 1)
+    assert factor == pytest.approx(1.225 * (lower + upper) / 2)
+
+
+def test_gas_and_water(deck_table):
+    factor, viscosity = deck_table.gas_properties(1000.)
+    assert factor == pytest.approx(2.5e-3)
+    assert viscosity == pytest.approx(0.014)
+    factor, viscosity = deck_table.water_properties(2985.3)
+    assert factor == pytest.approx(1.02)
+    assert viscosity == pytest.approx(0.5)
+
+
+def test_scalars_match_arrays(deck_table):
+    rng = np.random.default_rng(2)
+    pressure = rng.uniform(0., 7000., 200)
+    bubble_point = rng.uniform(0., 5000., 200)
+    properties = deck_table.fluid_properties(pressure, 150., bubble_point,
+                                             30., 0.7, 1.07, 0.2, 300.)
+    for i in range(0, 200, 23):
+        expected = deck_table.fluid_properties(pressure[i], 150.,
+                                               bubble_point[i], 30., 0.7,
+                                               1.07, 0.2, 300.)
+        for name, value in expected.items():
+            assert np.broadcast_to(properties[name], (200,))[i] == \
+                pytest.approx(value, rel=1e-12)
+
+
+def test_export_round_trip(tmp_path, correlation_table):
+    path = str(tmp_path / "fluid.inc")
+    correlation_table.write(path)
+    table = pvt.read(path)
+    assert table.densities == pytest.approx(correlation_table.densities)
+    pressure = np.linspace(0., 6500., 300)
+    expected = correlation_table.fluid_properties(pressure, 150., 2000., 30.,
+                                                  0.7, 1.07, 0., 300.)
+    result = table.fluid_properties(pressure, 150., 2000., 30., 0.7, 1.07, 0.,
+                                    300.)
+    for name, values in expected.items():
+        np.testing.assert_allclose(result[name], values, rtol=1e-8,
+                                   atol=1e-6)
+
+
+def test_matches_correlations(correlation_table):
+    bubble_point = correlations.mixture_bubble_point(150., 0.7, 30., 0., 300.)
+    assert correlation_table.mixture_bubble_point(150., 0.7, 30., 0., 300.) \
+        == pytest.approx(bubble_point, rel=1e-3)
+    pressure = np.linspace(0., 5000., 501)
+    expected = vectorized.fluid_properties(pressure, 150., bubble_point, 30.,
+                                           0.7, 1.07, 0., 300.)
+    result = correlation_table.fluid_properties(pressure, 150., bubble_point,
+                                                30., 0.7, 1.07, 0., 300.)
+    for name in ("gas_solubility_in_oil",
+                 "oil_formation_volume_factor",
+                 "oil_viscosity",
+                 "gas_formation_volume_factor",
+                 "gas_viscosity",
+                 "water_formation_volume_factor"):
+        np.testing.assert_allclose(result[name], expected[name], rtol=0.01)
+
+
+def test_traverse_with_table(correlation_table):
+    temperatures = [150.] * 21
+    arguments = (200., [400.] * 20, [90.] * 20, temperatures, 30., 0.7, 1.07,
+                 0., 300., 1500., 2.5, 0.0006)
+    expected, _ = traverse.traverse(*arguments, _against_flow=True)
+    pressures, patterns = traverse.traverse(*arguments, _against_flow=True,
+                                            _pvt=correlation_table)
+    assert pressures[-1] == pytest.approx(expected[-1], rel=0.005)
+    arrays, array_patterns = vectorized.traverse(
+        *arguments[:8], np.array([300., 300.]), *arguments[9:],
+        _against_flow=True, _pvt=correlation_table)
+    np.testing.assert_allclose(arrays[:, -1], pressures[-1], rtol=1e-9)
+    assert array_patterns[0].tolist() == [pattern.value
+                                          for pattern in patterns]
+
+
+def test_correlation_source():
+    source = pvt.CorrelationPVT()
+    assert source.mixture_bubble_point(150., 0.7, 30., 0.2, 300.) == \
+        correlations.mixture_bubble_point(150., 0.7, 30., 0.2, 300.)
+    expected = traverse.fluid_properties(1000., 150., 1500., 30., 0.7, 1.07,
+                                         0.2, 300.)
+    assert traverse.fluid_properties(1000., 150., 1500., 30., 0.7, 1.07, 0.2,
+                                     300., source) == expected
+
+
+def test_invalid_tables():
+    with pytest.raises(ValueError):
+        pvt.BlackOilTable.from_keywords(pvt.parse("PVDG\n14.7 200 0.01 /"))
+    with pytest.raises(ValueError):
+        pvt.parse("PVTW\n3*1.0 /")
+    with pytest.raises(ValueError):
+        pvt.BlackOilTable.from_keywords(pvt.parse(
+            DECK.replace("2514.7 1.30", "514.7 1.30")))
@@ -0,0 +1,120 @@
+"""
+Shared test
+"""
+
+import multiprocessing
+import os
+import pickle
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pytest
+from src import batch
+from src import deviation
+from src import friction
+from src import shared
+
+
+@pytest.fixture(scope="module")
+def wells():
+    catalog = batch.FluidCatalog()
+    catalog.add(30., 0.75, 1.07, 0.3, 600.)
+    catalog.add(22., 0.65, 1.02, 0.0, 150.)
+    rng = np.random.default_rng(2)
+    size = 60
+    return batch.WellBatch(catalog, rng.integers(0, 2, size),
+                           rng.uniform(100., 300., size), 100., 180.,
+                           6000., 2.441, rng.uniform(300., 2000., size))
+
+
+def _table_task(_handle, _reynolds):
+    return shared.attach_friction_table(_handle).evaluate(_reynolds)
+
+
+def test_attach_reads_without_copying():
+    values = np.arange(10.)
+    with shared.SharedArrays.create({"values": values,
+                                     "codes": np.arange(3, dtype=np.int8)},
+                                    {"unit": "psi"}) as block:
+        attached = shared.attach(block.handle)
+        assert attached.metadata == {"unit": "psi"}
+        assert np.array_equal(attached["values"], values)
+        assert attached["codes"].dtype == np.int8
+        assert not attached["values"].flags.writeable
+        block["values"][0] = 42.
+        assert attached["values"][0] == 42.
+        assert shared.attach(block.handle) is attached
+        shared.detach(block.name)
+
+
+def test_reference_counting():
+    block = shared.SharedArrays.create({"values": np.ones(4)})
+    handle = block.handle
+    block.acquire()
+    block.release()
+    shared.attach(handle)
+    shared.detach(handle.name)
+    block.release()
+    with pytest.raises(FileNotFoundError):
+        shared.attach(handle)
+
+
+def test_handle_is_small(wells):
+    with shared.share_batch(wells) as block:
+        assert len(pickle.dumps(block.handle)) < len(pickle.dumps(wells))
+        attached = shared.attach_batch(block.handle)
+        assert np.array_equal(attached.fluid, wells.fluid)
+        assert attached.catalog.fluid(1) == wells.catalog.fluid(1)
+        assert np.array_equal(attached.bottomhole_pressure(5),
+                              wells.bottomhole_pressure(5))
+        shared.detach(block.name)
+
+
+def test_friction_table_in_workers():
+    table = friction.FrictionTable(0.0006)
+    reynolds = np.geomspace(100., 1e8, 50)
+    with shared.share_friction_table(table) as block:
+        with multiprocessing.Pool(2) as pool:
+            results = pool.starmap(_table_task, [(block.handle, reynolds)] * 4)
+    for result in results:
+        assert np.array_equal(result, table.evaluate(reynolds))
+
+
+def test_bottomhole_pressure(wells):
+    expected = wells.bottomhole_pressure(5)
+    result = shared.bottomhole_pressure(wells, 5, 2, 16)
+    assert np.array_equal(result, expected)
+
+
+def test_pvt_source(wells):
+    catalog = batch.FluidCatalog(deviation.DeviationPVT("hall_yarborough"))
+    for index in range(len(wells.catalog)):
+        catalog.add(*wells.catalog.fluid(index).values())
+    deviated = batch.WellBatch(catalog, wells.fluid,
+                               *(getattr(wells, name)
+                                 for name in batch.WellBatch.FIELDS))
+    expected = deviated.bottomhole_pressure(5)
+    result = shared.bottomhole_pressure(deviated, 5, 2, 16)
+    assert np.allclose(result, expected, rtol=1e-9)
+    # The correlations alone give other pressures
+    assert not np.allclose(result, wells.bottomhole_pressure(5), atol=1.)
+
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="POSIX only")
+def test_cleanup_after_crash():
+    script = ("import os, numpy as np; from src import shared; "
+              "block = shared.SharedArrays.create({'x': np.ones(8)}); "
+              "print(block.name, flush=True); os.kill(os.getpid(), 9)")
+    root = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    process = subprocess.run([sys.executable, "-c", script], cwd=root,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True)
+    path = os.path.join("/dev/shm", process.stdout.strip().lstrip("/"))
+    for _ in range(50):
+        if not os.path.exists(path):
+            break
+        time.sleep(0.1)
+    assert not os.path.exists(path)
@@ -0,0 +1,90 @@
+"""
+Specialize test
+"""
+
+import numpy as np
+import pytest
+from src import correlations
+from src import friction
+from src import specialize
+from src import traverse
+
+FLUIDS = [
+    (30., 0.75, 1.07, 0.3, 600.),
+    (18., 0.65, 1.02, 0.0, 80.),
+    (42., 1.05, 1.10, 0.9, 2500.),
+]
+
+
+def outcome(_function, *_args):
+    # The generic chain raises on a few extreme inputs (e.g. a zero liquid
+    # holdup); the specialized one must raise the same way.
+    try:
+        return _function(*_args)
+    except (ArithmeticError, ValueError) as error:
+        return type(error)
+
+
+@pytest.mark.parametrize("fluid", FLUIDS)
+def test_identical_to_generic_chain(fluid):
+    kernel = specialize.compile_kernel(*fluid)
+    rng = np.random.default_rng(7)
+    for _ in range(300):
+        temperature = rng.uniform(60., 250.)
+        bubble_point = correlations.mixture_bubble_point(
+            temperature, fluid[1], fluid[0], fluid[3], fluid[4])
+        arguments = (rng.uniform(0., 6000.),
+                     temperature,
+                     bubble_point,
+                     rng.uniform(10., 5000.),
+                     rng.uniform(2., 12.),
+                     rng.uniform(-90., 90.),
+                     rng.uniform(1e-5, 1e-3))
+        expected = outcome(traverse.pressure_gradient,
+                           *arguments[:3], *fluid, *arguments[3:])
+        assert outcome(kernel, *arguments) == expected
+
+
+def test_constants_are_folded():
+    source = specialize.generate(*FLUIDS[0])
+    assert "_oil_api_gravity" not in source
+    assert "_gas_specific_gravity" not in source
+    assert repr(0.0125 * 30.) in source
+    assert repr(10 ** (3.0324 - 0.02023 * 30.)) in source
+    assert source.count("_pressure + 14.7") == 1
+
+
+def test_friction_table():
+    fluid = FLUIDS[0]
+    table = friction.friction_table(0.0006)
+    kernel = specialize.kernel(*fluid)
+    arguments = (900., 150., 1200., 1500., 2.441, 90., 0.0006, table)
+    expected = traverse.pressure_gradient(*arguments[:3], *fluid,
+                                          *arguments[3:])
+    assert kernel(*arguments) == expected
+
+
+def test_kernel_cache():
+    specialize.clear_kernels()
+    first = specialize.kernel(*FLUIDS[1])
+    assert specialize.kernel(*FLUIDS[1]) is first
+    assert specialize.kernel(*FLUIDS[2]) is not first
+    specialize.clear_kernels()
+    assert specialize.kernel(*FLUIDS[1]) is not first
+
+
+def test_traverse_with_kernel():
+    fluid = FLUIDS[0]
+    arguments = (1000.,
+                 [300.] * 20,
+                 [90.] * 20,
+                 traverse.linear_temperatures(100., 180., 20),
+                 *fluid,
+                 1500.,
+                 2.441,
+                 0.0006)
+    expected = traverse.traverse(*arguments, _against_flow=True)
+    result = traverse.traverse(*arguments,
+                               _against_flow=True,
+                               _kernel=specialize.kernel(*fluid))
+    assert result == expected
@@ -0,0 +1,112 @@
+"""
+Sweep test
+"""
+
+import os
+
+import numpy as np
+import pytest
+from src import deviation
+from src import monte_carlo
+from src import sweep
+
+AXES = {
+    "liquid_flow_rate": [500., 1000., 1500., 2000.],
+    "water_cut": [0.0, 0.3, 0.6],
+    "production_gas_liquid_ratio": [200., 800.],
+}
+
+
+@pytest.fixture(scope="module")
+def model():
+    return monte_carlo.WellModel(200., 100., 180., 6000., 2.441,
+                                 _liquid_flow_rate=1000., _segments=6)
+
+
+def test_units_cover_the_grid():
+    points = [sweep.unit_inputs(AXES, 5, unit) for unit in range(5)]
+    index = np.concatenate([point["index"] for point in points])
+    assert list(index) == list(range(24))
+    rates = np.concatenate([point["liquid_flow_rate"] for point in points])
+    assert list(rates[:6]) == [500.] * 6
+    assert points[0]["water_cut"][2] == 0.3
+
+
+def test_run_and_resume(model, tmp_path):
+    directory = str(tmp_path / "sweep")
+    first = sweep.Sweep(directory, AXES, model, _unit_size=5)
+    assert first.units == 5
+    assert first.run(_max_units=2) == 2
+    partial = sweep.read_results(directory)
+    assert list(partial["index"]) == list(range(10))
+
+    # A restarted sweep only evaluates the remaining units
+    second = sweep.Sweep(directory, AXES, model, _unit_size=5)
+    assert second.completed() == [0, 1]
+    assert second.run() == 3
+    assert second.pending() == []
+    assert second.run() == 0
+
+    results = second.results()
+    assert list(results["index"]) == list(range(24))
+    expected = model({name: results[name] for name in AXES})
+    assert np.array_equal(results["bottomhole_pressure"],
+                          expected["bottomhole_pressure"])
+    assert results["flow_pattern"].shape == (24, 6)
+
+
+def test_incomplete_journal_line(model, tmp_path):
+    directory = str(tmp_path / "sweep")
+    sweep.Sweep(directory, AXES, model, _unit_size=10).run(_max_units=2)
+    with open(os.path.join(directory, sweep.JOURNAL), "ab") as journal:
+        journal.write(b'{"unit": 2, "fi')
+    _, units = sweep.read_journal(directory)
+    assert sorted(units) == [0, 1]
+
+
+def test_resume_after_incomplete_journal_line(model, tmp_path):
+    directory = str(tmp_path / "sweep")
+    sweep.Sweep(directory, AXES, model, _unit_size=5).run(_max_units=2)
+    with open(os.path.join(directory, sweep.JOURNAL), "ab") as journal:
+        journal.write(b'{"unit": 2, "fi')
+    resumed = sweep.Sweep(directory, AXES, model, _unit_size=5)
+    assert resumed.run() == 3
+    # The records appended after the incomplete line are all read back
+    restarted = sweep.Sweep(directory, AXES, model, _unit_size=5)
+    assert restarted.completed() == [0, 1, 2, 3, 4]
+    assert restarted.run() == 0
+    assert list(restarted.results()["index"]) == list(range(24))
+
+
+def test_different_sweep(model, tmp_path):
+    directory = str(tmp_path / "sweep")
+    sweep.Sweep(directory, AXES, model, _unit_size=5)
+    with pytest.raises(ValueError):
+        sweep.Sweep(directory, AXES, model, _unit_size=6)
+
+
+def test_pvt_source_fingerprint(tmp_path):
+    def model(_method):
+        return monte_carlo.WellModel(200., 100., 180., 6000., 2.441,
+                                     _liquid_flow_rate=1000., _segments=6,
+                                     _pvt=deviation.DeviationPVT(_method))
+
+    directory = str(tmp_path / "sweep")
+    sweep.Sweep(directory, AXES, model("hall_yarborough"),
+                _unit_size=5).run(_max_units=1)
+    # A new but equal PVT source resumes the sweep
+    resumed = sweep.Sweep(directory, AXES, model("hall_yarborough"),
+                          _unit_size=5)
+    assert resumed.completed() == [0]
+    with pytest.raises(ValueError):
+        sweep.Sweep(directory, AXES, model("dranchuk_abou_kassem"),
+                    _unit_size=5)
+
+
+def test_processes(model, tmp_path):
+    directory = str(tmp_path / "sweep")
+    sweep.Sweep(directory, AXES, model, _unit_size=5).run(_processes=2)
+    serial = str(tmp_path / "serial")
+    sweep.Sweep(serial, AXES, model, _unit_size=5).run()
+    assert np.array_equal(sweep.read_results(directory)["liquid_flow_rate"],
+                          sweep.read_results(serial)["liquid_flow_rate"])
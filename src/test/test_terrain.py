@@ -0,0 +1,134 @@
+"""
+Terrain test
+"""
+
+import numpy as np
+import pytest
+from src import formulas
+from src import terrain
+from src import traverse
+from src import vectorized
+
+FLUID = (30., 0.75, 1.07, 0.3, 600., 3000., 6., 0.0006)
+
+
+@pytest.fixture(scope="module")
+def profile():
+    distances = np.linspace(0., 20000., 2001)
+    elevations = (-150. * np.sin(distances / 6000.) +
+                  20. * np.sin(distances / 900.))
+    return terrain.TerrainProfile(distances, elevations)
+
+
+def test_geometry():
+    profile = terrain.TerrainProfile([0., 100., 200., 300.],
+                                     [0., 100., 100., 0.])
+    assert list(profile.lengths) == pytest.approx(
+        [100. * 2 ** 0.5, 100., 100. * 2 ** 0.5])
+    assert list(profile.inclinations) == pytest.approx([45., 0., -45.])
+    assert profile.segments == 3
+
+
+def test_invalid_profiles():
+    with pytest.raises(ValueError):
+        terrain.TerrainProfile([0., 100., 100.], [0., 1., 2.])
+    with pytest.raises(ValueError):
+        terrain.TerrainProfile([0., 100.], [0.])
+    with pytest.raises(ValueError):
+        terrain.TerrainProfile([0.], [0.])
+
+
+def test_compress_collinear():
+    profile = terrain.TerrainProfile(np.arange(11.) * 100.,
+                                     [0, 10, 20, 30, 40, 50, 40, 30, 20, 10,
+                                      0])
+    compressed = profile.compress(0.1)
+    assert list(compressed.distances) == [0., 500., 1000.]
+    assert list(compressed.inclinations) == pytest.approx(
+        [profile.inclinations[0], profile.inclinations[-1]])
+
+
+def test_compress_keeps_shape(profile):
+    compressed = profile.compress(0.5)
+    assert compressed.segments < profile.segments / 5
+    assert compressed.elevations[-1] == profile.elevations[-1]
+    assert compressed.length == pytest.approx(profile.length, 1e-4)
+    # Every original point lies close to the compressed profile, and no
+    # merged segment mixes uphill and downhill stretches.
+    interpolated = np.interp(profile.distances, compressed.distances,
+                             compressed.elevations)
+    assert np.max(np.abs(interpolated - profile.elevations)) < 5.
+    kept = np.searchsorted(profile.distances, compressed.distances)
+    for start, end, inclination in zip(kept[:-1], kept[1:],
+                                       compressed.inclinations):
+        signs = np.sign(profile.inclinations[start:end])
+        assert np.all(signs == np.sign(inclination))
+
+
+def test_descending_segments_use_downward_holdup():
+    down = terrain.TerrainProfile([0., 1000.], [0., -100.])
+    up = terrain.TerrainProfile([0., 1000.], [0., 100.])
+    assert down.inclinations[0] < 0
+    pressure = 800.
+    _, patterns = down.traverse(pressure, 120., 120., *FLUID)
+    temperature = 120.
+    bubble_point = traverse.correlations.mixture_bubble_point(
+        temperature, FLUID[1], FLUID[0], FLUID[3], FLUID[4])
+    properties = traverse.fluid_properties(pressure, temperature,
+                                           bubble_point, *FLUID[:5])
+    downhill, _, _ = traverse.gradient_from_properties(
+        properties, FLUID[5], FLUID[3], FLUID[6], down.inclinations[0],
+        FLUID[7])
+    uphill, _, pattern = traverse.gradient_from_properties(
+        properties, FLUID[5], FLUID[3], FLUID[6], up.inclinations[0],
+        FLUID[7])
+    # Downward holdup differs from the uphill one for the same pattern
+    assert patterns == [pattern]
+    assert downhill > 0 > uphill
+    assert downhill != pytest.approx(-uphill, 1e-3)
+
+
+@pytest.mark.parametrize("angle", [10., 15., 20.])
+def test_steep_descent(angle):
+    # The downward correction clamps the holdup here, which is floored so the
+    # friction factor stays finite
+    distances = np.linspace(0., 5000., 11)
+    profile = terrain.TerrainProfile(
+        distances, -np.tan(np.radians(angle)) * distances)
+    fluid = (35., 0.8, 1.07, 0.1, 1500.)
+    for rate in (200., 500., 1000.):
+        pressures, _ = profile.traverse(500., 100., 90., *fluid, rate, 6.,
+                                        0.0006)
+        assert np.all(np.isfinite(pressures))
+        assert pressures[-1] > pressures[0]
+    gravitational, frictional, _ = vectorized.pressure_gradient(
+        np.full(3, 500.), 100., 3000., *fluid, np.array([200., 500., 1000.]),
+        6., -angle, 0.0006)
+    assert np.all(np.isfinite(gravitational + frictional))
+    assert formulas.liquid_holdup_with_incl(
+        0.3, formulas.FlowPattern.segregated, 0.01, 0.05, 0.1,
+        -angle) == formulas.MIN_LIQUID_HOLDUP
+
+
+def test_traverse_matches_engine(profile):
+    pressures, _ = profile.traverse(1000., 120., 80., *FLUID)
+    expected, _ = traverse.traverse(
+        1000.,
+        list(profile.lengths),
+        list(profile.inclinations),
+        list(np.linspace(120., 80., profile.segments + 1)),
+        *FLUID
+    )
+    assert len(pressures) == profile.segments + 1
+    # Equal segment lengths give the same linear temperatures
+    assert pressures[-1] == pytest.approx(expected[-1], abs=0.05)
+
+
+def test_compression_report(profile):
+    report = terrain.compression_report(profile, 0.5,
+                                        1000., 120., 80., *FLUID)
+    assert report.original_segments == profile.segments
+    assert report.savings > 0.8
+    assert abs(report.pressure_error) < 1.
+    assert report.pressure_error == pytest.approx(
+        report.compressed_pressure - report.original_pressure)
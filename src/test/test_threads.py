@@ -0,0 +1,111 @@
+"""
+Threads test
+"""
+
+import numpy as np
+import pytest
+from src import friction
+from src import threads
+from src import traverse
+from src import vectorized
+
+
+@pytest.fixture(scope="module")
+def cases():
+    rng = np.random.default_rng(9)
+    size = 5000
+    temperature = rng.uniform(80., 200., size)
+    api = rng.uniform(20., 40., size)
+    water_cut = rng.uniform(0., 0.8, size)
+    ratio = rng.uniform(100., 1500., size)
+    bubble_point = vectorized.mixture_bubble_point(temperature, 0.75, api,
+                                                   water_cut, ratio)
+    return (rng.uniform(100., 4000., size), temperature, bubble_point, api,
+            0.75, 1.07, water_cut, ratio, rng.uniform(200., 3000., size),
+            2.441, 90., 0.0006)
+
+
+def test_pressure_gradient(cases):
+    expected = vectorized.pressure_gradient(*cases)
+    result = threads.pressure_gradient(*cases, _chunk_size=700,
+                                       _workers=3)
+    assert isinstance(result, tuple)
+    for values, expected_values in zip(result, expected):
+        assert np.array_equal(values, expected_values)
+    assert result[2].dtype == np.int8
+
+
+def test_fluid_properties(cases):
+    expected = vectorized.fluid_properties(*cases[:8])
+    result = threads.fluid_properties(*cases[:8], _chunk_size=999)
+    assert result.keys() == expected.keys()
+    for name in expected:
+        # Properties that only depend on constants come back per case
+        assert np.array_equal(result[name],
+                              np.broadcast_to(expected[name], 5000),
+                              equal_nan=True)
+
+
+def test_bubble_point(cases):
+    result = threads.mixture_bubble_point(cases[1], 0.75, cases[3], cases[6],
+                                          cases[7], _chunk_size=1024)
+    assert np.array_equal(result, cases[2])
+
+
+def test_traverse(cases):
+    table = friction.friction_table(0.0006)
+    arguments = (150., [600.] * 10, [90.] * 10,
+                 traverse.linear_temperatures(100., 180., 10),
+                 30., 0.75, 1.07, cases[6][:300], cases[7][:300],
+                 cases[8][:300], 2.441, 0.0006)
+    expected = vectorized.traverse(*arguments, _against_flow=True,
+                                   _friction_table=table)
+    result = threads.traverse(*arguments, _against_flow=True,
+                              _friction_table=table, _chunk_size=64)
+    assert result[0].shape == (300, 11)
+    # Chunk boundaries change how NumPy's SIMD loops split the arrays, which
+    # moves a few results by the last bit
+    assert np.allclose(result[0], expected[0], rtol=1e-12, equal_nan=True)
+    assert (result[1] != expected[1]).mean() < 0.01
+
+
+def test_calibration_is_cached(cases):
+    threads.clear_chunk_sizes()
+    threads.pressure_gradient(*cases)
+    chunk_size = threads._CHUNK_SIZES[vectorized.pressure_gradient]
+    assert chunk_size in threads.CANDIDATE_CHUNK_SIZES
+    threads.pressure_gradient(*cases)
+    assert len(threads._CHUNK_SIZES) == 1
+
+
+def test_calibration_needs_a_full_chunk(cases):
+    threads.clear_chunk_sizes()
+    small = [np.asarray(values)[:100] if np.ndim(values) else values
+             for values in cases]
+    for values, expected in zip(threads.pressure_gradient(*small),
+                                vectorized.pressure_gradient(*small)):
+        assert np.array_equal(values, expected)
+    assert not threads._CHUNK_SIZES
+    empty = [np.asarray(values)[:0] if np.ndim(values) else values
+             for values in cases]
+    for values in threads.pressure_gradient(*empty):
+        assert np.size(values) == 0
+    assert not threads._CHUNK_SIZES
+    for values, expected in zip(threads.pressure_gradient(*cases),
+                                vectorized.pressure_gradient(*cases)):
+        assert np.array_equal(values, expected)
+    assert (threads._CHUNK_SIZES[vectorized.pressure_gradient] in
+            threads.CANDIDATE_CHUNK_SIZES)
+
+
+def test_calibrate_small_input():
+    values = np.arange(10.)
+    assert threads.calibrate(np.sqrt, [values]) == 10
+
+
+def test_persistent_executor():
+    first = threads.executor(2)
+    assert threads.executor(2) is first
+    assert threads.executor(3) is not first
+    threads.shutdown_executor()
+    assert threads.executor(2) is not first
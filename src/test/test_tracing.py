@@ -0,0 +1,139 @@
+"""
+Tracing test
+"""
+
+import json
+
+import pytest
+from src import formulas
+from src import specialize
+from src import tracing
+from src import traverse
+
+FLUID = (30., 0.75, 1.07, 0.3, 600.)
+
+
+def march(_rate=1500., _kernel=None, _segments=8):
+    return traverse.traverse(150.,
+                             [750.] * _segments,
+                             [90.] * _segments,
+                             traverse.linear_temperatures(100., 180.,
+                                                          _segments),
+                             *FLUID,
+                             _rate,
+                             2.441,
+                             0.0006,
+                             _against_flow=True,
+                             _kernel=_kernel)
+
+
+@pytest.fixture(scope="module")
+def tracer():
+    with tracing.Tracer() as tracer:
+        march()
+        march(300.)
+    return tracer
+
+
+def test_disabled_by_default():
+    assert traverse._TRACER is None
+    with tracing.Tracer() as tracer:
+        assert traverse._TRACER is tracer
+    assert traverse._TRACER is None
+    march()
+    assert len(tracer) == 0
+
+
+def test_results_are_unchanged(tracer):
+    expected = march()
+    with tracing.Tracer():
+        assert march() == expected
+
+
+def test_segment_spans(tracer):
+    records = tracer.records()
+    assert tracer.wells == 2
+    segments = records[records["stage"] == tracing.SEGMENT]
+    assert len(segments) == 16
+    for well, segment, iterations in segments[["well", "segment",
+                                               "iteration"]].tolist():
+        mine = records[(records["well"] == well) &
+                       (records["segment"] == segment)]
+        for stage in (tracing.PVT, tracing.FLOW_PATTERN, tracing.HOLDUP,
+                      tracing.FRICTION):
+            assert (mine["stage"] == stage).sum() == iterations
+        assert (mine["stage"] == tracing.BUBBLE_POINT).sum() == 1
+    assert (records["duration"] >= 0).all()
+    hottest = tracer.segments()
+    assert hottest["duration"][0] == segments["duration"].max()
+    patterns = {formulas.FlowPattern(value).name
+                for value in segments["pattern"].tolist()}
+    assert patterns <= {"distributed", "intermittent", "transition",
+                        "segregated"}
+
+
+def test_ring_buffer_drops_oldest_spans():
+    with tracing.Tracer(50) as tracer:
+        march()
+        march()
+    assert len(tracer) == 50
+    assert tracer.dropped > 0
+    assert tracer._buffer.dtype == tracing.RECORD
+    assert tracer._buffer.size == 50
+    records = tracer.records()
+    assert records["well"][-1] == 1
+    # Spans are written when they end
+    ends = records["start"] + records["duration"]
+    assert (ends[1:] >= ends[:-1]).all()
+
+
+def test_specialized_kernel_spans():
+    kernel = specialize.kernel(*FLUID)
+    expected = march(_kernel=kernel)
+    with tracing.Tracer() as tracer:
+        assert march(_kernel=kernel) == expected
+    stages = set(tracer.records()["stage"].tolist())
+    assert stages == {tracing.SEGMENT, tracing.BUBBLE_POINT, tracing.KERNEL}
+
+
+def test_chrome_trace(tracer, tmp_path):
+    path = tmp_path / "trace.json"
+    tracer.write_chrome_trace(str(path))
+    events = json.loads(path.read_text())["traceEvents"]
+    spans = [event for event in events if event["ph"] == "X"]
+    assert len(spans) == len(tracer)
+    assert {event["tid"] for event in spans} == {0, 1}
+    assert min(event["ts"] for event in spans) == 0
+    segment = next(event for event in spans if event["name"] == "segment")
+    assert segment["args"]["iterations"] >= 1
+    names = [event["args"]["name"] for event in events if event["ph"] == "M"]
+    assert names == ["well 0", "well 1"]
+
+
+def test_collapsed_stacks(tracer, tmp_path):
+    records = tracer.records()
+    stacks = tracer.collapsed_stacks()
+    segments = records[records["stage"] == tracing.SEGMENT]
+    assert sum(stacks.values()) == pytest.approx(
+        int(segments["duration"].sum()), rel=0.01)
+    assert "traverse;well 1;segment 7;holdup" in stacks
+
+    totals = tracer.collapsed_stacks(_per_segment=False)
+    assert set(totals) == {"traverse", "traverse;bubble_point",
+                           "traverse;pvt", "traverse;flow_pattern",
+                           "traverse;holdup", "traverse;friction"}
+    path = tmp_path / "stacks.txt"
+    tracer.write_collapsed_stacks(str(path), _per_segment=False)
+    for line in path.read_text().splitlines():
+        frame, count = line.rsplit(" ", 1)
+        assert frame in totals and int(count) == totals[frame]
+
+
+def test_enable_and_disable():
+    tracer = tracing.enable(128)
+    try:
+        march()
+    finally:
+        tracing.disable()
+    assert tracer.wells == 1
+    assert traverse._TRACER is None
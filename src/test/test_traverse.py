@@ -0,0 +1,148 @@
+"""
+Traverse test
+"""
+
+import pytest
+from src import correlations
+from src import formulas
+from src import traverse
+
+
+@pytest.fixture(scope="module")
+def input():
+    input_ = {}
+    input_["pressure"] = 1000.5
+    input_["temperature"] = 175
+    input_["oil_api_gravity"] = 25
+    input_["gas_specific_gravity"] = 0.65
+    input_["water_specific_gravity"] = 1.07
+    input_["water_cut"] = 0.3
+    input_["production_gas_liquid_ratio"] = 300
+    input_["liquid_flow_rate"] = 600
+    input_["diameter"] = 1.995
+    input_["rugosity"] = 0.000902255639097744
+    input_["bubble_point"] = correlations.mixture_bubble_point(
+        input_["temperature"],
+        input_["gas_specific_gravity"],
+        input_["oil_api_gravity"],
+        input_["water_cut"],
+        input_["production_gas_liquid_ratio"]
+    )
+    return input_
+
+
+def gradient(input, pressure, inclination):
+    return traverse.pressure_gradient(
+        pressure,
+        input["temperature"],
+        input["bubble_point"],
+        input["oil_api_gravity"],
+        input["gas_specific_gravity"],
+        input["water_specific_gravity"],
+        input["water_cut"],
+        input["production_gas_liquid_ratio"],
+        input["liquid_flow_rate"],
+        input["diameter"],
+        inclination,
+        input["rugosity"]
+    )
+
+
+def test_fluid_properties(input):
+    properties = traverse.fluid_properties(
+        input["pressure"],
+        input["temperature"],
+        input["bubble_point"],
+        input["oil_api_gravity"],
+        input["gas_specific_gravity"],
+        input["water_specific_gravity"],
+        input["water_cut"],
+        input["production_gas_liquid_ratio"]
+    )
+    rso = correlations.gas_solubility_in_oil(input["pressure"],
+                                             input["bubble_point"],
+                                             input["temperature"],
+                                             input["gas_specific_gravity"],
+                                             input["oil_api_gravity"])
+    assert properties["gas_solubility_in_oil"] == rso
+    assert properties["free_gas_liquid_ratio"] > 0
+
+
+def test_pressure_gradient(input):
+    gravitational, frictional, pattern = gradient(input, 1000.5, 90)
+    assert gravitational < 0
+    assert frictional < 0
+    assert isinstance(pattern, formulas.FlowPattern)
+
+    horizontal, _, _ = gradient(input, 1000.5, 0)
+    assert horizontal == pytest.approx(0)
+
+    downhill, _, _ = gradient(input, 1000.5, -10)
+    assert downhill > 0
+
+
+def test_downward_holdup_is_used(input):
+    # Mirror image segments use different holdup coefficients
+    uphill, _, _ = gradient(input, 1000.5, 10)
+    downhill, _, _ = gradient(input, 1000.5, -10)
+    assert uphill != pytest.approx(-downhill)
+
+
+def test_linear_temperatures():
+    assert traverse.linear_temperatures(100, 200, 4) == [100, 125, 150, 175,
+                                                          200]
+
+
+def test_traverse(input):
+    segments = 10
+    pressures, patterns = traverse.traverse(
+        200,
+        [500] * segments,
+        [90] * segments,
+        traverse.linear_temperatures(100, 175, segments),
+        input["oil_api_gravity"],
+        input["gas_specific_gravity"],
+        input["water_specific_gravity"],
+        input["water_cut"],
+        input["production_gas_liquid_ratio"],
+        input["liquid_flow_rate"],
+        input["diameter"],
+        input["rugosity"],
+        _against_flow=True
+    )
+    assert len(pressures) == segments + 1
+    assert len(patterns) == segments
+    assert all(b > a for a, b in zip(pressures, pressures[1:]))
+
+    # Marching back along the flow recovers the wellhead pressure
+    back, _ = traverse.traverse(
+        pressures[-1],
+        [500] * segments,
+        [90] * segments,
+        traverse.linear_temperatures(175, 100, segments),
+        input["oil_api_gravity"],
+        input["gas_specific_gravity"],
+        input["water_specific_gravity"],
+        input["water_cut"],
+        input["production_gas_liquid_ratio"],
+        input["liquid_flow_rate"],
+        input["diameter"],
+        input["rugosity"]
+    )
+    assert back[-1] == pytest.approx(200, abs=1)
+
+
+def test_bottomhole_pressure(input):
+    pressure = traverse.bottomhole_pressure(
+        200, 100, 175, 5000,
+        input["oil_api_gravity"],
+        input["gas_specific_gravity"],
+        input["water_specific_gravity"],
+        input["water_cut"],
+        input["production_gas_liquid_ratio"],
+        input["liquid_flow_rate"],
+        input["diameter"],
+        input["rugosity"],
+        10
+    )
+    assert 200 < pressure < 200 + 0.5 * 5000
@@ -0,0 +1,57 @@
+"""
+Validation test
+"""
+
+import numpy as np
+import pytest
+from src import validation
+
+
+@pytest.fixture(scope="module")
+def report():
+    return validation.validate(_per_stratum=4, _wells=5, _segments=10,
+                               _repeats=1)
+
+
+def test_default_paths_meet_their_budgets(report):
+    report.check()
+    assert [row["path"] for row in report.rows] == [
+        "vectorized", "friction_table", "float32", "specialized", "threaded"]
+    for row in report.rows:
+        assert row["gradient_speedup"] > 0
+        assert row["bhp_error"] is not None
+
+
+def test_every_stratum_is_covered(report):
+    assert len(report.strata) == (len(validation.SATURATIONS) *
+                                  len(validation.PATTERNS) *
+                                  len(validation.INCLINATIONS))
+    assert set(report.strata.values()) == {4}
+
+
+def test_exceeded_budget_fails_with_report():
+    def biased(_cases):
+        gravitational, frictional, patterns = (
+            validation.reference_gradient(_cases))
+        return gravitational * 1.01, frictional, patterns
+
+    paths = [validation.FastPath("biased", biased, _max_error=1e-3)]
+    report = validation.validate(paths, _per_stratum=1, _wells=2,
+                                 _repeats=1)
+    assert not report.passed
+    with pytest.raises(validation.BudgetExceeded) as error:
+        report.check()
+    message = str(error.value)
+    assert message.splitlines()[0].split()[:3] == ["path", "max", "err"]
+    assert "biased: max error" in message
+    assert "FAIL" in message
+    assert report.rows[0]["bhp_error"] is None
+
+
+def test_relative_error():
+    error = validation.relative_error([1.0, 2.2, np.nan, 0.0],
+                                      [1.0, 2.0, 1.0, 0.0])
+    assert error[0] == 0.0
+    assert error[1] == pytest.approx(0.1)
+    assert error[2] == np.inf
+    assert error[3] == 0.0
@@ -0,0 +1,193 @@
+"""
+Vectorized test
+"""
+
+import numpy as np
+import pytest
+from src import correlations
+from src import traverse
+from src import vectorized
+
+
+@pytest.fixture(scope="module")
+def input():
+    generator = np.random.default_rng(7)
+    size = 40
+    input_ = {}
+    input_["pressure"] = generator.uniform(0, 5000, size)
+    input_["temperature"] = generator.uniform(80, 250, size)
+    input_["oil_api_gravity"] = generator.uniform(15, 45, size)
+    input_["gas_specific_gravity"] = generator.uniform(0.6, 0.9, size)
+    input_["water_specific_gravity"] = 1.07
+    input_["water_cut"] = generator.uniform(0, 0.9, size)
+    input_["production_gas_liquid_ratio"] = generator.uniform(20, 1500, size)
+    input_["liquid_flow_rate"] = generator.uniform(100, 3000, size)
+    input_["diameter"] = generator.uniform(1.995, 4, size)
+    input_["inclination"] = generator.uniform(-30, 90, size)
+    input_["rugosity"] = generator.uniform(1e-4, 1e-3, size)
+    return input_
+
+
+def scalar_cases(input):
+    for i in range(input["pressure"].size):
+        yield {name: value[i] if isinstance(value, np.ndarray) else value
+               for name, value in input.items()}
+
+
+def test_mixture_bubble_point(input):
+    result = vectorized.mixture_bubble_point(
+        input["temperature"],
+        input["gas_specific_gravity"],
+        input["oil_api_gravity"],
+        input["water_cut"],
+        input["production_gas_liquid_ratio"]
+    )
+    expected = [
+        correlations.mixture_bubble_point(case["temperature"],
+                                          case["gas_specific_gravity"],
+                                          case["oil_api_gravity"],
+                                          case["water_cut"],
+                                          case["production_gas_liquid_ratio"])
+        for case in scalar_cases(input)
+    ]
+    assert list(result) == expected
+
+
+def test_scalar_fluid(input):
+    expected = correlations.mixture_bubble_point(150., 0.7, 30., 0.2, 500.)
+    result = vectorized.mixture_bubble_point(150., 0.7, 30., 0.2, 500.)
+    assert result.shape == ()
+    assert result == expected
+    # One fluid, shared node temperatures and per case rates
+    segments = 6
+    temperatures = traverse.linear_temperatures(100, 180, segments)
+    arguments = (200., [800.] * segments, [90.] * segments, temperatures,
+                 30., 0.7, 1.07, 0.2, 500.)
+    pressures, patterns = vectorized.traverse(
+        *arguments, input["liquid_flow_rate"][:3], 2.441, 0.0006,
+        _against_flow=True)
+    assert pressures.shape == (3, segments + 1)
+    for i in range(3):
+        expected, expected_patterns = traverse.traverse(
+            *arguments, input["liquid_flow_rate"][i], 2.441, 0.0006,
+            _against_flow=True)
+        assert list(pressures[i]) == pytest.approx(expected, 1e-12)
+        assert list(patterns[i]) == [p.value for p in expected_patterns]
+    # Every argument a scalar
+    pressures, _ = vectorized.traverse(*arguments, 1000., 2.441, 0.0006,
+                                       _against_flow=True)
+    assert pressures.shape == (segments + 1,)
+    assert list(pressures) == pytest.approx(traverse.traverse(
+        *arguments, 1000., 2.441, 0.0006, _against_flow=True)[0], 1e-12)
+
+
+def test_pressure_gradient(input):
+    bubble_point = vectorized.mixture_bubble_point(
+        input["temperature"],
+        input["gas_specific_gravity"],
+        input["oil_api_gravity"],
+        input["water_cut"],
+        input["production_gas_liquid_ratio"]
+    )
+    gravitational, frictional, pattern = vectorized.pressure_gradient(
+        input["pressure"],
+        input["temperature"],
+        bubble_point,
+        input["oil_api_gravity"],
+        input["gas_specific_gravity"],
+        input["water_specific_gravity"],
+        input["water_cut"],
+        input["production_gas_liquid_ratio"],
+        input["liquid_flow_rate"],
+        input["diameter"],
+        input["inclination"],
+        input["rugosity"]
+    )
+    for i, case in enumerate(scalar_cases(input)):
+        expected = traverse.pressure_gradient(
+            case["pressure"],
+            case["temperature"],
+            bubble_point[i],
+            case["oil_api_gravity"],
+            case["gas_specific_gravity"],
+            case["water_specific_gravity"],
+            case["water_cut"],
+            case["production_gas_liquid_ratio"],
+            case["liquid_flow_rate"],
+            case["diameter"],
+            case["inclination"],
+            case["rugosity"]
+        )
+        assert gravitational[i] == pytest.approx(expected[0], 1e-12)
+        assert frictional[i] == pytest.approx(expected[1], 1e-12)
+        assert pattern[i] == expected[2].value
+
+
+def test_traverse(input):
+    segments = 8
+    temperatures = traverse.linear_temperatures(100, 180, segments)
+    pressures, patterns = vectorized.traverse(
+        200.,
+        [800.] * segments,
+        [90.] * segments,
+        temperatures,
+        input["oil_api_gravity"],
+        input["gas_specific_gravity"],
+        input["water_specific_gravity"],
+        input["water_cut"],
+        input["production_gas_liquid_ratio"],
+        input["liquid_flow_rate"],
+        input["diameter"],
+        input["rugosity"],
+        _against_flow=True
+    )
+    assert pressures.shape == (input["pressure"].size, segments + 1)
+    for i, case in enumerate(scalar_cases(input)):
+        expected, expected_patterns = traverse.traverse(
+            200.,
+            [800.] * segments,
+            [90.] * segments,
+            temperatures,
+            case["oil_api_gravity"],
+            case["gas_specific_gravity"],
+            case["water_specific_gravity"],
+            case["water_cut"],
+            case["production_gas_liquid_ratio"],
+            case["liquid_flow_rate"],
+            case["diameter"],
+            case["rugosity"],
+            _against_flow=True
+        )
+        assert list(pressures[i]) == pytest.approx(expected, 1e-12)
+        assert list(patterns[i]) == [p.value for p in expected_patterns]
+
+
+def test_traverse_with_bubble_points(input):
+    segments = 4
+    temperatures = np.array(traverse.linear_temperatures(100, 180, segments))
+    arguments = (
+        200.,
+        [800.] * segments,
+        [90.] * segments,
+        temperatures,
+        input["oil_api_gravity"],
+        input["gas_specific_gravity"],
+        input["water_specific_gravity"],
+        input["water_cut"],
+        input["production_gas_liquid_ratio"],
+        input["liquid_flow_rate"],
+        input["diameter"],
+        input["rugosity"],
+    )
+    bubble_points = vectorized.mixture_bubble_point(
+        ((temperatures[1:] + temperatures[:-1]) / 2)[None, :],
+        input["gas_specific_gravity"][:, None],
+        input["oil_api_gravity"][:, None],
+        input["water_cut"][:, None],
+        input["production_gas_liquid_ratio"][:, None]
+    )
+    expected, _ = vectorized.traverse(*arguments, _against_flow=True)
+    pressures, _ = vectorized.traverse(*arguments,
+                                       _against_flow=True,
+                                       _bubble_points=bubble_points)
+    assert np.array_equal(pressures, expected)
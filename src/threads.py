@@ -0,0 +1,319 @@
+"""
+Threads
+"""
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from . import vectorized
+
+
+CANDIDATE_CHUNK_SIZES = (1024, 4096, 16384, 65536)
+
+_EXECUTOR = None
+
+_EXECUTOR_LOCK = threading.Lock()
+
+_CHUNK_SIZES = {}
+
+
+def default_workers():
+    """
+    Returns the number of threads used by default: the CPUs this process
+    may run on.
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def executor(_workers=None):
+    """
+    Returns the persistent `ThreadPoolExecutor`, creating it on first use
+    (or again when a different number of workers is asked for).
+    """
+    global _EXECUTOR
+    workers = _workers or default_workers()
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None or _EXECUTOR._max_workers != workers:
+            if _EXECUTOR is not None:
+                _EXECUTOR.shutdown(wait=True)
+            _EXECUTOR = ThreadPoolExecutor(workers,
+                                           thread_name_prefix="mfsim")
+        return _EXECUTOR
+
+
+def shutdown_executor():
+    """
+    Shuts the persistent executor down (a later call creates a new one).
+    """
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is not None:
+            _EXECUTOR.shutdown(wait=True)
+            _EXECUTOR = None
+
+
+def clear_chunk_sizes():
+    """
+    Forgets every calibrated chunk size.
+    """
+    _CHUNK_SIZES.clear()
+
+
+def _slice(_arrays, _start, _stop):
+    return [array[_start:_stop] for array in _arrays]
+
+
+def calibrate(_function, _arrays, _candidates=CANDIDATE_CHUNK_SIZES):
+    """
+    Times ``_function`` on the first elements of ``_arrays`` for every
+    candidate chunk size and returns the smallest one whose time per element
+    is within 10% of the best. Smaller chunks stay in cache and balance the
+    threads better, so they win ties.
+    """
+    size = len(_arrays[0])
+    timings = []
+    for chunk_size in _candidates:
+        if chunk_size > size:
+            break
+        chunk = _slice(_arrays, 0, chunk_size)
+        _function(*chunk)  # warm up
+        start = time.perf_counter()
+        _function(*chunk)
+        timings.append(((time.perf_counter() - start) / chunk_size,
+                        chunk_size))
+    if not timings:
+        return size
+    best = min(timing for timing, _ in timings)
+    return min(chunk_size for timing, chunk_size in timings
+               if timing <= 1.1 * best)
+
+
+def _allocate(_result, _size):
+    def empty(_array):
+        array = np.asarray(_array)
+        return np.empty((_size,) + array.shape[1:], dtype=array.dtype)
+
+    if isinstance(_result, dict):
+        return {name: empty(values) for name, values in _result.items()}
+    if isinstance(_result, tuple):
+        return tuple(empty(values) for values in _result)
+    return empty(_result)
+
+
+def _store(_outputs, _result, _start, _stop):
+    if isinstance(_outputs, dict):
+        for name, values in _result.items():
+            _outputs[name][_start:_stop] = values
+    elif isinstance(_outputs, tuple):
+        for output, values in zip(_outputs, _result):
+            output[_start:_stop] = values
+    else:
+        _outputs[_start:_stop] = _result
+
+
+def map_chunks(_function,
+               _arrays,
+               _chunk_size=None,
+               _workers=None,
+               _key=None):
+    """
+    Evaluates a vectorized function over chunks of its per case arrays on
+    the persistent thread pool. NumPy releases the GIL inside its ufuncs, so
+    the chunks run in parallel.
+
+    Args:
+        _function (callable): Receives one slice of every array in
+            ``_arrays`` (in order) and returns an array, a tuple of arrays or
+            a dict of arrays with one row per case.
+        _arrays (sequence): Per case arrays, broadcast to a common 1-D shape.
+        _chunk_size (int, optional): Cases per chunk. If omitted, it is
+            calibrated (see `calibrate`) on the first call for ``_key`` with
+            at least as many cases as the smallest candidate and reused
+            afterwards.
+        _workers (int, optional): Number of threads.
+        _key (hashable, optional): Calibration key, ``_function`` by
+            default.
+
+    Returns:
+        Results of the same kind as ``_function``'s, written chunk by chunk
+        into arrays allocated once for all cases.
+    """
+    arrays = np.broadcast_arrays(*(np.asarray(array) for array in _arrays))
+    size = len(arrays[0]) if arrays[0].ndim else 1
+    arrays = [np.broadcast_to(array, (size,)) for array in arrays]
+    if not size:
+        return _function(*arrays)
+    key = _function if _key is None else _key
+    chunk_size = _chunk_size or _CHUNK_SIZES.get(key)
+    if chunk_size is None:
+        chunk_size = calibrate(_function, arrays)
+        # Inputs shorter than the smallest candidate run as one chunk and
+        # say nothing about larger ones
+        if size >= CANDIDATE_CHUNK_SIZES[0]:
+            _CHUNK_SIZES[key] = chunk_size
+
+    # The first chunk runs here and gives the output types and shapes
+    stop = min(chunk_size, size)
+    first = _function(*_slice(arrays, 0, stop))
+    outputs = _allocate(first, size)
+    _store(outputs, first, 0, stop)
+
+    def run(_start):
+        stop = min(_start + chunk_size, size)
+        _store(outputs, _function(*_slice(arrays, _start, stop)), _start,
+               stop)
+
+    pool = executor(_workers)
+    for future in [pool.submit(run, start)
+                   for start in range(chunk_size, size, chunk_size)]:
+        future.result()
+    return outputs
+
+
+def mixture_bubble_point(_temperature,
+                         _gas_specific_gravity,
+                         _oil_api_gravity,
+                         _water_cut,
+                         _production_gas_liquid_ratio,
+                         _chunk_size=None,
+                         _workers=None):
+    """
+    Threaded `vectorized.mixture_bubble_point`.
+    """
+    return map_chunks(vectorized.mixture_bubble_point,
+                      (_temperature,
+                       _gas_specific_gravity,
+                       _oil_api_gravity,
+                       _water_cut,
+                       _production_gas_liquid_ratio),
+                      _chunk_size,
+                      _workers)
+
+
+def fluid_properties(_pressure,
+                     _temperature,
+                     _bubble_point,
+                     _oil_api_gravity,
+                     _gas_specific_gravity,
+                     _water_specific_gravity,
+                     _water_cut,
+                     _production_gas_liquid_ratio,
+                     _chunk_size=None,
+                     _workers=None):
+    """
+    Threaded `vectorized.fluid_properties`.
+    """
+    return map_chunks(vectorized.fluid_properties,
+                      (_pressure,
+                       _temperature,
+                       _bubble_point,
+                       _oil_api_gravity,
+                       _gas_specific_gravity,
+                       _water_specific_gravity,
+                       _water_cut,
+                       _production_gas_liquid_ratio),
+                      _chunk_size,
+                      _workers)
+
+
+def _pressure_gradient(_friction_table, *_arrays):
+    return vectorized.pressure_gradient(*_arrays, _friction_table)
+
+
+def pressure_gradient(_pressure,
+                      _temperature,
+                      _bubble_point,
+                      _oil_api_gravity,
+                      _gas_specific_gravity,
+                      _water_specific_gravity,
+                      _water_cut,
+                      _production_gas_liquid_ratio,
+                      _liquid_flow_rate,
+                      _diameter,
+                      _inclination,
+                      _rugosity,
+                      _friction_table=None,
+                      _chunk_size=None,
+                      _workers=None):
+    """
+    Threaded `vectorized.pressure_gradient`.
+    """
+    return map_chunks(functools.partial(_pressure_gradient, _friction_table),
+                      (_pressure,
+                       _temperature,
+                       _bubble_point,
+                       _oil_api_gravity,
+                       _gas_specific_gravity,
+                       _water_specific_gravity,
+                       _water_cut,
+                       _production_gas_liquid_ratio,
+                       _liquid_flow_rate,
+                       _diameter,
+                       _inclination,
+                       _rugosity),
+                      _chunk_size,
+                      _workers,
+                      _key=vectorized.pressure_gradient)
+
+
+def _traverse(_lengths, _inclinations, _temperatures, _options, *_arrays):
+    return vectorized.traverse(_arrays[0],
+                               _lengths,
+                               _inclinations,
+                               _temperatures,
+                               *_arrays[1:],
+                               **_options)
+
+
+def traverse(_pressure,
+             _lengths,
+             _inclinations,
+             _temperatures,
+             _oil_api_gravity,
+             _gas_specific_gravity,
+             _water_specific_gravity,
+             _water_cut,
+             _production_gas_liquid_ratio,
+             _liquid_flow_rate,
+             _diameter,
+             _rugosity,
+             _against_flow=False,
+             _tolerance=1e-3,
+             _max_iterations=20,
+             _friction_table=None,
+             _chunk_size=None,
+             _workers=None):
+    """
+    Threaded `vectorized.traverse` for 1-D cases. The segment geometry and
+    the node temperatures are shared by every case.
+    """
+    options = {
+        "_against_flow": _against_flow,
+        "_tolerance": _tolerance,
+        "_max_iterations": _max_iterations,
+        "_friction_table": _friction_table,
+    }
+    return map_chunks(functools.partial(_traverse,
+                                        _lengths,
+                                        _inclinations,
+                                        _temperatures,
+                                        options),
+                      (_pressure,
+                       _oil_api_gravity,
+                       _gas_specific_gravity,
+                       _water_specific_gravity,
+                       _water_cut,
+                       _production_gas_liquid_ratio,
+                       _liquid_flow_rate,
+                       _diameter,
+                       _rugosity),
+                      _chunk_size,
+                      _workers,
+                      _key=vectorized.traverse)
@@ -0,0 +1,228 @@
+"""
+Tracing
+"""
+import json
+import time
+
+import numpy as np
+
+from . import traverse
+
+
+STAGES = (
+    "segment",
+    "bubble_point",
+    "pvt",
+    "flow_pattern",
+    "holdup",
+    "friction",
+    "kernel",
+)
+
+SEGMENT, BUBBLE_POINT, PVT, FLOW_PATTERN, HOLDUP, FRICTION, KERNEL = range(
+    len(STAGES))
+
+_STAGE_INDEX = {stage: i for i, stage in enumerate(STAGES)}
+
+RECORD = np.dtype([
+    ("well", np.int32),
+    ("segment", np.int32),
+    ("iteration", np.int16),
+    ("stage", np.int8),
+    ("start", np.int64),
+    ("duration", np.int64),
+    ("pattern", np.int8),
+])
+
+
+class Tracer:
+    """
+    Records per segment spans of `traverse.traverse` while enabled (as a
+    context manager or with `enable`). Every traverse call is one well;
+    every segment records a ``segment`` span (its ``iteration`` field holds
+    the number of iterations), a ``bubble_point`` span and, per iteration,
+    ``pvt``, ``flow_pattern``, ``holdup`` and ``friction`` spans (a single
+    ``kernel`` span for specialized gradients). Spans of the flow pattern
+    and later stages carry the `FlowPattern` value.
+
+    Spans go into a `RECORD` ring buffer allocated once and written in
+    place: when it is full, the oldest spans are overwritten (see
+    ``dropped``). `traverse.traverse` calls the `begin`, `begin_segment`,
+    `stage` and `end_segment` hooks of the enabled tracer; when none is
+    enabled it runs its plain loop.
+
+    Args:
+        _capacity (int, optional): Spans kept.
+    """
+    def __init__(self, _capacity=1 << 16):
+        self.capacity = _capacity
+        self._buffer = np.empty(_capacity, dtype=RECORD)
+        self._next = 0
+        self.wells = 0
+        self._well = -1
+        self._segment = -1
+        self._segment_start = 0
+        self._mark = 0
+        self._previous = []
+
+    def __len__(self):
+        return min(self._next, self.capacity)
+
+    @property
+    def dropped(self):
+        """
+        Spans overwritten since the last `clear`.
+        """
+        return max(0, self._next - self.capacity)
+
+    def clear(self):
+        self._next = 0
+        self.wells = 0
+
+    def __enter__(self):
+        self._previous.append(traverse._TRACER)
+        traverse._TRACER = self
+        return self
+
+    def __exit__(self, *_exception):
+        traverse._TRACER = self._previous.pop()
+
+    def _record(self, _segment, _iteration, _stage, _start, _stop,
+                _pattern=None):
+        self._buffer[self._next % self.capacity] = (
+            self._well, _segment, _iteration, _stage, _start, _stop - _start,
+            0 if _pattern is None else _pattern.value
+        )
+        self._next += 1
+
+    def begin(self):
+        """
+        Hook called when a traverse (a new well) starts.
+        """
+        self._well = self.wells
+        self.wells += 1
+
+    def begin_segment(self, _segment):
+        """
+        Hook called when a segment starts.
+        """
+        self._segment = _segment
+        self._segment_start = self._mark = time.perf_counter_ns()
+
+    def stage(self, _stage, _iteration, _pattern=None):
+        """
+        Hook called when a stage (one of `STAGES`) of the current segment
+        ends: records its span since the end of the previous one.
+        """
+        stop = time.perf_counter_ns()
+        self._record(self._segment, _iteration, _STAGE_INDEX[_stage],
+                     self._mark, stop, _pattern)
+        self._mark = stop
+
+    def end_segment(self, _segment, _iterations, _pattern):
+        """
+        Hook called when a segment converged (or ran out of iterations).
+        """
+        self._record(_segment, _iterations, SEGMENT, self._segment_start,
+                     time.perf_counter_ns(), _pattern)
+
+    def records(self):
+        """
+        Returns a copy of the spans in the buffer, oldest first, as a
+        `RECORD` structured array (times in nanoseconds).
+        """
+        if self._next <= self.capacity:
+            return self._buffer[:self._next].copy()
+        oldest = self._next % self.capacity
+        return np.concatenate((self._buffer[oldest:],
+                               self._buffer[:oldest]))
+
+    def segments(self):
+        """
+        Returns the ``segment`` spans sorted from the most to the least
+        expensive: the segments to look at first.
+        """
+        records = self.records()
+        records = records[records["stage"] == SEGMENT]
+        return records[np.argsort(-records["duration"], kind="stable")]
+
+    def chrome_trace(self):
+        """
+        Returns the spans in the Chrome trace event format (load the JSON in
+        ``chrome://tracing`` or Perfetto). Every well is a thread.
+        """
+        records = self.records()
+        origin = int(records["start"].min()) if len(records) else 0
+        events = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": well,
+                   "args": {"name": "well {}".format(well)}}
+                  for well in np.unique(records["well"]).tolist()]
+        for record in records.tolist():
+            well, segment, iteration, stage, start, duration, pattern = record
+            arguments = {"segment": segment}
+            if stage == SEGMENT:
+                arguments["iterations"] = iteration
+            else:
+                arguments["iteration"] = iteration
+            if pattern:
+                arguments["flow_pattern"] = pattern
+            events.append({"name": STAGES[stage],
+                           "cat": "traverse",
+                           "ph": "X",
+                           "ts": (start - origin) / 1000,
+                           "dur": duration / 1000,
+                           "pid": 1,
+                           "tid": well,
+                           "args": arguments})
+        return {"traceEvents": events, "displayTimeUnit": "ns"}
+
+    def write_chrome_trace(self, _path):
+        with open(_path, "w") as output:
+            json.dump(self.chrome_trace(), output)
+
+    def collapsed_stacks(self, _per_segment=True):
+        """
+        Returns the time spent in every stack, in nanoseconds, as
+        ``{"traverse;well 0;segment 3;pvt": 1234, ...}`` (the collapsed
+        format of flamegraph tools). ``segment`` frames keep the time not
+        spent in their stages. Without ``_per_segment`` the stacks are
+        ``traverse;<stage>`` summed over every well and segment.
+        """
+        stacks = {}
+        children = {}
+        for well, segment, _, stage, _, duration, _ in self.records().tolist():
+            if stage == SEGMENT:
+                continue
+            children[(well, segment)] = (
+                children.get((well, segment), 0) + duration)
+            frame = ("traverse;well {};segment {};{}".format(
+                well, segment, STAGES[stage]) if _per_segment
+                else "traverse;" + STAGES[stage])
+            stacks[frame] = stacks.get(frame, 0) + duration
+        for well, segment, _, stage, _, duration, _ in self.records().tolist():
+            if stage != SEGMENT:
+                continue
+            frame = ("traverse;well {};segment {}".format(well, segment)
+                     if _per_segment else "traverse")
+            stacks[frame] = stacks.get(frame, 0) + max(
+                0, duration - children.get((well, segment), 0))
+        return stacks
+
+    def write_collapsed_stacks(self, _path, _per_segment=True):
+        with open(_path, "w") as output:
+            for frame, duration in sorted(
+                    self.collapsed_stacks(_per_segment).items()):
+                output.write("{} {}\n".format(frame, duration))
+
+
+def enable(_capacity=1 << 16):
+    """
+    Enables a new `Tracer` until `disable` is called and returns it.
+    """
+    return Tracer(_capacity).__enter__()
+
+
+def disable():
+    """
+    Disables tracing.
+    """
+    traverse._TRACER = None
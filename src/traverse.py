@@ -0,0 +1,643 @@
+"""
+Traverse
+"""
+from . import correlations
+from . import formulas
+
+
+# The enabled `tracing.Tracer`, if any
+_TRACER = None
+
+# The enabled `cache.ResultCache`, if any
+_CACHE = None
+
+
+def fluid_properties(_pressure,
+                     _temperature,
+                     _bubble_point,
+                     _oil_api_gravity,
+                     _gas_specific_gravity,
+                     _water_specific_gravity,
+                     _water_cut,
+                     _production_gas_liquid_ratio,
+                     _pvt=None):
+    """
+    Evaluates every PVT property needed by the Beggs and Brill gradient at the
+    given conditions, chaining the functions in `correlations` and `formulas`
+    (or with another PVT source, such as `pvt.BlackOilTable`).
+
+    Args:
+        _pressure (double): Pressure (:math:`psig`).
+        _temperature (double): Temperature (fahrenheit degrees).
+        _bubble_point (double): Mixture's bubble point (:math:`psig`) at
+            ``_temperature``.
+        _oil_api_gravity (double): Oil's API gravity (API degrees).
+        _gas_specific_gravity (double): Gas' specific gravity (no unit).
+        _water_specific_gravity (double): Water's specific gravity (no unit).
+        _water_cut (double): Water cut, WC.
+        _production_gas_liquid_ratio (double): Production gas liquid ratio,
+            :math:`GLR_p` (:math:`scf/stb`).
+        _pvt (optional): PVT source whose ``fluid_properties`` is used
+            instead of the correlations (see `pvt`).
+
+    Returns:
+        A dict with the gas solubilities (:math:`scf/stb`), formation volume
+        factors (:math:`bbl/stb` and :math:`bbl/scf`), densities
+        (:math:`lbm/ft^3`), viscosities (:math:`cp`), surface tensions
+        (:math:`dina/cm`) and the free gas liquid ratio (:math:`scf/stb`).
+    """
+    if _pvt is not None:
+        return _pvt.fluid_properties(_pressure,
+                                     _temperature,
+                                     _bubble_point,
+                                     _oil_api_gravity,
+                                     _gas_specific_gravity,
+                                     _water_specific_gravity,
+                                     _water_cut,
+                                     _production_gas_liquid_ratio)
+    bg_ft = correlations.gas_formation_volume_factor(_pressure,
+                                                     _temperature,
+                                                     _gas_specific_gravity,
+                                                     True)
+    gas_density = formulas.gas_density(_gas_specific_gravity, bg_ft)
+    return _fluid_properties(
+        _pressure,
+        _temperature,
+        _bubble_point,
+        _oil_api_gravity,
+        _gas_specific_gravity,
+        _water_specific_gravity,
+        _water_cut,
+        _production_gas_liquid_ratio,
+        correlations.gas_formation_volume_factor(_pressure,
+                                                 _temperature,
+                                                 _gas_specific_gravity,
+                                                 False),
+        gas_density,
+        correlations.gas_viscosity(_temperature,
+                                   _gas_specific_gravity,
+                                   gas_density)
+    )
+
+
+def _fluid_properties(_pressure,
+                      _temperature,
+                      _bubble_point,
+                      _oil_api_gravity,
+                      _gas_specific_gravity,
+                      _water_specific_gravity,
+                      _water_cut,
+                      _production_gas_liquid_ratio,
+                      _gas_formation_volume_factor,
+                      _gas_density,
+                      _gas_viscosity):
+    # The rest of `fluid_properties` around already evaluated gas properties
+    # (bbl/scf, lbm/ft3 and cp), which is how `deviation.DeviationPVT` puts
+    # its own deviation factor into the chain
+    oil_specific_gravity = formulas.specific_gravity_from_api(_oil_api_gravity)
+    rsw = correlations.gas_solubility_in_water(_pressure,
+                                               _bubble_point,
+                                               _temperature)
+    rso = correlations.gas_solubility_in_oil(_pressure,
+                                             _bubble_point,
+                                             _temperature,
+                                             _gas_specific_gravity,
+                                             _oil_api_gravity)
+    oil_compressibility = 0.
+    water_compressibility = 0.
+    if _pressure >= _bubble_point:
+        oil_compressibility = correlations.oil_compressibility(
+            _pressure,
+            _bubble_point,
+            _temperature,
+            rso,
+            _gas_specific_gravity,
+            _oil_api_gravity
+        )
+        water_compressibility = correlations.water_compressibility(
+            _pressure,
+            _bubble_point,
+            _temperature,
+            rsw
+        )
+    bo = correlations.oil_formation_volume_factor(_pressure,
+                                                  _bubble_point,
+                                                  _temperature,
+                                                  rso,
+                                                  _gas_specific_gravity,
+                                                  oil_specific_gravity,
+                                                  oil_compressibility)
+    bw = correlations.water_formation_volume_factor(_pressure,
+                                                    _bubble_point,
+                                                    _temperature,
+                                                    water_compressibility)
+    dead_oil_surface_tension = correlations.dead_oil_gas_surface_tension(
+        _temperature,
+        _oil_api_gravity
+    )
+    return {
+        "gas_solubility_in_oil": rso,
+        "gas_solubility_in_water": rsw,
+        "oil_formation_volume_factor": bo,
+        "water_formation_volume_factor": bw,
+        "gas_formation_volume_factor": _gas_formation_volume_factor,
+        "oil_density": formulas.live_oil_density(oil_specific_gravity,
+                                                 _gas_specific_gravity,
+                                                 rso,
+                                                 bo,
+                                                 _water_cut),
+        "water_density": formulas.live_water_density(_water_specific_gravity,
+                                                     _gas_specific_gravity,
+                                                     rsw,
+                                                     bw,
+                                                     _water_cut),
+        "gas_density": _gas_density,
+        "oil_viscosity": correlations.live_oil_viscosity(_pressure,
+                                                         _bubble_point,
+                                                         _temperature,
+                                                         rso,
+                                                         _oil_api_gravity),
+        "water_viscosity": correlations.water_viscosity(_pressure,
+                                                        _temperature),
+        "gas_viscosity": _gas_viscosity,
+        "oil_surface_tension": correlations.live_oil_gas_surface_tension(
+            dead_oil_surface_tension,
+            rso
+        ),
+        "water_surface_tension": correlations.water_gas_surface_tension(),
+        "free_gas_liquid_ratio": formulas.free_gas_liquid_ratio(
+            _pressure,
+            _bubble_point,
+            rso,
+            rsw,
+            _water_cut,
+            _production_gas_liquid_ratio
+        ),
+    }
+
+
+def gradient_from_properties(_properties,
+                             _liquid_flow_rate,
+                             _water_cut,
+                             _diameter,
+                             _inclination,
+                             _rugosity,
+                             _friction_table=None):
+    """
+    Calculates the Beggs and Brill pressure gradient from already evaluated
+    PVT properties (see `fluid_properties`). The inclination correction uses
+    the `FlowPattern.downward` coefficients whenever the flow goes downhill.
+
+    Args:
+        _properties (dict): PVT properties as returned by `fluid_properties`.
+        _liquid_flow_rate (double): Total liquid flow rate (:math:`bpd`).
+        _water_cut (double): Water cut, WC.
+        _diameter (double): Tubing diameter (:math:`in`).
+        _inclination (double): Inclination of the flow direction with the
+            horizontal in degrees (negative when flowing downhill).
+        _rugosity (double): Relative pipe roughness (no unit).
+        _friction_table (FrictionTable, optional): If given, the Moody
+            friction factor is looked up in this table (built for
+            ``_rugosity``) instead of evaluated.
+
+    Returns:
+        A tuple in the format ``(gravitational, frictional, flow_pattern)``
+        where both gradients are in :math:`psi/ft` (positive along the flow
+        direction) and the flow pattern is the horizontal `FlowPattern`.
+    """
+    flow = flow_regime(_properties, _liquid_flow_rate, _water_cut, _diameter)
+    holdup = liquid_holdup(_properties, flow, _inclination)
+    return gradients(_properties,
+                     flow,
+                     holdup,
+                     _diameter,
+                     _inclination,
+                     _rugosity,
+                     _friction_table)
+
+
+def flow_regime(_properties, _liquid_flow_rate, _water_cut, _diameter):
+    """
+    First stage of `gradient_from_properties`: in situ velocities, no slip
+    fractions, Froude number and flow pattern.
+
+    Returns:
+        A tuple ``(oil_velocity, gas_velocity, water_velocity,
+        mixture_velocity, no_slip_liquid_fraction, water_fraction,
+        froude_number, flow_pattern)``.
+    """
+    oil_flow_rate = formulas.in_situ_oil_flow_rate(
+        _liquid_flow_rate,
+        _properties["oil_formation_volume_factor"],
+        _water_cut
+    )
+    gas_flow_rate = formulas.in_situ_gas_flow_rate(
+        _liquid_flow_rate,
+        _properties["gas_formation_volume_factor"],
+        _properties["free_gas_liquid_ratio"]
+    )
+    water_flow_rate = formulas.in_situ_water_flow_rate(
+        _liquid_flow_rate,
+        _properties["water_formation_volume_factor"],
+        _water_cut
+    )
+    oil_velocity = formulas.superficial_velocity(oil_flow_rate, _diameter)
+    gas_velocity = formulas.superficial_velocity(gas_flow_rate, _diameter)
+    water_velocity = formulas.superficial_velocity(water_flow_rate, _diameter)
+    mixture_velocity = oil_velocity + gas_velocity + water_velocity
+
+    no_slip_liquid_fraction = formulas.no_slip_liquid_fraction(oil_velocity,
+                                                               gas_velocity,
+                                                               water_velocity)
+    water_fraction = formulas.water_fraction(oil_velocity, water_velocity)
+    froude = formulas.froude_number(mixture_velocity, _diameter)
+    pattern = formulas.flow_pattern(froude, no_slip_liquid_fraction)
+    return (oil_velocity, gas_velocity, water_velocity, mixture_velocity,
+            no_slip_liquid_fraction, water_fraction, froude, pattern)
+
+
+def liquid_holdup(_properties, _flow, _inclination):
+    """
+    Second stage of `gradient_from_properties`: the liquid holdup corrected
+    for the inclination, from the `flow_regime` tuple.
+
+    Returns:
+        A tuple ``(liquid_holdup, liquid_density)``.
+    """
+    (oil_velocity, _, water_velocity, _, no_slip_liquid_fraction,
+     water_fraction, froude, pattern) = _flow
+    horz_liquid_holdup = formulas.horz_liquid_holdup(pattern,
+                                                     froude,
+                                                     no_slip_liquid_fraction)
+
+    liquid_density = formulas.estimate_fluid_property(
+        _properties["oil_density"],
+        _properties["water_density"],
+        water_fraction
+    )
+    liquid_surface_tension = formulas.estimate_fluid_property(
+        _properties["oil_surface_tension"],
+        _properties["water_surface_tension"],
+        water_fraction
+    )
+    liquid_velocity_number = formulas.liquid_velocity_number(
+        oil_velocity + water_velocity,
+        liquid_density,
+        liquid_surface_tension
+    )
+    inclination_pattern = pattern
+    if _inclination < 0:
+        inclination_pattern = formulas.FlowPattern.downward
+    holdup = formulas.liquid_holdup_with_incl(horz_liquid_holdup,
+                                              inclination_pattern,
+                                              froude,
+                                              no_slip_liquid_fraction,
+                                              liquid_velocity_number,
+                                              _inclination)
+    return holdup, liquid_density
+
+
+def gradients(_properties,
+              _flow,
+              _holdup,
+              _diameter,
+              _inclination,
+              _rugosity,
+              _friction_table=None):
+    """
+    Last stage of `gradient_from_properties`: mixture properties, friction
+    factor and both pressure gradients, from the `flow_regime` and
+    `liquid_holdup` tuples.
+
+    Returns:
+        A tuple ``(gravitational, frictional, flow_pattern)``.
+    """
+    (_, _, _, mixture_velocity, no_slip_liquid_fraction, water_fraction, _,
+     pattern) = _flow
+    holdup, liquid_density = _holdup
+    liquid_viscosity = formulas.estimate_fluid_property(
+        _properties["oil_viscosity"],
+        _properties["water_viscosity"],
+        water_fraction
+    )
+    mixture_viscosity_no_slip = formulas.estimate_fluid_property(
+        liquid_viscosity,
+        _properties["gas_viscosity"],
+        1 - no_slip_liquid_fraction
+    )
+    mixture_density_no_slip = formulas.estimate_fluid_property(
+        liquid_density,
+        _properties["gas_density"],
+        1 - no_slip_liquid_fraction
+    )
+    mixture_density_holdup = formulas.estimate_fluid_property(
+        liquid_density,
+        _properties["gas_density"],
+        1 - holdup
+    )
+    reynolds = formulas.reynolds(mixture_density_no_slip,
+                                 mixture_velocity,
+                                 _diameter,
+                                 mixture_viscosity_no_slip)
+    if _friction_table is None:
+        moody_friction = formulas.moody_friction_factor(reynolds, _rugosity)
+    else:
+        moody_friction = _friction_table(reynolds)
+    friction_factor = formulas.friction_factor(no_slip_liquid_fraction,
+                                               holdup,
+                                               moody_friction)
+
+    gravitational = formulas.gravitational_pressure_gradient(
+        formulas.density_to_specific_gravity(mixture_density_holdup),
+        _inclination
+    )
+    frictional = formulas.frictional_pressure_gradient(
+        friction_factor,
+        formulas.density_to_specific_gravity(mixture_density_no_slip),
+        mixture_velocity,
+        _diameter
+    )
+    return gravitational, frictional, pattern
+
+
+def pressure_gradient(_pressure,
+                      _temperature,
+                      _bubble_point,
+                      _oil_api_gravity,
+                      _gas_specific_gravity,
+                      _water_specific_gravity,
+                      _water_cut,
+                      _production_gas_liquid_ratio,
+                      _liquid_flow_rate,
+                      _diameter,
+                      _inclination,
+                      _rugosity,
+                      _friction_table=None,
+                      _pvt=None):
+    """
+    Calculates the Beggs and Brill pressure gradient at the given conditions.
+    This is a convenience method that chains `fluid_properties` (with the
+    ``_pvt`` source) and `gradient_from_properties`.
+
+    Returns:
+        A tuple in the format ``(gravitational, frictional, flow_pattern)``
+        (see `gradient_from_properties`).
+    """
+    properties = fluid_properties(_pressure,
+                                  _temperature,
+                                  _bubble_point,
+                                  _oil_api_gravity,
+                                  _gas_specific_gravity,
+                                  _water_specific_gravity,
+                                  _water_cut,
+                                  _production_gas_liquid_ratio,
+                                  _pvt)
+    return gradient_from_properties(properties,
+                                    _liquid_flow_rate,
+                                    _water_cut,
+                                    _diameter,
+                                    _inclination,
+                                    _rugosity,
+                                    _friction_table)
+
+
+def _traced_gradient(_tracer,
+                     _iteration,
+                     _pressure,
+                     _temperature,
+                     _bubble_point,
+                     _oil_api_gravity,
+                     _gas_specific_gravity,
+                     _water_specific_gravity,
+                     _water_cut,
+                     _production_gas_liquid_ratio,
+                     _liquid_flow_rate,
+                     _diameter,
+                     _inclination,
+                     _rugosity,
+                     _friction_table=None,
+                     _pvt=None):
+    """
+    `pressure_gradient` split into its stages, each one reported to the
+    tracer's `tracing.Tracer.stage` hook as it ends.
+    """
+    properties = fluid_properties(_pressure,
+                                  _temperature,
+                                  _bubble_point,
+                                  _oil_api_gravity,
+                                  _gas_specific_gravity,
+                                  _water_specific_gravity,
+                                  _water_cut,
+                                  _production_gas_liquid_ratio,
+                                  _pvt)
+    _tracer.stage("pvt", _iteration)
+    flow = flow_regime(properties, _liquid_flow_rate, _water_cut, _diameter)
+    pattern = flow[-1]
+    _tracer.stage("flow_pattern", _iteration, pattern)
+    holdup = liquid_holdup(properties, flow, _inclination)
+    _tracer.stage("holdup", _iteration, pattern)
+    result = gradients(properties,
+                       flow,
+                       holdup,
+                       _diameter,
+                       _inclination,
+                       _rugosity,
+                       _friction_table)
+    _tracer.stage("friction", _iteration, pattern)
+    return result
+
+
+def linear_temperatures(_first_temperature, _last_temperature, _segments):
+    """
+    Returns the node temperatures of ``_segments`` equal segments with a
+    linear temperature profile between both ends.
+    """
+    step = (_last_temperature - _first_temperature) / _segments
+    return [_first_temperature + i * step for i in range(_segments + 1)]
+
+
+def traverse(_pressure,
+             _lengths,
+             _inclinations,
+             _temperatures,
+             _oil_api_gravity,
+             _gas_specific_gravity,
+             _water_specific_gravity,
+             _water_cut,
+             _production_gas_liquid_ratio,
+             _liquid_flow_rate,
+             _diameter,
+             _rugosity,
+             _against_flow=False,
+             _tolerance=1e-3,
+             _max_iterations=20,
+             _friction_table=None,
+             _kernel=None,
+             _pvt=None,
+             _cache=None):
+    """
+    Marches the pressure through a sequence of segments using the Beggs and
+    Brill gradient evaluated at each segment's average pressure and
+    temperature. The segment pressure drop is iterated until it changes less
+    than ``_tolerance``.
+
+    Args:
+        _pressure (double): Known pressure at the first node (:math:`psig`).
+        _lengths (list): Length of each segment (:math:`ft`).
+        _inclinations (list): Inclination of the flow direction in each
+            segment with the horizontal (degrees, negative when downhill).
+        _temperatures (list): Temperature at each node (fahrenheit degrees),
+            one more value than the number of segments.
+        _liquid_flow_rate (double): Total liquid flow rate (:math:`bpd`).
+        _diameter (double): Tubing diameter (:math:`in`).
+        _rugosity (double): Relative pipe roughness (no unit).
+        _against_flow (boolean, optional): If ``True``, the first node is the
+            downstream end (e.g. the wellhead of a producer) and the march goes
+            against the flow direction. Defaults to ``False``.
+        _tolerance (double, optional): Segment pressure drop tolerance
+            (:math:`psi`).
+        _max_iterations (int, optional): Maximum iterations per segment.
+        _friction_table (FrictionTable, optional): Moody friction factor
+            table (see `gradient_from_properties`).
+        _kernel (function, optional): Gradient specialized for this fluid
+            (see `specialize.kernel`), used instead of `pressure_gradient`.
+        _pvt (optional): PVT source of the bubble points and fluid
+            properties instead of the correlations (see `pvt`).
+        _cache (ResultCache, optional): Result cache consulted first, the
+            enabled one by default (``False`` skips it, see `cache`).
+
+    Returns:
+        A tuple ``(pressures, flow_patterns)`` with the pressure at each node
+        (:math:`psig`) and the `FlowPattern` of each segment.
+    """
+    arguments = dict(locals())
+    cache = _CACHE if _cache is None else _cache
+    if cache and _TRACER is None:
+        del arguments["_cache"]
+        return cache.call("traverse", traverse, arguments)
+    # The enabled tracer's hooks mark the end of every stage
+    tracer = _TRACER
+    if tracer is not None:
+        tracer.begin()
+    direction = -1.0 if _against_flow else 1.0
+    pressures = [_pressure]
+    patterns = []
+    pressure_drop = 0.0
+    for i, length in enumerate(_lengths):
+        if tracer is not None:
+            tracer.begin_segment(i)
+        pressure = pressures[-1]
+        temperature = (_temperatures[i] + _temperatures[i + 1]) / 2
+        bubble_point = (_pvt or correlations).mixture_bubble_point(
+            temperature,
+            _gas_specific_gravity,
+            _oil_api_gravity,
+            _water_cut,
+            _production_gas_liquid_ratio
+        )
+        if tracer is not None:
+            tracer.stage("bubble_point", 0)
+        for iteration in range(_max_iterations):
+            if _kernel is not None:
+                gravitational, frictional, pattern = _kernel(
+                    pressure + pressure_drop / 2,
+                    temperature,
+                    bubble_point,
+                    _liquid_flow_rate,
+                    _diameter,
+                    _inclinations[i],
+                    _rugosity,
+                    _friction_table
+                )
+                if tracer is not None:
+                    tracer.stage("kernel", iteration, pattern)
+            elif tracer is None:
+                gravitational, frictional, pattern = pressure_gradient(
+                    pressure + pressure_drop / 2,
+                    temperature,
+                    bubble_point,
+                    _oil_api_gravity,
+                    _gas_specific_gravity,
+                    _water_specific_gravity,
+                    _water_cut,
+                    _production_gas_liquid_ratio,
+                    _liquid_flow_rate,
+                    _diameter,
+                    _inclinations[i],
+                    _rugosity,
+                    _friction_table,
+                    _pvt
+                )
+            else:
+                gravitational, frictional, pattern = _traced_gradient(
+                    tracer,
+                    iteration,
+                    pressure + pressure_drop / 2,
+                    temperature,
+                    bubble_point,
+                    _oil_api_gravity,
+                    _gas_specific_gravity,
+                    _water_specific_gravity,
+                    _water_cut,
+                    _production_gas_liquid_ratio,
+                    _liquid_flow_rate,
+                    _diameter,
+                    _inclinations[i],
+                    _rugosity,
+                    _friction_table,
+                    _pvt
+                )
+            new_pressure_drop = (
+                direction * (gravitational + frictional) * length
+            )
+            converged = abs(new_pressure_drop - pressure_drop) < _tolerance
+            pressure_drop = new_pressure_drop
+            if converged:
+                break
+        pressures.append(pressure + pressure_drop)
+        patterns.append(pattern)
+        if tracer is not None:
+            tracer.end_segment(i, iteration + 1, pattern)
+    return pressures, patterns
+
+
+def bottomhole_pressure(_wellhead_pressure,
+                        _wellhead_temperature,
+                        _bottomhole_temperature,
+                        _depth,
+                        _oil_api_gravity,
+                        _gas_specific_gravity,
+                        _water_specific_gravity,
+                        _water_cut,
+                        _production_gas_liquid_ratio,
+                        _liquid_flow_rate,
+                        _diameter,
+                        _rugosity,
+                        _segments=50,
+                        _pvt=None):
+    """
+    Calculates the flowing bottomhole pressure of a vertical producer by
+    marching from the wellhead down to ``_depth`` (see `traverse`).
+
+    Returns:
+        The flowing bottomhole pressure in :math:`psig`.
+    """
+    pressures, _ = traverse(
+        _wellhead_pressure,
+        [_depth / _segments] * _segments,
+        [90.0] * _segments,
+        linear_temperatures(_wellhead_temperature,
+                            _bottomhole_temperature,
+                            _segments),
+        _oil_api_gravity,
+        _gas_specific_gravity,
+        _water_specific_gravity,
+        _water_cut,
+        _production_gas_liquid_ratio,
+        _liquid_flow_rate,
+        _diameter,
+        _rugosity,
+        _against_flow=True,
+        _pvt=_pvt
+    )
+    return pressures[-1]
@@ -0,0 +1,568 @@
+"""
+Validation
+"""
+import math
+import time
+
+import numpy as np
+
+from . import formulas
+from . import friction
+from . import specialize
+from . import threads
+from . import traverse
+from . import vectorized
+
+
+FLUIDS = (
+    (30., 0.75, 1.07, 0.3, 600.),
+    (18., 0.65, 1.02, 0.0, 80.),
+    (42., 1.05, 1.10, 0.8, 2500.),
+    (25., 0.70, 1.05, 0.5, 1200.),
+)
+
+FLUID_NAMES = (
+    "oil_api_gravity",
+    "gas_specific_gravity",
+    "water_specific_gravity",
+    "water_cut",
+    "production_gas_liquid_ratio",
+)
+
+INCLINATIONS = ((-90., -45.), (-45., -5.), (-5., 5.), (5., 45.), (45., 90.))
+
+PATTERNS = tuple(pattern for pattern in formulas.FlowPattern
+                 if pattern != formulas.FlowPattern.downward)
+
+SATURATIONS = ("saturated", "undersaturated")
+
+
+class BudgetExceeded(Exception):
+    """
+    A fast path is less accurate than its declared budget. The message is
+    the full `ValidationReport` table followed by the violations.
+    """
+    def __init__(self, _report):
+        super().__init__("\n".join([_report.table(), ""] + _report.failures))
+        self.report = _report
+
+
+class FastPath:
+    """
+    An approximation of the scalar `traverse` chain and its error budget.
+
+    Args:
+        _name (str): Name shown in the report.
+        _gradient (callable): Receives a dict of per case arrays (see
+            `stratified_cases`) and returns ``(gravitational, frictional,
+            flow_pattern)`` arrays, patterns as `FlowPattern` values.
+        _bottomhole_pressure (callable, optional): Receives a dict of per
+            well arrays (see `well_cases`) and the number of segments and
+            returns the bottomhole pressures.
+        _max_error (double, optional): Largest relative error of the total
+            pressure gradient allowed.
+        _percentile_error (double, optional): Relative error allowed at the
+            99th percentile (``_max_error`` when omitted).
+        _pattern_mismatch (double, optional): Fraction of cases allowed to
+            get another flow pattern than the reference.
+        _bhp_error (double, optional): Largest relative error of the
+            bottomhole pressure allowed.
+    """
+    def __init__(self,
+                 _name,
+                 _gradient,
+                 _bottomhole_pressure=None,
+                 _max_error=1e-9,
+                 _percentile_error=None,
+                 _pattern_mismatch=0.0,
+                 _bhp_error=1e-9):
+        self.name = _name
+        self.gradient = _gradient
+        self.bottomhole_pressure = _bottomhole_pressure
+        self.max_error = _max_error
+        self.percentile_error = (_max_error if _percentile_error is None
+                                 else _percentile_error)
+        self.pattern_mismatch = _pattern_mismatch
+        self.bhp_error = _bhp_error
+
+
+def _gradient_arguments(_cases, _dtype=None):
+    arguments = [_cases[name] for name in ("pressure",
+                                           "temperature",
+                                           "bubble_point")]
+    arguments += [_cases[name] for name in FLUID_NAMES]
+    arguments += [_cases[name] for name in ("liquid_flow_rate",
+                                            "diameter",
+                                            "inclination",
+                                            "rugosity")]
+    if _dtype is not None:
+        arguments = [np.asarray(values, dtype=_dtype) for values in arguments]
+    return arguments
+
+
+def _traverse_arguments(_wells, _segments, _dtype=None):
+    depth = float(_wells["depth"][0])
+    arguments = [
+        _wells["wellhead_pressure"],
+        [depth / _segments] * _segments,
+        [90.0] * _segments,
+        traverse.linear_temperatures(float(_wells["wellhead_temperature"][0]),
+                                     float(_wells["bottomhole_temperature"][0]),
+                                     _segments),
+    ]
+    arguments += [_wells[name] for name in FLUID_NAMES]
+    arguments += [_wells[name] for name in ("liquid_flow_rate",
+                                            "diameter",
+                                            "rugosity")]
+    if _dtype is not None:
+        arguments = arguments[:4] + [np.asarray(values, dtype=_dtype)
+                                     for values in arguments[4:]]
+        arguments[0] = np.asarray(arguments[0], dtype=_dtype)
+    return arguments
+
+
+def _vectorized_gradient(_cases, _dtype=None, _friction_table=None):
+    return vectorized.pressure_gradient(*_gradient_arguments(_cases, _dtype),
+                                        _friction_table)
+
+
+def _vectorized_bottomhole_pressure(_wells, _segments, _dtype=None,
+                                    _friction_table=None):
+    pressures, _ = vectorized.traverse(
+        *_traverse_arguments(_wells, _segments, _dtype),
+        _against_flow=True,
+        _friction_table=_friction_table
+    )
+    return pressures[:, -1]
+
+
+def _threaded_gradient(_cases):
+    return threads.pressure_gradient(*_gradient_arguments(_cases))
+
+
+def _threaded_bottomhole_pressure(_wells, _segments):
+    pressures, _ = threads.traverse(
+        *_traverse_arguments(_wells, _segments),
+        _against_flow=True
+    )
+    return pressures[:, -1]
+
+
+def _specialized_gradient(_cases):
+    size = len(_cases["pressure"])
+    gravitational = np.empty(size)
+    frictional = np.empty(size)
+    patterns = np.empty(size, dtype=np.int8)
+    arguments = [_cases[name] for name in ("pressure",
+                                           "temperature",
+                                           "bubble_point",
+                                           "liquid_flow_rate",
+                                           "diameter",
+                                           "inclination",
+                                           "rugosity")]
+    fluids = np.stack([_cases[name] for name in FLUID_NAMES], axis=1)
+    for i in range(size):
+        kernel = specialize.kernel(*fluids[i])
+        gravitational[i], frictional[i], pattern = kernel(
+            *(float(values[i]) for values in arguments))
+        patterns[i] = pattern.value
+    return gravitational, frictional, patterns
+
+
+def _specialized_bottomhole_pressure(_wells, _segments):
+    arguments = _traverse_arguments(_wells, _segments)
+    pressures = np.empty(len(_wells["wellhead_pressure"]))
+    for i in range(len(pressures)):
+        case = [float(np.asarray(values)[i]) if np.ndim(values) else values
+                for values in arguments[4:]]
+        case_pressures, _ = traverse.traverse(
+            float(arguments[0][i]), *arguments[1:4], *case,
+            _against_flow=True,
+            _kernel=specialize.kernel(*case[:5])
+        )
+        pressures[i] = case_pressures[-1]
+    return pressures
+
+
+def default_paths(_rugosity=0.0006):
+    """
+    Returns the `FastPath` of every approximation in the package with its
+    budget:
+
+    - ``vectorized``: `vectorized` (same formulas, last bits differ).
+    - ``friction_table``: `vectorized` with a `friction.FrictionTable`
+      (relative error :math:`10^{-6}` on the friction factor).
+    - ``float32``: `vectorized` fed with ``float32`` inputs (e.g. read back
+      from Parquet or a `flow_map`), i.e. inputs rounded to 7 digits.
+    - ``specialized``: `specialize` kernels (identical operations).
+    - ``threaded``: `threads` (chunked `vectorized`).
+    """
+    table = friction.friction_table(_rugosity)
+    return [
+        FastPath("vectorized",
+                 _vectorized_gradient,
+                 _vectorized_bottomhole_pressure,
+                 _max_error=1e-9,
+                 _bhp_error=1e-6),
+        FastPath("friction_table",
+                 lambda cases: _vectorized_gradient(cases,
+                                                    _friction_table=table),
+                 lambda wells, segments: _vectorized_bottomhole_pressure(
+                     wells, segments, _friction_table=table),
+                 _max_error=1e-5,
+                 _bhp_error=1e-5),
+        FastPath("float32",
+                 lambda cases: _vectorized_gradient(cases, np.float32),
+                 lambda wells, segments: _vectorized_bottomhole_pressure(
+                     wells, segments, np.float32),
+                 _max_error=1e-3,
+                 _percentile_error=1e-5,
+                 _pattern_mismatch=0.01,
+                 _bhp_error=1e-4),
+        FastPath("specialized",
+                 _specialized_gradient,
+                 _specialized_bottomhole_pressure,
+                 _max_error=0.0,
+                 _bhp_error=0.0),
+        FastPath("threaded",
+                 _threaded_gradient,
+                 _threaded_bottomhole_pressure,
+                 _max_error=1e-9,
+                 _bhp_error=1e-6),
+    ]
+
+
+def _saturation(_saturated):
+    return SATURATIONS[0] if _saturated else SATURATIONS[1]
+
+
+def _inclination_bin(_inclination):
+    for low, high in INCLINATIONS:
+        if _inclination <= high:
+            return "{:g}..{:g}".format(low, high)
+    return "{:g}..{:g}".format(*INCLINATIONS[-1])
+
+
+def _candidates(_rng, _size, _fluids, _rugosity):
+    fluid = _rng.integers(len(_fluids), size=_size)
+    table = np.asarray(_fluids, dtype=float)[fluid]
+    cases = {name: table[:, i] for i, name in enumerate(FLUID_NAMES)}
+    cases["temperature"] = _rng.uniform(60., 250., _size)
+    cases["bubble_point"] = vectorized.mixture_bubble_point(
+        cases["temperature"],
+        cases["gas_specific_gravity"],
+        cases["oil_api_gravity"],
+        cases["water_cut"],
+        cases["production_gas_liquid_ratio"]
+    )
+    # Half of the cases below the bubble point, half above it
+    saturated = _rng.random(_size) < 0.5
+    cases["pressure"] = np.where(
+        saturated,
+        cases["bubble_point"] * _rng.uniform(0.02, 0.98, _size),
+        cases["bubble_point"] * _rng.uniform(1.02, 3.0, _size)
+    )
+    cases["liquid_flow_rate"] = np.exp(_rng.uniform(math.log(20.),
+                                                    math.log(20000.),
+                                                    _size))
+    cases["diameter"] = _rng.uniform(1.5, 8.0, _size)
+    cases["inclination"] = _rng.uniform(-90., 90., _size)
+    cases["rugosity"] = np.full(_size, float(_rugosity))
+    cases["fluid"] = fluid
+    return cases
+
+
+def _stratum(_pressure, _bubble_point, _pattern, _inclination):
+    return (_saturation(_pressure < _bubble_point),
+            formulas.FlowPattern(int(_pattern)).name,
+            _inclination_bin(_inclination))
+
+
+def stratified_cases(_per_stratum=40,
+                     _seed=0,
+                     _fluids=FLUIDS,
+                     _rugosity=0.0006,
+                     _max_rounds=50):
+    """
+    Draws pressure gradient cases evenly over the strata of the input space:
+    below or above the bubble point, every `FlowPattern` the gradient
+    returns and the inclination bins in `INCLINATIONS` (the negative ones use
+    the `FlowPattern.downward` holdup). Random candidates are drawn until
+    every stratum has ``_per_stratum`` cases (or ``_max_rounds`` batches
+    were drawn; see `ValidationReport.strata` for the coverage).
+
+    Returns:
+        A dict of per case arrays: the arguments of
+        `traverse.pressure_gradient` by name, plus ``fluid`` (the index in
+        ``_fluids``) and ``stratum`` (a tuple per case).
+    """
+    rng = np.random.default_rng(_seed)
+    keys = [(saturation, pattern.name, _inclination_bin(high))
+            for saturation in SATURATIONS
+            for pattern in PATTERNS
+            for _, high in INCLINATIONS]
+    counts = dict.fromkeys(keys, 0)
+    chosen = []
+    for _ in range(_max_rounds):
+        cases = _candidates(rng, 4096, _fluids, _rugosity)
+        with np.errstate(all="ignore"):
+            gravitational, frictional, patterns = (
+                vectorized.pressure_gradient(*_gradient_arguments(cases)))
+        # The scalar chain raises where the gradient is not finite (e.g. a
+        # production GLR below the solution gas), which is outside the domain
+        # being validated
+        valid = np.isfinite(gravitational + frictional)
+        indexes = []
+        for i in np.flatnonzero(valid):
+            key = _stratum(cases["pressure"][i],
+                           cases["bubble_point"][i],
+                           patterns[i],
+                           cases["inclination"][i])
+            if counts.get(key, _per_stratum) < _per_stratum:
+                counts[key] += 1
+                indexes.append(i)
+        chosen.append({name: values[indexes]
+                       for name, values in cases.items()})
+        if min(counts.values()) >= _per_stratum:
+            break
+    cases = {name: np.concatenate([batch[name] for batch in chosen])
+             for name in chosen[0]}
+    cases["stratum"] = [
+        _stratum(pressure, bubble_point, pattern, inclination)
+        for pressure, bubble_point, pattern, inclination in zip(
+            cases["pressure"],
+            cases["bubble_point"],
+            vectorized.pressure_gradient(*_gradient_arguments(cases))[2],
+            cases["inclination"])
+    ]
+    return cases
+
+
+def well_cases(_count=24, _seed=0, _fluids=FLUIDS, _rugosity=0.0006):
+    """
+    Draws vertical producers for the bottomhole pressure comparison: every
+    fluid in ``_fluids`` at low to high rates and wellhead pressures. The
+    wells share their depth and temperature profile, so the threaded
+    traverse (shared geometry) applies.
+
+    Returns:
+        A dict of per well arrays named after the arguments of
+        `traverse.bottomhole_pressure`.
+    """
+    rng = np.random.default_rng(_seed)
+    fluid = np.arange(_count) % len(_fluids)
+    table = np.asarray(_fluids, dtype=float)[fluid]
+    wells = {name: table[:, i] for i, name in enumerate(FLUID_NAMES)}
+    wells["wellhead_pressure"] = rng.uniform(100., 1500., _count)
+    wells["wellhead_temperature"] = np.full(_count, 100.)
+    wells["bottomhole_temperature"] = np.full(_count, 200.)
+    wells["depth"] = np.full(_count, 8000.)
+    wells["liquid_flow_rate"] = np.exp(rng.uniform(math.log(100.),
+                                                   math.log(8000.),
+                                                   _count))
+    wells["diameter"] = rng.uniform(2., 5., _count)
+    wells["rugosity"] = np.full(_count, float(_rugosity))
+    return wells
+
+
+def reference_gradient(_cases):
+    """
+    Evaluates `traverse.pressure_gradient` (the scalar `correlations` and
+    `formulas` chain) case by case.
+
+    Returns:
+        A tuple ``(gravitational, frictional, flow_pattern)`` of arrays.
+    """
+    arguments = _gradient_arguments(_cases)
+    size = len(_cases["pressure"])
+    gravitational = np.empty(size)
+    frictional = np.empty(size)
+    patterns = np.empty(size, dtype=np.int8)
+    for i in range(size):
+        gravitational[i], frictional[i], pattern = traverse.pressure_gradient(
+            *(float(np.asarray(values)[i]) if np.ndim(values) else values
+              for values in arguments))
+        patterns[i] = pattern.value
+    return gravitational, frictional, patterns
+
+
+def reference_bottomhole_pressure(_wells, _segments):
+    """
+    Evaluates the scalar `traverse.traverse` well by well.
+    """
+    arguments = _traverse_arguments(_wells, _segments)
+    pressures = np.empty(len(_wells["wellhead_pressure"]))
+    for i in range(len(pressures)):
+        case = [float(values[i]) for values in arguments[4:]]
+        case_pressures, _ = traverse.traverse(float(arguments[0][i]),
+                                              *arguments[1:4],
+                                              *case,
+                                              _against_flow=True)
+        pressures[i] = case_pressures[-1]
+    return pressures
+
+
+def relative_error(_values, _reference):
+    """
+    Returns ``|values - reference| / |reference|`` (zero where both are
+    zero, infinite where only the approximation is not finite).
+    """
+    values = np.asarray(_values, dtype=float)
+    reference = np.asarray(_reference, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        error = np.abs(values - reference) / np.abs(reference)
+    error[values == reference] = 0.0
+    error[~np.isfinite(error)] = np.inf
+    return error
+
+
+def _timed(_function, *_args, _repeats=3):
+    best = math.inf
+    for _ in range(_repeats):
+        start = time.perf_counter()
+        result = _function(*_args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+class ValidationReport:
+    """
+    Accuracy and speed of every `FastPath` against the scalar reference.
+
+    ``rows`` holds one dict per path with the gradient relative errors
+    (``max_error``, ``p99_error``, ``p50_error`` and the stratum of the worst
+    case), the fraction of cases with another flow pattern, the largest
+    relative bottomhole pressure error and the speedups over the scalar
+    reference. ``strata`` counts the cases of every stratum and
+    ``failures`` lists the budgets exceeded.
+    """
+    COLUMNS = (
+        ("path", "path", "{}"),
+        ("max_error", "max err", "{:.2e}"),
+        ("p99_error", "p99 err", "{:.2e}"),
+        ("pattern_mismatch", "pattern", "{:.2%}"),
+        ("bhp_error", "BHP err", "{:.2e}"),
+        ("gradient_speedup", "speedup", "{:.1f}x"),
+        ("bhp_speedup", "BHP speedup", "{:.1f}x"),
+        ("status", "status", "{}"),
+    )
+
+    def __init__(self, _rows, _strata, _failures):
+        self.rows = _rows
+        self.strata = _strata
+        self.failures = _failures
+
+    @property
+    def passed(self):
+        return not self.failures
+
+    def table(self):
+        """
+        Returns the report as a text table.
+        """
+        lines = [[label for _, label, _ in self.COLUMNS]]
+        for row in self.rows:
+            lines.append(["-" if row[name] is None else form.format(row[name])
+                          for name, _, form in self.COLUMNS])
+        widths = [max(len(line[i]) for line in lines)
+                  for i in range(len(self.COLUMNS))]
+        return "\n".join(
+            "  ".join([line[0].ljust(widths[0])] +
+                      [cell.rjust(width)
+                       for cell, width in zip(line[1:], widths[1:])])
+            for line in lines
+        )
+
+    def __str__(self):
+        return self.table()
+
+    def check(self):
+        """
+        Raises `BudgetExceeded` if any path exceeded its budget.
+        """
+        if self.failures:
+            raise BudgetExceeded(self)
+        return self
+
+
+def validate(_paths=None,
+             _per_stratum=40,
+             _wells=24,
+             _segments=20,
+             _seed=0,
+             _repeats=3):
+    """
+    Runs every fast path over `stratified_cases` and `well_cases` and
+    compares it with the scalar reference (`reference_gradient` and
+    `reference_bottomhole_pressure`).
+
+    Args:
+        _paths (list, optional): `FastPath` list, `default_paths` when
+            omitted.
+        _per_stratum (int, optional): Gradient cases per stratum.
+        _wells (int, optional): Wells in the bottomhole pressure comparison.
+        _segments (int, optional): Tubing segments of every well.
+        _seed (int, optional): Seed of the input draws.
+        _repeats (int, optional): Timings keep the best of this many runs.
+
+    Returns:
+        A `ValidationReport` (call its ``check`` to fail on exceeded
+        budgets).
+    """
+    paths = default_paths() if _paths is None else _paths
+    cases = stratified_cases(_per_stratum, _seed)
+    wells = well_cases(_wells, _seed)
+    reference, reference_time = _timed(reference_gradient, cases,
+                                       _repeats=1)
+    reference_total = reference[0] + reference[1]
+    reference_bhp, reference_bhp_time = _timed(
+        reference_bottomhole_pressure, wells, _segments, _repeats=1)
+
+    strata = {}
+    for key in cases["stratum"]:
+        strata[key] = strata.get(key, 0) + 1
+    rows = []
+    failures = []
+    for path in paths:
+        with np.errstate(all="ignore"):
+            result, elapsed = _timed(path.gradient, cases, _repeats=_repeats)
+        error = relative_error(result[0] + result[1], reference_total)
+        worst = int(np.argmax(error))
+        row = {
+            "path": path.name,
+            "max_error": float(error.max()),
+            "p99_error": float(np.percentile(error, 99)),
+            "p50_error": float(np.percentile(error, 50)),
+            "worst_stratum": cases["stratum"][worst],
+            "pattern_mismatch": float(np.mean(
+                np.asarray(result[2]) != reference[2])),
+            "gradient_speedup": reference_time / elapsed,
+            "bhp_error": None,
+            "bhp_speedup": None,
+        }
+        if path.bottomhole_pressure is not None:
+            with np.errstate(all="ignore"):
+                bhp, elapsed = _timed(path.bottomhole_pressure, wells,
+                                      _segments, _repeats=_repeats)
+            row["bhp_error"] = float(relative_error(bhp, reference_bhp).max())
+            row["bhp_speedup"] = reference_bhp_time / elapsed
+
+        violations = []
+        if row["max_error"] > path.max_error:
+            violations.append("max error {:.3g} > {:.3g} (worst case: {})"
+                              .format(row["max_error"], path.max_error,
+                                      ", ".join(row["worst_stratum"])))
+        if row["p99_error"] > path.percentile_error:
+            violations.append("99th percentile error {:.3g} > {:.3g}".format(
+                row["p99_error"], path.percentile_error))
+        if row["pattern_mismatch"] > path.pattern_mismatch:
+            violations.append("flow pattern mismatch {:.2%} > {:.2%}".format(
+                row["pattern_mismatch"], path.pattern_mismatch))
+        if row["bhp_error"] is not None and row["bhp_error"] > path.bhp_error:
+            violations.append("bottomhole pressure error {:.3g} > {:.3g}"
+                              .format(row["bhp_error"], path.bhp_error))
+        row["status"] = "FAIL" if violations else "ok"
+        failures += ["{}: {}".format(path.name, violation)
+                     for violation in violations]
+        rows.append(row)
+    return ValidationReport(rows, strata, failures)
@@ -0,0 +1,966 @@
+"""
+Vectorized
+"""
+import numpy as np
+
+from . import correlations
+from . import formulas
+from . import fused
+
+
+DISTRIBUTED = formulas.FlowPattern.distributed.value
+INTERMITTENT = formulas.FlowPattern.intermittent.value
+TRANSITION = formulas.FlowPattern.transition.value
+SEGREGATED = formulas.FlowPattern.segregated.value
+DOWNWARD = formulas.FlowPattern.downward.value
+
+# The enabled `cache.ResultCache`, if any
+_CACHE = None
+
+
+def gas_solubility_in_oil(_pressure,
+                          _bubble_point,
+                          _temperature,
+                          _gas_specific_gravity,
+                          _oil_api_gravity):
+    """
+    Array version of `correlations.gas_solubility_in_oil`.
+    """
+    pressure = np.minimum(_pressure, _bubble_point)
+    exponent = 0.0125 * _oil_api_gravity - 0.00091 * _temperature
+    first_term = (pressure + 14.7)/18.2 + 1.4
+    return _gas_specific_gravity * (first_term * 10 ** exponent) ** 1.2048
+
+
+def gas_solubility_in_water(_pressure, _bubble_point, _temperature):
+    """
+    Array version of `correlations.gas_solubility_in_water`.
+    """
+    term_a = (8.15839 -
+              6.12265e-2 * _temperature +
+              1.91663e-4 * (_temperature ** 2) -
+              2.1654e-7 * (_temperature ** 3))
+
+    term_b = (1.01021e-2 -
+              7.44241e-5 * _temperature +
+              3.05553e-7 * (_temperature ** 2) -
+              2.94883e-10 * (_temperature ** 3))
+
+    term_c = (-9.02505 +
+              0.130237 * _temperature -
+              8.53425e-4 * (_temperature ** 2) +
+              2.34122e-6 * (_temperature ** 3) -
+              2.37049e-9 * (_temperature ** 4)) * (10 ** -7)
+
+    abs_pressure = np.minimum(_pressure, _bubble_point) + 14.7
+    return term_a + term_b * (abs_pressure) + term_c * (abs_pressure) ** 2
+
+
+def mixture_bubble_point(_temperature,
+                         _gas_specific_gravity,
+                         _oil_api_gravity,
+                         _water_cut,
+                         _production_gas_liquid_ratio,
+                         _max_iterations=200):
+    """
+    Array version of `correlations.mixture_bubble_point`. Every element runs
+    the same bisection as the scalar function and stops iterating as soon as
+    it converges, so the results are identical.
+
+    Returns:
+        The mixture's bubble point Pb (psi) as an array.
+    """
+    shape = np.broadcast(_temperature,
+                         _gas_specific_gravity,
+                         _oil_api_gravity,
+                         _water_cut,
+                         _production_gas_liquid_ratio).shape
+    # Flat copies, so scalars (0-d) work too
+    size = int(np.prod(shape))
+    temperature = np.broadcast_to(_temperature, shape).reshape(size)
+    gas_specific_gravity = np.broadcast_to(_gas_specific_gravity,
+                                           shape).reshape(size)
+    oil_api_gravity = np.broadcast_to(_oil_api_gravity, shape).reshape(size)
+    water_cut = np.broadcast_to(_water_cut, shape).reshape(size)
+    gas_liquid_ratio = np.broadcast_to(_production_gas_liquid_ratio,
+                                       shape).reshape(size)
+
+    pressure_low = np.zeros(size)
+    pressure_high = np.full(size, 100000.0)
+    bubble_point = np.zeros(size)
+    active = np.ones(size, dtype=bool)
+    for _ in range(_max_iterations):
+        index = np.nonzero(active)
+        if not index[0].size:
+            break
+        low = pressure_low[index]
+        high = pressure_high[index]
+        middle = (low + high)/2
+        wc = water_cut[index]
+        rso = gas_solubility_in_oil(middle,
+                                    high,
+                                    temperature[index],
+                                    gas_specific_gravity[index],
+                                    oil_api_gravity[index])
+        rsw = gas_solubility_in_water(middle, high, temperature[index])
+        error = gas_liquid_ratio[index] - (1 - wc) * rso - wc * rsw
+
+        bubble_point[index] = middle
+        pressure_low[index] = np.where(error > 0.0, middle, low)
+        pressure_high[index] = np.where(error > 0.0, high, middle)
+        active[index] = np.abs(error) > 1e-10
+    return bubble_point.reshape(shape)
+
+
+def oil_compressibility(_pressure,
+                        _bubble_point,
+                        _temperature,
+                        _gas_solubility_in_oil_at_bp,
+                        _gas_specific_gravity,
+                        _oil_api_gravity):
+    """
+    Array version of `correlations.oil_compressibility`. Elements below the
+    bubble point are set to zero instead of raising an error.
+    """
+    numerator = (-1433 +
+                 5 * _gas_solubility_in_oil_at_bp +
+                 17.2 * _temperature -
+                 1180 * _gas_specific_gravity +
+                 12.61 * _oil_api_gravity)
+    denominator = (_pressure + 14.7) * (10 ** 5)
+    return np.where(_pressure >= _bubble_point, numerator/denominator, 0.0)
+
+
+def oil_formation_volume_factor(_pressure,
+                                _bubble_point,
+                                _temperature,
+                                _gas_solubility_in_oil,
+                                _gas_specific_gravity,
+                                _oil_specific_gravity,
+                                _oil_compressibility=0.0):
+    """
+    Array version of `correlations.oil_formation_volume_factor`.
+    """
+    result = (0.9759 + 12e-5 * (
+        _gas_solubility_in_oil *
+        np.sqrt(_gas_specific_gravity/_oil_specific_gravity) +
+        1.25 * _temperature
+    ) ** 1.2)
+    return np.where(
+        _pressure > _bubble_point,
+        result * np.exp(_oil_compressibility * (_bubble_point - _pressure)),
+        result
+    )
+
+
+def water_compressibility(_pressure,
+                          _bubble_point,
+                          _temperature,
+                          _gas_solubility_in_water_at_bp,
+                          _backend=None):
+    """
+    Array version of `correlations.water_compressibility`. Elements below the
+    bubble point are set to zero instead of raising an error.
+    ``_backend`` selects NumPy or the fused numexpr kernel (see
+    `fused.set_backend`).
+    """
+    if fused.backend(_backend) == "numexpr":
+        return fused.evaluate("water_compressibility",
+                              pressure=_pressure,
+                              bubble_point=_bubble_point,
+                              temperature=_temperature,
+                              solubility=_gas_solubility_in_water_at_bp)
+    term_a = 3.8546 - 1.34e-4 * (_pressure + 14.7)
+    term_b = -0.01052 + 4.77e-7 * (_pressure + 14.7)
+    term_c = 3.9267e-5 - 8.8e-10 * (_pressure + 14.7)
+
+    result = ((term_a + term_b * _temperature + term_c * (_temperature ** 2)) *
+              (1 + 8.9e-3 * _gas_solubility_in_water_at_bp) / 1e6)
+    return np.where(_pressure >= _bubble_point, result, 0.0)
+
+
+def water_formation_volume_factor(_pressure,
+                                  _bubble_point,
+                                  _temperature,
+                                  _water_compressibility):
+    """
+    Array version of `correlations.water_formation_volume_factor`.
+    """
+    result = (1.0 +
+              1.2e-4 * (_temperature - 60) +
+              1.0e-6 * (_temperature - 60) ** 2)
+    above = _pressure >= _bubble_point
+    return np.where(
+        above,
+        (result - 3.33e-6 * (_bubble_point + 14.7)) *
+        np.exp(_water_compressibility * (_bubble_point - _pressure)),
+        result - 3.33e-6 * (_pressure + 14.7)
+    )
+
+
+def gas_deviation_factor(_pressure, _temperature, _gas_specific_gravity):
+    """
+    Array version of `correlations.gas_deviation_factor`.
+    """
+    return correlations.gas_deviation_factor(_pressure,
+                                             _temperature,
+                                             _gas_specific_gravity)
+
+
+def gas_formation_volume_factor(_pressure,
+                                _temperature,
+                                _gas_specific_gravity,
+                                _in_cubic_feet=True):
+    """
+    Array version of `correlations.gas_formation_volume_factor`.
+    """
+    return correlations.gas_formation_volume_factor(_pressure,
+                                                    _temperature,
+                                                    _gas_specific_gravity,
+                                                    _in_cubic_feet)
+
+
+def dead_oil_viscosity(_temperature, _oil_api_gravity):
+    """
+    Array version of `correlations.dead_oil_viscosity`.
+    """
+    return correlations.dead_oil_viscosity(_temperature, _oil_api_gravity)
+
+
+def live_oil_viscosity(_pressure,
+                       _bubble_point,
+                       _temperature,
+                       _gas_solubility_in_oil,
+                       _oil_api_gravity,
+                       _backend=None):
+    """
+    Array version of `correlations.live_oil_viscosity`.
+    ``_backend`` selects NumPy or the fused numexpr kernel (see
+    `fused.set_backend`).
+    """
+    if fused.backend(_backend) == "numexpr":
+        return fused.evaluate("live_oil_viscosity",
+                              pressure=_pressure,
+                              bubble_point=_bubble_point,
+                              temperature=_temperature,
+                              solubility=_gas_solubility_in_oil,
+                              api=_oil_api_gravity)
+    _dead_oil_viscosity = dead_oil_viscosity(_temperature, _oil_api_gravity)
+
+    _live_oil_viscosity = (10.715 *
+                           (_gas_solubility_in_oil + 100) ** (-0.515) *
+                           _dead_oil_viscosity **
+                           (5.44 * (_gas_solubility_in_oil + 150) ** (-0.338)))
+
+    return np.where(
+        _pressure > _bubble_point,
+        _live_oil_viscosity *
+        ((_pressure + 14.7) / (_bubble_point + 14.7)) ** (
+            2.6 * (_pressure + 14.7) ** 1.187 * np.exp(
+                -11.513 - 8.98e-5 * (_pressure + 14.7)
+            )
+        ),
+        _live_oil_viscosity
+    )
+
+
+def gas_viscosity(_temperature,
+                  _gas_specific_gravity,
+                  _gas_density,
+                  _backend=None):
+    """
+    Array version of `correlations.gas_viscosity`.
+    ``_backend`` selects NumPy or the fused numexpr kernel (see
+    `fused.set_backend`).
+    """
+    if fused.backend(_backend) == "numexpr":
+        return fused.evaluate("gas_viscosity",
+                              temperature=_temperature,
+                              gravity=_gas_specific_gravity,
+                              density=_gas_density)
+    molecular_weight = 28.97 * _gas_specific_gravity
+    x_exponent = 3.5 + 986 / (_temperature + 460) + 0.01 * molecular_weight
+    y_exponent = 2.4 - 0.2 * x_exponent
+    _gas_viscosity = (
+        (9.4 + 0.02 * molecular_weight) * ((_temperature + 460.) ** 1.5) /
+        (209. + 19. * molecular_weight + _temperature + 460) *
+        10 ** (-4) * np.exp(
+            x_exponent * (_gas_density / 62.4) ** y_exponent
+        )
+    )
+    return _gas_viscosity
+
+
+def water_viscosity(_pressure, _temperature):
+    """
+    Array version of `correlations.water_viscosity`.
+    """
+    return correlations.water_viscosity(_pressure, _temperature)
+
+
+def live_oil_gas_surface_tension(_dead_oil_surface_tension,
+                                 _gas_solubility_in_oil):
+    """
+    Array version of `correlations.live_oil_gas_surface_tension`.
+    """
+    return _dead_oil_surface_tension * (
+        0.056379 +
+        0.94362 * np.exp(
+            -3.8491e-3 * _gas_solubility_in_oil
+        )
+    )
+
+
+def free_gas_liquid_ratio(_pressure,
+                          _bubble_point,
+                          _gas_solubility_in_oil,
+                          _gas_solubility_in_water,
+                          _water_cut,
+                          _production_gas_liquid_ratio):
+    """
+    Array version of `formulas.free_gas_liquid_ratio`.
+    """
+    return np.where(
+        _pressure >= _bubble_point,
+        0.0,
+        _production_gas_liquid_ratio -
+        _gas_solubility_in_oil * (1 - _water_cut) -
+        _gas_solubility_in_water * _water_cut
+    )
+
+
+def flow_pattern(_froude_number, _no_slip_liquid_fraction):
+    """
+    Array version of `formulas.flow_pattern`.
+
+    Returns:
+        An ``int8`` array with the `FlowPattern` values.
+    """
+    fr1, fr2, fr3, fr4 = formulas.transition_froude_numbers(
+        _no_slip_liquid_fraction
+    )
+    return np.select(
+        [
+            (_froude_number > fr1) | (_froude_number > fr4),
+            _froude_number > fr3,
+            _froude_number > fr2
+        ],
+        [DISTRIBUTED, INTERMITTENT, TRANSITION],
+        SEGREGATED
+    ).astype(np.int8)
+
+
+_HORZ_CONSTANTS = np.array([
+    (np.nan, np.nan, np.nan),
+    (1.065, 0.5824, 0.0609),  # distributed
+    (0.845, 0.5351, 0.0173),  # intermittent
+    (np.nan, np.nan, np.nan),  # transition
+    (0.980, 0.4846, 0.0868),  # segregated
+    (np.nan, np.nan, np.nan),
+])
+
+_INCL_CONSTANTS = np.array([
+    (np.nan, np.nan, np.nan, np.nan),
+    (1.0, 1.0, 1.0, 1.0),  # distributed
+    (2.960, 0.3050, -0.4473, 0.0978),  # intermittent
+    (1.0, 1.0, 1.0, 1.0),  # transition
+    (0.011, -3.7680, 3.5390, -1.6140),  # segregated
+    (4.700, -0.3692, 0.1244, -0.5056),  # downward
+])
+
+
+def _holdup_for_pattern(_pattern, _froude_number, _no_slip_liquid_fraction):
+    constants = _HORZ_CONSTANTS[_pattern]
+    term_a, term_b, term_c = (constants[..., 0], constants[..., 1],
+                              constants[..., 2])
+    return np.maximum(
+        term_a *
+        _no_slip_liquid_fraction ** term_b / _froude_number ** term_c,
+        _no_slip_liquid_fraction
+    )
+
+
+def horz_liquid_holdup(_flow_pattern,
+                       _froude_number,
+                       _no_slip_liquid_fraction):
+    """
+    Array version of `formulas.horz_liquid_holdup`. ``_flow_pattern`` must
+    hold `FlowPattern` values (as returned by `flow_pattern`).
+    """
+    _flow_pattern, _froude_number, _no_slip_liquid_fraction = (
+        np.broadcast_arrays(_flow_pattern,
+                            _froude_number,
+                            _no_slip_liquid_fraction)
+    )
+    transition = _flow_pattern == TRANSITION
+    pattern = np.where(transition, SEGREGATED, _flow_pattern)
+    answer = _holdup_for_pattern(pattern,
+                                 _froude_number,
+                                 _no_slip_liquid_fraction)
+    if transition.any():
+        froude = _froude_number[transition]
+        fraction = _no_slip_liquid_fraction[transition]
+        _, fr2, fr3, _ = formulas.transition_froude_numbers(fraction)
+        term_a = (fr3 - froude) / (fr3 - fr2)
+        term_b = 1 - term_a
+        answer[transition] = np.maximum(
+            term_a * answer[transition] +
+            term_b * _holdup_for_pattern(INTERMITTENT, froude, fraction),
+            fraction
+        )
+    return answer
+
+
+def liquid_holdup_with_incl(_horz_liquid_holdup,
+                            _flow_pattern,
+                            _froude_number,
+                            _no_slip_liquid_fraction,
+                            _liquid_velocity_number,
+                            _inclination):
+    """
+    Array version of `formulas.liquid_holdup_with_incl`. ``_flow_pattern``
+    must hold `FlowPattern` values.
+    """
+    constants = _INCL_CONSTANTS[_flow_pattern]
+    term_d, term_e, term_f, term_g = (constants[..., 0], constants[..., 1],
+                                      constants[..., 2], constants[..., 3])
+    inclination_rad = _inclination * np.pi/180
+
+    c_parameter = np.maximum(0, (
+        (1 - _no_slip_liquid_fraction) *
+        np.log(
+            term_d *
+            _no_slip_liquid_fraction ** term_e *
+            _liquid_velocity_number ** term_f *
+            _froude_number ** term_g
+        )
+    ))
+    c_parameter = np.where(
+        (_flow_pattern == DISTRIBUTED) | (_flow_pattern == TRANSITION),
+        0,
+        c_parameter
+    )
+
+    phi_parameter = (
+        1 + c_parameter * (
+            np.sin(1.8 * inclination_rad) -
+            0.333 * (np.sin(1.8 * inclination_rad) ** 3)
+        )
+    )
+    return np.maximum(formulas.MIN_LIQUID_HOLDUP,
+                      np.minimum(1, _horz_liquid_holdup * phi_parameter))
+
+
+def gravitational_pressure_gradient(_mixture_specific_gravity, _inclination):
+    """
+    Array version of `formulas.gravitational_pressure_gradient`.
+    """
+    _inclination_rad = _inclination * np.pi/180
+    return -0.433 * _mixture_specific_gravity * np.sin(_inclination_rad)
+
+
+def moody_friction_factor(_reynolds, _rugosity, _backend=None):
+    """
+    Array version of `formulas.moody_friction_factor`.
+    ``_backend`` selects NumPy or the fused numexpr kernel (see
+    `fused.set_backend`).
+    """
+    if fused.backend(_backend) == "numexpr":
+        return fused.evaluate("moody_friction_factor",
+                              reynolds=_reynolds,
+                              rugosity=_rugosity)
+    term_a = (
+        2.457 * np.log(
+            1 / (
+                (7/_reynolds) ** 0.9 + 0.27 * _rugosity
+            )
+        )
+    ) ** 16
+    term_b = (37530 / _reynolds) ** 16
+    answer = (
+        8 * (
+            (8 / _reynolds) ** 12 +
+            1 / ((term_a + term_b) ** (3/2))
+        ) ** (1/12)
+    )
+    return answer
+
+
+def friction_factor(_no_slip_liquid_fraction,
+                    _liquid_holdup,
+                    _moody_friction_factor):
+    """
+    Array version of `formulas.friction_factor`.
+    """
+    term_y = _no_slip_liquid_fraction / (_liquid_holdup ** 2)
+    log_y = np.log(term_y)
+    middle = (term_y >= 1.0) & (term_y <= 1.2)
+    term_s = np.where(
+        middle,
+        np.log(np.where(middle, 2.2 * term_y - 1.2, 1.0)),
+        log_y / (
+            -0.0523 +
+            3.182 * log_y -
+            0.8725 * (log_y ** 2) +
+            0.01853 * (log_y ** 4)
+        )
+    )
+    return _moody_friction_factor * np.exp(term_s)
+
+
+def fluid_properties(_pressure,
+                     _temperature,
+                     _bubble_point,
+                     _oil_api_gravity,
+                     _gas_specific_gravity,
+                     _water_specific_gravity,
+                     _water_cut,
+                     _production_gas_liquid_ratio,
+                     _pvt=None):
+    """
+    Array version of `traverse.fluid_properties`. All arguments are
+    broadcast against each other.
+    """
+    if _pvt is not None:
+        return _pvt.fluid_properties(_pressure,
+                                     _temperature,
+                                     _bubble_point,
+                                     _oil_api_gravity,
+                                     _gas_specific_gravity,
+                                     _water_specific_gravity,
+                                     _water_cut,
+                                     _production_gas_liquid_ratio)
+    bg_ft = gas_formation_volume_factor(_pressure,
+                                        _temperature,
+                                        _gas_specific_gravity,
+                                        True)
+    gas_density = formulas.gas_density(_gas_specific_gravity, bg_ft)
+    return _fluid_properties(
+        _pressure,
+        _temperature,
+        _bubble_point,
+        _oil_api_gravity,
+        _gas_specific_gravity,
+        _water_specific_gravity,
+        _water_cut,
+        _production_gas_liquid_ratio,
+        gas_formation_volume_factor(_pressure,
+                                    _temperature,
+                                    _gas_specific_gravity,
+                                    False),
+        gas_density,
+        gas_viscosity(_temperature, _gas_specific_gravity, gas_density)
+    )
+
+
+def _fluid_properties(_pressure,
+                      _temperature,
+                      _bubble_point,
+                      _oil_api_gravity,
+                      _gas_specific_gravity,
+                      _water_specific_gravity,
+                      _water_cut,
+                      _production_gas_liquid_ratio,
+                      _gas_formation_volume_factor,
+                      _gas_density,
+                      _gas_viscosity):
+    # Array version of `traverse._fluid_properties`
+    oil_specific_gravity = formulas.specific_gravity_from_api(_oil_api_gravity)
+    rsw = gas_solubility_in_water(_pressure, _bubble_point, _temperature)
+    rso = gas_solubility_in_oil(_pressure,
+                                _bubble_point,
+                                _temperature,
+                                _gas_specific_gravity,
+                                _oil_api_gravity)
+    bo = oil_formation_volume_factor(
+        _pressure,
+        _bubble_point,
+        _temperature,
+        rso,
+        _gas_specific_gravity,
+        oil_specific_gravity,
+        oil_compressibility(_pressure,
+                            _bubble_point,
+                            _temperature,
+                            rso,
+                            _gas_specific_gravity,
+                            _oil_api_gravity)
+    )
+    bw = water_formation_volume_factor(
+        _pressure,
+        _bubble_point,
+        _temperature,
+        water_compressibility(_pressure, _bubble_point, _temperature, rsw)
+    )
+    dead_oil_surface_tension = correlations.dead_oil_gas_surface_tension(
+        _temperature,
+        _oil_api_gravity
+    )
+    return {
+        "gas_solubility_in_oil": rso,
+        "gas_solubility_in_water": rsw,
+        "oil_formation_volume_factor": bo,
+        "water_formation_volume_factor": bw,
+        "gas_formation_volume_factor": _gas_formation_volume_factor,
+        "oil_density": formulas.live_oil_density(oil_specific_gravity,
+                                                 _gas_specific_gravity,
+                                                 rso,
+                                                 bo,
+                                                 _water_cut),
+        "water_density": formulas.live_water_density(_water_specific_gravity,
+                                                     _gas_specific_gravity,
+                                                     rsw,
+                                                     bw,
+                                                     _water_cut),
+        "gas_density": _gas_density,
+        "oil_viscosity": live_oil_viscosity(_pressure,
+                                            _bubble_point,
+                                            _temperature,
+                                            rso,
+                                            _oil_api_gravity),
+        "water_viscosity": water_viscosity(_pressure, _temperature),
+        "gas_viscosity": _gas_viscosity,
+        "oil_surface_tension": live_oil_gas_surface_tension(
+            dead_oil_surface_tension,
+            rso
+        ),
+        "water_surface_tension": correlations.water_gas_surface_tension(),
+        "free_gas_liquid_ratio": free_gas_liquid_ratio(
+            _pressure,
+            _bubble_point,
+            rso,
+            rsw,
+            _water_cut,
+            _production_gas_liquid_ratio
+        ),
+    }
+
+
+def gradient_intermediates(_properties,
+                           _liquid_flow_rate,
+                           _water_cut,
+                           _diameter,
+                           _inclination,
+                           _rugosity,
+                           _friction_table=None,
+                           _holdup_multiplier=None,
+                           _friction_multiplier=None):
+    """
+    Evaluates the Beggs and Brill gradient like `gradient_from_properties`
+    but returns every intermediate array: in-situ flow rates
+    (:math:`ft^3/s`), superficial and mixture velocities (:math:`ft/s`),
+    fractions, Froude and Reynolds numbers, flow pattern, holdups, mixture
+    properties, friction factors and both gradients (:math:`psi/ft`).
+
+    ``_holdup_multiplier`` scales the inclined liquid holdup (kept within
+    `formulas.MIN_LIQUID_HOLDUP` and 1) and ``_friction_multiplier`` the
+    two-phase friction factor, the usual tuning knobs when matching measured
+    pressures (see `calibration`).
+
+    Returns:
+        A dict of arrays keyed by the name of the `formulas` function (or
+        quantity) that produces each of them.
+    """
+    oil_flow_rate = formulas.in_situ_oil_flow_rate(
+        _liquid_flow_rate,
+        _properties["oil_formation_volume_factor"],
+        _water_cut
+    )
+    gas_flow_rate = formulas.in_situ_gas_flow_rate(
+        _liquid_flow_rate,
+        _properties["gas_formation_volume_factor"],
+        _properties["free_gas_liquid_ratio"]
+    )
+    water_flow_rate = formulas.in_situ_water_flow_rate(
+        _liquid_flow_rate,
+        _properties["water_formation_volume_factor"],
+        _water_cut
+    )
+    oil_velocity = formulas.superficial_velocity(oil_flow_rate, _diameter)
+    gas_velocity = formulas.superficial_velocity(gas_flow_rate, _diameter)
+    water_velocity = formulas.superficial_velocity(water_flow_rate, _diameter)
+    mixture_velocity = oil_velocity + gas_velocity + water_velocity
+
+    no_slip_liquid_fraction = formulas.no_slip_liquid_fraction(oil_velocity,
+                                                               gas_velocity,
+                                                               water_velocity)
+    water_fraction = formulas.water_fraction(oil_velocity, water_velocity)
+    froude = formulas.froude_number(mixture_velocity, _diameter)
+    pattern = flow_pattern(froude, no_slip_liquid_fraction)
+    horz_holdup = horz_liquid_holdup(pattern, froude, no_slip_liquid_fraction)
+
+    liquid_density = formulas.estimate_fluid_property(
+        _properties["oil_density"],
+        _properties["water_density"],
+        water_fraction
+    )
+    liquid_surface_tension = formulas.estimate_fluid_property(
+        _properties["oil_surface_tension"],
+        _properties["water_surface_tension"],
+        water_fraction
+    )
+    liquid_velocity_number = formulas.liquid_velocity_number(
+        oil_velocity + water_velocity,
+        liquid_density,
+        liquid_surface_tension
+    )
+    liquid_holdup = liquid_holdup_with_incl(
+        horz_holdup,
+        np.where(np.less(_inclination, 0), DOWNWARD, pattern),
+        froude,
+        no_slip_liquid_fraction,
+        liquid_velocity_number,
+        _inclination
+    )
+    if _holdup_multiplier is not None:
+        liquid_holdup = np.clip(liquid_holdup * _holdup_multiplier,
+                                formulas.MIN_LIQUID_HOLDUP, 1)
+
+    liquid_viscosity = formulas.estimate_fluid_property(
+        _properties["oil_viscosity"],
+        _properties["water_viscosity"],
+        water_fraction
+    )
+    mixture_viscosity_no_slip = formulas.estimate_fluid_property(
+        liquid_viscosity,
+        _properties["gas_viscosity"],
+        1 - no_slip_liquid_fraction
+    )
+    mixture_density_no_slip = formulas.estimate_fluid_property(
+        liquid_density,
+        _properties["gas_density"],
+        1 - no_slip_liquid_fraction
+    )
+    mixture_density_holdup = formulas.estimate_fluid_property(
+        liquid_density,
+        _properties["gas_density"],
+        1 - liquid_holdup
+    )
+    reynolds = formulas.reynolds(mixture_density_no_slip,
+                                 mixture_velocity,
+                                 _diameter,
+                                 mixture_viscosity_no_slip)
+    if _friction_table is None:
+        moody_friction = moody_friction_factor(reynolds, _rugosity)
+    else:
+        moody_friction = _friction_table.evaluate(reynolds)
+    friction = friction_factor(no_slip_liquid_fraction,
+                               liquid_holdup,
+                               moody_friction)
+    if _friction_multiplier is not None:
+        friction = friction * _friction_multiplier
+
+    gravitational = gravitational_pressure_gradient(
+        formulas.density_to_specific_gravity(mixture_density_holdup),
+        _inclination
+    )
+    frictional = formulas.frictional_pressure_gradient(
+        friction,
+        formulas.density_to_specific_gravity(mixture_density_no_slip),
+        mixture_velocity,
+        _diameter
+    )
+    return {
+        "in_situ_oil_flow_rate": oil_flow_rate,
+        "in_situ_gas_flow_rate": gas_flow_rate,
+        "in_situ_water_flow_rate": water_flow_rate,
+        "oil_superficial_velocity": oil_velocity,
+        "gas_superficial_velocity": gas_velocity,
+        "water_superficial_velocity": water_velocity,
+        "mixture_velocity": mixture_velocity,
+        "no_slip_liquid_fraction": no_slip_liquid_fraction,
+        "water_fraction": water_fraction,
+        "froude_number": froude,
+        "flow_pattern": pattern,
+        "horz_liquid_holdup": horz_holdup,
+        "liquid_density": liquid_density,
+        "liquid_surface_tension": liquid_surface_tension,
+        "liquid_velocity_number": liquid_velocity_number,
+        "liquid_holdup": liquid_holdup,
+        "liquid_viscosity": liquid_viscosity,
+        "mixture_viscosity_no_slip": mixture_viscosity_no_slip,
+        "mixture_density_no_slip": mixture_density_no_slip,
+        "mixture_density_holdup": mixture_density_holdup,
+        "reynolds": reynolds,
+        "moody_friction_factor": moody_friction,
+        "friction_factor": friction,
+        "gravitational_pressure_gradient": gravitational,
+        "frictional_pressure_gradient": frictional,
+    }
+
+
+def gradient_from_properties(_properties,
+                             _liquid_flow_rate,
+                             _water_cut,
+                             _diameter,
+                             _inclination,
+                             _rugosity,
+                             _friction_table=None,
+                             _holdup_multiplier=None,
+                             _friction_multiplier=None):
+    """
+    Array version of `traverse.gradient_from_properties` (see
+    `gradient_intermediates` for the multipliers).
+
+    Returns:
+        A tuple ``(gravitational, frictional, flow_pattern)`` of arrays, the
+        flow pattern holding `FlowPattern` values.
+    """
+    intermediates = gradient_intermediates(_properties,
+                                           _liquid_flow_rate,
+                                           _water_cut,
+                                           _diameter,
+                                           _inclination,
+                                           _rugosity,
+                                           _friction_table,
+                                           _holdup_multiplier,
+                                           _friction_multiplier)
+    return (intermediates["gravitational_pressure_gradient"],
+            intermediates["frictional_pressure_gradient"],
+            intermediates["flow_pattern"])
+
+
+def pressure_gradient(_pressure,
+                      _temperature,
+                      _bubble_point,
+                      _oil_api_gravity,
+                      _gas_specific_gravity,
+                      _water_specific_gravity,
+                      _water_cut,
+                      _production_gas_liquid_ratio,
+                      _liquid_flow_rate,
+                      _diameter,
+                      _inclination,
+                      _rugosity,
+                      _friction_table=None,
+                      _holdup_multiplier=None,
+                      _friction_multiplier=None,
+                      _pvt=None):
+    """
+    Array version of `traverse.pressure_gradient` (see
+    `gradient_intermediates` for the multipliers).
+    """
+    properties = fluid_properties(_pressure,
+                                  _temperature,
+                                  _bubble_point,
+                                  _oil_api_gravity,
+                                  _gas_specific_gravity,
+                                  _water_specific_gravity,
+                                  _water_cut,
+                                  _production_gas_liquid_ratio,
+                                  _pvt)
+    return gradient_from_properties(properties,
+                                    _liquid_flow_rate,
+                                    _water_cut,
+                                    _diameter,
+                                    _inclination,
+                                    _rugosity,
+                                    _friction_table,
+                                    _holdup_multiplier,
+                                    _friction_multiplier)
+
+
+def traverse(_pressure,
+             _lengths,
+             _inclinations,
+             _temperatures,
+             _oil_api_gravity,
+             _gas_specific_gravity,
+             _water_specific_gravity,
+             _water_cut,
+             _production_gas_liquid_ratio,
+             _liquid_flow_rate,
+             _diameter,
+             _rugosity,
+             _against_flow=False,
+             _tolerance=1e-3,
+             _max_iterations=20,
+             _friction_table=None,
+             _bubble_points=None,
+             _holdup_multiplier=None,
+             _friction_multiplier=None,
+             _pvt=None,
+             _cache=None):
+    """
+    Array version of `traverse.traverse` that marches many independent
+    cases at once. Per-case arguments are 1-D arrays (or scalars) of the same
+    length; segment geometry is shared. ``_temperatures`` may be a sequence
+    of node temperatures or a ``(cases, nodes)`` array.
+
+    ``_bubble_points`` optionally gives the bubble point of every segment
+    (an array whose last axis runs over segments), which skips its
+    computation when the fluid and temperatures are reused across calls.
+    The multipliers (per case arrays or scalars) tune the holdup and the
+    friction factor (see `gradient_intermediates`). ``_pvt`` replaces the
+    correlations of the bubble points and fluid properties (see `pvt`), and
+    ``_cache`` is the result cache consulted first (see `traverse.traverse`).
+
+    Returns:
+        A tuple ``(pressures, flow_patterns)`` of ``(cases, nodes)`` and
+        ``(cases, segments)`` arrays.
+    """
+    arguments = dict(locals())
+    cache = _CACHE if _cache is None else _cache
+    if cache:
+        del arguments["_cache"]
+        return cache.call("vectorized.traverse", traverse, arguments)
+    shape = np.broadcast(_pressure,
+                         _oil_api_gravity,
+                         _gas_specific_gravity,
+                         _water_specific_gravity,
+                         _water_cut,
+                         _production_gas_liquid_ratio,
+                         _liquid_flow_rate,
+                         _diameter,
+                         _rugosity).shape
+    temperatures = np.asarray(_temperatures, dtype=float)
+    direction = -1.0 if _against_flow else 1.0
+    pressures = np.empty(shape + (len(_lengths) + 1,))
+    patterns = np.empty(shape + (len(_lengths),), dtype=np.int8)
+    pressures[..., 0] = _pressure
+    pressure_drop = np.zeros(shape)
+    for i, length in enumerate(_lengths):
+        pressure = pressures[..., i]
+        temperature = (temperatures[..., i] + temperatures[..., i + 1]) / 2
+        if _bubble_points is None:
+            bubble_point = (mixture_bubble_point if _pvt is None
+                            else _pvt.mixture_bubble_point)(
+                temperature,
+                _gas_specific_gravity,
+                _oil_api_gravity,
+                _water_cut,
+                _production_gas_liquid_ratio
+            )
+        else:
+            bubble_point = np.asarray(_bubble_points)[..., i]
+        active = np.ones(shape, dtype=bool)
+        for _ in range(_max_iterations):
+            gravitational, frictional, pattern = pressure_gradient(
+                pressure + pressure_drop / 2,
+                temperature,
+                bubble_point,
+                _oil_api_gravity,
+                _gas_specific_gravity,
+                _water_specific_gravity,
+                _water_cut,
+                _production_gas_liquid_ratio,
+                _liquid_flow_rate,
+                _diameter,
+                _inclinations[i],
+                _rugosity,
+                _friction_table,
+                _holdup_multiplier,
+                _friction_multiplier,
+                _pvt
+            )
+            new_pressure_drop = (
+                direction * (gravitational + frictional) * length
+            )
+            converged = np.abs(new_pressure_drop - pressure_drop) < _tolerance
+            pressure_drop = np.where(active, new_pressure_drop, pressure_drop)
+            patterns[..., i] = np.where(active, pattern, patterns[..., i])
+            active &= ~converged
+            if not active.any():
+                break
+        pressures[..., i + 1] = pressure + pressure_drop
+    return pressures, patterns